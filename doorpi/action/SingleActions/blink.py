@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from doorpi.action.base import SingleAction
+import doorpi
+
+def blink(pin, on_time, off_time, cycles, on_value, off_value):
+    return doorpi.DoorPi().keyboard.output_scheduler.blink(pin, on_value, off_value, on_time, off_time, cycles)
+
+def get(parameters):
+    parameter_list = parameters.split(',')
+    if len(parameter_list) not in [3, 4, 6]: return None
+
+    pin = parameter_list[0]
+    on_time = float(parameter_list[1])
+    off_time = float(parameter_list[2])
+    cycles = int(parameter_list[3]) if len(parameter_list) > 3 else 0
+
+    if len(parameter_list) == 6:
+        on_value = parameter_list[4]
+        off_value = parameter_list[5]
+    else:
+        on_value = 'HIGH'
+        off_value = 'LOW'
+
+    return BlinkAction(blink,
+        pin = pin,
+        on_time = on_time,
+        off_time = off_time,
+        cycles = cycles,
+        on_value = on_value,
+        off_value = off_value
+    )
+
+class BlinkAction(SingleAction):
+    pass
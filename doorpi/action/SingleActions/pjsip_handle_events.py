@@ -9,7 +9,9 @@ from doorpi.action.base import SingleAction
 import doorpi
 
 def pjsip_handle_events(timeout):
-    doorpi.DoorPi().sipphone.self_check(timeout)
+    # the pump thread is the only one registered at the SIP library
+    sipphone = doorpi.DoorPi().sipphone
+    sipphone.pump.run_in_thread(sipphone.self_check, timeout)
 
 def get(parameters):
     parameter_list = parameters.split(',')
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from doorpi.action.base import SingleAction
+import doorpi
+
+
+def ringgroup(*targets):
+    doorpi.DoorPi().sipphone.call_group(list(targets))
+
+def get(parameters):
+    parameter_list = [parameter.strip() for parameter in parameters.split(',') if parameter.strip()]
+    if len(parameter_list) < 1: return None
+
+    return RingGroupAction(ringgroup, *parameter_list)
+
+class RingGroupAction(SingleAction):
+    pass
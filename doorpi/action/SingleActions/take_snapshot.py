@@ -6,8 +6,8 @@ from doorpi.action.base import SingleAction
 import doorpi
 import subprocess as sub
 import os
-import datetime
-import glob
+from doorpi.camera.SnapshotCatalogue import load_catalogue
+from doorpi.action.http_client import load_http_client
 
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
@@ -17,56 +17,63 @@ DOORPI_SECTION = 'DoorPi'
 
 
 def get_last_snapshot(snapshot_path=None):
-    if not snapshot_path:
-        snapshot_path = conf.get_string_parsed(DOORPI_SECTION, 'snapshot_path', '/tmp')
-    files = sorted(glob.glob(os.path.join(snapshot_path, "*.*")), key=os.path.getctime)
-    if len(files) > 0:
-        return files[-1]
-    else:
-        return False
+    return load_catalogue(snapshot_path).latest() or False
 
 
 def get_next_filename(snapshot_path):
-    if not os.path.exists(snapshot_path):
-        os.makedirs(snapshot_path)
+    # reserved in the catalogue - add_snapshot() or release_snapshot() after the capture
+    return load_catalogue(snapshot_path).reserve()
+
+
+def add_snapshot(filename):
+    load_catalogue(os.path.dirname(filename)).add(filename, conf.get_int(DOORPI_SECTION, 'number_of_snapshots', 10))
+    conf.set_value(DOORPI_SECTION, 'last_snapshot', filename)
+    return filename
 
-    files = sorted(glob.glob(os.path.join(snapshot_path, "*.*")), key=os.path.getctime)
-    if len(files) > conf.get_int(DOORPI_SECTION, 'number_of_snapshots', 10):
-        try:
-            os.remove(os.path.join(snapshot_path, files[0]))
-        except OSError as exp:
-            logger.warning("couldn't delete snapshot file %s with error %s" % (files[0], exp))
 
-    return os.path.join(
-        snapshot_path,
-        datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")+".jpg"
-    )
+def release_snapshot(filename):
+    load_catalogue(os.path.dirname(filename)).release(filename)
+    return False
 
 
 def get_snapshot_from_picam(snapshot_path):
     import picamera
     filename = get_next_filename(snapshot_path)
-    with picamera.PiCamera() as camera:
-        camera.resolution = (1024, 768)
-        camera.capture(filename)
-    conf.set_value(DOORPI_SECTION, 'last_snapshot', filename)
-    return filename
+    try:
+        with picamera.PiCamera() as camera:
+            camera.resolution = (1024, 768)
+            camera.capture(filename)
+    except:
+        release_snapshot(filename)
+        raise
+    return add_snapshot(filename)
+
+
+def get_snapshot_from_camera(snapshot_path):
+    # frame of the running camera service at the time of the key press - no warm up
+    filename = get_next_filename(snapshot_path)
+    if not doorpi.DoorPi().camera.snapshot(filename):
+        return release_snapshot(filename)
+    return add_snapshot(filename)
 
 
 def get_snapshot_from_url(snapshot_path, url):
-    import requests
     filename = get_next_filename(snapshot_path)
-    r = requests.get(url, stream=True)
-    with open(filename, 'wb') as fd:
-        for chunk in r.iter_content(1024):
-            fd.write(chunk)
-    conf.set_value(DOORPI_SECTION, 'last_snapshot', filename)
-    return filename
+    try:
+        load_http_client().download(url, filename)
+    except:
+        release_snapshot(filename)
+        raise
+    return add_snapshot(filename)
 
 
 def get(parameters=""):
     snapshot_path = conf.get_string_parsed(DOORPI_SECTION, 'snapshot_path', '/tmp')
-    if parameters == "":
+    # reconciled with the directory at startup
+    load_catalogue(snapshot_path)
+    if parameters == "" and doorpi.DoorPi().camera:
+        return SnapShotAction(get_snapshot_from_camera, snapshot_path=snapshot_path)
+    elif parameters == "":
         return SnapShotAction(get_snapshot_from_picam, snapshot_path=snapshot_path)
     else:
         return SnapShotAction(get_snapshot_from_url, snapshot_path=snapshot_path, url=parameters)
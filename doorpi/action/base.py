@@ -29,6 +29,10 @@ class SingleAction:
         else:
             self.action_name = self.__class__.__name__
 
+    @property
+    def action_module(self):
+        return self.__class__.__module__.split('.')[-1]
+
     def __str__(self):
         return self.name
 
@@ -9,11 +9,14 @@ import threading
 import time # used by: fire_event_synchron
 from inspect import isfunction, ismethod # used by: register_action
 import string, random # used by event_id
+from collections import deque # used by: EventLane
+from fnmatch import fnmatchcase # used by: EventHandler.get_lane
 
 import sqlite3
 import os
 
 from base import SingleAction
+from input_trace import TRACE_ACTION, action_identity
 import doorpi
 
 class EnumWaitSignalsClass():
@@ -30,15 +33,74 @@ EnumWaitSignals = EnumWaitSignalsClass()
 
 ONTIME = 'OnTime'
 
+EVENTHANDLER_SECTION = 'EventHandler'
+
+LANE_CRITICAL = 'critical'
+LANE_TIMER = 'timer'
+LANE_NORMAL = 'normal'
+LANE_BESTEFFORT = 'besteffort'
+# ordered from highest to lowest priority
+LANES = [LANE_CRITICAL, LANE_TIMER, LANE_NORMAL, LANE_BESTEFFORT]
+
+# the OnTime ticks and the watchdog have their own workers - hanging HTTP requests or mails
+# in the besteffort lane must not delay the feeding of the watchdog until the board reboots
+LANE_DEFAULTS = {
+    LANE_CRITICAL:      dict(events = '', actions = 'out,out_triggered,blink,call,ringgroup,hangup',
+                             workers = 0, max_queued = 0),
+    LANE_TIMER:         dict(events = 'OnTime*', actions = 'statuswatchdog', workers = 4, max_queued = 0),
+    LANE_NORMAL:        dict(events = '', actions = '', workers = 0, max_queued = 0),
+    LANE_BESTEFFORT:    dict(events = '', actions = 'mailto,statusfile,url_call,ipsrpc_setvalue,take_snapshot',
+                             workers = 2, max_queued = 100)
+}
+
+LANE_LATENCY_SAMPLES = 500
+LANE_WORKER_IDLE_TIMEOUT = 5
+
 def id_generator(size = 6, chars = string.ascii_uppercase + string.digits):
     return ''.join(random.choice(chars) for _ in range(size))
 
+# correlation id of the event whose actions run in this thread - events fired by these
+# actions get it in their kwargs, so one key press and all its follow-up events share it
+correlation_context = threading.local()
+
+def new_correlation_id(): return id_generator(10)
+def current_correlation_id(): return getattr(correlation_context, 'correlation_id', None)
+def set_correlation_id(correlation_id): correlation_context.correlation_id = correlation_id
+
 class EventLog(object):
+    """ event and action log in SQLite
+
+    Inserts are committed together (group commit) at most commit_interval seconds after
+    the first uncommitted insert - one commit per event would cost more than the event.
+    commit_interval = 0 commits every insert.
+    """
 
     _db = False
 
+    @property
+    def statistic(self):
+        with self.__lock:
+            persist_times = sorted(self.__persist_times)
+            return {
+                'committed':        self.__committed,
+                'uncommitted':      len(self.__uncommitted),
+                'commit_interval':  self.__commit_interval,
+                'persist_time':     {
+                    'avg':  sum(persist_times) / len(persist_times) if persist_times else 0,
+                    'p50':  percentile(persist_times, 50),
+                    'p95':  percentile(persist_times, 95),
+                    'max':  max(persist_times) if persist_times else 0
+                }
+            }
+
     #doorpi.DoorPi().conf.get_string_parsed('DoorPi', 'eventlog', '!BASEPATH!/conf/eventlog.db')
-    def __init__(self, file_name):
+    def __init__(self, file_name, commit_interval = 1):
+        self.__lock = threading.RLock()
+        self.__commit_interval = commit_interval
+        self.__commit_job = None
+        self.__uncommitted = []
+        self.__committed = 0
+        self.__persist_times = deque(maxlen = LANE_LATENCY_SAMPLES)
 
         if not file_name: return
         try:
@@ -69,6 +131,7 @@ class EventLog(object):
                     action_result TEXT
                 );'''
             )
+            self._db.commit()
         except:
             logger.error('error to create event_db')
 
@@ -118,7 +181,31 @@ class EventLog(object):
     def execute_sql(self, sql):
         if not self._db: return
         #logger.trace('fire sql: %s', sql)
-        return self._db.execute(sql)
+        with self.__lock:
+            return self._db.execute(sql)
+
+    def __commit_later(self, event_time = None):
+        if not self._db: return
+        with self.__lock:
+            if event_time is not None: self.__uncommitted.append(event_time)
+            if self.__commit_job: return
+            scheduler = doorpi.DoorPi().scheduler
+            if self.__commit_interval <= 0 or scheduler is None: return self.commit()
+            self.__commit_job = scheduler.call_later(self.__commit_interval, self.commit)
+
+    def commit(self):
+        if not self._db: return
+        with self.__lock:
+            self.__commit_job = None
+            try:
+                self._db.commit()
+            except sqlite3.Error as exp:
+                logger.error('could not commit event log: %s', exp)
+                return
+            now = time.time()
+            self.__persist_times.extend(now - event_time for event_time in self.__uncommitted)
+            self.__committed += len(self.__uncommitted)
+            self.__uncommitted = []
 
     def insert_event_log(self, event_id, fired_by, event_name, start_time, additional_infos):
         sql_statement = '''
@@ -133,6 +220,18 @@ class EventLog(object):
             additional_infos = str(additional_infos).replace('"', "'")
         )
         self.execute_sql(sql_statement)
+        self.__commit_later(start_time)
+
+    def insert_event_logs(self, rows):
+        # several events at once - rows of (event_id, fired_by, event_name, start_time, additional_infos)
+        if not self._db or not rows: return
+        with self.__lock:
+            self._db.executemany('INSERT INTO event_log VALUES (?, ?, ?, ?, ?);', [(
+                event_id, fired_by.replace('"', "'"), event_name.replace('"', "'"), start_time,
+                str(additional_infos).replace('"', "'")
+            ) for event_id, fired_by, event_name, start_time, additional_infos in rows])
+            self.__uncommitted.extend(row[3] for row in rows)
+            self.__commit_later()
 
     def insert_action_log(self, event_id, action_name, start_time, action_result):
         sql_statement = '''
@@ -146,16 +245,167 @@ class EventLog(object):
             action_result = str(action_result).replace('"', "'")
         )
         self.execute_sql(sql_statement)
+        self.__commit_later()
 
     def update_event_log(self):
         pass
 
     def destroy(self):
+        self.commit()
         try: self._db.close()
         except: pass
 
     __del__ = destroy
 
+def percentile(sorted_values, percent):
+    if not sorted_values: return 0
+    index = int(round((len(sorted_values) - 1) * percent / 100.0))
+    return sorted_values[index]
+
+class EventLane(object):
+    """ queue with own worker threads for events of one priority class
+
+    max_workers = 0 means a new worker is started whenever no idle worker is left,
+    so work in this lane never waits for other work. Idle workers stop after
+    LANE_WORKER_IDLE_TIMEOUT seconds.
+
+    Work submitted with a key replaces the pending work with the same key (only the newest
+    OnTime tick of an event waits). With max_queued > 0 the oldest pending work is dropped,
+    when the queue is full.
+    """
+
+    @property
+    def workers(self): return len(self.__workers)
+
+    @property
+    def idle_workers(self): return self.__idle_workers
+
+    @property
+    def queued(self): return len(self.__queue)
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            wait_times = sorted(self.__wait_times)
+            run_times = sorted(self.__run_times)
+            return {
+                'max_workers':      self.max_workers,
+                'workers':          len(self.__workers),
+                'idle_workers':     self.__idle_workers,
+                'queued':           len(self.__queue),
+                'max_queued':       self.max_queued,
+                'processed':        self.__processed,
+                'coalesced':        self.__coalesced,
+                'dropped':          self.__dropped,
+                'wait_time':        self.__time_statistic(wait_times, self.__max_wait_time),
+                'run_time':         self.__time_statistic(run_times, self.__max_run_time)
+            }
+
+    @staticmethod
+    def __time_statistic(sorted_times, max_time):
+        return {
+            'avg':  sum(sorted_times) / len(sorted_times) if sorted_times else 0,
+            'p50':  percentile(sorted_times, 50),
+            'p95':  percentile(sorted_times, 95),
+            'max':  max_time
+        }
+
+    def __init__(self, name, max_workers = 0, max_queued = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.__queue = deque()              # [queued time, function, args, key]
+        self.__keyed = {}                   # key -> pending entry of the queue
+        self.__coalesced = 0
+        self.__dropped = 0
+        self.__condition = threading.Condition()
+        self.__workers = []
+        self.__idle_workers = 0
+        self.__started_workers = 0
+        self.__processed = 0
+        self.__wait_times = deque(maxlen = LANE_LATENCY_SAMPLES)
+        self.__run_times = deque(maxlen = LANE_LATENCY_SAMPLES)
+        self.__max_wait_time = 0
+        self.__max_run_time = 0
+        self.__stopped = False
+
+    def stop(self, timeout = 0.1):
+        # idle workers finish now instead of waiting for their timeout
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+            idle_workers = self.__idle_workers
+            workers = list(self.__workers)
+        if idle_workers is 0: return
+        for worker in workers:
+            if worker is not threading.current_thread(): worker.join(timeout)
+
+    def submit(self, function, *args):
+        self.submit_keyed(None, function, *args)
+
+    def submit_keyed(self, key, function, *args):
+        with self.__condition:
+            self.__stopped = False
+            if key is not None and key in self.__keyed:
+                # the pending work keeps its place in the queue, but runs with the newest arguments
+                self.__keyed[key][1:3] = [function, args]
+                self.__coalesced += 1
+                return
+            if self.max_queued > 0 and len(self.__queue) >= self.max_queued:
+                dropped = self.__queue.popleft()
+                if dropped[3] is not None: self.__keyed.pop(dropped[3], None)
+                self.__dropped += 1
+                logger.warning('event lane %s is full (%s) - drop %s', self.name, self.max_queued, dropped[1])
+            entry = [time.time(), function, args, key]
+            self.__queue.append(entry)
+            if key is not None: self.__keyed[key] = entry
+            if self.__idle_workers < len(self.__queue) and \
+                    (self.max_workers <= 0 or len(self.__workers) < self.max_workers):
+                self.__start_worker()
+            else:
+                self.__condition.notify()
+
+    def __start_worker(self):
+        self.__started_workers += 1
+        worker = threading.Thread(
+            target = self.__work,
+            name = "EventLane %s worker %s" % (self.name, self.__started_workers)
+        )
+        worker.daemon = True
+        self.__workers.append(worker)
+        worker.start()
+
+    def __work(self):
+        while True:
+            with self.__condition:
+                self.__idle_workers += 1
+                idle_since = time.time()
+                while not self.__queue and not self.__stopped and \
+                        time.time() - idle_since < LANE_WORKER_IDLE_TIMEOUT:
+                    self.__condition.wait(LANE_WORKER_IDLE_TIMEOUT - (time.time() - idle_since))
+                self.__idle_workers -= 1
+                if not self.__queue:
+                    self.__workers.remove(threading.current_thread())
+                    return
+                queued_time, function, args, key = self.__queue.popleft()
+                if key is not None: self.__keyed.pop(key, None)
+
+            start_time = time.time()
+            try:
+                function(*args)
+            except:
+                logger.exception('error in event lane %s while running %s', self.name, function)
+            finally:
+                self.__add_statistic(start_time - queued_time, time.time() - start_time)
+
+    def __add_statistic(self, wait_time, run_time):
+        with self.__condition:
+            self.__processed += 1
+            self.__wait_times.append(wait_time)
+            self.__run_times.append(run_time)
+            if wait_time > self.__max_wait_time: self.__max_wait_time = wait_time
+            if run_time > self.__max_run_time: self.__max_run_time = run_time
+
 class EventHandler:
 
     __Sources = [] # Auflistung Sources
@@ -163,6 +413,7 @@ class EventHandler:
     __Actions = {} # Zuordnung Event zu Actions (1: n)
 
     __additional_informations = {}
+    __listeners = []
 
     @property
     def event_history(self): return self.db.get_event_log_entries()
@@ -186,18 +437,42 @@ class EventHandler:
     @property
     def threads(self): return threading.enumerate()
     @property
-    def idle(self): return len(self.threads) - 1 is 0
+    def idle(self):
+        idle_lane_workers = sum(lane.idle_workers for lane in self.__lanes.values())
+        return len(self.threads) - 1 - idle_lane_workers <= 0
+    @property
+    def lanes(self): return self.__lanes
     @property
     def additional_informations(self): return self.__additional_informations
 
     def __init__(self):
         db_path = doorpi.DoorPi().config.get_string_parsed('DoorPi', 'eventlog', '!BASEPATH!/conf/eventlog.db')
-        self.db = EventLog(db_path)
+        self.db = EventLog(db_path, doorpi.DoorPi().config.get_float('DoorPi', 'eventlog_commit_interval', 1))
+
+        self.__lanes = {}
+        self.__lane_events = {}
+        self.__lane_actions = {}
+        self.__lane_cache = {}
+        for lane in LANES:
+            conf = doorpi.DoorPi().config
+            self.__lanes[lane] = EventLane(
+                lane,
+                conf.get_int(EVENTHANDLER_SECTION, 'lane_%s_workers' % lane, LANE_DEFAULTS[lane]['workers']),
+                conf.get_int(EVENTHANDLER_SECTION, 'lane_%s_max_queued' % lane, LANE_DEFAULTS[lane]['max_queued'])
+            )
+            self.__lane_events[lane] = [e.strip() for e in conf.get_list(
+                EVENTHANDLER_SECTION, 'lane_%s_events' % lane, LANE_DEFAULTS[lane]['events']) if e.strip()]
+            self.__lane_actions[lane] = [a.strip() for a in conf.get_list(
+                EVENTHANDLER_SECTION, 'lane_%s_actions' % lane, LANE_DEFAULTS[lane]['actions']) if a.strip()]
 
     __destroy = False
 
+    def stop_lanes(self):
+        for lane in self.__lanes.values(): lane.stop()
+
     def destroy(self, force_destroy = False):
         self.__destroy = True
+        self.stop_lanes()
         self.db.destroy()
 
     def register_source(self, event_source):
@@ -222,15 +497,55 @@ class EventHandler:
         if syncron is False: return self.fire_event_asynchron(event_name, event_source, kwargs)
         else: return self.fire_event_synchron(event_name, event_source, kwargs)
 
+    def get_lane(self, event_name):
+        if event_name in self.__lane_cache: return self.__lane_cache[event_name]
+
+        # explicit assignment of the event name wins over the assignment of its actions
+        lane_name = None
+        for lane in LANES:
+            for pattern in self.__lane_events[lane]:
+                if fnmatchcase(event_name, pattern):
+                    lane_name = lane
+                    break
+            if lane_name: break
+
+        if not lane_name:
+            # otherwise the action with the highest priority decides - actions without lane are normal
+            action_lanes = []
+            for action in self.__Actions.get(event_name, []):
+                action_lane = LANE_NORMAL
+                for lane in LANES:
+                    if action.action_module in self.__lane_actions[lane]:
+                        action_lane = lane
+                        break
+                action_lanes.append(LANES.index(action_lane))
+            lane_name = LANES[min(action_lanes)] if action_lanes else LANE_NORMAL
+
+        self.__lane_cache[event_name] = lane_name
+        return lane_name
+
     def fire_event_asynchron(self, event_name, event_source, kwargs = None):
         silent = ONTIME in event_name
         if self.__destroy and not silent: return False
-        if not silent: logger.trace("fire Event %s from %s asyncron", event_name, event_source)
-        return threading.Thread(
-            target = self.fire_event_synchron,
-            args = (event_name, event_source, kwargs),
-            name = "%s from %s" % (event_name, event_source)
-        ).start()
+        lane = self.get_lane(event_name)
+        if not silent: logger.trace("fire Event %s from %s asyncron in lane %s", event_name, event_source, lane)
+        kwargs = self.__fired(event_name, event_source, kwargs, silent)
+        # a tick that still waits is replaced by the newer one
+        self.__lanes[lane].submit_keyed(event_name if silent else None, self.__fire_event, event_name, event_source, kwargs)
+
+    def fire_events_asynchron(self, events, event_source):
+        # the events of one input, e.g. the nine events of a key press, as (event_name, kwargs):
+        # events with actions are fired like fire_event_asynchron, the others are only written
+        # to the event log - with one insert in this thread instead of one worker per event
+        if self.__destroy: return False
+        logged = []
+        for event_name, kwargs in events:
+            if event_name in self.__Actions or ONTIME in event_name:
+                self.fire_event_asynchron(event_name, event_source, kwargs)
+                continue
+            kwargs = self.__fired(event_name, event_source, kwargs, False)
+            logged.append((id_generator(), event_source, event_name, time.time(), kwargs))
+        self.db.insert_event_logs(logged)
 
     def fire_event_asynchron_daemon(self, event_name, event_source, kwargs = None):
         logger.trace("fire Event %s from %s asyncron and as daemons", event_name, event_source)
@@ -242,7 +557,45 @@ class EventHandler:
         t.daemon = True
         t.start()
 
+    @staticmethod
+    def __record_sipphone_event(event_name, event_source, kwargs):
+        trace_recorder = doorpi.DoorPi().trace_recorder
+        if trace_recorder and trace_recorder.active:
+            trace_recorder.record_sipphone_event(event_name, event_source, kwargs)
+
+    def add_listener(self, callback):
+        # callback(event_name, event_source, kwargs, fire_time) for every fired event except OnTime*
+        self.__listeners.append(callback)
+
+    def __fired(self, event_name, event_source, kwargs, silent):
+        if not silent:
+            correlation_id = current_correlation_id()
+            if correlation_id and (kwargs is None or 'correlation_id' not in kwargs):
+                kwargs = dict(kwargs or {}, correlation_id = correlation_id)
+        self.__record_sipphone_event(event_name, event_source, kwargs)
+        if not silent:
+            fire_time = time.time()
+            for listener in self.__listeners:
+                try:
+                    listener(event_name, event_source, kwargs, fire_time)
+                except Exception:
+                    logger.exception('error in event listener %s', listener)
+        return kwargs
+
     def fire_event_synchron(self, event_name, event_source, kwargs = None):
+        kwargs = self.__fired(event_name, event_source, kwargs, ONTIME in event_name)
+        return self.__fire_event(event_name, event_source, kwargs)
+
+    def __fire_event(self, event_name, event_source, kwargs = None):
+        # the actions of the event run with its correlation id
+        previous_correlation_id = current_correlation_id()
+        set_correlation_id(kwargs.get('correlation_id') if kwargs else None)
+        try:
+            return self.__fire_event_actions(event_name, event_source, kwargs)
+        finally:
+            set_correlation_id(previous_correlation_id)
+
+    def __fire_event_actions(self, event_name, event_source, kwargs = None):
         silent = ONTIME in event_name
         if self.__destroy and not silent: return False
 
@@ -278,8 +631,11 @@ class EventHandler:
             self.__additional_informations[event_name]['last_duration'] = None
 
         if not silent: logger.debug("[%s] fire for event %s this actions %s ", event_fire_id, event_name, self.__Actions[event_name])
+        trace_recorder = doorpi.DoorPi().trace_recorder
+        if silent or trace_recorder and not trace_recorder.active: trace_recorder = None
         for action in self.__Actions[event_name]:
             if not silent: logger.trace("[%s] try to fire action %s", event_fire_id, action)
+            if trace_recorder: trace_recorder.record(TRACE_ACTION, event_name, action_identity(action))
             try:
                 result = action.run(silent)
                 if not silent: self.db.insert_action_log(event_fire_id, action.name, start_time, result)
@@ -347,6 +703,7 @@ class EventHandler:
             action_object.single_fire_action = True
             del kwargs['single_fire_action']
 
+        self.__lane_cache.pop(event_name, None)
         if event_name in self.__Actions:
             self.__Actions[event_name].append(action_object)
             logger.trace("action %s was added to event %s", action_object, event_name)
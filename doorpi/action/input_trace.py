@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Input trace
+#  -----------
+#
+#  With [DoorPi] trace_file = !BASEPATH!/log/input.trace every input of DoorPi is appended
+#  to the file - one line per record with tab separated fields:
+#
+#  <unix time>  K  <OnKeyDown|OnKeyPressed|OnKeyUp>  <keyboard>.<pin>
+#  <unix time>  S  <event name>  <source>  <json of the event infos>   (events of the sipphone callbacks)
+#  <unix time>  W  <event name>  <source>                              (/control/trigger_event)
+#  <unix time>  A  <event name>  <action>                              (start of an action)
+#
+#  The file can be replayed with "doorpi_cli replay --tracefile file --configfile doorpi.ini"
+#  (see doorpi/benchmark.py).
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import re
+import json
+import time
+import threading
+
+import doorpi
+
+TRACE_KEY = 'K'
+TRACE_SIPPHONE = 'S'
+TRACE_WEB = 'W'
+TRACE_ACTION = 'A'
+INPUT_KINDS = [TRACE_KEY, TRACE_SIPPHONE, TRACE_WEB]
+
+TRACE_HEADER = '# doorpi input trace v1\n'
+TRACE_FLUSH_INTERVAL = 1
+# events of these sources are recorded as sipphone inputs
+SIPPHONE_CALLBACK_SOURCES = ('doorpi.sipphone.linphone_lib.', 'doorpi.sipphone.pjsua_lib.')
+
+def clean_field(value):
+    return str(value).replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+
+def action_identity(action):
+    # without memory addresses, so the same action has the same name in every run
+    return re.sub(' at 0x[0-9a-fA-F]+', '', str(action.name))
+
+def load_trace(file_name):
+    records = []
+    with open(file_name, 'r') as trace_file:
+        for line_number, line in enumerate(trace_file, 1):
+            if line.startswith('#') or line.strip() == '': continue
+            fields = line.rstrip('\n').split('\t')
+            try:
+                records.append([float(fields[0])] + fields[1:])
+            except (ValueError, IndexError):
+                logger.warning('skip line %s of %s', line_number, file_name)
+    return records
+
+class TraceRecorder(object):
+    """ append-only recorder of all inputs and started actions
+
+    The records are written to a buffered file and flushed by the scheduler at the latest
+    TRACE_FLUSH_INTERVAL seconds later. Listeners get every record too (used by the replay).
+    Without file and listeners record() returns at once.
+    """
+
+    @property
+    def active(self): return self.__active
+
+    @property
+    def records(self): return self.__records
+
+    def __init__(self, file_name = ''):
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__flush_job = None
+        self.__listeners = []
+        self.__records = 0
+        if file_name:
+            if not os.path.exists(os.path.dirname(file_name)):
+                logger.info('Path %s does not exist - creating it now', os.path.dirname(file_name))
+                os.makedirs(os.path.dirname(file_name))
+            self.__file = open(file_name, 'a', 64 * 1024)
+            if self.__file.tell() == 0: self.__file.write(TRACE_HEADER)
+            logger.info('record inputs to %s', file_name)
+        self.__active = self.__file is not None
+
+    def add_listener(self, callback):
+        # callback(record) with record = [time, kind, field, ...]
+        with self.__lock:
+            self.__listeners.append(callback)
+            self.__active = True
+
+    def record(self, kind, *fields):
+        if not self.__active: return
+        record = [time.time(), kind] + [clean_field(field) for field in fields]
+        with self.__lock:
+            self.__records += 1
+            listeners = list(self.__listeners)
+            if self.__file:
+                self.__file.write('%.6f\t%s\n' % (record[0], '\t'.join(record[1:])))
+                self.__flush_later()
+        for listener in listeners: listener(record)
+
+    def record_sipphone_event(self, event_name, event_source, kwargs):
+        if not self.__active or not event_source.startswith(SIPPHONE_CALLBACK_SOURCES): return
+        try:
+            infos = json.dumps(dict((str(key), str(value)) for key, value in (kwargs or {}).items()))
+        except Exception:
+            infos = '{}'
+        self.record(TRACE_SIPPHONE, event_name, event_source, infos)
+
+    def __flush_later(self):
+        if self.__flush_job: return
+        scheduler = doorpi.DoorPi().scheduler
+        if scheduler is None: return self.__file.flush()
+        self.__flush_job = scheduler.call_later(TRACE_FLUSH_INTERVAL, self.flush)
+
+    def flush(self):
+        with self.__lock:
+            self.__flush_job = None
+            if self.__file: self.__file.flush()
+
+    def destroy(self):
+        with self.__lock:
+            self.__active = False
+            self.__listeners = []
+            if self.__file:
+                self.__file.close()
+                self.__file = None
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  IP-Symcon JSON-RPC client of the actions ipsrpc_setvalue and ipsrpc_call_value
+#  ------------------------------------------------------------------------------
+#
+#  [IP-Symcon]
+#  server = http://ips:3777/api/
+#  username =
+#  password =
+#  jsonrpc = 2.0
+#  cache_ttl = 300            # seconds the type of an existing variable is cached
+#  batch_delay = 0.02         # max. seconds to collect calls for one batch (0 = no batches)
+#
+#  A call is sent at once, if no other request to IP-Symcon is running. Otherwise the calls
+#  are collected until the running request is answered (at most batch_delay seconds) and
+#  sent as one JSON-RPC 2.0 batch (an array of requests) over a kept-alive connection of the
+#  HTTP client. A SetValue of a variable that is still waiting in a batch only gets the new
+#  value. Variables that don't exist are not cached - they can be created in IP-Symcon.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import itertools
+import json
+import threading
+import time
+
+from requests.auth import HTTPBasicAuth
+
+import doorpi
+from doorpi.action.http_client import load_http_client
+
+IPS_SECTION = 'IP-Symcon'
+
+# http://www.ip-symcon.de/service/dokumentation/befehlsreferenz/variablenverwaltung/ips-getvariable/
+# Variablentyp (0: Boolean, 1: Integer, 2: Float, 3: String)
+TYPE_BOOLEAN = 0
+TYPE_INTEGER = 1
+TYPE_FLOAT = 2
+TYPE_STRING = 3
+
+class IpsRpcError(Exception): pass
+
+def convert_value(value, value_type):
+    if value_type == TYPE_BOOLEAN: return str(value).lower() in ['true', 'yes', '1']
+    elif value_type == TYPE_INTEGER: return int(value)
+    elif value_type == TYPE_FLOAT: return float(value)
+    else: return str(value)
+
+class RpcCall(object):
+
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def finish(self, result = None, error = None):
+        self.result, self.error = result, error
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None: raise IpsRpcError('%s%s failed: %s' % (self.method, tuple(self.params), self.error))
+        return self.result
+
+class IpsRpcClient(object):
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            return {
+                'server':       self.__url,
+                'calls':        self.__calls,
+                'coalesced':    self.__coalesced,
+                'requests':     self.__requests,
+                'cache_hits':   self.__cache_hits,
+                'cache_size':   len(self.__variables),
+                'pending':      len(self.__pending)
+            }
+
+    def __init__(self, url, username = '', password = '', jsonrpc = '2.0', cache_ttl = 300, batch_delay = 0.02):
+        self.__url = url
+        self.__auth = HTTPBasicAuth(username, password) if username else None
+        self.__jsonrpc = jsonrpc
+        self.__cache_ttl = cache_ttl
+        # batches are part of JSON-RPC 2.0 only
+        self.__batch_delay = batch_delay if jsonrpc == '2.0' else 0
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        # notified when a request is answered
+        self.__condition = threading.Condition(self.__lock)
+        self.__sending = 0          # running requests
+        self.__pending = []         # calls of the next batch
+        self.__writes = {}          # variable -> SetValue call in the next batch
+        self.__collecting = False
+        self.__variables = {}       # variable -> (expires, exists, type)
+        self.__calls = 0
+        self.__coalesced = 0
+        self.__requests = 0
+        self.__cache_hits = 0
+
+    def __enqueue(self, calls):
+        # calls: [(method, params, variable of a write or None)] - returns RpcCalls and if this
+        # caller has to send the batch
+        rpc_calls = []
+        with self.__lock:
+            for method, params, write_variable in calls:
+                self.__calls += 1
+                if write_variable is not None and write_variable in self.__writes:
+                    rpc_call = self.__writes[write_variable]
+                    rpc_call.params = params
+                    self.__coalesced += 1
+                else:
+                    rpc_call = RpcCall(method, params)
+                    self.__pending.append(rpc_call)
+                    if write_variable is not None: self.__writes[write_variable] = rpc_call
+                rpc_calls.append(rpc_call)
+            leader = not self.__collecting
+            self.__collecting = True
+        return rpc_calls, leader
+
+    def __flush(self):
+        # a lone call doesn't wait - only while a request is running, the next batch collects
+        with self.__condition:
+            if self.__batch_delay and self.__sending:
+                deadline = time.time() + self.__batch_delay
+                while self.__sending and time.time() < deadline: self.__condition.wait(deadline - time.time())
+            rpc_calls, self.__pending, self.__writes, self.__collecting = self.__pending, [], {}, False
+            self.__sending += 1
+        try:
+            if self.__batch_delay: self.__send(rpc_calls)
+            else:
+                for rpc_call in rpc_calls: self.__send([rpc_call])
+        finally:
+            with self.__condition:
+                self.__sending -= 1
+                self.__condition.notify_all()
+
+    def __payload(self, rpc_call, call_id):
+        return {'method': rpc_call.method, 'params': rpc_call.params, 'jsonrpc': self.__jsonrpc, 'id': call_id}
+
+    def __send(self, rpc_calls):
+        calls_by_id = dict((next(self.__ids), rpc_call) for rpc_call in rpc_calls)
+        try:
+            payload = [self.__payload(rpc_call, call_id) for call_id, rpc_call in calls_by_id.items()]
+            with self.__lock: self.__requests += 1
+            response = load_http_client().post(
+                self.__url,
+                idempotent = True,
+                headers = {'content-type': 'application/json'},
+                auth = self.__auth,
+                data = json.dumps(payload if len(payload) > 1 else payload[0])
+            )
+            response.raise_for_status()
+            results = response.json()
+            if isinstance(results, dict): results = [results]
+            for result in results:
+                rpc_call = calls_by_id.pop(result.get('id'), None)
+                if rpc_call is None: continue
+                if result.get('error') is not None: rpc_call.finish(error = result['error'])
+                else: rpc_call.finish(result = result.get('result'))
+            for rpc_call in calls_by_id.values(): rpc_call.finish(error = 'no response')
+        except Exception as exp:
+            logger.warning('IP-Symcon request with %s calls failed: %s', len(rpc_calls), exp)
+            for rpc_call in calls_by_id.values():
+                if not rpc_call.done.is_set(): rpc_call.finish(error = str(exp))
+
+    def call_many(self, calls):
+        # [(method, params, variable of a write or None)] in one batch - returns the RpcCalls
+        rpc_calls, leader = self.__enqueue(calls)
+        if leader: self.__flush()
+        for rpc_call in rpc_calls: rpc_call.done.wait()
+        return rpc_calls
+
+    def call(self, method, *params):
+        return self.call_many([(method, list(params), None)])[0].wait()
+
+    def variable(self, key):
+        # (exists, type) of a variable - from the cache or with one batch, only existing
+        # variables are cached
+        now = time.time()
+        with self.__lock:
+            cached = self.__variables.get(key)
+            if cached and cached[0] > now:
+                self.__cache_hits += 1
+                return cached[1:]
+        exists_call, variable_call = self.call_many([('IPS_VariableExists', [key], None), ('IPS_GetVariable', [key], None)])
+        exists = exists_call.wait() is True
+        if not exists: return False, None
+        value_type = variable_call.wait()['VariableValue']['ValueType']
+        with self.__lock:
+            self.__variables[key] = (now + self.__cache_ttl, True, value_type)
+        return True, value_type
+
+    def forget(self, key):
+        with self.__lock:
+            self.__variables.pop(key, None)
+
+    def get_value(self, key):
+        return self.call('GetValue', key)
+
+    def set_value(self, key, value):
+        exists, value_type = self.variable(key)
+        if not exists: raise IpsRpcError("var %s doesn't exist" % key)
+        try:
+            return self.call_many([('SetValue', [key, convert_value(value, value_type)], key)])[0].wait()
+        except IpsRpcError:
+            # deleted or changed in IP-Symcon
+            self.forget(key)
+            raise
+
+IPS_CLIENT = None
+IPS_CLIENT_LOCK = threading.Lock()
+
+def load_ips_client():
+    # a new client, when the connection in the config changed
+    global IPS_CLIENT
+    config = doorpi.DoorPi().config
+    settings = dict(
+        url = config.get(IPS_SECTION, 'server'),
+        username = config.get(IPS_SECTION, 'username'),
+        password = config.get(IPS_SECTION, 'password', password = True),
+        jsonrpc = config.get(IPS_SECTION, 'jsonrpc', '2.0'),
+        cache_ttl = config.get_float(IPS_SECTION, 'cache_ttl', 300),
+        batch_delay = config.get_float(IPS_SECTION, 'batch_delay', 0.02)
+    )
+    with IPS_CLIENT_LOCK:
+        if IPS_CLIENT is None or IPS_CLIENT[0] != settings:
+            IPS_CLIENT = (settings, IpsRpcClient(**settings))
+        return IPS_CLIENT[1]
@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Mail queue of the action mailto
+#  -------------------------------
+#
+#  [SMTP]
+#  server = smtp.gmail.com
+#  port = 465
+#  username =
+#  password =
+#  from =
+#  use_ssl = True
+#  use_tls = False
+#  need_login = True
+#  signature = !EPILOG!
+#  queue = !BASEPATH!/conf/mail_queue.db   # SQLite file of the queue - empty = only in memory
+#  retries = 5                # retries of a mail before it is kept as failed
+#  retry_backoff = 30         # 30, 60, 120, ... seconds between the retries
+#  retry_max_delay = 3600     # at most so many seconds between the retries
+#  idle_timeout = 60          # seconds the connection stays open after the last mail
+#  digest_delay = 0           # seconds mails to the same recipients are collected for one
+#                             # digest mail (0 = every mail alone)
+#  timeout = 30               # seconds for the connection and every command
+#
+#  mailto only puts the mail into the queue - a sender thread sends it. The queue is stored,
+#  so mails that could not be sent (server down, no network, DoorPi stopped) are sent later.
+#  The sender keeps the logged in connection open while there are mails and sends all of
+#  them through it. Attachments are read and base64 encoded chunk by chunk while they are
+#  sent - a snapshot is never completely in memory.
+#  put() hard-links (or copies) the attachment into the spool folder next to the queue file
+#  (mail_queue_attachments for mail_queue.db), so a snapshot that is rotated away before the
+#  mail is sent is still attached. The spooled file is deleted together with the mail.
+#
+#  The settings are read once, when the queue is created with the first mailto action.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import time
+import shutil
+import tempfile
+import base64
+import sqlite3
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.header import Header
+from email.Utils import COMMASPACE, formatdate, make_msgid
+from email.generator import _make_boundary
+
+import doorpi
+from doorpi.action.base import SingleAction
+
+class MailQueueDestroyAction(SingleAction): pass
+
+MAIL_SECTION = 'SMTP'
+STATE_QUEUED = 'queued'
+STATE_FAILED = 'failed'
+# failed mails that are kept in the queue for the status
+MAX_FAILED_MAILS = 100
+# 57 bytes are one base64 line of 76 characters
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+CRLF = '\r\n'
+
+class MailPermanentError(Exception): pass
+
+def to_utf8(value):
+    return value.encode('utf-8') if isinstance(value, unicode) else str(value)
+
+def encode_header(value):
+    # utf-8 str -> RFC 2047, if it is not plain ASCII
+    try:
+        return value.decode('ascii')
+    except UnicodeDecodeError:
+        return Header(value.decode('utf-8', 'replace'), 'utf-8').encode()
+
+class MailQueue(object):
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            statistic = {
+                'server':       '%s:%s' % (self.__server, self.__port),
+                'sent':         self.__sent,
+                'digests':      self.__digests,
+                'connections':  self.__connections,
+                'reused':       self.__reused,
+                'retries':      self.__retries_done,
+                'last_error':   self.__last_error,
+                'connected':    self.__connection is not None,
+                STATE_QUEUED:   0,
+                STATE_FAILED:   0
+            }
+            if self.__db:
+                for state, count, oldest in self.__db.execute(
+                        'SELECT state, COUNT(*), MIN(created) FROM mails GROUP BY state'):
+                    statistic[state] = count
+                    if state == STATE_QUEUED: statistic['oldest_queued_age'] = round(time.time() - oldest, 3)
+            return statistic
+
+    def __init__(self, db_file, server, port, username = '', password = '', sender = '', use_ssl = True,
+                 use_tls = False, need_login = True, signature = '', retries = 5, retry_backoff = 30,
+                 retry_max_delay = 3600, idle_timeout = 60, digest_delay = 0, timeout = 30):
+        self.__db_file = db_file or ':memory:'
+        self.__spool_path = None
+        self.__server = server
+        self.__port = port
+        self.__username = username
+        self.__password = password
+        self.__sender = sender
+        self.__use_ssl = use_ssl
+        self.__use_tls = use_tls and not use_ssl
+        self.__need_login = need_login
+        self.__signature = signature
+        self.__retries = max(0, retries)
+        self.__retry_backoff = retry_backoff
+        self.__retry_max_delay = retry_max_delay
+        self.__idle_timeout = idle_timeout
+        self.__digest_delay = max(0, digest_delay)
+        self.__timeout = timeout
+        self.__condition = threading.Condition(threading.RLock())
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__db = None
+        self.__connection = None
+        self.__last_used = 0
+        self.__sent = 0
+        self.__digests = 0
+        self.__connections = 0
+        self.__reused = 0
+        self.__retries_done = 0
+        self.__last_error = None
+
+    def start(self):
+        if self.__thread: return self
+        if self.__db_file != ':memory:' and not os.path.exists(os.path.dirname(self.__db_file)):
+            logger.info('Path %s does not exist - creating it now', os.path.dirname(self.__db_file))
+            os.makedirs(os.path.dirname(self.__db_file))
+        if self.__db_file == ':memory:':
+            self.__spool_path = tempfile.mkdtemp(prefix = 'doorpi_mail_queue_')
+        else:
+            self.__spool_path = os.path.splitext(self.__db_file)[0] + '_attachments'
+            if not os.path.exists(self.__spool_path): os.makedirs(self.__spool_path)
+        db = sqlite3.connect(database = self.__db_file, timeout = 1, check_same_thread = False)
+        db.text_factory = str
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS mails (
+                mail_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                recipients TEXT NOT NULL,
+                subject TEXT,
+                html TEXT,
+                attachment TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_try REAL NOT NULL,
+                last_error TEXT,
+                state TEXT NOT NULL
+            );'''
+        )
+        # the sender looks for the next due mail
+        db.execute('CREATE INDEX IF NOT EXISTS mails_state_next_try ON mails (state, next_try);')
+        db.commit()
+        with self.__condition:
+            self.__db = db
+            queued = db.execute('SELECT COUNT(*) FROM mails WHERE state = ?', (STATE_QUEUED,)).fetchone()[0]
+            spooled = set(row[0] for row in db.execute('SELECT attachment FROM mails WHERE attachment IS NOT NULL'))
+        # left by a stop between spooling and commit
+        self.__remove_attachments(os.path.join(self.__spool_path, name) for name in os.listdir(self.__spool_path)
+                                  if os.path.join(self.__spool_path, name) not in spooled)
+        if queued: logger.info('%s mails of the last run are still queued in %s', queued, self.__db_file)
+
+        doorpi.DoorPi().event_handler.register_action('OnShutdown', MailQueueDestroyAction(self.destroy))
+        self.__thread = threading.Thread(target = self.__run, name = 'MailQueue')
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def destroy(self):
+        # queued mails stay in the queue and are sent at the next start
+        if self.__stop.is_set(): return
+        logger.debug('destroy')
+        self.__stop.set()
+        with self.__condition: self.__condition.notify_all()
+        if self.__thread: self.__thread.join(self.__timeout)
+        with self.__condition:
+            self.__disconnect()
+            logger.debug('statistic: %s', self.statistic)
+            if self.__db: self.__db.close()
+            self.__db = None
+        if self.__db_file == ':memory:' and self.__spool_path:
+            shutil.rmtree(self.__spool_path, ignore_errors = True)
+
+    def put(self, recipients, subject, html, attachment = None):
+        # returns the mail_id of the queued mail
+        now = time.time()
+        with self.__condition:
+            if self.__db is None: raise IOError('mail queue is not started')
+            mail_id = self.__db.execute('''
+                INSERT INTO mails (created, recipients, subject, html, next_try, state)
+                VALUES (?, ?, ?, ?, ?, ?)''', (
+                now, ' '.join(recipients), to_utf8(subject), to_utf8(html), now + self.__digest_delay, STATE_QUEUED
+            )).lastrowid
+            if attachment:
+                self.__db.execute('UPDATE mails SET attachment = ? WHERE mail_id = ?',
+                                  (self.__spool(mail_id, attachment), mail_id))
+            self.__db.commit()
+            self.__condition.notify_all()
+        logger.debug('mail %s to %s queued', mail_id, ', '.join(recipients))
+        return mail_id
+
+    def __spool(self, mail_id, attachment):
+        # under lock - the spooled file or None, then the mail is sent without
+        spooled = os.path.join(self.__spool_path, '%s_%s' % (mail_id, os.path.basename(attachment)))
+        try:
+            try:
+                # snapshots are written to new files and rotated by delete - a link is enough
+                os.link(attachment, spooled)
+            except OSError:
+                # other file system or one without hard links
+                shutil.copyfile(attachment, spooled)
+        except (IOError, OSError) as exp:
+            logger.error('attachment %s of mail %s could not be spooled: %s', attachment, mail_id, exp)
+            self.__remove_attachments([spooled])
+            return None
+        return spooled
+
+    def __remove_attachments(self, attachments):
+        for attachment in attachments:
+            # attachments of mails from before the spool are not ours
+            if not attachment or os.path.dirname(attachment) != self.__spool_path: continue
+            try:
+                os.remove(attachment)
+            except OSError as exp:
+                if os.path.exists(attachment): logger.warning('spooled attachment %s not deleted: %s', attachment, exp)
+
+    def __next_mails(self):
+        # under lock - (mails to send now, seconds to wait for the next one)
+        now = time.time()
+        row = self.__db.execute(
+            'SELECT mail_id, recipients, next_try FROM mails WHERE state = ? ORDER BY next_try, mail_id LIMIT 1',
+            (STATE_QUEUED,)
+        ).fetchone()
+        if row is None: return [], None
+        if row[2] > now: return [], row[2] - now
+        columns = ['mail_id', 'created', 'recipients', 'subject', 'html', 'attachment', 'attempts']
+        query = 'SELECT %s FROM mails WHERE ' % ', '.join(columns)
+        if self.__digest_delay:
+            # the burst to these recipients - with the mails that are still in their digest_delay
+            rows = self.__db.execute(query + 'state = ? AND recipients = ? AND (attempts = 0 OR mail_id = ?) ORDER BY mail_id',
+                                     (STATE_QUEUED, row[1], row[0])).fetchall()
+        else:
+            rows = self.__db.execute(query + 'mail_id = ?', (row[0],)).fetchall()
+        return [dict(zip(columns, mail)) for mail in rows], 0
+
+    def __run(self):
+        while not self.__stop.is_set():
+            with self.__condition:
+                if self.__db is None: return
+                mails, wait = self.__next_mails()
+                if not mails:
+                    if self.__connection is not None:
+                        idle = self.__last_used + self.__idle_timeout - time.time()
+                        if idle <= 0: self.__disconnect()
+                        elif wait is None or idle < wait: wait = idle
+                    self.__condition.wait(wait)
+                    continue
+            self.__send(mails)
+
+    def __connect(self):
+        if self.__connection is not None:
+            try:
+                if self.__connection.noop()[0] == 250:
+                    self.__reused += 1
+                    return self.__connection
+            except (smtplib.SMTPException, IOError): pass
+            self.__disconnect()
+        if self.__use_ssl:
+            connection = smtplib.SMTP_SSL(self.__server, self.__port, timeout = self.__timeout)
+        else:
+            connection = smtplib.SMTP(self.__server, self.__port, timeout = self.__timeout)
+        try:
+            connection.ehlo()
+            if self.__use_tls:
+                connection.starttls()
+                connection.ehlo()
+            if self.__need_login:
+                connection.login(self.__username, self.__password)
+        except Exception:
+            connection.close()
+            raise
+        self.__connection = connection
+        self.__connections += 1
+        logger.debug('connected to %s:%s', self.__server, self.__port)
+        return connection
+
+    def __disconnect(self):
+        connection, self.__connection = self.__connection, None
+        if connection is None: return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, IOError):
+            connection.close()
+        logger.debug('disconnected from %s:%s', self.__server, self.__port)
+
+    def __send(self, mails):
+        mail_ids = [mail['mail_id'] for mail in mails]
+        recipients = mails[0]['recipients'].split()
+        try:
+            connection = self.__connect()
+            self.__transmit(connection, recipients, self.__message(mails))
+        except Exception as exp:
+            if isinstance(exp, (smtplib.SMTPServerDisconnected, IOError)):
+                # maybe in the middle of DATA - a QUIT would be part of the message, only close
+                connection, self.__connection = self.__connection, None
+                if connection is not None: connection.close()
+            elif not isinstance(exp, MailPermanentError): self.__disconnect()
+            return self.__failed_attempt(mails, exp)
+        finally:
+            self.__last_used = time.time()
+
+        with self.__condition:
+            if self.__db is None: return
+            self.__db.execute('DELETE FROM mails WHERE mail_id IN (%s)' % ', '.join('?' * len(mail_ids)), mail_ids)
+            self.__db.commit()
+            self.__sent += len(mails)
+            if len(mails) > 1: self.__digests += 1
+        self.__remove_attachments(mail['attachment'] for mail in mails)
+        logger.info('mail %s sent to %s', ', '.join(str(mail_id) for mail_id in mail_ids), ', '.join(recipients))
+
+    def __failed_attempt(self, mails, exp):
+        error = '%s: %s' % (exp.__class__.__name__, exp)
+        now = time.time()
+        with self.__condition:
+            self.__last_error = error
+            if self.__db is None: return
+            for mail in mails:
+                attempts = mail['attempts'] + 1
+                if isinstance(exp, MailPermanentError) or attempts > self.__retries:
+                    logger.error('mail %s to %s failed: %s', mail['mail_id'], mail['recipients'], error)
+                    self.__db.execute('UPDATE mails SET attempts = ?, last_error = ?, state = ? WHERE mail_id = ?',
+                                      (attempts, error, STATE_FAILED, mail['mail_id']))
+                    continue
+                delay = min(self.__retry_backoff * 2 ** (attempts - 1), self.__retry_max_delay)
+                self.__retries_done += 1
+                logger.warning('mail %s to %s failed (%s) - retry in %s seconds', mail['mail_id'],
+                               mail['recipients'], error, delay)
+                self.__db.execute('UPDATE mails SET attempts = ?, last_error = ?, next_try = ? WHERE mail_id = ?',
+                                  (attempts, error, now + delay, mail['mail_id']))
+            dropped = self.__db.execute('''
+                SELECT mail_id, attachment FROM mails WHERE state = ? AND mail_id NOT IN
+                (SELECT mail_id FROM mails WHERE state = ? ORDER BY mail_id DESC LIMIT ?)''',
+                (STATE_FAILED, STATE_FAILED, MAX_FAILED_MAILS)).fetchall()
+            self.__db.executemany('DELETE FROM mails WHERE mail_id = ?', [(mail_id,) for mail_id, _ in dropped])
+            self.__db.commit()
+        self.__remove_attachments(attachment for _, attachment in dropped)
+
+    def __transmit(self, connection, recipients, message):
+        # smtplib.SMTP.sendmail with the message as a generator of chunks
+        code, response = connection.mail(self.__sender)
+        if code != 250: raise self.__error(smtplib.SMTPSenderRefused(code, response, self.__sender))
+        refused = {}
+        for recipient in recipients:
+            code, response = connection.rcpt(recipient)
+            if code not in [250, 251]: refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            connection.rset()
+            raise self.__error(smtplib.SMTPRecipientsRefused(refused), min(code for code, _ in refused.values()))
+        if refused: logger.warning('recipients refused: %s', refused)
+        code, response = connection.docmd('data')
+        if code != 354:
+            connection.rset()
+            raise self.__error(smtplib.SMTPDataError(code, response))
+        # every chunk starts at the beginning of a line and ends with CRLF - small chunks are
+        # joined, one write of the headers and texts and then one write per attachment chunk
+        buffered, size = [], 0
+        for chunk in message:
+            buffered.append(smtplib.quotedata(chunk))
+            size += len(buffered[-1])
+            if size >= ATTACHMENT_CHUNK_SIZE:
+                connection.send(''.join(buffered))
+                buffered, size = [], 0
+        buffered.append('.' + CRLF)
+        connection.send(''.join(buffered))
+        code, response = connection.getreply()
+        if code != 250: raise self.__error(smtplib.SMTPDataError(code, response))
+
+    def __error(self, exp, code = None):
+        # 5xx replies are not retried
+        code = code or getattr(exp, 'smtp_code', 0)
+        return MailPermanentError(str(exp)) if code >= 500 else exp
+
+    def __message(self, mails):
+        # the mails - more than one as digest - as multipart/mixed with streamed attachments
+        boundary = _make_boundary()
+        subject = mails[0]['subject']
+        if len(mails) > 1: subject = '%s (+%s)' % (subject, len(mails) - 1)
+        yield CRLF.join([
+            'From: %s' % self.__sender,
+            'To: %s' % COMMASPACE.join(mails[0]['recipients'].split()),
+            'Subject: %s' % encode_header(subject),
+            'Date: %s' % formatdate(localtime = True),
+            'Message-ID: %s' % make_msgid(),
+            'MIME-Version: 1.0',
+            'Content-Type: multipart/mixed; boundary="%s"' % boundary,
+            '', ''
+        ])
+        for mail in mails:
+            html = mail['html'] or ''
+            if len(mails) > 1:
+                html = '<p><b>%s</b> - %s</p>%s' % (
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mail['created'])), mail['subject'], html)
+            yield self.__part(boundary, MIMEText(html, 'html', 'utf-8'))
+        if self.__signature:
+            yield self.__part(boundary, MIMEText('\nsent by:\n' + self.__signature, 'plain', 'utf-8'))
+        for mail in mails:
+            if not mail['attachment']: continue
+            if not os.path.isfile(mail['attachment']):
+                logger.warning('attachment %s of mail %s does not exist anymore', mail['attachment'], mail['mail_id'])
+                continue
+            for chunk in self.__attachment(boundary, mail['attachment']): yield chunk
+        yield '--%s--%s' % (boundary, CRLF)
+
+    def __part(self, boundary, part):
+        return '--%s%s%s%s' % (boundary, CRLF, part.as_string().replace('\n', CRLF), CRLF)
+
+    def __attachment_name(self, file_name):
+        # without the mail_id of the spooled file
+        name = os.path.basename(file_name)
+        return name.split('_', 1)[1] if os.path.dirname(file_name) == self.__spool_path else name
+
+    def __attachment(self, boundary, file_name):
+        yield CRLF.join([
+            '--%s' % boundary,
+            'Content-Type: application/octet-stream',
+            'MIME-Version: 1.0',
+            'Content-Transfer-Encoding: base64',
+            'Content-Disposition: attachment; filename="%s"' % self.__attachment_name(file_name),
+            '', ''
+        ])
+        with open(file_name, 'rb') as attachment_file:
+            while True:
+                chunk = attachment_file.read(ATTACHMENT_CHUNK_SIZE)
+                if not chunk: break
+                yield base64.encodestring(chunk).replace('\n', CRLF)
+
+MAIL_QUEUE = None
+MAIL_QUEUE_LOCK = threading.Lock()
+
+def load_mail_queue():
+    global MAIL_QUEUE
+    with MAIL_QUEUE_LOCK:
+        if MAIL_QUEUE is None:
+            config = doorpi.DoorPi().config
+            MAIL_QUEUE = MailQueue(
+                db_file = config.get_string_parsed(MAIL_SECTION, 'queue', '!BASEPATH!/conf/mail_queue.db'),
+                server = config.get(MAIL_SECTION, 'server', 'smtp.gmail.com'),
+                port = config.get_int(MAIL_SECTION, 'port', 465),
+                username = config.get(MAIL_SECTION, 'username'),
+                password = config.get(MAIL_SECTION, 'password', password = True),
+                sender = config.get(MAIL_SECTION, 'from'),
+                use_ssl = config.get_boolean(MAIL_SECTION, 'use_ssl', True),
+                use_tls = config.get_boolean(MAIL_SECTION, 'use_tls', False),
+                need_login = config.get_boolean(MAIL_SECTION, 'need_login', True),
+                signature = config.get_string_parsed(MAIL_SECTION, 'signature', '!EPILOG!'),
+                retries = config.get_int(MAIL_SECTION, 'retries', 5),
+                retry_backoff = config.get_float(MAIL_SECTION, 'retry_backoff', 30),
+                retry_max_delay = config.get_float(MAIL_SECTION, 'retry_max_delay', 3600),
+                idle_timeout = config.get_float(MAIL_SECTION, 'idle_timeout', 60),
+                digest_delay = config.get_float(MAIL_SECTION, 'digest_delay', 0),
+                timeout = config.get_float(MAIL_SECTION, 'timeout', 30)
+            ).start()
+        return MAIL_QUEUE
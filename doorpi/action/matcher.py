@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+from collections import deque
+
+class SequenceMatcher(object):
+    """ Aho-Corasick automaton for codes in a stream of symbols (DTMF digits, chars of a keyboard)
+
+    The automaton is built once from all codes and advanced one symbol at a time.
+    feed() returns the values of all codes the received symbols end with - the same
+    result as testing received.endswith(code) for every code, but independent of the
+    number of codes and the length of the received sequence.
+    Only the last history_size symbols are kept (for logging and event infos).
+    """
+
+    @property
+    def history(self): return ''.join(self.__history)
+
+    @property
+    def codes(self): return self.__codes
+
+    def __init__(self, codes, history_size = None):
+        # codes is a dict code -> value or a list of codes (value is the code itself)
+        if not isinstance(codes, dict): codes = dict((code, code) for code in codes)
+        self.__codes = dict((code, value) for code, value in codes.items() if code)
+
+        self.__goto = [{}]
+        self.__output = [[]]
+        for code in sorted(self.__codes):
+            state = 0
+            for symbol in code:
+                if symbol not in self.__goto[state]:
+                    self.__goto.append({})
+                    self.__output.append([])
+                    self.__goto[state][symbol] = len(self.__goto) - 1
+                state = self.__goto[state][symbol]
+            self.__output[state].append(self.__codes[code])
+
+        # failure links (breadth-first) - every state also reports the outputs of its failure state
+        self.__fail = [0] * len(self.__goto)
+        queue = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self.__goto[state].items():
+                queue.append(next_state)
+                fail = self.__fail[state]
+                while fail and symbol not in self.__goto[fail]:
+                    fail = self.__fail[fail]
+                self.__fail[next_state] = self.__goto[fail].get(symbol, 0)
+                self.__output[next_state] = self.__output[next_state] + self.__output[self.__fail[next_state]]
+
+        longest_code = max([len(code) for code in self.__codes] or [0])
+        self.__history = deque(maxlen = history_size or max(longest_code, 1))
+        self.__state = 0
+
+    def reset(self):
+        self.__state = 0
+        self.__history.clear()
+
+    def feed(self, symbol):
+        self.__history.append(symbol)
+        state = self.__state
+        while state and symbol not in self.__goto[state]:
+            state = self.__fail[state]
+        self.__state = state = self.__goto[state].get(symbol, 0)
+        return self.__output[state]
+
+    def feed_sequence(self, symbols):
+        matches = []
+        for symbol in symbols: matches.extend(self.feed(symbol))
+        return matches
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+import heapq
+import itertools
+
+class ScheduledJob(object):
+
+    @property
+    def cancelled(self): return self.__cancelled
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.__cancelled = False
+
+    def cancel(self):
+        self.__cancelled = True
+
+    def __str__(self):
+        return "%s%s at %s" % (self.callback, self.args, self.when)
+
+class Scheduler(object):
+    """ one thread with a timer heap for short, time-based callbacks
+
+    callbacks run in the scheduler thread and should only do quick work
+    (set an output, fire an event) - everything else belongs into an action
+    """
+
+    @property
+    def jobs(self):
+        with self.__condition:
+            return [job for (_, _, job) in self.__heap if not job.cancelled]
+
+    @property
+    def is_running(self): return self.__thread is not None and self.__thread.is_alive()
+
+    def __init__(self, name = 'Scheduler'):
+        self.name = name
+        self.__heap = []
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+
+    def start(self):
+        with self.__condition:
+            if self.is_running: return self
+            self.__stopped = False
+            self.__thread = threading.Thread(target = self.__run, name = self.name)
+            self.__thread.daemon = True
+            self.__thread.start()
+        return self
+
+    def stop(self, timeout = 1):
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join(timeout)
+        self.__thread = None
+
+    destroy = stop
+
+    def call_at(self, when, callback, *args):
+        job = ScheduledJob(when, callback, args)
+        with self.__condition:
+            heapq.heappush(self.__heap, (when, next(self.__counter), job))
+            # only wake up the thread if the new job is the next one
+            if self.__heap[0][2] is job: self.__condition.notify()
+        return job
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.time() + delay, callback, *args)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__stopped:
+                    while self.__heap and self.__heap[0][2].cancelled:
+                        heapq.heappop(self.__heap)
+                    if not self.__heap:
+                        self.__condition.wait()
+                        continue
+                    delay = self.__heap[0][0] - time.time()
+                    if delay <= 0: break
+                    self.__condition.wait(delay)
+                if self.__stopped: return
+                job = heapq.heappop(self.__heap)[2]
+
+            try:
+                job.callback(*job.args)
+            except Exception:
+                logger.exception('error while running scheduled job %s', job)
@@ -0,0 +1,1795 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  doorpi_cli bench [--duration 10] [--rate 20] [--json] [--configfile file]
+#
+#  Starts DoorPi with a synthetic keyboard and the dummy sipphone and reports the latency of
+#  - key edge, rfid read and dtmf code -> start of the actions (probe action after the configured actions)
+#  - event -> event log persisted (commit of the event log)
+#  - HTTP /status request -> response
+#  together with the created threads, CPU time and memory.
+#
+#  Without --configfile a config with a synthetic keyboard, webserver on a free local port and
+#  event log in a temp folder is generated. With --configfile at least one keyboard has to be
+#  of type synthetic - rate and duration come from its config then.
+#
+#  doorpi_cli replay --tracefile input.trace --configfile doorpi.ini [--fast] [--json]
+#
+#  Replays an input trace ([DoorPi] trace_file) with the config of the recording, but all
+#  keyboards are synthetic, the sipphone is the dummy and the webserver listens local.
+#  The inputs are fired in real time (or with --fast one after another) and the started
+#  actions are compared with the recorded ones, together with the reaction times
+#  (last input -> action start) of both runs.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import resource
+import urllib2
+import base64
+import smtpd
+import smtplib
+import asyncore
+import BaseHTTPServer
+import SocketServer
+from random import Random
+import ConfigParser
+from collections import defaultdict, deque, Counter, OrderedDict
+
+import doorpi
+from action.base import SingleAction
+from action.handler import percentile, current_correlation_id
+from action.input_trace import load_trace, TRACE_KEY, TRACE_SIPPHONE, TRACE_WEB, TRACE_ACTION, INPUT_KINDS
+from conf.config_object import ConfigObject
+from sipphone.AbstractBaseClass import SipphoneAbstractBaseClass
+from sipphone.RegistrationMonitor import REGISTRATION_OK, REGISTRATION_FAILED
+
+BENCH_KEYBOARD = 'bench'
+BENCH_USER = 'bench'
+HTTP_RATE = 5
+DRAIN_TIMEOUT = 5
+STARTUP_DELAY = 1
+REPORT_TOP = 10
+
+BENCH_CONFIG = '''
+[DoorPi]
+base_path = {base_path}
+eventlog = {base_path}/eventlog.db
+
+[DoorPiWeb]
+ip = 127.0.0.1
+port = {http_port}
+
+[User]
+{user} = {user}
+
+[Group]
+administrator = {user}
+
+[WritePermission]
+administrator = status
+
+[ReadPermission]
+administrator = status
+
+[AREA_status]
+/status
+
+[AREA_public]
+/favicon.ico
+
+[keyboards]
+{keyboard} = synthetic
+
+[{keyboard}_keyboard]
+rate = {rate}
+duration = {duration}
+start_delay = {start_delay}
+distribution = poisson
+mix = key:70,rfid:20,dtmf:10
+tags = 1234567,7654321
+
+[{keyboard}_InputPins]
+1 = sleep:0
+2 = sleep:0
+3 = sleep:0
+1234567 = sleep:0
+
+[{keyboard}_OutputPins]
+door = door
+
+[DTMF]
+"#" = sleep:0
+"1#" = sleep:0
+'''
+
+class BenchmarkProbeAction(SingleAction): pass
+
+def free_port():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+def latency_statistic(values):
+    values = sorted(values)
+    if not values: return dict(count = 0)
+    # in ms
+    return dict(
+        count = len(values),
+        avg = round(sum(values) / len(values) * 1000, 3),
+        p50 = round(percentile(values, 50) * 1000, 3),
+        p95 = round(percentile(values, 95) * 1000, 3),
+        p99 = round(percentile(values, 99) * 1000, 3),
+        max = round(values[-1] * 1000, 3)
+    )
+
+class Benchmark(object):
+
+    def __init__(self, duration, http_url = None, http_auth = None):
+        self.__duration = duration
+        self.__http_url = http_url
+        self.__http_auth = http_auth
+        self.__lock = threading.Lock()
+        # emitted inputs per measured event, paired with the probes in the same order
+        self.__pending = defaultdict(deque)
+        self.__probed_events = set()
+        self.__latencies = defaultdict(list)
+        self.__http_errors = 0
+        self.__threads_created = 0
+        self.__report = None
+
+    @property
+    def report(self): return self.__report
+
+    @property
+    def pending(self):
+        with self.__lock:
+            return sum(len(queue) for queue in self.__pending.values())
+
+    def __thread_started(self, frame, event, arg):
+        # profile hook of threading - called once in every new thread
+        sys.setprofile(None)
+        with self.__lock: self.__threads_created += 1
+
+    def emitted(self, kind, value, measured_event, emit_time):
+        with self.__lock:
+            self.__pending[measured_event].append((kind, emit_time))
+            if measured_event in self.__probed_events: return
+            self.__probed_events.add(measured_event)
+        doorpi.DoorPi().event_handler.register_action(
+            measured_event, BenchmarkProbeAction(self.action_started, measured_event))
+
+    def action_started(self, measured_event):
+        now = time.time()
+        with self.__lock:
+            if not self.__pending[measured_event]: return
+            kind, emit_time = self.__pending[measured_event].popleft()
+            self.__latencies[kind].append(now - emit_time)
+
+    def request_status(self):
+        request = urllib2.Request(self.__http_url)
+        if self.__http_auth: request.add_header('Authorization', 'Basic ' + base64.b64encode(self.__http_auth))
+        start_time = time.time()
+        try:
+            urllib2.urlopen(request, timeout = 5).read()
+            with self.__lock: self.__latencies['http'].append(time.time() - start_time)
+        except Exception as exp:
+            logger.warning('status request failed: %s', exp)
+            with self.__lock: self.__http_errors += 1
+
+    def run(self, doorpi_object, synthetic_keyboards):
+        start_time = time.time()
+        while time.time() - start_time < self.__duration:
+            if self.__http_url: self.request_status()
+            time.sleep(1.0 / HTTP_RATE)
+
+        # the generators can run longer than the duration (start_delay, replay)
+        while any(keyboard.statistic['running'] for keyboard in synthetic_keyboards) and \
+                time.time() - start_time < self.__duration * 2 + DRAIN_TIMEOUT:
+            time.sleep(0.1)
+        drain_time = time.time()
+        while self.pending and time.time() - drain_time < DRAIN_TIMEOUT:
+            time.sleep(0.1)
+        doorpi_object.event_handler.db.commit()
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        with self.__lock:
+            self.__report = {
+                'duration':         round(time.time() - start_time, 3),
+                'latency_ms':       {
+                    'key -> action start':          latency_statistic(self.__latencies['key']),
+                    'rfid -> action start':         latency_statistic(self.__latencies['rfid']),
+                    'dtmf -> action start':         latency_statistic(self.__latencies['dtmf']),
+                    'event -> eventlog persisted':  self.__eventlog_statistic(doorpi_object),
+                    'http /status':                 latency_statistic(self.__latencies['http'])
+                },
+                'emitted':          dict((keyboard.keyboard_name, keyboard.statistic['emitted'])
+                                         for keyboard in synthetic_keyboards),
+                'without_probe':    sum(len(queue) for queue in self.__pending.values()),
+                'http_errors':      self.__http_errors,
+                'threads_created':  self.__threads_created,
+                'threads_alive':    threading.active_count(),
+                'cpu_user_s':       round(usage.ru_utime - self.__usage.ru_utime, 3),
+                'cpu_system_s':     round(usage.ru_stime - self.__usage.ru_stime, 3),
+                'max_rss_kb':       usage.ru_maxrss,
+                'lanes':            dict((name, lane.statistic) for name, lane in doorpi_object.event_handler.lanes.items())
+            }
+        doorpi_object.doorpi_shutdown(0)
+
+    @staticmethod
+    def __eventlog_statistic(doorpi_object):
+        persist_time = doorpi_object.event_handler.db.statistic['persist_time']
+        statistic = dict((key, round(value * 1000, 3)) for key, value in persist_time.items())
+        statistic['count'] = doorpi_object.event_handler.db.statistic['committed']
+        return statistic
+
+    def start(self, parsed_arguments):
+        self.__usage = resource.getrusage(resource.RUSAGE_SELF)
+        threading.setprofile(self.__thread_started)
+        try:
+            doorpi_object = doorpi.DoorPi(parsed_arguments)
+            doorpi_object.prepare(parsed_arguments)
+            synthetic_keyboards = [keyboard for keyboard in doorpi_object.keyboard.keyboards.values()
+                                   if keyboard.keyboard_typ == 'Synthetic']
+            if not synthetic_keyboards:
+                logger.error('no keyboard of type synthetic in config - nothing to measure')
+                return False
+            for keyboard in synthetic_keyboards: keyboard.add_emit_listener(self.emitted)
+
+            runner = threading.Thread(target = self.run, args = (doorpi_object, synthetic_keyboards), name = 'Benchmark')
+            runner.daemon = True
+            runner.start()
+            try:                        doorpi_object.run()
+            except KeyboardInterrupt:   logger.info("KeyboardInterrupt -> benchmark stopped")
+            return self.__report is not None
+        finally:
+            threading.setprofile(None)
+            doorpi.DoorPi().destroy()
+
+def format_report(report):
+    lines = ['DoorPi benchmark (%s s)' % report['duration'], '']
+    lines.append('%-30s %8s %10s %10s %10s %10s %10s' % ('latency [ms]', 'count', 'avg', 'p50', 'p95', 'p99', 'max'))
+    for path, statistic in sorted(report['latency_ms'].items()):
+        lines.append('%-30s %8s %10s %10s %10s %10s %10s' % (
+            path, statistic.get('count'), statistic.get('avg', '-'), statistic.get('p50', '-'),
+            statistic.get('p95', '-'), statistic.get('p99', '-'), statistic.get('max', '-')))
+    lines.append('')
+    for keyboard_name, emitted in sorted(report['emitted'].items()):
+        lines.append('emitted by %s: %s' % (keyboard_name, ', '.join('%s %s' % item for item in sorted(emitted.items()))))
+    lines.append('inputs without probe: %s, http errors: %s' % (report['without_probe'], report['http_errors']))
+    lines.append('threads created: %s, alive at the end: %s' % (report['threads_created'], report['threads_alive']))
+    lines.append('cpu time: %s s user, %s s system' % (report['cpu_user_s'], report['cpu_system_s']))
+    lines.append('memory: %s kB max rss' % report['max_rss_kb'])
+    return '\n'.join(lines)
+
+def run_benchmark(parsed_arguments):
+    if parsed_arguments.scenario: return run_scenarios(parsed_arguments)
+    base_path = None
+    http_url = None
+    http_auth = None
+    if not parsed_arguments.configfile:
+        base_path = tempfile.mkdtemp(prefix = 'doorpi_bench_')
+        http_port = free_port()
+        parsed_arguments.configfile = os.path.join(base_path, 'bench.ini')
+        with open(parsed_arguments.configfile, 'w') as config_file:
+            config_file.write(BENCH_CONFIG.format(
+                base_path = base_path,
+                http_port = http_port,
+                user = BENCH_USER,
+                keyboard = BENCH_KEYBOARD,
+                rate = parsed_arguments.rate,
+                duration = parsed_arguments.duration,
+                start_delay = STARTUP_DELAY
+            ))
+        http_url = 'http://127.0.0.1:%s/status?module=keyboard&output=json' % http_port
+        http_auth = '%s:%s' % (BENCH_USER, BENCH_USER)
+
+    benchmark = Benchmark(parsed_arguments.duration, http_url, http_auth)
+    try:
+        if not benchmark.start(parsed_arguments): return 1
+    finally:
+        if base_path: shutil.rmtree(base_path, ignore_errors = True)
+
+    if parsed_arguments.json: print(json.dumps(benchmark.report, sort_keys = True, indent = 4))
+    else: print(format_report(benchmark.report))
+    return 0
+
+def input_reactions(records):
+    # actions caused by the inputs - not by the startup and shutdown of DoorPi - as
+    # (event, action, seconds from the last input before the action to its start)
+    reactions = []
+    last_input = None
+    for record in records:
+        if record[1] in INPUT_KINDS: last_input = record[0]
+        elif record[1] != TRACE_ACTION or last_input is None: continue
+        elif record[2] == 'OnShutdown': break
+        else: reactions.append((record[2], record[3], record[0] - last_input))
+    return reactions
+
+class Replay(object):
+
+    def __init__(self, records, fast = False):
+        records = sorted(records, key = lambda record: record[0])
+        self.__inputs = [record for record in records if record[1] in INPUT_KINDS]
+        self.__recorded = records
+        self.__fast = fast
+        self.__lock = threading.Lock()
+        self.__replayed = []
+        self.__added_sources = set()
+        self.__report = None
+
+    @property
+    def report(self): return self.__report
+
+    def recorded(self, record):
+        with self.__lock: self.__replayed.append(record)
+
+    def __replayed_actions(self):
+        with self.__lock: return len(input_reactions(sorted(self.__replayed, key = lambda record: record[0])))
+
+    def __keyboard_for(self, doorpi_object, last_key):
+        keyboards = doorpi_object.keyboard.keyboards
+        names = [name for name in keyboards if last_key.startswith(name+'.')]
+        if not names: return None, last_key
+        name = max(names, key = len)
+        return keyboards[name], last_key[len(name)+1:]
+
+    def __fire(self, doorpi_object, record):
+        kind, event_name = record[1], record[2]
+        if kind == TRACE_KEY:
+            keyboard, pin = self.__keyboard_for(doorpi_object, record[3])
+            if keyboard is None or not hasattr(keyboard, 'replay_edge'):
+                logger.warning('no synthetic keyboard for %s - skip %s', record[3], event_name)
+                return
+            keyboard.replay_edge(event_name, pin)
+        elif kind == TRACE_SIPPHONE:
+            event_source = record[3]
+            # the events of the real sipphone are unknown to the dummy
+            doorpi_object.event_handler.register_event(event_name, event_source)
+            self.__added_sources.add(event_source)
+            try:                kwargs = json.loads(record[4])
+            except Exception:   kwargs = {}
+            doorpi_object.event_handler(event_name, event_source, kwargs)
+        elif kind == TRACE_WEB:
+            # like /control/trigger_event - the source can be a replaced keyboard or sipphone
+            doorpi_object.event_handler.register_event(event_name, record[3])
+            self.__added_sources.add(record[3])
+            doorpi_object.trace_recorder.record(TRACE_WEB, event_name, record[3])
+            doorpi_object.event_handler.fire_event_synchron(event_name, record[3])
+
+    def run(self, doorpi_object):
+        time.sleep(STARTUP_DELAY)
+        start_time = time.time()
+        first_input = self.__inputs[0][0] if self.__inputs else 0
+        for record in self.__inputs:
+            if not self.__fast:
+                delay = start_time + record[0] - first_input - time.time()
+                if delay > 0: time.sleep(delay)
+            try:
+                self.__fire(doorpi_object, record)
+            except Exception:
+                logger.exception('replay of %s failed', record)
+        replay_duration = time.time() - start_time
+
+        # wait for the actions of the last inputs
+        expected = len(input_reactions(self.__recorded))
+        last_count, last_change = -1, time.time()
+        while time.time() - last_change < DRAIN_TIMEOUT:
+            count = self.__replayed_actions()
+            if count >= expected: break
+            if count != last_count: last_count, last_change = count, time.time()
+            time.sleep(0.1)
+
+        for event_source in self.__added_sources:
+            doorpi_object.event_handler.unregister_source(event_source, True)
+        with self.__lock:
+            self.__report = self.__compare(sorted(self.__replayed, key = lambda record: record[0]), replay_duration)
+        doorpi_object.doorpi_shutdown(0)
+
+    def __compare(self, replayed, replay_duration):
+        recorded_reactions = input_reactions(self.__recorded)
+        replayed_reactions = input_reactions(replayed)
+        recorded_actions = [(event_name, action) for event_name, action, reaction in recorded_reactions]
+        replayed_actions = [(event_name, action) for event_name, action, reaction in replayed_reactions]
+        recorded_counter = Counter(recorded_actions)
+        replayed_counter = Counter(replayed_actions)
+
+        # the lanes run in parallel - so the order is only compared per event
+        recorded_sequences = defaultdict(list)
+        replayed_sequences = defaultdict(list)
+        for event_name, action in recorded_actions: recorded_sequences[event_name].append(action)
+        for event_name, action in replayed_actions: replayed_sequences[event_name].append(action)
+        events = set(recorded_sequences) | set(replayed_sequences)
+        different_events = sorted(event_name for event_name in events
+                                  if recorded_sequences[event_name] != replayed_sequences[event_name])
+
+        # the n-th reaction of an action in the recording is compared with its n-th reaction in the replay
+        replayed_by_action = defaultdict(list)
+        for event_name, action, reaction in replayed_reactions: replayed_by_action[(event_name, action)].append(reaction)
+        recorded_by_action = defaultdict(list)
+        for event_name, action, reaction in recorded_reactions: recorded_by_action[(event_name, action)].append(reaction)
+        deltas = []
+        for key, reactions in recorded_by_action.items():
+            deltas.extend(replayed - recorded for recorded, replayed in zip(reactions, replayed_by_action[key]))
+
+        return {
+            'inputs':               len(self.__inputs),
+            'mode':                 'fast' if self.__fast else 'realtime',
+            'recorded_duration':    round(self.__inputs[-1][0] - self.__inputs[0][0], 3) if self.__inputs else 0,
+            'replayed_duration':    round(replay_duration, 3),
+            'actions_recorded':     len(recorded_actions),
+            'actions_replayed':     len(replayed_actions),
+            'missing':              ['%s x %s -> %s' % (count, event_name, action) for (event_name, action), count in
+                                     (recorded_counter - replayed_counter).most_common(REPORT_TOP)],
+            'unexpected':           ['%s x %s -> %s' % (count, event_name, action) for (event_name, action), count in
+                                     (replayed_counter - recorded_counter).most_common(REPORT_TOP)],
+            'events':               len(events),
+            'different_events':     different_events[:REPORT_TOP],
+            'different_count':      len(different_events),
+            'reaction_ms':          {
+                'recorded':         latency_statistic([reaction for event_name, action, reaction in recorded_reactions]),
+                'replayed':         latency_statistic([reaction for event_name, action, reaction in replayed_reactions]),
+                'replay - record':  latency_statistic(deltas)
+            }
+        }
+
+    @property
+    def matches(self):
+        return self.__report is not None and self.__report['different_count'] == 0 and \
+               not self.__report['missing'] and not self.__report['unexpected']
+
+    def start(self, parsed_arguments):
+        try:
+            doorpi_object = doorpi.DoorPi(parsed_arguments)
+            doorpi_object.prepare(parsed_arguments)
+            doorpi_object.trace_recorder.add_listener(self.recorded)
+
+            runner = threading.Thread(target = self.run, args = (doorpi_object, ), name = 'Replay')
+            runner.daemon = True
+            runner.start()
+            try:                        doorpi_object.run()
+            except KeyboardInterrupt:   logger.info("KeyboardInterrupt -> replay stopped")
+            return self.__report is not None
+        finally:
+            doorpi.DoorPi().destroy()
+
+def format_replay_report(report):
+    lines = ['DoorPi replay of %s inputs (%s) - recorded %s s, replayed %s s' % (
+        report['inputs'], report['mode'], report['recorded_duration'], report['replayed_duration']), '']
+    lines.append('actions recorded: %s, replayed: %s' % (report['actions_recorded'], report['actions_replayed']))
+    lines.append('events with other actions or order: %s of %s %s' % (
+        report['different_count'], report['events'], ', '.join(report['different_events'])))
+    for title in ['missing', 'unexpected']:
+        if not report[title]: continue
+        lines.append('%s:' % title)
+        lines.extend('    %s' % entry for entry in report[title])
+    lines.append('')
+    lines.append('%-30s %8s %10s %10s %10s %10s %10s' % ('reaction [ms]', 'count', 'avg', 'p50', 'p95', 'p99', 'max'))
+    for run, statistic in sorted(report['reaction_ms'].items()):
+        lines.append('%-30s %8s %10s %10s %10s %10s %10s' % (
+            run, statistic.get('count'), statistic.get('avg', '-'), statistic.get('p50', '-'),
+            statistic.get('p95', '-'), statistic.get('p99', '-'), statistic.get('max', '-')))
+    return '\n'.join(lines)
+
+def write_replay_config(configfile, base_path):
+    config = ConfigParser.RawConfigParser(allow_no_value = True)
+    config.read(configfile)
+    for section in ['DoorPi', 'DoorPiWeb', 'SIP-Phone', 'keyboards']:
+        if not config.has_section(section): config.add_section(section)
+
+    config.set('DoorPi', 'eventlog', os.path.join(base_path, 'eventlog.db'))
+    config.set('DoorPi', 'trace_file', '')
+    config.set('DoorPiWeb', 'ip', '127.0.0.1')
+    config.set('DoorPiWeb', 'port', str(free_port()))
+    config.set('SIP-Phone', 'sipphonetyp', 'dummy')
+    for keyboard_name in config.options('keyboards'):
+        config.set('keyboards', keyboard_name, 'synthetic')
+        section_name = keyboard_name+'_keyboard'
+        # only the edges of the trace - no generated inputs
+        if config.has_section(section_name): config.remove_section(section_name)
+        config.add_section(section_name)
+        config.set(section_name, 'rate', '0')
+
+    replay_configfile = os.path.join(base_path, 'replay.ini')
+    with open(replay_configfile, 'w') as replay_file: config.write(replay_file)
+    return replay_configfile
+
+def run_replay(parsed_arguments):
+    if not parsed_arguments.tracefile:
+        logger.error('replay needs --tracefile')
+        return 1
+    configfile = ConfigObject.find_config(parsed_arguments.configfile)
+    if not configfile:
+        logger.error('replay needs the config of the recording (--configfile)')
+        return 1
+
+    records = load_trace(parsed_arguments.tracefile)
+    base_path = tempfile.mkdtemp(prefix = 'doorpi_replay_')
+    replay = Replay(records, parsed_arguments.fast)
+    try:
+        parsed_arguments.configfile = write_replay_config(configfile, base_path)
+        if not replay.start(parsed_arguments): return 1
+    finally:
+        shutil.rmtree(base_path, ignore_errors = True)
+
+    if parsed_arguments.json: print(json.dumps(replay.report, sort_keys = True, indent = 4))
+    else: print(format_replay_report(replay.report))
+    return 0 if replay.matches else 2
+
+#
+#  doorpi_cli bench --scenario rdm6300[,...|all] [--json]
+#
+#  Component scenarios: every scenario drives one component of a DoorPi (dummy sipphone) with
+#  generated input from a local stand-in (pty, socket or server) and reports its metrics and
+#  the checks of the results. The exit code is 2, if a check failed.
+#
+
+class Scenario(object):
+    """ one component under generated load
+
+    sections() returns the config sections the scenario needs, run() runs it in the started
+    DoorPi and returns the metrics, check() notes failed checks.
+    """
+
+    name = None
+    description = ''
+
+    def __init__(self, base_path, parsed_arguments):
+        self.base_path = base_path
+        self.arguments = parsed_arguments
+        self.failed = []
+
+    def sections(self): return {}
+
+    def check(self, condition, description):
+        if not condition:
+            logger.error('scenario %s: check failed: %s', self.name, description)
+            self.failed.append(description)
+        return condition
+
+    def run(self, doorpi_object): return {}
+
+    def cleanup(self): pass
+
+SCENARIOS = OrderedDict()
+
+def scenario(scenario_class):
+    SCENARIOS[scenario_class.name] = scenario_class
+    return scenario_class
+
+def wait_until(condition, timeout):
+    end_time = time.time() + timeout
+    while not condition() and time.time() < end_time: time.sleep(0.01)
+    return condition()
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def rdm6300_frame(tag, valid = True):
+    data = '00%08X' % tag
+    checksum = 0
+    for position in range(0, 10, 2): checksum ^= int(data[position:position + 2], 16)
+    if not valid: checksum ^= 0xFF
+    return '\x02%s%02X\x03' % (data, checksum)
+
+class StandInHttpHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the answers go out at once - without, every keep alive request waits for delayed ACK
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def log_message(self, *args): pass
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connected(self.connection)
+
+    def finish(self):
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        finally:
+            self.server.disconnected(self.connection)
+
+    def answer(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status, content_type, reply = self.server.respond(self.command, self.path, body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_GET = do_POST = answer
+
+class StandInHttpServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ local HTTP/1.1 server with keep alive for the scenarios
+
+    respond(method, path, body) returns (status, content type, body) and runs in the thread of
+    the connection. connections counts the accepted connections, stop() closes them.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, respond):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHttpHandler)
+        self.respond = respond
+        self.connections = 0
+        self.__sockets = []
+        self.__lock = threading.Lock()
+        thread = threading.Thread(target = self.serve_forever, name = 'StandInHttpServer')
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def url(self): return 'http://127.0.0.1:%s' % self.server_address[1]
+
+    def connected(self, connection):
+        with self.__lock:
+            self.connections += 1
+            self.__sockets.append(connection)
+
+    def disconnected(self, connection):
+        with self.__lock:
+            if connection in self.__sockets: self.__sockets.remove(connection)
+
+    def handle_error(self, request, client_address):
+        # the client closed the connection or stop() did
+        logger.debug('stand-in connection of %s ended: %s', client_address, sys.exc_info()[1])
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        # the kept-alive connections end their threads
+        with self.__lock: sockets = list(self.__sockets)
+        for connection in sockets:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        wait_until(lambda: not self.__sockets, 1)
+
+class StandInSmtpServer(smtpd.SMTPServer):
+    """ local SMTP server (HELO only) for the scenarios
+
+    respond(recipients, data) returns the reply to the message - None is 250 - and runs in the
+    thread of the server. handshake delays the greeting of every connection (TLS and login of a
+    real server). connections counts the accepted connections, stop() closes them.
+    """
+
+    def __init__(self, respond, handshake = 0):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.respond = respond
+        self.handshake = handshake
+        self.connections = 0
+        self.__channels = []
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target = self.__serve, name = 'StandInSmtpServer')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    @property
+    def port(self): return self.socket.getsockname()[1]
+
+    def __serve(self):
+        while not self.__stopped.is_set(): asyncore.loop(timeout = 0.01, count = 1)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None: return
+        self.connections += 1
+        time.sleep(self.handshake)
+        self.__channels.append(smtpd.SMTPChannel(self, *pair))
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        return self.respond(rcpttos, data)
+
+    def stop(self):
+        self.__stopped.set()
+        self.__thread.join(1)
+        for channel in self.__channels: channel.close()
+        self.close()
+
+class StandInRegistrar(object):
+    """ local UDP registrar that answers the OPTIONS pings while up is True """
+
+    def __init__(self):
+        self.up = True
+        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__socket.bind(('127.0.0.1', 0))
+        self.__socket.settimeout(0.05)
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target = self.__serve, name = 'StandInRegistrar')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    @property
+    def name(self): return '127.0.0.1:%s' % self.__socket.getsockname()[1]
+
+    def __serve(self):
+        while not self.__stopped.is_set():
+            try:
+                request, address = self.__socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except socket.error:
+                return
+            if self.up and request.startswith('OPTIONS '):
+                self.__socket.sendto('SIP/2.0 200 OK\r\n' + request.split('\r\n', 1)[1], address)
+
+    def stop(self):
+        self.__stopped.set()
+        self.__thread.join(1)
+        self.__socket.close()
+
+class StandInSipphone(SipphoneAbstractBaseClass):
+    """ sipphone with a fake core for the scenarios
+
+    The core registers in the pump thread at the registrar of _use_registrar() and reports it
+    with registration_state_changed() like the callback of linphone - ok if the stand-in
+    registrar is up, failed otherwise. Calls are made in the pump thread like linphone and pjsua
+    and only recorded with their correlation id.
+    """
+
+    def __init__(self, registrars):
+        self.__registrars = dict((registrar.name, registrar) for registrar in registrars)
+        self.__lock = threading.Lock()
+        self.__register_at = registrars[0].name
+        self.registered_at = None
+        self.queued = []        # correlation id of the calls when they were made by an action
+        self.calls = []         # (number, correlation id, thread) of the calls made by the core
+
+    @property
+    def name(self): return 'stand-in phone'
+
+    def start(self):
+        self.pump.start()
+        self.registration.start()
+        return self
+
+    def destroy(self):
+        self.registration.stop()
+        self.pump.stop()
+
+    def refresh_registers(self):
+        with self.__lock: self.__register_at = self.registered_at
+        self.pump.wake()
+
+    def _use_registrar(self, registrar):
+        with self.__lock: self.__register_at = registrar
+
+    def iterate(self):
+        with self.__lock: registrar, self.__register_at = self.__register_at, None
+        if registrar is None: return
+        self.registered_at = registrar
+        if self.__registrars[registrar].up: self.registration_state_changed(REGISTRATION_OK, 'Registration successful')
+        else: self.registration_state_changed(REGISTRATION_FAILED, 'Request Timeout')
+
+    def registration_state_changed(self, state, message):
+        self.registration.registration_state(state, message)
+
+    def call(self, number):
+        return self._call_with_trace(self.__call, number)
+
+    def __call(self, number):
+        self.queued.append(current_correlation_id())
+        if self.registration.queue_call(self.__make_call, number): return None
+        return self.pump.run_in_thread(self.__make_call, number)
+
+    def __make_call(self, number):
+        self.calls.append((number, current_correlation_id(), threading.current_thread().name))
+
+    def hangup(self): pass
+
+@scenario
+class Rdm6300Scenario(Scenario):
+    """ tag stream through a pty into the RDM6300 keyboard
+
+    Valid frames of known and unknown tags, frames with a wrong checksum and noise between the
+    frames are written in chunks of random size, so frames are split over several reads.
+    Every valid frame has to fire exactly one OnFoundTag, the invalid ones none.
+    """
+
+    name = 'rdm6300'
+    description = 'RFID frames through a pty -> OnFoundKnownTag / OnFoundUnknownTag'
+    FRAMES = 5000
+    KNOWN_TAGS = 20
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__master, self.__slave = os.openpty()
+        self.__events = Counter()
+        self.__lock = threading.Lock()
+
+    def sections(self):
+        return {
+            'keyboards': {'bench_rfid': 'rdm6300'},
+            'bench_rfid_keyboard': {'port': os.ttyname(self.__slave), 'baudrate': '9600', 'debounce': 'none'},
+            'bench_rfid_InputPins': dict((str(0x100000 + index), 'sleep:0') for index in range(self.KNOWN_TAGS))
+        }
+
+    def __event_fired(self, event_name, event_source, kwargs, fire_time):
+        if event_name in ['OnFoundTag', 'OnFoundKnownTag', 'OnFoundUnknownTag']:
+            with self.__lock: self.__events[event_name] += 1
+
+    def run(self, doorpi_object):
+        # pyserial is only needed by this scenario
+        from keyboard.from_rdm6300 import RDM6300, START_FLAG, STOP_FLAG, PAYLOAD_LENGTH
+        from keyboard.serial_lib.FrameDecoder import FrameDecoder
+        random = Random(29)
+        stream, expected = [], Counter()
+        for index in range(self.FRAMES):
+            roll = random.random()
+            if roll < 0.1:
+                stream.append(rdm6300_frame(0x200000 + index, valid = False))
+                continue
+            if roll < 0.5:
+                stream.append(rdm6300_frame(0x100000 + index % self.KNOWN_TAGS))
+                expected['OnFoundKnownTag'] += 1
+            else:
+                stream.append(rdm6300_frame(0x300000 + index))
+                expected['OnFoundUnknownTag'] += 1
+            expected['OnFoundTag'] += 1
+            if roll > 0.95: stream.append('\x00noise\xff')
+        stream = ''.join(stream)
+
+        doorpi_object.event_handler.add_listener(self.__event_fired)
+        start_time, start_cpu = time.time(), cpu_time()
+        position = 0
+        while position < len(stream):
+            chunk_size = random.randint(1, 64)
+            position += os.write(self.__master, stream[position:position + chunk_size])
+        write_time = time.time() - start_time
+        wait_until(lambda: self.__events['OnFoundKnownTag'] + self.__events['OnFoundUnknownTag'] >=
+                           expected['OnFoundTag'], 30)
+        duration = time.time() - start_time
+        cpu_used = cpu_time() - start_cpu
+
+        with self.__lock: events = dict(self.__events)
+        for event_name, count in expected.items():
+            self.check(events.get(event_name, 0) == count, '%s: %s events for %s valid frames' % (
+                event_name, events.get(event_name, 0), count))
+
+        # the decoder alone - without UART and event handler
+        decoder = FrameDecoder(stop_flag = STOP_FLAG, start_flag = START_FLAG, payload_length = PAYLOAD_LENGTH,
+                               validator = RDM6300.check_checksum)
+        decode_start = time.time()
+        decoded = sum(len(decoder.feed(stream[position:position + 64])) for position in range(0, len(stream), 64))
+        decode_time = time.time() - decode_start
+        self.check(decoded == expected['OnFoundTag'], 'decoder: %s payloads for %s valid frames' % (
+            decoded, expected['OnFoundTag']))
+        return {
+            'decoder_frames_per_s': round(decoded / decode_time, 1),
+            'frames':           self.FRAMES,
+            'bytes':            len(stream),
+            'valid_frames':     expected['OnFoundTag'],
+            'events':           events,
+            'write_s':          round(write_time, 3),
+            'frames_per_s':     round(expected['OnFoundTag'] / duration, 1),
+            'cpu_s':            round(cpu_used, 3)
+        }
+
+    def cleanup(self):
+        os.close(self.__master)
+        os.close(self.__slave)
+
+@scenario
+class MatcherScenario(Scenario):
+    """ SequenceMatcher with thousands of DTMF codes against the endswith() scan it replaced
+
+    The matches of the automaton are compared symbol by symbol with the scan over the first
+    NAIVE_SYMBOLS symbols, the throughput is measured over the whole stream.
+    """
+
+    name = 'matcher'
+    description = 'Aho-Corasick SequenceMatcher vs. endswith() scan over all codes'
+    CODE_COUNTS = [100, 1000, 5000]
+    SYMBOLS = 100000
+    NAIVE_SYMBOLS = 2000
+    DTMF_SYMBOLS = '0123456789*#'
+
+    def run(self, doorpi_object):
+        from action.matcher import SequenceMatcher
+        random = Random(30)
+        metrics = {}
+        for code_count in self.CODE_COUNTS:
+            codes = set()
+            while len(codes) < code_count:
+                codes.add(''.join(random.choice(self.DTMF_SYMBOLS) for _ in range(random.randint(2, 8))))
+            codes = sorted(codes)
+            # random symbols with a code every 20 symbols
+            stream = []
+            while len(stream) < self.SYMBOLS:
+                stream.extend(random.choice(self.DTMF_SYMBOLS) for _ in range(random.randint(0, 20)))
+                stream.extend(random.choice(codes))
+
+            build_start = time.time()
+            matcher = SequenceMatcher(codes)
+            build_time = time.time() - build_start
+
+            longest = max(len(code) for code in codes)
+            received = ''
+            naive_start = time.time()
+            naive_matches = []
+            for symbol in stream[:self.NAIVE_SYMBOLS]:
+                received = (received + symbol)[-longest:]
+                naive_matches.append(sorted(code for code in codes if received.endswith(code)))
+            naive_time = time.time() - naive_start
+
+            mismatches = 0
+            for position, symbol in enumerate(stream[:self.NAIVE_SYMBOLS]):
+                if sorted(matcher.feed(symbol)) != naive_matches[position]: mismatches += 1
+            self.check(mismatches == 0, '%s codes: %s symbols with other matches than the scan' % (
+                code_count, mismatches))
+
+            matcher.reset()
+            matches = 0
+            match_start = time.time()
+            for symbol in stream: matches += len(matcher.feed(symbol))
+            match_time = time.time() - match_start
+
+            metrics['%s codes' % code_count] = {
+                'build_ms':             round(build_time * 1000, 1),
+                'matches':              matches,
+                'matcher_symbols_per_s': int(len(stream) / match_time),
+                'scan_symbols_per_s':   int(self.NAIVE_SYMBOLS / naive_time),
+                'speedup':              round((naive_time / self.NAIVE_SYMBOLS) / (match_time / len(stream)), 1)
+            }
+
+        # overlapping codes and reset
+        matcher = SequenceMatcher({'123': 'long', '23': 'short', '3': 'digit'})
+        self.check(sorted(matcher.feed_sequence('123')) == ['digit', 'long', 'short'], 'overlapping codes')
+        matcher.feed_sequence('12')
+        matcher.reset()
+        self.check(matcher.feed('3') == ['digit'], 'reset forgets the received symbols')
+        self.check(len(matcher.history) <= 3, 'history is bounded to the longest code')
+        return metrics
+
+@scenario
+class CredentialsScenario(Scenario):
+    """ CredentialStore with 100k tags: import, lookups and incremental reload
+
+    The lookups are compared with the membership test in the list of InputPins they replaced.
+    """
+
+    name = 'credentials'
+    description = 'credential store with 100k tags vs. InputPin list'
+    TAGS = 100000
+    GROUPS = 10
+    LOOKUPS = 100000
+    LIST_LOOKUPS = 1000
+    CHANGES = 100
+
+    def __write_file(self, file_name, tags):
+        with open(file_name, 'w') as credential_file:
+            for tag, line in sorted(tags.items()): credential_file.write('%s;%s\n' % (tag, line))
+
+    def run(self, doorpi_object):
+        from keyboard.CredentialStore import CredentialStore
+        random = Random(31)
+        file_name = os.path.join(self.base_path, 'credentials.csv')
+        tags = dict(('%010d' % (1000000 + index * 7), 'group%s' % (index % self.GROUPS)) for index in range(self.TAGS))
+        tags['0000000001'] = 'expired;2000-01-01;2000-12-31'
+        self.__write_file(file_name, tags)
+
+        import_start = time.time()
+        store = CredentialStore(os.path.join(self.base_path, 'credentials.db'), file_name, 3600)
+        import_time = time.time() - import_start
+        try:
+            self.check(store.count == len(tags), 'imported %s of %s tags' % (store.count, len(tags)))
+
+            tag_list = sorted(tags)
+            samples = [random.choice(tag_list) if random.random() < 0.8 else '%010d' % random.randint(0, 10 ** 9)
+                       for _ in range(self.LOOKUPS)]
+            latencies = []
+            wrong = 0
+            lookup_start = time.time()
+            for tag in samples:
+                start_time = time.time()
+                group = store.lookup(tag)
+                latencies.append(time.time() - start_time)
+                if tag in tags and tag != '0000000001':
+                    if group != tags[tag]: wrong += 1
+                elif group is not None: wrong += 1
+            lookup_time = time.time() - lookup_start
+            self.check(wrong == 0, '%s lookups with a wrong group' % wrong)
+            self.check(store.lookup('0000000001') is None, 'expired tag is not valid')
+
+            input_pins = list(tag_list)
+            list_start = time.time()
+            for tag in samples[:self.LIST_LOOKUPS]: tag in input_pins
+            list_time = time.time() - list_start
+
+            # incremental reload - changed, removed and new tags
+            changed = random.sample(tag_list[1:], self.CHANGES)
+            for tag in changed[:self.CHANGES // 2]: tags[tag] = 'moved'
+            for tag in changed[self.CHANGES // 2:]: del tags[tag]
+            tags['9999999999'] = 'new'
+            self.__write_file(file_name, tags)
+            sync_start = time.time()
+            store.sync_file()
+            sync_time = time.time() - sync_start
+            self.check(all(store.lookup(tag) == 'moved' for tag in changed[:self.CHANGES // 2]), 'changed tags moved')
+            self.check(all(store.lookup(tag) is None for tag in changed[self.CHANGES // 2:]), 'removed tags unknown')
+            self.check(store.lookup('9999999999') == 'new', 'new tag known')
+            self.check(set(store.groups) == set(line.split(';')[0] for line in tags.values()), 'groups of the store')
+        finally:
+            store.destroy()
+
+        # the file is reloaded by the timer of the store, not by lookup()
+        timer_file = os.path.join(self.base_path, 'timer.csv')
+        self.__write_file(timer_file, {'0000000002': 'before'})
+        store = CredentialStore(os.path.join(self.base_path, 'timer.db'), timer_file, 0.2)
+        try:
+            self.__write_file(timer_file, {'0000000002': 'after'})
+            os.utime(timer_file, (time.time() + 1, time.time() + 1))
+            self.check(wait_until(lambda: store.lookup('0000000002') == 'after', 2), 'reload by the timer')
+        finally:
+            store.destroy()
+
+        return {
+            'tags':                 self.TAGS,
+            'import_s':             round(import_time, 3),
+            'lookup':               latency_statistic(latencies),
+            'lookups_per_s':        int(self.LOOKUPS / lookup_time),
+            'list_lookups_per_s':   int(self.LIST_LOOKUPS / list_time),
+            'reload_%s_changes_ms' % self.CHANGES: round(sync_time * 1000, 1)
+        }
+
+@scenario
+class SocketScenario(Scenario):
+    """ press frames over UDP and TCP into the socket keyboard, with and without HMAC
+
+    Every press has to fire exactly one OnKeyPressed and the keyboard has to take at least
+    MIN_FRAMES_PER_S frames. A signed frame sent a second time, a frame with a wrong signature
+    and a frame older than hmac_max_age have to be rejected.
+    """
+
+    name = 'socket'
+    description = 'socket keyboard: UDP/TCP frames/s, signed frames and replays'
+    FRAMES = 2000
+    LINES_PER_DATAGRAM = 50
+    PINS = 10
+    HMAC_KEY = 'bench'
+    MIN_FRAMES_PER_S = 1000
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__ports = dict(udp = free_port(), tcp = free_port(), signed = free_port())
+        self.__pressed = Counter()
+        self.__lock = threading.Lock()
+
+    def sections(self):
+        return {
+            'keyboards': {'bench_socket': 'socket', 'bench_signed': 'socket'},
+            'bench_socket_keyboard': {'udp_port': str(self.__ports['udp']), 'tcp_port': str(self.__ports['tcp']),
+                                      'debounce': 'none'},
+            'bench_socket_InputPins': dict(('sock%s' % index, 'sleep:0') for index in range(self.PINS)),
+            'bench_signed_keyboard': {'tcp_port': str(self.__ports['signed']), 'hmac_key': self.HMAC_KEY,
+                                      'hmac_max_age': '30', 'debounce': 'none'},
+            'bench_signed_InputPins': dict(('sig%s' % index, 'sleep:0') for index in range(self.PINS))
+        }
+
+    def __event_fired(self, event_name, event_source, kwargs, fire_time):
+        if event_name.startswith('OnKeyPressed_'):
+            # counted by the pin name without its number: sock or sig
+            with self.__lock: self.__pressed[event_name[len('OnKeyPressed_'):].rstrip('0123456789')] += 1
+
+    def __measure(self, keyboard, prefix, send):
+        frames_before = keyboard.statistic['frames']
+        with self.__lock: pressed_before = self.__pressed[prefix]
+        start_time, start_cpu = time.time(), cpu_time()
+        send()
+        frames_done = wait_until(lambda: keyboard.statistic['frames'] - frames_before >= self.FRAMES, 30)
+        frames_time = time.time() - start_time
+        wait_until(lambda: self.__pressed[prefix] - pressed_before >= self.FRAMES, 60)
+        events_time = time.time() - start_time
+        with self.__lock: pressed = self.__pressed[prefix] - pressed_before
+        self.check(frames_done, '%s: %s of %s frames received' % (
+            prefix, keyboard.statistic['frames'] - frames_before, self.FRAMES))
+        self.check(pressed == self.FRAMES, '%s: %s OnKeyPressed for %s presses' % (prefix, pressed, self.FRAMES))
+        self.check(self.FRAMES / frames_time >= self.MIN_FRAMES_PER_S, '%s: %.1f frames/s' % (
+            prefix, self.FRAMES / frames_time))
+        return {
+            'frames_per_s':     round(self.FRAMES / frames_time, 1),
+            'presses_per_s':    round(self.FRAMES / events_time, 1),
+            'cpu_s':            round(cpu_time() - start_cpu, 3)
+        }
+
+    def run(self, doorpi_object):
+        from keyboard.from_socket import sign_frame
+        keyboards = doorpi_object.keyboard.keyboards
+        frames = ['press sock%s' % (index % self.PINS) for index in range(self.FRAMES)]
+        doorpi_object.event_handler.add_listener(self.__event_fired)
+        metrics = {}
+
+        def send_udp():
+            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            for position in range(0, len(frames), self.LINES_PER_DATAGRAM):
+                client.sendto('\n'.join(frames[position:position + self.LINES_PER_DATAGRAM]),
+                              ('127.0.0.1', self.__ports['udp']))
+            client.close()
+        metrics['udp'] = self.__measure(keyboards['bench_socket'], 'sock', send_udp)
+
+        def send_tcp():
+            client = socket.create_connection(('127.0.0.1', self.__ports['tcp']))
+            client.sendall('\n'.join(frames) + '\n')
+            client.close()
+        metrics['tcp'] = self.__measure(keyboards['bench_socket'], 'sock', send_tcp)
+
+        def send_signed():
+            client = socket.create_connection(('127.0.0.1', self.__ports['signed']))
+            client.sendall(''.join(sign_frame(self.HMAC_KEY, 'press sig%s' % (index % self.PINS)) + '\n'
+                                   for index in range(self.FRAMES)))
+            client.close()
+        sign_start = time.time()
+        for index in range(self.FRAMES): sign_frame(self.HMAC_KEY, 'press sig0')
+        sign_time = time.time() - sign_start
+        metrics['tcp_hmac'] = self.__measure(keyboards['bench_signed'], 'sig', send_signed)
+        metrics['tcp_hmac']['sign_per_s'] = int(self.FRAMES / sign_time)
+
+        # replays and forged frames - every one answered with an error, the status read
+        # afterwards is the only other answer
+        client = socket.create_connection(('127.0.0.1', self.__ports['signed']))
+        client.settimeout(5)
+        captured = sign_frame(self.HMAC_KEY, 'press sig0')
+        forged = sign_frame('other key', 'press sig0')
+        too_old = sign_frame(self.HMAC_KEY, 'press sig0', time.time() - 60)
+        client.sendall('\n'.join([captured, captured, forged, too_old, sign_frame(self.HMAC_KEY, 'in sig0')]) + '\n')
+        answers = ''
+        try:
+            while answers.count('\n') < 4:
+                data = client.recv(4096)
+                if not data: break
+                answers += data
+        except socket.timeout:
+            pass
+        client.close()
+        self.check(answers.splitlines() == ['error frame replayed', 'error wrong signature', 'error frame too old',
+                                            'in sig0 0'], 'answers to replayed and forged frames: %r' % answers)
+        self.check(keyboards['bench_signed'].statistic['replayed'] == 1, 'one replay counted')
+        # the other scenarios may add keyboards without statistic
+        metrics['statistic'] = dict((name, keyboards[name].statistic) for name in ['bench_socket', 'bench_signed'])
+        return metrics
+
+@scenario
+class AdminNumbersScenario(Scenario):
+    """ AdminNumberMatcher with 1000 numbers against the scan over all keys it replaced
+
+    Fixed URIs check wildcards, internal numbers with a leading **, the host and the display
+    name. A change of the config has to compile the entries again.
+    """
+
+    name = 'admin'
+    description = 'AdminNumberMatcher vs. scan over all [AdminNumbers]'
+    NUMBERS = 1000
+    LOOKUPS = 20000
+    SCAN_LOOKUPS = 2000
+    ENTRIES = ['**621', '**622@fritz.box', '0170*', '*@home.lan', '**61?']
+    CASES = [
+        ('"Tuer" <sip:**621@fritz.box:5060;transport=udp>', True),
+        ('sip:**621', True),
+        ('sip:**6210@fritz.box', False),
+        ('sip:x**621@fritz.box', False),
+        ('<sip:**622@fritz.box>', True),
+        ('<sip:**622@other.box>', False),
+        ('sip:**615@fritz.box', True),
+        ('sip:**6155@fritz.box', False),
+        ('sip:01701234@provider.de', True),
+        ('sip:0171@provider.de', False),
+        ('sip:anyone@HOME.lan', True),
+        ('sip:anyone@home.lan.evil', False),
+        ('sip:%2A%2A621@fritz.box', True),
+        ('tel:1050', True),
+        ('sip:1050@fritz.box', True),
+        ('sip:2050@fritz.box', False),
+        ('', False),
+        (None, False)
+    ]
+
+    def sections(self):
+        entries = dict((entry, 'active') for entry in self.ENTRIES)
+        entries.update((str(1000 + index), 'active') for index in range(self.NUMBERS))
+        return {'AdminNumbers': entries}
+
+    def run(self, doorpi_object):
+        from sipphone.AdminNumbers import AdminNumberMatcher
+        random = Random(43)
+        config = doorpi_object.config
+        matcher = AdminNumberMatcher()
+        for uri, expected in self.CASES:
+            self.check(matcher.match(uri) is expected, 'match(%r) is %s' % (uri, expected))
+
+        # every change of the config compiles again
+        compiled = matcher.statistic['compiled']
+        config.set_value('AdminNumbers', '**629', 'active')
+        self.check(matcher.match('sip:**629@fritz.box'), 'new number after set_value')
+        self.check(matcher.statistic['compiled'] == compiled + 1, 'compiled again after set_value')
+        config.delete_key('AdminNumbers', '**629')
+        self.check(not matcher.match('sip:**629@fritz.box'), 'number unknown after delete_key')
+        config.set_value('AdminNumbers', '*', 'active')
+        self.check(matcher.match('sip:nobody@nowhere'), '* allows every caller')
+        config.delete_key('AdminNumbers', '*')
+        self.check(not matcher.match('sip:nobody@nowhere'), '* removed')
+        compiled = matcher.statistic['compiled']
+        for uri, expected in self.CASES: matcher.match(uri)
+        self.check(matcher.statistic['compiled'] == compiled, 'no compile without change of the config')
+
+        # numbers with and without a display name, 20% unknown
+        uris = []
+        for _ in range(self.LOOKUPS):
+            number = random.randint(1000, 1000 + self.NUMBERS + self.NUMBERS // 4)
+            uris.append(('"Tuer" <sip:%s@fritz.box>' if random.random() < 0.5 else 'sip:%s@fritz.box') % number)
+
+        keys = config.get_keys('AdminNumbers', log = False)
+        def scan(uri):
+            for number in keys:
+                if number == '*' or 'sip:' + number + '@' in uri: return True
+            return False
+
+        scan_start = time.time()
+        scanned = [scan(uri) for uri in uris[:self.SCAN_LOOKUPS]]
+        scan_time = time.time() - scan_start
+        match_start = time.time()
+        matched = [matcher.match(uri) for uri in uris]
+        match_time = time.time() - match_start
+        different = sum(1 for position, result in enumerate(scanned) if matched[position] != result)
+        self.check(different == 0, '%s of %s numbers matched other than by the scan' % (different, len(scanned)))
+        return {
+            'numbers':          len(keys),
+            'matches':          sum(matched),
+            'match_per_s':      int(self.LOOKUPS / match_time),
+            'scan_per_s':       int(self.SCAN_LOOKUPS / scan_time),
+            'speedup':          round((scan_time / self.SCAN_LOOKUPS) / (match_time / self.LOOKUPS), 1),
+            'statistic':        matcher.statistic
+        }
+
+@scenario
+class HttpScenario(Scenario):
+    """ the pooled HTTP client of the actions against a fresh connection per request
+
+    Before, url_call and take_snapshot opened a new connection for every request. Also checks
+    the limit of parallel requests per host, the retries of 503 and the streamed download.
+    """
+
+    name = 'http'
+    description = 'pooled HTTP client vs. new connection per request'
+    REQUESTS = 500
+    MAX_CONNECTIONS = 2
+    PARALLEL = 6
+    IMAGE_SIZE = 100000
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__lock = threading.Lock()
+        self.__running = 0
+        self.__max_running = 0
+        self.__flaky = 0
+
+    def sections(self):
+        return {'HTTP': {'connect_timeout': '1', 'read_timeout': '2', 'retries': '2', 'retry_backoff': '0.01',
+                         'max_connections': str(self.MAX_CONNECTIONS)}}
+
+    def __respond(self, method, path, body):
+        if path == '/slow':
+            with self.__lock:
+                self.__running += 1
+                self.__max_running = max(self.__max_running, self.__running)
+            time.sleep(0.1)
+            with self.__lock: self.__running -= 1
+        elif path == '/flaky':
+            with self.__lock:
+                self.__flaky += 1
+                if self.__flaky % 3: return 503, 'text/plain', 'busy'
+        elif path == '/image':
+            return 200, 'image/jpeg', '\xff\xd8' + 'x' * (self.IMAGE_SIZE - 4) + '\xff\xd9'
+        return 200, 'text/plain', 'ok'
+
+    def __measure(self, server, get):
+        connections = server.connections
+        latencies = []
+        start_time = time.time()
+        for _ in range(self.REQUESTS):
+            request_start = time.time()
+            get(server.url + '/door')
+            latencies.append(time.time() - request_start)
+        duration = time.time() - start_time
+        return {
+            'connections':      server.connections - connections,
+            'requests_per_s':   round(self.REQUESTS / duration, 1),
+            'latency':          latency_statistic(latencies)
+        }
+
+    def run(self, doorpi_object):
+        import requests
+        from action.http_client import load_http_client
+        client = load_http_client()
+        server = StandInHttpServer(self.__respond)
+        try:
+            metrics = {
+                'pooled':   self.__measure(server, client.get),
+                'fresh':    self.__measure(server, requests.get)
+            }
+            self.check(metrics['pooled']['connections'] <= self.MAX_CONNECTIONS, 'pooled: %s connections' % (
+                metrics['pooled']['connections']))
+            self.check(metrics['fresh']['connections'] == self.REQUESTS, 'fresh: %s connections' % (
+                metrics['fresh']['connections']))
+            metrics['speedup'] = round(metrics['pooled']['requests_per_s'] / metrics['fresh']['requests_per_s'], 1)
+
+            threads = [threading.Thread(target = client.get, args = (server.url + '/slow',)) for _ in range(self.PARALLEL)]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+            self.check(self.__max_running == self.MAX_CONNECTIONS, '%s parallel requests, %s at the same time' % (
+                self.PARALLEL, self.__max_running))
+
+            self.__flaky = 0
+            response = client.get(server.url + '/flaky')
+            self.check(response.status_code == 200 and self.__flaky == 3, 'GET retried after 503: %s in %s tries' % (
+                response.status_code, self.__flaky))
+            self.__flaky = 0
+            response = client.post(server.url + '/flaky', data = '')
+            self.check(response.status_code == 503 and self.__flaky == 1, 'POST not retried: %s in %s tries' % (
+                response.status_code, self.__flaky))
+
+            image_file = os.path.join(self.base_path, 'image.jpg')
+            size = client.download(server.url + '/image', image_file)
+            self.check(size == self.IMAGE_SIZE == os.path.getsize(image_file), 'download of %s bytes' % size)
+            metrics['client'] = client.statistic['hosts']
+        finally:
+            server.stop()
+        return metrics
+
+@scenario
+class IpsScenario(Scenario):
+    """ ipsrpc_setvalue against a JSON-RPC stand-in of IP-Symcon
+
+    Compared with three single requests per SetValue (exists, type, set) as before. Checks that
+    a lone call doesn't wait for a batch, that parallel calls are batched and coalesced and that
+    a missing variable isn't cached.
+    """
+
+    name = 'ips'
+    description = 'IP-Symcon JSON-RPC client: batches, cache, lone calls'
+    SETS = 200
+    PARALLEL = 20
+    BATCH_DELAY = 0.05
+    # answer time of the stand-in per request
+    LATENCY = 0.002
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__lock = threading.Lock()
+        self.__variables = {10: [0, False], 11: [1, 0], 12: [3, '']}     # id -> [type, value]
+        self.__requests = Counter()
+        self.__server = StandInHttpServer(self.__respond)
+
+    def sections(self):
+        return {'IP-Symcon': {'server': self.__server.url + '/api/', 'batch_delay': str(self.BATCH_DELAY),
+                              'cache_ttl': '300'}}
+
+    def __call(self, request):
+        method, params = request['method'], request['params']
+        with self.__lock:
+            self.__requests[method] += 1
+            variable = self.__variables.get(params[0])
+            if method == 'IPS_VariableExists': result = variable is not None
+            elif variable is None: return {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -1, 'message': 'unknown'}}
+            elif method == 'IPS_GetVariable': result = {'VariableValue': {'ValueType': variable[0]}}
+            elif method == 'GetValue': result = variable[1]
+            else:
+                variable[1] = params[1]
+                result = True
+        return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+
+    def __respond(self, method, path, body):
+        time.sleep(self.LATENCY)
+        request = json.loads(body)
+        with self.__lock: self.__requests['http'] += 1
+        answer = [self.__call(single) for single in request] if isinstance(request, list) else self.__call(request)
+        return 200, 'application/json', json.dumps(answer)
+
+    def __http_requests(self):
+        with self.__lock: return self.__requests['http']
+
+    def run(self, doorpi_object):
+        from action.SingleActions.ipsrpc_setvalue import ips_rpc_set_value
+        from action.http_client import load_http_client
+        from action.ips_client import load_ips_client
+        client = load_ips_client()
+        url = self.__server.url + '/api/'
+        metrics = {}
+
+        # before: three requests one after another for every SetValue
+        def single(method, *params):
+            return load_http_client().post(url, idempotent = True, headers = {'content-type': 'application/json'},
+                                           data = json.dumps({'method': method, 'params': params, 'jsonrpc': '2.0', 'id': 0}))
+        start_time = time.time()
+        for index in range(self.SETS):
+            single('IPS_VariableExists', 11)
+            single('IPS_GetVariable', 11)
+            single('SetValue', 11, index)
+        metrics['single_requests_sets_per_s'] = round(self.SETS / (time.time() - start_time), 1)
+
+        # lone calls - the type is cached, one request each and no batch delay
+        ips_rpc_set_value(11, '0')
+        requests_before = self.__http_requests()
+        latencies = []
+        for index in range(self.SETS):
+            start_time = time.time()
+            self.check(ips_rpc_set_value(11, str(index)), 'SetValue %s' % index)
+            latencies.append(time.time() - start_time)
+        metrics['client_sets_per_s'] = round(self.SETS / sum(latencies), 1)
+        metrics['lone_set'] = latency_statistic(latencies)
+        self.check(self.__http_requests() - requests_before == self.SETS, '%s requests for %s lone SetValue' % (
+            self.__http_requests() - requests_before, self.SETS))
+        self.check(percentile(sorted(latencies), 50) < self.BATCH_DELAY, 'lone SetValue waits for no batch (p50 %s ms)' % (
+            metrics['lone_set']['p50']))
+        self.check(self.__variables[11][1] == self.SETS - 1, 'last value set')
+
+        # parallel actions - one request for the first, the others are batched while it runs
+        requests_before = self.__http_requests()
+        results = []
+        # the actions of one event start at the same time
+        fired = threading.Event()
+        def set_value(key, value):
+            fired.wait()
+            results.append(ips_rpc_set_value(key, value))
+        threads = [threading.Thread(target = set_value, args = (11, str(1000 + index))) for index in range(self.PARALLEL)]
+        threads.append(threading.Thread(target = set_value, args = (10, 'true')))
+        threads.append(threading.Thread(target = set_value, args = (12, 'door')))
+        for thread in threads: thread.start()
+        start_time = time.time()
+        fired.set()
+        for thread in threads: thread.join()
+        metrics['parallel_sets_ms'] = round((time.time() - start_time) * 1000, 1)
+        metrics['parallel_requests'] = self.__http_requests() - requests_before
+        self.check(all(results) and len(results) == len(threads), 'all parallel SetValue succeeded')
+        self.check(metrics['parallel_requests'] * 4 <= len(threads), '%s requests for %s parallel SetValue' % (
+            metrics['parallel_requests'], len(threads)))
+        self.check(self.__variables[10][1] is True and self.__variables[12][1] == 'door', 'batched values set')
+
+        # a missing variable is asked again - it can be created in IP-Symcon
+        exists_before = self.__requests['IPS_VariableExists']
+        self.check(not ips_rpc_set_value(13, '1') and not ips_rpc_set_value(13, '1'), 'SetValue of missing variable fails')
+        self.check(self.__requests['IPS_VariableExists'] - exists_before == 2, 'missing variable is not cached')
+        with self.__lock: self.__variables[13] = [1, 0]
+        self.check(ips_rpc_set_value(13, '7') and self.__variables[13][1] == 7, 'SetValue of the created variable')
+
+        metrics['speedup'] = round(metrics['client_sets_per_s'] / metrics['single_requests_sets_per_s'], 1)
+        metrics['client'] = client.statistic
+        return metrics
+
+    def cleanup(self):
+        self.__server.stop()
+
+@scenario
+class MailScenario(Scenario):
+    """ mailto through the mail queue against an SMTP stand-in
+
+    Compared with a new connection, HELO and QUIT for every mail in the action as before. Checks
+    that a burst is sent over one connection, that 4xx replies are retried and 5xx not, that mails
+    to the same recipients are sent as one digest and that the spooled snapshots are attached
+    after they were rotated away.
+    """
+
+    name = 'mail'
+    description = 'mail queue: one connection, retries, digest, spooled attachments'
+    MAILS = 100
+    DIGEST_MAILS = 5
+    # connect, TLS and login of a real server
+    HANDSHAKE = 0.02
+    DIGEST_DELAY = 0.2
+    RETRY_BACKOFF = 0.05
+    SENDER = 'doorpi@example.org'
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__lock = threading.Lock()
+        self.__messages = []        # (recipients, data) of the accepted messages
+        self.__attempts = Counter()
+        self.__server = StandInSmtpServer(self.__respond, self.HANDSHAKE)
+
+    def sections(self):
+        return {'SMTP': {'server': '127.0.0.1', 'port': str(self.__server.port), 'use_ssl': 'False',
+                         'need_login': 'False', 'from': self.SENDER, 'signature': '',
+                         'queue': os.path.join(self.base_path, 'mail_queue.db'),
+                         'retry_backoff': str(self.RETRY_BACKOFF), 'digest_delay': str(self.DIGEST_DELAY),
+                         'idle_timeout': '30', 'timeout': '5'}}
+
+    def __respond(self, recipients, data):
+        with self.__lock:
+            self.__attempts[recipients[0]] += 1
+            if recipients[0].startswith('busy') and self.__attempts[recipients[0]] < 3: return '451 try again later'
+            if recipients[0].startswith('rejected'): return '554 rejected'
+            self.__messages.append((recipients, data))
+
+    def __received(self, recipient):
+        with self.__lock: return [data for recipients, data in self.__messages if recipient in recipients]
+
+    def run(self, doorpi_object):
+        from action.SingleActions.mailto import fire_action_mail
+        from action.mail_queue import load_mail_queue
+        queue = load_mail_queue()
+        port = self.__server.port
+        metrics = {}
+
+        # before: the action connected, sent and quit for every mail
+        latencies = []
+        for index in range(self.MAILS):
+            start_time = time.time()
+            connection = smtplib.SMTP('127.0.0.1', port, timeout = 5)
+            connection.ehlo()
+            connection.sendmail(self.SENDER, ['fresh%s@example.org' % index],
+                                'Subject: door %s\r\n\r\nsomeone rang' % index)
+            connection.quit()
+            latencies.append(time.time() - start_time)
+        metrics['fresh'] = {
+            'connections':      self.MAILS,
+            'mails_per_s':      round(self.MAILS / sum(latencies), 1),
+            'action':           latency_statistic(latencies)
+        }
+
+        # a burst of mails to different recipients - one connection for all
+        connections = self.__server.connections
+        latencies = []
+        start_time = time.time()
+        for index in range(self.MAILS):
+            put_time = time.time()
+            self.check(fire_action_mail('burst%s@example.org' % index, 'door %s' % index, 'someone rang', False),
+                       'mail %s queued' % index)
+            latencies.append(time.time() - put_time)
+        sent = wait_until(lambda: queue.statistic['sent'] >= self.MAILS, 30)
+        duration = time.time() - start_time
+        self.check(sent and len(self.__received('burst%s@example.org' % (self.MAILS - 1))) == 1,
+                   'burst of %s mails sent' % self.MAILS)
+        metrics['queued'] = {
+            'connections':      self.__server.connections - connections,
+            # with the digest delay of the first mail
+            'mails_per_s':      round(self.MAILS / duration, 1),
+            'action':           latency_statistic(latencies)
+        }
+        self.check(metrics['queued']['connections'] == 1, 'burst over %s connections' % metrics['queued']['connections'])
+        metrics['speedup'] = round(metrics['queued']['mails_per_s'] / metrics['fresh']['mails_per_s'], 1)
+
+        # 4xx is retried, 5xx not
+        retries = queue.statistic['retries']
+        fire_action_mail('busy@example.org', 'busy', 'retried', False)
+        fire_action_mail('rejected@example.org', 'rejected', 'not retried', False)
+        self.check(wait_until(lambda: self.__received('busy@example.org') and queue.statistic['failed'] == 1, 5),
+                   '4xx retried, 5xx failed')
+        self.check(self.__attempts['busy@example.org'] == 3 and queue.statistic['retries'] - retries == 2,
+                   '%s attempts after 451' % self.__attempts['busy@example.org'])
+        time.sleep(self.RETRY_BACKOFF * 4)
+        self.check(self.__attempts['rejected@example.org'] == 1,
+                   '%s attempts after 554' % self.__attempts['rejected@example.org'])
+
+        # mails of one ring to the same recipients - one digest with all snapshots, although
+        # the snapshots are rotated away before it is sent
+        snapshot_path = os.path.join(self.base_path, 'mail_snapshots')
+        os.makedirs(snapshot_path)
+        digests = queue.statistic['digests']
+        contents = []
+        for index in range(self.DIGEST_MAILS):
+            snapshot = os.path.join(snapshot_path, 'snapshot_%s.jpg' % index)
+            contents.append('\xff\xd8%s\xff\xd9' % os.urandom(1000 * (index + 1)))
+            with open(snapshot, 'wb') as snapshot_file: snapshot_file.write(contents[-1])
+            fire_action_mail('digest@example.org', 'ring %s' % index, 'at the door', snapshot)
+            os.remove(snapshot)
+        self.check(wait_until(lambda: queue.statistic['digests'] > digests, self.DIGEST_DELAY + 5), 'digest sent')
+        received = self.__received('digest@example.org')
+        self.check(len(received) == 1 and queue.statistic['digests'] - digests == 1,
+                   '%s mails for %s in the digest delay' % (len(received), self.DIGEST_MAILS))
+        if received:
+            self.check('(+%s)' % (self.DIGEST_MAILS - 1) in received[0], 'subject of the digest')
+            self.check(all(base64.encodestring(content) in received[0] for content in contents),
+                       'all spooled snapshots attached')
+            self.check('filename="snapshot_0.jpg"' in received[0], 'original name of the attachment')
+        spool_path = os.path.join(self.base_path, 'mail_queue_attachments')
+        self.check(wait_until(lambda: not os.listdir(spool_path), 1), 'spooled attachments deleted with the mails')
+
+        metrics['client'] = queue.statistic
+        return metrics
+
+    def cleanup(self):
+        self.__server.stop()
+
+@scenario
+class RegistrationScenario(Scenario):
+    """ registration monitor with a fake core against two stand-in registrars
+
+    A call before the registration waits for it and is made with the correlation id of its
+    action, the monitor fails over to the backup when the primary is gone, back when it
+    answers again and drops a call that waits longer than the queue timeout.
+    """
+
+    name = 'registration'
+    description = 'registration monitor: queued calls, failover, failback'
+    QUEUE_TIMEOUT = 0.5
+
+    def __init__(self, base_path, parsed_arguments):
+        Scenario.__init__(self, base_path, parsed_arguments)
+        self.__registrars = [StandInRegistrar(), StandInRegistrar()]
+        self.__phone = None
+
+    def sections(self):
+        return {'SIP-Phone': {'sipserver_server': self.__registrars[0].name,
+                              'sipserver_backup': self.__registrars[1].name,
+                              'registration_probe_interval': '1', 'registration_probe_timeout': '0.2',
+                              'registration_probe_failures': '1', 'registration_failback_probes': '1',
+                              'registration_queue_timeout': str(self.QUEUE_TIMEOUT), 'pump_interval_idle': '20'}}
+
+    def run(self, doorpi_object):
+        primary, backup = self.__registrars
+        phone = self.__phone = StandInSipphone(self.__registrars)
+        metrics = {}
+        try:
+            # the call of an action before the registration
+            phone.call('**621')
+            self.check(not phone.calls, 'call waits for the registration')
+            start_time = time.time()
+            phone.start()
+            self.check(wait_until(lambda: phone.calls, 2), 'queued call made after the registration')
+            metrics['queued_call_ms'] = round((time.time() - start_time) * 1000, 1)
+            if phone.calls:
+                number, correlation_id, thread_name = phone.calls[0]
+                self.check(number == '**621' and correlation_id is not None and correlation_id == phone.queued[0],
+                           'queued call with the correlation id of its action (%s, %s)' % (correlation_id, phone.queued[0]))
+                self.check(thread_name == phone.pump.name, 'queued call made in the %s thread' % thread_name)
+
+            # the primary is gone - the next registration fails and the backup takes over
+            primary.up = False
+            start_time = time.time()
+            phone.refresh_registers()
+            self.check(wait_until(lambda: phone.registration.registered and phone.registered_at == backup.name, 5),
+                       'failover to the backup: %s' % phone.registration.registrar)
+            metrics['failover_s'] = round(time.time() - start_time, 2)
+
+            primary.up = True
+            start_time = time.time()
+            self.check(wait_until(lambda: phone.registration.registered and phone.registered_at == primary.name, 5),
+                       'failback to the primary: %s' % phone.registration.registrar)
+            metrics['failback_s'] = round(time.time() - start_time, 2)
+
+            # registered - the call of an action is made by the pump thread with its correlation id
+            phone.call('**623')
+            self.check(wait_until(lambda: phone.calls[-1][0] == '**623', 1), 'call made while registered')
+            self.check(phone.calls[-1][1:] == (phone.queued[-1], phone.pump.name),
+                       'call in the pump thread with the correlation id of its action: %s' % (phone.calls[-1],))
+
+            # no registrar - the call is dropped after the queue timeout
+            primary.up = backup.up = False
+            phone.refresh_registers()
+            self.check(wait_until(lambda: not phone.registration.registered, 2), 'registration failed')
+            calls = len(phone.calls)
+            phone.call('**622')
+            self.check(wait_until(lambda: phone.registration.statistic['dropped_calls'] == 1, self.QUEUE_TIMEOUT + 2),
+                       'call dropped after the queue timeout')
+            self.check(len(phone.calls) == calls, 'dropped call not made')
+
+            metrics['monitor'] = phone.registration.statistic
+        finally:
+            # before the shutdown - DoorPi waits for the threads
+            self.cleanup()
+        return metrics
+
+    def cleanup(self):
+        if self.__phone: self.__phone.destroy()
+        for registrar in self.__registrars: registrar.stop()
+
+class ScenarioRunner(object):
+
+    def __init__(self, scenarios):
+        self.__scenarios = scenarios
+        self.__report = None
+
+    @property
+    def report(self): return self.__report
+
+    @property
+    def failed(self):
+        return [scenario.name for scenario in self.__scenarios if scenario.failed]
+
+    def run(self, doorpi_object):
+        time.sleep(STARTUP_DELAY)
+        report = OrderedDict()
+        for scenario in self.__scenarios:
+            start_time = time.time()
+            try:
+                metrics = scenario.run(doorpi_object)
+            except Exception as exp:
+                logger.exception('scenario %s failed', scenario.name)
+                scenario.failed.append('%s: %s' % (exp.__class__.__name__, exp))
+                metrics = {}
+            report[scenario.name] = {
+                'description':  scenario.description,
+                'duration':     round(time.time() - start_time, 3),
+                'metrics':      metrics,
+                'failed':       scenario.failed
+            }
+        self.__report = report
+        doorpi_object.doorpi_shutdown(0)
+
+    def start(self, parsed_arguments):
+        try:
+            doorpi_object = doorpi.DoorPi(parsed_arguments)
+            doorpi_object.prepare(parsed_arguments)
+            runner = threading.Thread(target = self.run, args = (doorpi_object, ), name = 'Scenarios')
+            runner.daemon = True
+            runner.start()
+            try:                        doorpi_object.run()
+            except KeyboardInterrupt:   logger.info("KeyboardInterrupt -> scenarios stopped")
+            return self.__report is not None
+        finally:
+            doorpi.DoorPi().destroy()
+            # after the shutdown - the components may still use the stand-ins until then
+            for scenario in self.__scenarios: scenario.cleanup()
+
+def format_scenario_report(report):
+    lines = []
+    for name, result in report.items():
+        lines.append('%s - %s (%s s): %s' % (name, result['description'], result['duration'],
+                                            'FAILED' if result['failed'] else 'ok'))
+        for key, value in sorted(result['metrics'].items()):
+            if not isinstance(value, dict):
+                lines.append('    %-28s %s' % (key, value))
+                continue
+            lines.append('    %s' % key)
+            lines.extend('        %-24s %s' % item for item in sorted(value.items()))
+        for failed in result['failed']:
+            lines.append('    check failed: %s' % failed)
+        lines.append('')
+    return '\n'.join(lines)
+
+def write_scenario_config(configfile, base_path, scenarios):
+    config = ConfigParser.RawConfigParser()
+    config.optionxform = str
+    sections = OrderedDict([
+        ('DoorPi', {'base_path': base_path, 'eventlog': os.path.join(base_path, 'eventlog.db'),
+                    'snapshot_path': os.path.join(base_path, 'snapshots')}),
+        ('DoorPiWeb', {'ip': '127.0.0.1', 'port': str(free_port())}),
+        ('SIP-Phone', {'sipphonetyp': 'dummy'}),
+        ('keyboards', {})
+    ])
+    for scenario in scenarios:
+        for section, values in scenario.sections().items():
+            sections.setdefault(section, {}).update(values)
+    for section, values in sections.items():
+        config.add_section(section)
+        for key, value in values.items(): config.set(section, key, value)
+    with open(configfile, 'w') as config_file: config.write(config_file)
+
+def run_scenarios(parsed_arguments):
+    names = SCENARIOS.keys() if parsed_arguments.scenario == 'all' else \
+        [name.strip() for name in parsed_arguments.scenario.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        logger.error('unknown scenario %s - known are %s', ', '.join(unknown), ', '.join(SCENARIOS))
+        return 1
+
+    base_path = tempfile.mkdtemp(prefix = 'doorpi_scenario_')
+    scenarios = []
+    try:
+        scenarios = [SCENARIOS[name](base_path, parsed_arguments) for name in names]
+        parsed_arguments.configfile = os.path.join(base_path, 'scenario.ini')
+        write_scenario_config(parsed_arguments.configfile, base_path, scenarios)
+        runner = ScenarioRunner(scenarios)
+        if not runner.start(parsed_arguments): return 1
+    finally:
+        shutil.rmtree(base_path, ignore_errors = True)
+
+    if parsed_arguments.json: print(json.dumps(runner.report, indent = 4))
+    else: print(format_scenario_report(runner.report))
+    return 2 if runner.failed else 0
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+class CameraSourceError(IOError): pass
+
+class CameraSourceAbstractBaseClass(object):
+    """ a source of JPEG frames for the camera service
+
+    open() is called once (and again after an error), read() blocks until the next frame
+    is available and returns it as JPEG data. The camera service calls grab() for every frame
+    and retrieve() only for the frames it keeps - sources that can skip the JPEG encoding of a
+    frame implement both, the others only read().
+    """
+
+    # -------------methods to implement--------------
+    def __init__(self, **kwargs): raise NotImplementedError("Subclasses should implement this!")
+
+    def open(self): raise NotImplementedError("Subclasses should implement this!")
+
+    def read(self): raise NotImplementedError("Subclasses should implement this!")
+
+    def close(self): pass # optional - raise NotImplementedError("Subclasses should implement this!")
+    # -----------------------------------------------
+
+    __grabbed = None
+
+    def grab(self): self.__grabbed = self.read()
+
+    def retrieve(self): return self.__grabbed
+
+    @property
+    def name(self): return '%s Camera' % self.__class__.__name__
+
+    @property
+    def additional_info(self): return {}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import importlib
+
+import doorpi
+from doorpi.camera.CameraService import CameraService
+
+CAMERA_SECTION = 'Camera'
+
+def parse_resolution(resolution, default = (1024, 768)):
+    try:
+        width, height = resolution.lower().split('x', 1)
+        return int(width), int(height)
+    except ValueError:
+        logger.warning('wrong resolution "%s" - use %sx%s', resolution, default[0], default[1])
+        return default
+
+def load_camera():
+    config = doorpi.DoorPi().config
+    source_name = config.get_string(CAMERA_SECTION, 'source', '').lower()
+    if not source_name:
+        logger.info('no camera source configured - snapshots open the camera each time')
+        return None
+
+    fps = config.get_float(CAMERA_SECTION, 'fps', 2)
+    try:
+        source = importlib.import_module('doorpi.camera.from_'+source_name).get(
+            resolution = parse_resolution(config.get_string(CAMERA_SECTION, 'resolution', '1024x768')),
+            fps = fps,
+            quality = config.get_int(CAMERA_SECTION, 'quality', 85),
+            device = config.get_string(CAMERA_SECTION, 'device', '0'),
+            url = config.get_string_parsed(CAMERA_SECTION, 'url', ''),
+            timeout = config.get_float(CAMERA_SECTION, 'timeout', 10)
+        )
+    except ImportError as exp:
+        logger.exception('camera %s not found @ camera.from_%s with exception %s', source_name, source_name, exp)
+        logger.warning('use no camera service after last exception!')
+        return None
+    except Exception as exp:
+        logger.exception('could not create camera %s: %s', source_name, exp)
+        return None
+
+    return CameraService(
+        source = source,
+        buffer_frames = config.get_int(CAMERA_SECTION, 'buffer_frames', 10),
+        fps = fps,
+        snapshot_offset = config.get_float(CAMERA_SECTION, 'snapshot_offset', 0.5)
+    )
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Camera service
+#  --------------
+#
+#  The camera source stays open and a thread keeps the last buffer_frames JPEG frames (at
+#  most fps per second) in a ring buffer. A snapshot only writes a frame of the buffer:
+#
+#  - the time of the key press is known by the correlation id of the action (OnKeyPressed*),
+#    without key press (web, timer) the time of the snapshot is used
+#  - the newest frame that is at least snapshot_offset seconds older than this time is taken
+#    (the oldest frame, if the buffer doesn't reach back so far)
+#
+#  After an error the source is closed and opened again after REOPEN_DELAY seconds.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import threading
+import time
+from collections import deque, OrderedDict
+
+import doorpi
+from doorpi.action.base import SingleAction
+from doorpi.action.handler import current_correlation_id
+
+class CameraDestroyAction(SingleAction): pass
+
+REOPEN_DELAY = 5
+# a snapshot waits so long for the first frame after the start
+FIRST_FRAME_TIMEOUT = 5
+# key presses that could still lead to a snapshot
+MAX_PENDING_KEYS = 100
+
+class CameraService(object):
+
+    @property
+    def running(self): return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            frames = list(self.__frames)
+        return {
+            'source':           self.__source.name,
+            'running':          self.running,
+            'opened':           self.__opened,
+            'frames':           len(frames),
+            'buffer_frames':    self.__frames.maxlen,
+            'buffer_seconds':   round(frames[-1][0] - frames[0][0], 3) if frames else 0,
+            'last_frame_age':   round(time.time() - frames[-1][0], 3) if frames else None,
+            'buffer_bytes':     sum(len(frame) for _, frame in frames),
+            'captured':         self.__captured,
+            'skipped':          self.__skipped,
+            'errors':           self.__errors,
+            'last_error':       self.__last_error,
+            'snapshots':        self.__snapshots,
+            'source_info':      self.__source.additional_info
+        }
+
+    def __init__(self, source, buffer_frames = 10, fps = 2, snapshot_offset = 0):
+        self.__source = source
+        self.__interval = 1.0 / fps if fps > 0 else 0
+        self.__snapshot_offset = snapshot_offset
+        self.__frames = deque(maxlen = max(1, buffer_frames))   # (time, jpeg)
+        self.__condition = threading.Condition()
+        self.__keys = OrderedDict()                             # correlation_id -> time of the key press
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__opened = False
+        self.__captured = 0
+        self.__skipped = 0
+        self.__errors = 0
+        self.__last_error = None
+        self.__snapshots = 0
+
+    def start(self):
+        if self.__thread: return self
+        doorpi.DoorPi().event_handler.add_listener(self.__event_fired)
+        doorpi.DoorPi().event_handler.register_action('OnShutdown', CameraDestroyAction(self.destroy))
+        self.__thread = threading.Thread(target = self.__capture, name = 'CameraService')
+        self.__thread.daemon = True
+        self.__thread.start()
+        logger.info('camera service started with %s', self.__source.name)
+        return self
+
+    def destroy(self):
+        if self.__stop.is_set(): return
+        logger.debug('destroy')
+        self.__stop.set()
+        if self.__thread: self.__thread.join(REOPEN_DELAY)
+        logger.debug('statistic: %s', self.statistic)
+
+    def __event_fired(self, event_name, event_source, kwargs, fire_time):
+        if not event_name.startswith('OnKeyPressed'): return
+        correlation_id = kwargs.get('correlation_id') if kwargs else None
+        if not correlation_id: return
+        with self.__condition:
+            if correlation_id in self.__keys: return
+            self.__keys[correlation_id] = fire_time
+            if len(self.__keys) > MAX_PENDING_KEYS: self.__keys.popitem(last = False)
+
+    def __capture(self):
+        while not self.__stop.is_set():
+            try:
+                self.__source.open()
+                self.__opened = True
+                while not self.__stop.is_set():
+                    self.__source.grab()
+                    now = time.time()
+                    with self.__condition:
+                        # the source can be faster than fps - only every interval a frame is kept
+                        # (and encoded by retrieve)
+                        if self.__frames and now - self.__frames[-1][0] < self.__interval * 0.9:
+                            self.__skipped += 1
+                            continue
+                    frame = self.__source.retrieve()
+                    with self.__condition:
+                        self.__frames.append((now, frame))
+                        self.__captured += 1
+                        self.__condition.notify_all()
+            except Exception as exp:
+                self.__errors += 1
+                self.__last_error = str(exp)
+                logger.exception('camera %s failed - reopen in %s seconds', self.__source.name, REOPEN_DELAY)
+            finally:
+                self.__opened = False
+                try:
+                    self.__source.close()
+                except Exception as exp:
+                    logger.warning('could not close camera %s: %s', self.__source.name, exp)
+            self.__stop.wait(REOPEN_DELAY)
+
+    def key_time(self, correlation_id):
+        with self.__condition:
+            return self.__keys.get(correlation_id)
+
+    def frame_at(self, when):
+        # (time, jpeg) of the newest frame not newer than when, else the oldest frame
+        with self.__condition:
+            for frame in reversed(self.__frames):
+                if frame[0] <= when: return frame
+            return self.__frames[0] if self.__frames else None
+
+    def snapshot(self, filename, correlation_id = None):
+        # writes the frame at the key press of correlation_id (default: the running action)
+        correlation_id = correlation_id or current_correlation_id()
+        key_time = self.key_time(correlation_id) if correlation_id else None
+        reference = key_time or time.time()
+        with self.__condition:
+            if not self.__frames: self.__condition.wait(FIRST_FRAME_TIMEOUT)
+        frame = self.frame_at(reference - self.__snapshot_offset)
+        if frame is None:
+            logger.warning('no frame of camera %s for snapshot %s', self.__source.name, filename)
+            return None
+        frame_time, jpeg = frame
+        temp_filename = filename + '.part'
+        with open(temp_filename, 'wb') as snapshot_file:
+            snapshot_file.write(jpeg)
+        os.rename(temp_filename, filename)
+        self.__snapshots += 1
+        logger.debug('[%s] snapshot %s with frame %+.3f seconds from %s', correlation_id, filename,
+                     frame_time - reference, 'key press' if key_time else 'now')
+        return filename
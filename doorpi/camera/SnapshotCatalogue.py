@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Snapshot catalogue
+#  ------------------
+#
+#  The snapshots of a snapshot_path in the order they were taken - without glob and stat of
+#  all files for every snapshot. The catalogue is a deque in memory and an index file in the
+#  snapshot_path (INDEX_FILE), that only gets appended:
+#
+#  +<tab>1449237311.12<tab>2015-12-04_14-55-11.jpg     snapshot added
+#  -<tab>2015-12-04_14-55-11.jpg                       snapshot deleted
+#
+#  It is written again (compacted) when it has more than twice the lines of the catalogue.
+#  At the first use of a snapshot_path the index is reconciled with the directory once:
+#  deleted files are removed, unknown files with the name of a snapshot (SNAPSHOT_NAME) are
+#  added by their modification time - other files of the directory are never touched.
+#
+#  Files of the same second get a counter: 2015-12-04_14-55-11.jpg, 2015-12-04_14-55-11_1.jpg
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import re
+import itertools
+import threading
+import time
+import datetime
+from collections import deque
+
+import doorpi
+
+DOORPI_SECTION = 'DoorPi'
+INDEX_FILE = '.snapshots.index'
+FILENAME_FORMAT = '%Y-%m-%d_%H-%M-%S'
+SNAPSHOT_NAME = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(_\d+)?\.\w+$')
+# the index is compacted, when it has more lines than COMPACT_FACTOR * snapshots + COMPACT_MIN
+COMPACT_FACTOR = 2
+COMPACT_MIN = 100
+
+class SnapshotCatalogue(object):
+
+    @property
+    def path(self): return self.__path
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            return {
+                'path':         self.__path,
+                'snapshots':    len(self.__snapshots),
+                'oldest':       self.__snapshots[0][1] if self.__snapshots else None,
+                'latest':       self.__snapshots[-1][1] if self.__snapshots else None,
+                'reserved':     len(self.__reserved),
+                'index_lines':  self.__index_lines,
+                'compacted':    self.__compacted
+            }
+
+    def __init__(self, path):
+        self.__path = path
+        self.__index_file = os.path.join(path, INDEX_FILE)
+        self.__lock = threading.RLock()
+        self.__snapshots = deque()      # (time, name) - oldest first
+        self.__names = set()
+        self.__reserved = set()
+        self.__index_lines = 0
+        self.__compacted = 0
+        self.__reconcile()
+
+    def __len__(self): return len(self.__snapshots)
+
+    def __reconcile(self):
+        if not os.path.exists(self.__path): os.makedirs(self.__path)
+        indexed = self.__read_index()
+        files = set(name for name in os.listdir(self.__path) if SNAPSHOT_NAME.match(name))
+        snapshots = [(snapshot_time, name) for name, snapshot_time in indexed.items() if name in files]
+        for name in files.difference(indexed):
+            try:
+                snapshots.append((os.path.getmtime(os.path.join(self.__path, name)), name))
+            except OSError: pass
+        self.__snapshots = deque(sorted(snapshots))
+        self.__names = set(name for _, name in self.__snapshots)
+        logger.info('snapshot catalogue %s: %s snapshots (%s indexed, %s files)',
+                    self.__path, len(self.__snapshots), len(indexed), len(files))
+        self.__write_index()
+
+    def __read_index(self):
+        # name -> time of the snapshots in the index
+        snapshots = {}
+        if not os.path.isfile(self.__index_file): return snapshots
+        with open(self.__index_file, 'r') as index_file:
+            for line in index_file:
+                fields = line.rstrip('\n').split('\t')
+                try:
+                    if fields[0] == '+': snapshots[fields[2]] = float(fields[1])
+                    elif fields[0] == '-': snapshots.pop(fields[1], None)
+                    else: raise ValueError()
+                except (IndexError, ValueError):
+                    logger.warning('skip broken line "%s" of %s', line.strip(), self.__index_file)
+        return snapshots
+
+    def __write_index(self):
+        # under lock - the whole catalogue into a new index file
+        temp_filename = self.__index_file + '.part'
+        try:
+            with open(temp_filename, 'w') as index_file:
+                for snapshot_time, name in self.__snapshots:
+                    index_file.write('+\t%.3f\t%s\n' % (snapshot_time, name))
+            os.rename(temp_filename, self.__index_file)
+        except (IOError, OSError) as exp:
+            logger.warning('could not write snapshot index %s: %s', self.__index_file, exp)
+            return
+        self.__index_lines = len(self.__snapshots)
+        self.__compacted += 1
+
+    def __append_index(self, lines):
+        # under lock
+        if self.__index_lines + len(lines) > COMPACT_FACTOR * len(self.__snapshots) + COMPACT_MIN:
+            return self.__write_index()
+        try:
+            with open(self.__index_file, 'a') as index_file:
+                index_file.write(''.join(lines))
+            self.__index_lines += len(lines)
+        except IOError as exp:
+            logger.warning('could not write snapshot index %s: %s', self.__index_file, exp)
+
+    def reserve(self, extension = '.jpg'):
+        # a new filename for a snapshot, that is added with add() when it is written
+        with self.__lock:
+            base_name = datetime.datetime.now().strftime(FILENAME_FORMAT)
+            name, counter = base_name + extension, 0
+            while name in self.__names or name in self.__reserved or os.path.exists(os.path.join(self.__path, name)):
+                counter += 1
+                name = '%s_%s%s' % (base_name, counter, extension)
+            self.__reserved.add(name)
+            return os.path.join(self.__path, name)
+
+    def add(self, filename, max_snapshots = 0):
+        # adds a written snapshot and deletes the oldest ones above max_snapshots (0 = no limit)
+        name = os.path.basename(filename)
+        snapshot_time = time.time()
+        with self.__lock:
+            self.__reserved.discard(name)
+            if name in self.__names: return []
+            self.__snapshots.append((snapshot_time, name))
+            self.__names.add(name)
+            lines = ['+\t%.3f\t%s\n' % (snapshot_time, name)]
+            deleted = []
+            while max_snapshots > 0 and len(self.__snapshots) > max_snapshots:
+                _, old_name = self.__snapshots.popleft()
+                self.__names.discard(old_name)
+                lines.append('-\t%s\n' % old_name)
+                deleted.append(os.path.join(self.__path, old_name))
+            self.__append_index(lines)
+        for old_filename in deleted:
+            try:
+                os.remove(old_filename)
+            except OSError as exp:
+                logger.warning("couldn't delete snapshot file %s with error %s", old_filename, exp)
+        return deleted
+
+    def release(self, filename):
+        # a reserved filename that was not written
+        with self.__lock:
+            self.__reserved.discard(os.path.basename(filename))
+
+    def latest(self):
+        with self.__lock:
+            return os.path.join(self.__path, self.__snapshots[-1][1]) if self.__snapshots else None
+
+    def oldest(self):
+        with self.__lock:
+            return os.path.join(self.__path, self.__snapshots[0][1]) if self.__snapshots else None
+
+    def file_name(self, name):
+        # full path of a snapshot of the catalogue - None for every other name
+        with self.__lock:
+            return os.path.join(self.__path, name) if name in self.__names else None
+
+    def files(self):
+        # all snapshots, oldest first
+        with self.__lock:
+            return [os.path.join(self.__path, name) for _, name in self.__snapshots]
+
+    def list(self, offset = 0, limit = 50):
+        # newest first - only the snapshots up to the page are touched
+        with self.__lock:
+            page = itertools.islice(reversed(self.__snapshots), max(0, offset), max(0, offset) + max(0, limit))
+            return {
+                'total':        len(self.__snapshots),
+                'snapshots':    [{'file_name': name, 'time': snapshot_time} for snapshot_time, name in page]
+            }
+
+CATALOGUES = {}
+CATALOGUES_LOCK = threading.Lock()
+
+def load_catalogue(path = None):
+    # one catalogue per snapshot_path (default: of the config) - reconciled at the first use
+    if not path: path = doorpi.DoorPi().config.get_string_parsed(DOORPI_SECTION, 'snapshot_path', '/tmp')
+    path = os.path.abspath(path)
+    with CATALOGUES_LOCK:
+        if path not in CATALOGUES: CATALOGUES[path] = SnapshotCatalogue(path)
+        return CATALOGUES[path]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [Camera]
+#  source = mjpeg
+#  url = http://ipcam/video.mjpg   # MJPEG stream (multipart/x-mixed-replace) or a single JPEG
+#  fps = 2
+#  timeout = 10
+#
+#  A stream stays open and the frames are cut at the JPEG markers. An URL that returns a
+#  single JPEG (snapshot URL of most IP cameras) is polled with fps.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import time
+import urllib2
+
+from doorpi.camera.AbstractBaseClass import CameraSourceAbstractBaseClass, CameraSourceError
+
+JPEG_START = '\xff\xd8'
+JPEG_END = '\xff\xd9'
+CHUNK_SIZE = 4096
+# a frame bigger than this is no frame - the stream is broken
+MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+def get(**kwargs): return MJPEG(**kwargs)
+class MJPEG(CameraSourceAbstractBaseClass):
+
+    @property
+    def additional_info(self): return {'url': self.__url, 'stream': self.__stream}
+
+    def __init__(self, url = '', fps = 2, timeout = 10, **kwargs):
+        if not url: raise CameraSourceError('no url for mjpeg camera configured')
+        self.__url = url
+        self.__interval = 1.0 / fps if fps > 0 else 0
+        self.__timeout = timeout
+        self.__response = None
+        self.__stream = False
+        self.__buffer = ''
+        self.__next_frame = 0
+
+    def open(self):
+        self.__response = urllib2.urlopen(self.__url, timeout = self.__timeout)
+        content_type = self.__response.info().gettype()
+        self.__stream = content_type.startswith('multipart/')
+        self.__buffer = ''
+        self.__next_frame = time.time()
+        logger.debug('opened %s (%s)', self.__url, 'stream' if self.__stream else 'single jpeg')
+
+    def read(self):
+        if self.__stream: return self.__read_stream()
+        delay = self.__next_frame - time.time()
+        if delay > 0: time.sleep(delay)
+        self.__next_frame = max(self.__next_frame + self.__interval, time.time())
+        if self.__response is None: self.__response = urllib2.urlopen(self.__url, timeout = self.__timeout)
+        try:
+            frame = self.__response.read()
+        finally:
+            self.__response.close()
+            self.__response = None
+        if not frame.startswith(JPEG_START): raise CameraSourceError('no jpeg from %s' % self.__url)
+        return frame
+
+    def __read_stream(self):
+        # the boundaries and headers of the parts are skipped - a frame is SOI ... EOI
+        while True:
+            start = self.__buffer.find(JPEG_START)
+            if start >= 0:
+                end = self.__buffer.find(JPEG_END, start + 2)
+                if end >= 0:
+                    frame = self.__buffer[start:end + 2]
+                    self.__buffer = self.__buffer[end + 2:]
+                    return frame
+                self.__buffer = self.__buffer[start:]
+            else:
+                # keep a last 0xff, it could be the start of the next frame
+                self.__buffer = self.__buffer[-1:]
+            if len(self.__buffer) > MAX_FRAME_SIZE: raise CameraSourceError('no end of frame in stream %s' % self.__url)
+            chunk = self.__response.read(CHUNK_SIZE)
+            if not chunk: raise CameraSourceError('stream %s closed' % self.__url)
+            self.__buffer += chunk
+
+    def close(self):
+        if self.__response: self.__response.close()
+        self.__response = None
+        self.__buffer = ''
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [Camera]
+#  source = picamera
+#  resolution = 1024x768
+#  fps = 2
+#  quality = 85
+#
+#  The camera stays open and the frames are taken from the video port - so there is no
+#  warm up of the sensor for a snapshot.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import io
+
+import picamera
+
+from doorpi.camera.AbstractBaseClass import CameraSourceAbstractBaseClass
+
+def get(**kwargs): return PiCamera(**kwargs)
+class PiCamera(CameraSourceAbstractBaseClass):
+
+    def __init__(self, resolution = (1024, 768), fps = 2, quality = 85, **kwargs):
+        self.__resolution = resolution
+        self.__fps = fps
+        self.__quality = quality
+        self.__camera = None
+        self.__stream = None
+        self.__frames = None
+
+    def open(self):
+        self.__camera = picamera.PiCamera(resolution = self.__resolution, framerate = max(1, int(self.__fps)))
+        self.__stream = io.BytesIO()
+        self.__frames = self.__camera.capture_continuous(self.__stream, format = 'jpeg',
+                                                         use_video_port = True, quality = self.__quality)
+
+    def read(self):
+        next(self.__frames)
+        frame = self.__stream.getvalue()
+        self.__stream.seek(0)
+        self.__stream.truncate()
+        return frame
+
+    def close(self):
+        if self.__frames: self.__frames.close()
+        if self.__camera: self.__camera.close()
+        self.__camera = self.__stream = self.__frames = None
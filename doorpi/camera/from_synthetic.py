@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  Synthetic camera for tests without hardware.
+#
+#  [Camera]
+#  source = synthetic
+#  resolution = 160x120       # rounded down to a multiple of 8
+#  fps = 2
+#
+#  Every frame is a grey baseline JPEG with a bright bar that moves one block per frame.
+#  The comment (COM) of the JPEG holds the number and the time of the frame:
+#
+#  doorpi synthetic frame 42 1449237311.123
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import struct
+import time
+
+from doorpi.camera.AbstractBaseClass import CameraSourceAbstractBaseClass
+
+# only the DC coefficient of the 8x8 blocks is used - every block has one grey level
+BLOCK_SIZE = 8
+QUANTIZATION = 8
+# standard luminance DC table (ITU T.81 K.3) and an AC table with end of block only
+DC_BITS = [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0]
+DC_VALUES = range(12)
+AC_BITS = [1] + [0] * 15
+AC_VALUES = [0x00]
+
+def huffman_codes(bits, values):
+    # canonical codes of a JPEG huffman table: value -> (code, length)
+    codes, code, index = {}, 0, 0
+    for length, count in enumerate(bits, 1):
+        for _ in range(count):
+            codes[values[index]] = (code, length)
+            code, index = code + 1, index + 1
+        code <<= 1
+    return codes
+
+DC_CODES = huffman_codes(DC_BITS, DC_VALUES)
+EOB_CODE = huffman_codes(AC_BITS, AC_VALUES)[0x00]
+
+def segment(marker, data):
+    return struct.pack('>BBH', 0xFF, marker, len(data) + 2) + data
+
+def encode_blocks(levels):
+    # levels: grey levels (0-255) of the blocks in raster order -> entropy coded data
+    bits, bit_count, data, predictor = 0, 0, [], 0
+    for level in levels:
+        value = (level - 128) * BLOCK_SIZE // QUANTIZATION
+        diff, predictor = value - predictor, value
+        category = len(bin(abs(diff))) - 2 if diff else 0
+        code, length = DC_CODES[category]
+        codes = [(code, length), ((diff if diff > 0 else diff + (1 << category) - 1), category), EOB_CODE]
+        for code, length in codes:
+            bits, bit_count = (bits << length) | code, bit_count + length
+            while bit_count >= 8:
+                bit_count -= 8
+                byte = (bits >> bit_count) & 0xFF
+                data.append(chr(byte))
+                if byte == 0xFF: data.append('\x00')
+        bits &= (1 << bit_count) - 1
+    if bit_count:
+        byte = ((bits << (8 - bit_count)) | ((1 << (8 - bit_count)) - 1)) & 0xFF
+        data.append(chr(byte))
+        if byte == 0xFF: data.append('\x00')
+    return ''.join(data)
+
+def encode_jpeg(width, height, levels, comment = ''):
+    # grey baseline JPEG of width / 8 x height / 8 blocks
+    return ''.join([
+        '\xff\xd8',
+        segment(0xE0, 'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'),
+        segment(0xFE, comment) if comment else '',
+        segment(0xDB, '\x00' + chr(QUANTIZATION) * 64),
+        segment(0xC0, struct.pack('>BHHBBBB', 8, height, width, 1, 1, 0x11, 0)),
+        segment(0xC4, '\x00' + ''.join(chr(count) for count in DC_BITS) + ''.join(chr(value) for value in DC_VALUES)),
+        segment(0xC4, '\x10' + ''.join(chr(count) for count in AC_BITS) + ''.join(chr(value) for value in AC_VALUES)),
+        segment(0xDA, '\x01\x01\x00\x00\x3f\x00'),
+        encode_blocks(levels),
+        '\xff\xd9'
+    ])
+
+def get(**kwargs): return Synthetic(**kwargs)
+class Synthetic(CameraSourceAbstractBaseClass):
+
+    @property
+    def additional_info(self): return {'frames': self.__frame_number}
+
+    def __init__(self, resolution = (160, 120), fps = 2, **kwargs):
+        self.__width = max(BLOCK_SIZE, resolution[0] // BLOCK_SIZE * BLOCK_SIZE)
+        self.__height = max(BLOCK_SIZE, resolution[1] // BLOCK_SIZE * BLOCK_SIZE)
+        self.__interval = 1.0 / fps if fps > 0 else 0
+        self.__frame_number = 0
+        self.__next_frame = 0
+
+    def open(self):
+        self.__next_frame = time.time()
+
+    def frame(self, frame_number, frame_time):
+        columns, rows = self.__width // BLOCK_SIZE, self.__height // BLOCK_SIZE
+        bar = frame_number % columns
+        levels = [235 if column == bar else 32 + row * 160 // rows
+                  for row in range(rows) for column in range(columns)]
+        comment = 'doorpi synthetic frame %s %.3f' % (frame_number, frame_time)
+        return encode_jpeg(self.__width, self.__height, levels, comment)
+
+    def read(self):
+        # a camera delivers the frames with its own frame rate
+        delay = self.__next_frame - time.time()
+        if delay > 0: time.sleep(delay)
+        self.__next_frame = max(self.__next_frame + self.__interval, time.time())
+        self.__frame_number += 1
+        return self.frame(self.__frame_number, time.time())
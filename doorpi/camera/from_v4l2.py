@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [Camera]
+#  source = v4l2
+#  device = 0                 # number of /dev/videoX or the path of the device
+#  resolution = 640x480
+#  fps = 2
+#  quality = 85
+#
+#  Every Video4Linux webcam with OpenCV (python-opencv).
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import cv2
+
+from doorpi.camera.AbstractBaseClass import CameraSourceAbstractBaseClass, CameraSourceError
+
+# the constants moved from cv2.cv to cv2 with OpenCV 3
+CAP_PROP_FRAME_WIDTH = getattr(cv2, 'CAP_PROP_FRAME_WIDTH', 3)
+CAP_PROP_FRAME_HEIGHT = getattr(cv2, 'CAP_PROP_FRAME_HEIGHT', 4)
+CAP_PROP_FPS = getattr(cv2, 'CAP_PROP_FPS', 5)
+IMWRITE_JPEG_QUALITY = getattr(cv2, 'IMWRITE_JPEG_QUALITY', 1)
+
+def get(**kwargs): return V4L2(**kwargs)
+class V4L2(CameraSourceAbstractBaseClass):
+
+    @property
+    def additional_info(self): return {'device': self.__device}
+
+    def __init__(self, device = '0', resolution = (640, 480), fps = 2, quality = 85, **kwargs):
+        self.__device = int(device) if str(device).isdigit() else device
+        self.__resolution = resolution
+        self.__fps = fps
+        self.__quality = quality
+        self.__capture = None
+
+    def open(self):
+        self.__capture = cv2.VideoCapture(self.__device)
+        if not self.__capture.isOpened(): raise CameraSourceError('could not open video device %s' % self.__device)
+        self.__capture.set(CAP_PROP_FRAME_WIDTH, self.__resolution[0])
+        self.__capture.set(CAP_PROP_FRAME_HEIGHT, self.__resolution[1])
+        self.__capture.set(CAP_PROP_FPS, self.__fps)
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def grab(self):
+        # only takes the raw frame from the device - frames the camera service drops aren't encoded
+        if not self.__capture.grab(): raise CameraSourceError('could not read from video device %s' % self.__device)
+
+    def retrieve(self):
+        success, image = self.__capture.retrieve()
+        if not success: raise CameraSourceError('could not read from video device %s' % self.__device)
+        success, jpeg = cv2.imencode('.jpg', image, [IMWRITE_JPEG_QUALITY, self.__quality])
+        if not success: raise CameraSourceError('could not encode frame of video device %s' % self.__device)
+        return jpeg.tostring()
+
+    def close(self):
+        if self.__capture: self.__capture.release()
+        self.__capture = None
@@ -16,10 +16,15 @@ class ConfigObject():
 
     __sections = {}
     _config_file = None
+    # counts the changes - users of a value can cache what they built from it
+    _generation = 0
 
     @property
     def all(self): return self.__sections
 
+    @property
+    def generation(self): return self._generation
+
     @property
     def config_file(self): return self._config_file
 
@@ -120,6 +125,7 @@ class ConfigObject():
                                  key, section, self.__sections[section][key], password_friendly_value)
 
         self.__sections[section][key] = value
+        self._generation += 1
         return True
 
     def rename_key(self, section, old_key, new_key, default = '', log = True):
@@ -143,6 +149,7 @@ class ConfigObject():
                 raise KeyError('section is not empty')
 
             self.__sections.pop(section)
+            self._generation += 1
             return True
         except KeyError as exp:
             if log: logger.warning('delete section %s failed: %s', section, exp)
@@ -152,6 +159,7 @@ class ConfigObject():
         try:
             if log: logger.info('delete key %s from section %s', key, section)
             self.__sections[section].pop(key)
+            self._generation += 1
             self.delete_section(section, log = log)
 
             return True
@@ -235,6 +243,7 @@ class ConfigObject():
             for key, value in config.items(section):
                 if key.startswith(';') or key.startswith('#'): continue
                 self.__sections[section][str(key)] = str(value)
+        self._generation += 1
 
     get = get_string
     get_bool = get_boolean
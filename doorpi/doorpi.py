@@ -18,9 +18,12 @@ import tempfile
 import metadata
 from keyboard.KeyboardInterface import load_keyboard
 from sipphone.SipphoneInterface import load_sipphone
+from camera.CameraInterface import load_camera
 from status.webserver import load_webserver
 from conf.config_object import ConfigObject
 from action.handler import EventHandler
+from action.scheduler import Scheduler
+from action.input_trace import TraceRecorder
 from status.status_class import DoorPiStatus
 #from status.webservice import run_webservice, WebService
 from action.base import SingleAction
@@ -56,6 +59,10 @@ class DoorPi(object):
     @property
     def sipphone(self): return self.__sipphone
 
+    __camera = None
+    @property
+    def camera(self): return self.__camera
+
     @property
     def additional_informations(self):
         if self.event_handler is None: return {}
@@ -69,6 +76,14 @@ class DoorPi(object):
     @property
     def webserver(self): return self.__webserver
 
+    __scheduler = None
+    @property
+    def scheduler(self): return self.__scheduler
+
+    __trace_recorder = None
+    @property
+    def trace_recorder(self): return self.__trace_recorder
+
     @property
     def status(self): return DoorPiStatus(self)
     def get_status(self, modules = '', value= '', name = ''): return DoorPiStatus(self, modules, value, name)
@@ -120,6 +135,8 @@ class DoorPi(object):
         self.__config = ConfigObject.load_config(parsed_arguments.configfile)
         self._base_path = self.config.get('DoorPi', 'base_path', self.base_path)
         self.__event_handler = EventHandler()
+        self.__trace_recorder = TraceRecorder(self.config.get_string_parsed('DoorPi', 'trace_file', ''))
+        self.__scheduler = Scheduler().start()
 
         if self.config.config_file is None:
             self.event_handler.register_action('AfterStartup', self.config.save_config)
@@ -147,6 +164,8 @@ class DoorPi(object):
         self.__keyboard     = load_keyboard()
         self.__sipphone     = load_sipphone()
         self.sipphone.start()
+        self.__camera       = load_camera()
+        if self.camera: self.camera.start()
 
         # register eventbased actions from configfile
         for event_section in self.config.get_sections('EVENT_'):
@@ -178,8 +197,7 @@ class DoorPi(object):
         # register keep_alive_led
         is_alive_led = self.config.get('DoorPi', 'is_alive_led', '')
         if is_alive_led is not '':
-            self.event_handler.register_action('OnTimeSecondEvenNumber', 'out:%s,HIGH,False'%is_alive_led)
-            self.event_handler.register_action('OnTimeSecondUnevenNumber', 'out:%s,LOW,False'%is_alive_led)
+            self.keyboard.output_scheduler.blink(is_alive_led, 'HIGH', 'LOW', 1, 1)
 
         self.__prepared = True
         return self
@@ -204,10 +222,12 @@ class DoorPi(object):
         self.event_handler.fire_event('BeforeShutdown', __name__)
         self.event_handler.fire_event_synchron('OnShutdown', __name__)
         self.event_handler.fire_event('AfterShutdown', __name__)
+        self.scheduler.destroy()
 
         timeout = 5
         waiting_between_checks = 0.5
         time.sleep(waiting_between_checks)
+        self.event_handler.stop_lanes()
         while timeout > 0 and self.modules_destroyed is not True:
             # while not self.event_handler.idle and timeout > 0 and len(self.event_handler.sources) > 1:
             logger.debug('wait %s seconds for threads %s and %s event',
@@ -216,10 +236,15 @@ class DoorPi(object):
             logger.trace('still existing event sources: %s', self.event_handler.sources)
             time.sleep(waiting_between_checks)
             timeout -= waiting_between_checks
+            self.event_handler.stop_lanes()
 
         if timeout <= 0:
             logger.warning("waiting for threads to time out - there are still threads: %s", self.event_handler.threads[1:])
 
+        # the scheduler is gone, so write the last events of the event log now
+        self.event_handler.db.commit()
+        self.trace_recorder.destroy()
+
         logger.info('======== DoorPi successfully shutdown ========')
         return True
 
@@ -248,7 +273,6 @@ class DoorPi(object):
 
         while True and not self.__shutdown:
             time_ticks += 0.05
-            self.check_time_critical_threads()
             if time_ticks > 0.5:
                 self.__last_tick = time.time()
                 self.__event_handler.fire_event_asynchron('OnTimeTick', __name__)
@@ -256,9 +280,6 @@ class DoorPi(object):
             time.sleep(0.05)
         return self
 
-    def check_time_critical_threads(self):
-        if self.sipphone: self.sipphone.self_check()
-
     def parse_string(self, input_string):
         parsed_string = datetime.datetime.now().strftime(str(input_string))
 
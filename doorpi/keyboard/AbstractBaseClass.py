@@ -5,8 +5,15 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
+import threading
+import time
+
 import doorpi
 from doorpi.action.base import SingleAction
+from doorpi.keyboard.CredentialStore import load_credential_store
+from doorpi.keyboard.EdgeFilter import EdgeFilter, FILTER_NONE
+from doorpi.action.input_trace import TRACE_KEY
+from doorpi.action.handler import new_correlation_id
 
 HIGH_LEVEL = ['1', 'high', 'on', 'true']
 LOW_LEVEL = ['0', 'low', 'off', 'false']
@@ -26,7 +33,7 @@ class KeyboardAbstractBaseClass(object):
 
     def self_test(self): pass # optional - raise NotImplementedError("Subclasses should implement this!")
 
-    def status_input(self, pin): raise NotImplementedError("Subclasses should implement this!")
+    def read_input(self, pin): raise NotImplementedError("Subclasses should implement this!")
 
     def set_output(self, pin, value, log_output = True): raise NotImplementedError("Subclasses should implement this!")
     # -----------------------------------------------
@@ -88,6 +95,123 @@ class KeyboardAbstractBaseClass(object):
     def status_output(self, pin):
         return self._OutputStatus[pin]
 
+    __input_lock = threading.Lock()
+    @property
+    def _input_condition(self):
+        # subclasses don't call __init__ of this class, so create the cache on first use
+        if '_input_status' not in self.__dict__:
+            with KeyboardAbstractBaseClass.__input_lock:
+                if '_input_status' not in self.__dict__:
+                    self.__dict__['_input_condition_object'] = threading.Condition()
+                    self.__dict__['_input_status'] = {}
+        return self.__dict__['_input_condition_object']
+
+    @property
+    def input_status(self):
+        with self._input_condition:
+            return dict(self._input_status)
+
+    def _set_input_status(self, pin, value):
+        # called by the edge handlers of the keyboards - returns True if the value has changed
+        value = bool(value)
+        with self._input_condition:
+            changed = self._input_status.get(str(pin)) is not value
+            self._input_status[str(pin)] = value
+            if changed: self._input_condition.notify_all()
+        return changed
+
+    def _set_last_input(self, pin):
+        # for readers of tags and codes: only the last recognized one counts as pressed
+        with self._input_condition:
+            for cached_pin in self._input_status:
+                if cached_pin != str(pin): self._input_status[cached_pin] = False
+            self._input_status[str(pin)] = True
+            self._input_condition.notify_all()
+
+    def status_input(self, pin, verify = False):
+        # served from the cache - verify = True forces a read from the hardware
+        with self._input_condition:
+            if not verify and str(pin) in self._input_status:
+                return self._input_status[str(pin)]
+        self._set_input_status(pin, self.read_input(pin))
+        return self._input_status[str(pin)]
+
+    def wait_for_input(self, pin, value = True, timeout = None):
+        value = bool(value)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._input_condition:
+            while self._input_status.get(str(pin)) is not value:
+                if deadline is None:
+                    self._input_condition.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0: return False
+                self._input_condition.wait(remaining)
+        return True
+
+    _edge_filter = None
+
+    @property
+    def edge_filter_statistic(self):
+        return self._edge_filter.statistic if self._edge_filter else None
+
+    def _init_edge_filter(self, section_name, strategy = FILTER_NONE, filter_time = 0):
+        # strategy and time (ms) from the config - the defaults depend on the keyboard type
+        strategy = doorpi.DoorPi().config.get(section_name, 'debounce', strategy).lower()
+        filter_time = doorpi.DoorPi().config.get_float(section_name, 'debounce_time', filter_time)
+        try:
+            self._edge_filter = EdgeFilter(strategy, filter_time / 1000.0, self.__deliver_edge, self.__accepted_level)
+        except ValueError as exp:
+            logger.error('%s - keyboard %s without debounce', exp, self.keyboard_name)
+            self._edge_filter = EdgeFilter(FILTER_NONE, 0, self.__deliver_edge, self.__accepted_level)
+        doorpi.DoorPi().event_handler.register_action('OnShutdown', KeyboardDestroyAction(self._edge_filter.destroy))
+        logger.debug('keyboard %s uses debounce %s (%s ms)', self.keyboard_name, self._edge_filter.strategy, filter_time)
+
+    def __accepted_level(self, pin):
+        with self._input_condition:
+            return self._input_status.get(str(pin), False)
+
+    def __deliver_edge(self, pin, value):
+        name = self.__class__.__module__
+        self._set_input_status(pin, value)
+        if value:
+            self._fire_OnKeyDown(pin, name)
+            if self._pressed_on_key_down: self._fire_OnKeyPressed(pin, name)  # issue 134
+        else:
+            self._fire_OnKeyUp(pin, name)
+            if not self._pressed_on_key_down: self._fire_OnKeyPressed(pin, name)
+
+    def _input_edge(self, pin, value):
+        # level reported by the hardware - the edge filter decides whether and when it fires
+        if self._edge_filter is None: self._edge_filter = EdgeFilter(FILTER_NONE, 0, self.__deliver_edge, self.__accepted_level)
+        self._edge_filter.edge(pin, value)
+
+    def _press_accepted(self, pin):
+        # for whole presses (tags, codes): False if the press is filtered
+        if self._edge_filter is None: return True
+        return self._edge_filter.press(pin)
+
+    _credential_store = None
+
+    def _load_credential_store(self, section_name, name):
+        self._credential_store = load_credential_store(section_name)
+        if not self._credential_store: return
+        doorpi.DoorPi().event_handler.register_action('OnShutdown', KeyboardDestroyAction(self._credential_store.destroy))
+        self.__credential_groups = set()
+        for group in self._credential_store.groups: self.__register_credential_group(group, name)
+
+    def __register_credential_group(self, group, name):
+        if group in self.__credential_groups: return
+        self.__credential_groups.add(group)
+        self._register_EVENTS_for_pin(group, name)
+
+    def _credential_pin(self, tag, name):
+        # the group of a tag is used as input pin - so all tags of a group share their events
+        if not self._credential_store: return None
+        group = self._credential_store.lookup(tag)
+        if group is not None: self.__register_credential_group(group, name)
+        return group
+
     def _register_EVENTS_for_pin(self, pin, name):
         for event in ['OnKeyPressed', 'OnKeyUp', 'OnKeyDown']:
             doorpi.DoorPi().event_handler.register_event(event, name)
@@ -95,13 +219,28 @@ class KeyboardAbstractBaseClass(object):
             doorpi.DoorPi().event_handler.register_event(event+'_'+self.keyboard_name+'.'+str(pin), name)
 
     def _fire_EVENT(self, event_name, pin, name):
+        doorpi.DoorPi().event_handler.fire_events_asynchron(self.__key_events(event_name, pin), name)
+
+    def _fire_press(self, pin, name):
+        # a whole press (OnKeyDown, OnKeyPressed and OnKeyUp) - its events are fired together
+        events = self.__key_events('OnKeyDown', pin) + self.__key_events('OnKeyPressed', pin)
+        self._set_input_status(pin, False)
+        doorpi.DoorPi().event_handler.fire_events_asynchron(events + self.__key_events('OnKeyUp', pin), name)
+
+    def __key_events(self, event_name, pin):
+        # the event and its two pin specific events with their kwargs
         if self.keyboard_name == '':
             doorpi.DoorPi().keyboard.last_key = self.last_key = pin
         else:
             doorpi.DoorPi().keyboard.last_key = self.last_key = self.keyboard_name+'.'+str(pin)
-        doorpi.DoorPi().event_handler(event_name, name, self.additional_info)
-        doorpi.DoorPi().event_handler(event_name+'_'+str(pin), name, self.additional_info)
-        doorpi.DoorPi().event_handler(event_name+'_'+self.keyboard_name+'.'+str(pin), name, self.additional_info)
+        doorpi.DoorPi().trace_recorder.record(TRACE_KEY, event_name, self.last_key)
+        if event_name in ['OnKeyDown', 'OnKeyPressed']:
+            doorpi.DoorPi().keyboard.output_scheduler.input_triggered([str(pin), self.keyboard_name+'.'+str(pin)])
+        additional_info = self.additional_info
+        # a press starts a new trace (e.g. of the call setup) - shared by the three events
+        if event_name == 'OnKeyPressed': additional_info['correlation_id'] = new_correlation_id()
+        return [(event, dict(additional_info)) for event in
+                [event_name, event_name+'_'+str(pin), event_name+'_'+self.keyboard_name+'.'+str(pin)]]
 
     def _fire_OnKeyUp(self, pin, name): self._fire_EVENT('OnKeyUp', pin, name)
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Credential store for RFID / NFC keyboards
+#  -----------------------------------------
+#
+#  Instead of one InputPin per tag, the tags are stored in a SQLite database with
+#  the group they belong to. Only the groups are InputPins of the keyboard, so all
+#  tags of a group fire the same events (e.g. OnKeyPressed_rfidreader.staff).
+#
+#  Sample:
+#
+#  [rfidreader_keyboard]
+#  credential_store = !BASEPATH!/conf/credentials.db
+#  credential_file = !BASEPATH!/conf/credentials.csv
+#
+#  [rfidreader_InputPins]
+#  staff = out:Tueroeffner,1,0,3
+#
+#  The optional credential_file is synchronised into the database when it has changed
+#  (checked by a timer every credential_reload_interval seconds), one tag per line:
+#  tag;group[;valid_from[;valid_until]]
+#  1234567;staff
+#  2345678;staff;2016-01-01;2016-12-31 18:00
+#
+#  Tags which are already InputPins are handled as before.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import time
+import threading
+import sqlite3
+import datetime
+
+import doorpi
+
+SOURCE_FILE = 'file'
+SOURCE_MANUAL = 'manual'
+
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+def normalize_tag(tag): return str(tag).strip().upper()
+
+def parse_time(value):
+    value = value.strip()
+    if value == '': return None
+    try:
+        return float(value)
+    except ValueError: pass
+    for date_format in DATE_FORMATS:
+        try:
+            return time.mktime(datetime.datetime.strptime(value, date_format).timetuple())
+        except ValueError: pass
+    raise ValueError('unknown time format %s' % value)
+
+def load_credential_store(section_name):
+    file_name = doorpi.DoorPi().config.get_string_parsed(section_name, 'credential_store', '')
+    if file_name == '': return None
+    return CredentialStore(
+        file_name,
+        doorpi.DoorPi().config.get_string_parsed(section_name, 'credential_file', ''),
+        doorpi.DoorPi().config.get_int(section_name, 'credential_reload_interval', 60)
+    )
+
+class CredentialStore(object):
+
+    @property
+    def groups(self):
+        with self.__lock:
+            return [row[0] for row in self.__db.execute(
+                'SELECT DISTINCT group_name FROM credentials'
+            )]
+
+    @property
+    def count(self):
+        with self.__lock:
+            return self.__db.execute('SELECT COUNT(*) FROM credentials').fetchone()[0]
+
+    def __init__(self, file_name, import_file = '', reload_interval = 60):
+        if not os.path.exists(os.path.dirname(file_name)):
+            logger.info('Path %s does not exist - creating it now', os.path.dirname(file_name))
+            os.makedirs(os.path.dirname(file_name))
+
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(
+            database = file_name,
+            timeout = 1,
+            check_same_thread = False
+        )
+        self.__db.text_factory = str
+        with self.__lock:
+            # the primary key is the index for the lookup of a tag
+            self.__db.execute('''
+                CREATE TABLE IF NOT EXISTS credentials (
+                    tag TEXT PRIMARY KEY,
+                    group_name TEXT NOT NULL,
+                    valid_from REAL,
+                    valid_until REAL,
+                    source TEXT
+                );'''
+            )
+            self.__db.execute('CREATE INDEX IF NOT EXISTS credentials_group ON credentials (group_name);')
+            self.__db.commit()
+
+        self.__import_file = import_file
+        self.__import_file_mtime = None
+        self.__reload_interval = reload_interval
+        self.__last_reload_check = 0
+        self.__reload_job = None
+        self.__destroyed = False
+        self.check_reload()
+        self.__schedule_reload()
+        logger.info('credential store %s loaded with %s tags', file_name, self.count)
+
+    def destroy(self):
+        self.__destroyed = True
+        if self.__reload_job: self.__reload_job.cancel()
+        with self.__lock:
+            self.__db.close()
+
+    def __schedule_reload(self):
+        # the file is checked on the scheduler thread - lookup() never touches the disk for it
+        if not self.__import_file or self.__reload_interval <= 0 or self.__destroyed: return
+        self.__reload_job = doorpi.DoorPi().scheduler.call_later(self.__reload_interval, self.__reload)
+
+    def __reload(self):
+        try:
+            self.__check_file()
+        except Exception:
+            logger.exception('could not reload credential file %s', self.__import_file)
+        finally:
+            self.__schedule_reload()
+
+    def lookup(self, tag, now = None):
+        # returns the group of the tag if the tag is known and valid now, otherwise None
+        with self.__lock:
+            row = self.__db.execute(
+                'SELECT group_name, valid_from, valid_until FROM credentials WHERE tag = ?',
+                (normalize_tag(tag),)
+            ).fetchone()
+        if row is None: return None
+
+        group, valid_from, valid_until = row
+        if now is None: now = time.time()
+        if valid_from is not None and now < valid_from or valid_until is not None and now > valid_until:
+            logger.info('tag %s of group %s is not valid now', tag, group)
+            return None
+        return group
+
+    def add(self, tag, group, valid_from = None, valid_until = None, source = SOURCE_MANUAL):
+        with self.__lock:
+            self.__db.execute(
+                'INSERT OR REPLACE INTO credentials VALUES (?, ?, ?, ?, ?)',
+                (normalize_tag(tag), group, valid_from, valid_until, source)
+            )
+            self.__db.commit()
+
+    def remove(self, tag):
+        with self.__lock:
+            self.__db.execute('DELETE FROM credentials WHERE tag = ?', (normalize_tag(tag),))
+            self.__db.commit()
+
+    def check_reload(self):
+        if not self.__import_file: return False
+        now = time.time()
+        if now - self.__last_reload_check < self.__reload_interval: return False
+        return self.__check_file()
+
+    def __check_file(self):
+        self.__last_reload_check = time.time()
+        try:
+            mtime = os.path.getmtime(self.__import_file)
+        except OSError:
+            return False
+        if mtime == self.__import_file_mtime: return False
+        self.__import_file_mtime = mtime
+        self.sync_file()
+        return True
+
+    def sync_file(self):
+        # writes only the changed lines of the file into the database
+        credentials = {}
+        with open(self.__import_file, 'r') as import_file:
+            for line_number, line in enumerate(import_file, 1):
+                line = line.strip()
+                if line == '' or line.startswith('#'): continue
+                try:
+                    fields = line.split(';') + ['', '']
+                    credentials[normalize_tag(fields[0])] = (
+                        fields[1].strip(), parse_time(fields[2]), parse_time(fields[3])
+                    )
+                except Exception as exp:
+                    logger.warning('skip line %s of %s: %s', line_number, self.__import_file, exp)
+
+        with self.__lock:
+            existing = {}
+            for tag, group, valid_from, valid_until in self.__db.execute(
+                    'SELECT tag, group_name, valid_from, valid_until FROM credentials WHERE source = ?',
+                    (SOURCE_FILE,)):
+                existing[tag] = (group, valid_from, valid_until)
+
+            changed = [(tag,) + values + (SOURCE_FILE,) for tag, values in credentials.items()
+                       if existing.get(tag) != values]
+            removed = [(tag,) for tag in existing if tag not in credentials]
+            self.__db.executemany('INSERT OR REPLACE INTO credentials VALUES (?, ?, ?, ?, ?)', changed)
+            self.__db.executemany('DELETE FROM credentials WHERE tag = ?', removed)
+            self.__db.commit()
+        logger.info('synchronised %s: %s tags changed, %s tags removed', self.__import_file, len(changed), len(removed))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [KeyboardName_keyboard]
+#  debounce = lockout             # none, lockout, integrator or min_press
+#  debounce_time = 50             # ms
+#
+#  lockout      the first edge counts at once, further edges of the pin within debounce_time
+#               are ignored - if the level differs at the end, this counts as a new edge
+#  integrator   an edge counts after the level was stable for debounce_time (delays every edge)
+#  min_press    a press counts if the input stays pressed for debounce_time, the release at once -
+#               short spikes of noisy bell wires are dropped completely
+#
+#  Readers of tags and codes (rdm6300, pn532, usb_plain, ...) report whole presses: with lockout
+#  and integrator the same pin is ignored for debounce_time after a press, min_press lets all pass.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+
+import doorpi
+
+FILTER_NONE = 'none'
+FILTER_LOCKOUT = 'lockout'
+FILTER_INTEGRATOR = 'integrator'
+FILTER_MIN_PRESS = 'min_press'
+FILTERS = [FILTER_NONE, FILTER_LOCKOUT, FILTER_INTEGRATOR, FILTER_MIN_PRESS]
+
+class PinState(object):
+    __slots__ = ['raw', 'level', 'locked_until', 'job', 'generation', 'edges', 'accepted']
+
+    def __init__(self, level):
+        self.raw = level            # last level of the hardware
+        self.level = level          # last accepted level
+        self.locked_until = 0
+        self.job = None
+        self.generation = 0
+        self.edges = 0
+        self.accepted = 0
+
+class EdgeFilter(object):
+    """ per pin edge filter in front of the events of a keyboard
+
+    edge(pin, value) gets every level reported by the hardware and calls deliver(pin, value)
+    for the accepted edges - at once or later from the scheduler. press(pin) returns whether
+    a whole press (tag, code) counts. level(pin) returns the accepted level of a new pin.
+    """
+
+    @property
+    def strategy(self): return self.__strategy
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            suppressed = dict((pin, state.edges - state.accepted) for pin, state in self.__pins.items()
+                              if state.edges > state.accepted)
+            return {
+                'strategy':             self.__strategy,
+                'time_ms':              self.__filter_time * 1000,
+                'edges':                sum(state.edges for state in self.__pins.values()),
+                'suppressed':           sum(suppressed.values()),
+                'suppressed_per_pin':   suppressed
+            }
+
+    def __init__(self, strategy, filter_time, deliver, level):
+        if strategy not in FILTERS: raise ValueError('unknown debounce strategy %s' % strategy)
+        self.__strategy = strategy if filter_time > 0 else FILTER_NONE
+        self.__filter_time = filter_time if filter_time > 0 else 0
+        self.__deliver = deliver
+        self.__level = level
+        self.__lock = threading.Lock()
+        self.__pins = {}
+        self.__destroyed = False
+
+    def destroy(self):
+        with self.__lock:
+            self.__destroyed = True
+            for state in self.__pins.values():
+                if state.job: state.job.cancel()
+                state.job = None
+
+    def __state(self, pin):
+        state = self.__pins.get(pin)
+        if state is None: state = self.__pins[pin] = PinState(bool(self.__level(pin)))
+        return state
+
+    def __settle_at(self, pin, state, when, restart = True):
+        # one deferred check per pin - restart moves it to the new time
+        if state.job:
+            if not restart: return
+            state.job.cancel()
+        state.generation += 1
+        state.job = doorpi.DoorPi().scheduler.call_at(when, self.__settle, pin, state.generation)
+
+    def __cancel(self, state):
+        if state.job: state.job.cancel()
+        state.job = None
+        state.generation += 1
+
+    def __accept(self, state, value, now):
+        state.level = value
+        state.accepted += 1
+        if self.__strategy == FILTER_LOCKOUT: state.locked_until = now + self.__filter_time
+
+    def edge(self, pin, value):
+        value = bool(value)
+        now = time.time()
+        with self.__lock:
+            if self.__destroyed: return
+            state = self.__state(pin)
+            state.edges += 1
+            state.raw = value
+
+            accepted = False
+            if self.__strategy == FILTER_NONE:
+                accepted = value is not state.level
+            elif self.__strategy == FILTER_LOCKOUT:
+                if now < state.locked_until: self.__settle_at(pin, state, state.locked_until, restart = False)
+                else: accepted = value is not state.level
+            elif self.__strategy == FILTER_INTEGRATOR:
+                self.__settle_at(pin, state, now + self.__filter_time)
+            elif value:
+                # min_press: down counts later, if the input is still pressed
+                if not state.level: self.__settle_at(pin, state, now + self.__filter_time)
+            else:
+                self.__cancel(state)
+                accepted = state.level
+
+            if accepted: self.__accept(state, value, now)
+        if accepted: self.__deliver(pin, value)
+
+    def __settle(self, pin, generation):
+        with self.__lock:
+            state = self.__pins[pin]
+            if self.__destroyed or state.generation != generation: return
+            state.job = None
+            if state.raw is state.level: return
+            value = state.raw
+            self.__accept(state, value, time.time())
+        self.__deliver(pin, value)
+
+    def press(self, pin):
+        now = time.time()
+        with self.__lock:
+            if self.__destroyed: return False
+            state = self.__state(pin)
+            state.edges += 1
+            if self.__strategy in [FILTER_LOCKOUT, FILTER_INTEGRATOR]:
+                if now < state.locked_until: return False
+                state.locked_until = now + self.__filter_time
+            state.accepted += 1
+            return True
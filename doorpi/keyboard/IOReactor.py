@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import errno
+import fcntl
+import select
+import threading
+import time
+from collections import deque
+
+SHUTDOWN_LATENCY_SAMPLES = 20
+
+def set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+class IOReactor(object):
+    """ one epoll loop (and thread) for all fd based keyboards
+
+    register(fd, callback) calls callback(fd, event_mask) in the reactor thread every time
+    the fd is readable - callbacks have to read what is waiting without blocking.
+    call_soon(callback) runs a callback in the reactor thread.
+    The thread is started with the first registered fd and ends with the last one.
+    """
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            latencies = list(self.__shutdown_latencies)
+            return {
+                'running':                  self.__thread is not None,
+                'registered_fds':           len(self.__handlers),
+                'last_shutdown_latency':    latencies[-1] if latencies else None,
+                'max_shutdown_latency':     max(latencies) if latencies else None
+            }
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__handlers = {}
+        self.__pending = deque()
+        self.__thread = None
+        self.__epoll = None
+        self.__wakeup_read = None
+        self.__wakeup_write = None
+        self.__shutdown_latencies = deque(maxlen = SHUTDOWN_LATENCY_SAMPLES)
+
+    @property
+    def in_reactor_thread(self):
+        return self.__thread is threading.current_thread()
+
+    def register(self, fd, callback, event_mask = select.EPOLLIN):
+        with self.__lock:
+            if self.__thread is None: self.__start()
+            self.__handlers[fd] = callback
+            self.__epoll.register(fd, event_mask)
+        logger.debug('fd %s registered for %s', fd, callback)
+
+    def unregister(self, fd):
+        start_time = time.time()
+        with self.__lock:
+            if fd not in self.__handlers: return False
+            del self.__handlers[fd]
+            try:
+                self.__epoll.unregister(fd)
+            except (IOError, OSError, ValueError):
+                pass # fd is already closed
+            last_handler = len(self.__handlers) is 0
+
+        # after this no callback for fd is running anymore
+        if not self.in_reactor_thread:
+            passed = threading.Event()
+            self.call_soon(passed.set)
+            passed.wait(1)
+        if last_handler: self.__stop()
+
+        latency = time.time() - start_time
+        with self.__lock:
+            self.__shutdown_latencies.append(latency)
+        logger.debug('fd %s unregistered after %.1f ms', fd, latency * 1000)
+        return True
+
+    def call_soon(self, callback, *args):
+        self.__pending.append((callback, args))
+        self.__wakeup()
+
+    def __start(self):
+        if self.__wakeup_read is None:
+            # the pipe lives as long as the reactor - so a late wakeup never hits a reused fd
+            self.__wakeup_read, self.__wakeup_write = os.pipe()
+            set_nonblocking(self.__wakeup_read)
+            set_nonblocking(self.__wakeup_write)
+        self.__epoll = select.epoll()
+        self.__epoll.register(self.__wakeup_read, select.EPOLLIN)
+        self.__thread = threading.Thread(
+            target = self.__run,
+            args = (self.__epoll, self.__wakeup_read),
+            name = 'IOReactor'
+        )
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __stop(self):
+        with self.__lock:
+            # a new fd could have been registered in the meantime
+            if self.__handlers or self.__thread is None: return
+            thread = self.__thread
+            self.__thread = None
+            self.__epoll = None
+            self.__wakeup()
+        if thread is not threading.current_thread(): thread.join(1)
+
+    def __wakeup(self):
+        if self.__wakeup_write is None: return
+        try:
+            os.write(self.__wakeup_write, 'x')
+        except OSError as exp:
+            # pipe is full - the loop is awake anyway
+            if exp.errno != errno.EAGAIN: raise
+
+    def __run_pending(self):
+        while self.__pending:
+            callback, args = self.__pending.popleft()
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception('error in reactor callback %s', callback)
+
+    def __run(self, epoll, wakeup_read):
+        logger.debug('IOReactor started')
+        try:
+            while True:
+                for fd, event_mask in epoll.poll():
+                    if fd == wakeup_read:
+                        try:
+                            while os.read(wakeup_read, 4096): pass
+                        except OSError as exp:
+                            if exp.errno != errno.EAGAIN: raise
+                        continue
+                    callback = self.__handlers.get(fd)
+                    if callback is None: continue
+                    try:
+                        callback(fd, event_mask)
+                    except Exception:
+                        logger.exception('error in reactor callback for fd %s', fd)
+                self.__run_pending()
+                if self.__thread is not threading.current_thread(): break
+        finally:
+            self.__run_pending()
+            epoll.close()
+            logger.debug('IOReactor stopped')
+
+REACTOR = IOReactor()
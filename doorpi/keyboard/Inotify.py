@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+# see /usr/include/linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+class InotifyError(OSError): pass
+
+_libc = None
+def libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+    return _libc
+
+class Inotify(object):
+    """ thin ctypes wrapper around the inotify syscalls of linux
+
+    the fd is non-blocking and meant to be watched by epoll - read_events() returns
+    all queued events as (watch_descriptor, mask, name)
+    """
+
+    @property
+    def fd(self): return self.__fd
+
+    def __init__(self):
+        self.__fd = libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            error = ctypes.get_errno()
+            raise InotifyError(error, 'inotify_init1: %s' % os.strerror(error))
+        self.__watches = {}
+
+    def add_watch(self, path, mask):
+        watch_descriptor = libc().inotify_add_watch(self.__fd, path, mask)
+        if watch_descriptor < 0:
+            error = ctypes.get_errno()
+            raise InotifyError(error, 'inotify_add_watch %s: %s' % (path, os.strerror(error)))
+        self.__watches[watch_descriptor] = path
+        return watch_descriptor
+
+    def path(self, watch_descriptor):
+        return self.__watches.get(watch_descriptor)
+
+    def read_events(self):
+        try:
+            data = os.read(self.__fd, READ_SIZE)
+        except OSError as exp:
+            if exp.errno == errno.EAGAIN: return []
+            raise
+        events = []
+        position = 0
+        while position + EVENT_HEADER.size <= len(data):
+            watch_descriptor, mask, cookie, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = data[position:position + length].rstrip('\0')
+            position += length
+            events.append((watch_descriptor, mask, name))
+        return events
+
+    def close(self):
+        if self.__fd is None: return
+        os.close(self.__fd)
+        self.__fd = None
@@ -9,6 +9,7 @@ import importlib
 
 import doorpi
 from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass
+from doorpi.keyboard.OutputScheduler import OutputScheduler
 
 class KeyboardImportError(ImportError): pass
 class UnknownOutputPin(Exception): pass
@@ -89,6 +90,12 @@ class KeyboardHandler(KeyboardAbstractBaseClass):
                 return_dict[Keyboard+'.'+str(pin)] = self.__keyboards[Keyboard].status_output(pin)
         return return_dict
 
+    @property
+    def output_scheduler(self): return self.__output_scheduler
+
+    @property
+    def keyboards(self): return dict(self.__keyboards)
+
     @property
     def loaded_keyboards(self):
         return_dict = {}
@@ -99,6 +106,9 @@ class KeyboardHandler(KeyboardAbstractBaseClass):
     def __init__(self, config_keyboards):
         self.__OutputMappingTable = {}
         self.__keyboards = {}
+        self.__output_scheduler = OutputScheduler(self.__set_output, doorpi.DoorPi().scheduler)
+        # registered before the keyboards, so running pulses end before the keyboards shut down
+        self.register_destroy_action(self.__output_scheduler.destroy)
         for keyboard_name in config_keyboards:
             logger.info("trying to add keyboard '%s' to handler", keyboard_name)
             self.__keyboards[keyboard_name] = load_single_keyboard(keyboard_name)
@@ -124,19 +134,39 @@ class KeyboardHandler(KeyboardAbstractBaseClass):
 
     def destroy(self):
         try:
+            self.__output_scheduler.destroy()
             for Keyboard in self.__keyboards:
                 self.__keyboards[Keyboard].destroy()
         except: pass
 
     def set_output(self, pin, value, log_output = True):
+        # a direct output overrides pulses and blinking on this pin
+        self.__output_scheduler.cancel(pin)
+        return self.__set_output(pin, value, log_output)
+
+    def __set_output(self, pin, value, log_output = True):
         if pin not in self.__OutputMappingTable:
             raise UnknownOutputPin('outputpin with name %s is unknown %s' % (pin, self.__OutputMappingTable))
-        self.__keyboards[self.__OutputMappingTable[pin]].set_output(pin, value, log_output)
+        return self.__keyboards[self.__OutputMappingTable[pin]].set_output(pin, value, log_output)
+
+    @property
+    def pressed_keys(self):
+        pressed_keys = []
+        for Keyboard in self.__keyboards:
+            for input_pin in self.__keyboards[Keyboard].pressed_keys:
+                pressed_keys.append(Keyboard+'.'+str(input_pin))
+        return pressed_keys
+
+    def status_input(self, pin, verify = False):
+        for keyboard in self.__keyboards:
+            if pin.startswith(keyboard+'.'):
+                return self.__keyboards[keyboard].status_input(pin[len(keyboard+'.'):], verify)
+        return None
 
-    def status_input(self, pin):
+    def wait_for_input(self, pin, value = True, timeout = None):
         for keyboard in self.__keyboards:
             if pin.startswith(keyboard+'.'):
-                return self.__keyboards[keyboard].status_input(pin[len(keyboard+'.'):])
+                return self.__keyboards[keyboard].wait_for_input(pin[len(keyboard+'.'):], value, timeout)
         return None
 
     def status_output(self, pin):
@@ -145,4 +175,8 @@ class KeyboardHandler(KeyboardAbstractBaseClass):
                 return self.__keyboards[keyboard].status_output(pin[len(keyboard+'.'):])
         return None
 
+    get_input = status_input
+    status_inputpin = status_input
+    get_output = status_output
+    which_keys_are_pressed = pressed_keys
     __del__ = destroy
\ No newline at end of file
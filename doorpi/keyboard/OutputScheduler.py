@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+
+PULSE = 'pulse'
+BLINK = 'blink'
+
+class OutputJob(object):
+    def __init__(self, kind, pin, on_value, off_value, log_output):
+        self.kind = kind
+        self.pin = pin
+        self.on_value = on_value
+        self.off_value = off_value
+        self.log_output = log_output
+        self.deadline = None
+        self.stop_pins = []
+        self.on_time = 0
+        self.off_time = 0
+        self.remaining_cycles = 0
+        self.state_on = True
+        self.timer = None
+
+    @property
+    def status(self):
+        return {
+            'kind':         self.kind,
+            'on_value':     self.on_value,
+            'off_value':    self.off_value,
+            'deadline':     self.deadline,
+            'stop_pins':    self.stop_pins
+        }
+
+class OutputScheduler(object):
+    """ pulses, blink patterns and timed-off outputs for the KeyboardHandler
+
+    There is only one job per output pin. A new pulse with the same values as the
+    running pulse retriggers it (the later deadline wins, stop pins are merged).
+    Every other new job and every direct set_output on the pin replaces the running
+    job without restoring its off value - the latest request wins.
+    """
+
+    @property
+    def jobs(self):
+        with self.__lock:
+            return dict((pin, self.__jobs[pin].status) for pin in self.__jobs)
+
+    def __init__(self, set_output, scheduler):
+        self.__set_output = set_output
+        self.__scheduler = scheduler
+        self.__jobs = {}
+        self.__lock = threading.RLock()
+
+    def destroy(self):
+        with self.__lock:
+            for pin in self.__jobs.keys(): self.stop(pin)
+
+    def pulse(self, pin, on_value, off_value, duration, stop_pin = None, log_output = True):
+        with self.__lock:
+            deadline = time.time() + float(duration)
+            job = self.__jobs.get(pin)
+            if job and job.kind == PULSE and (job.on_value, job.off_value) == (on_value, off_value):
+                if stop_pin and stop_pin not in job.stop_pins: job.stop_pins.append(stop_pin)
+                if deadline > job.deadline:
+                    job.timer.cancel()
+                    job.deadline = deadline
+                    job.timer = self.__scheduler.call_at(deadline, self.__finish_pulse, job)
+                if log_output: logger.debug('retrigger pulse on %s until %s', pin, job.deadline)
+                return True
+
+            self.cancel(pin)
+            job = OutputJob(PULSE, pin, on_value, off_value, log_output)
+            job.deadline = deadline
+            if stop_pin: job.stop_pins.append(stop_pin)
+            self.__jobs[pin] = job
+            self.__set_output(pin, on_value, log_output)
+            job.timer = self.__scheduler.call_at(deadline, self.__finish_pulse, job)
+            return True
+
+    def blink(self, pin, on_value, off_value, on_time, off_time, cycles = 0, log_output = False):
+        with self.__lock:
+            self.cancel(pin)
+            job = OutputJob(BLINK, pin, on_value, off_value, log_output)
+            job.on_time = float(on_time)
+            job.off_time = float(off_time)
+            job.remaining_cycles = int(cycles)
+            self.__jobs[pin] = job
+            self.__set_output(pin, on_value, log_output)
+            job.deadline = time.time() + job.on_time
+            job.timer = self.__scheduler.call_at(job.deadline, self.__toggle_blink, job)
+            return True
+
+    def cancel(self, pin):
+        with self.__lock:
+            job = self.__jobs.pop(pin, None)
+            if job: job.timer.cancel()
+            return job is not None
+
+    def stop(self, pin):
+        with self.__lock:
+            job = self.__jobs.get(pin)
+            if not job: return False
+            self.cancel(pin)
+            self.__set_output(pin, job.off_value, job.log_output)
+            return True
+
+    def input_triggered(self, pin_names):
+        with self.__lock:
+            for job in self.__jobs.values():
+                for stop_pin in job.stop_pins:
+                    if stop_pin in pin_names:
+                        logger.debug('stop %s on %s by stop pin %s', job.kind, job.pin, stop_pin)
+                        self.stop(job.pin)
+                        break
+
+    def __finish_pulse(self, job):
+        with self.__lock:
+            if self.__jobs.get(job.pin) is not job: return
+            del self.__jobs[job.pin]
+            self.__set_output(job.pin, job.off_value, job.log_output)
+
+    def __toggle_blink(self, job):
+        with self.__lock:
+            if self.__jobs.get(job.pin) is not job: return
+            if job.state_on:
+                job.state_on = False
+                self.__set_output(job.pin, job.off_value, job.log_output)
+                if job.remaining_cycles > 0:
+                    job.remaining_cycles -= 1
+                    if job.remaining_cycles is 0:
+                        del self.__jobs[job.pin]
+                        return
+                # schedule relative to the last deadline, so the rhythm doesn't drift
+                job.deadline += job.off_time
+            else:
+                job.state_on = True
+                self.__set_output(job.pin, job.on_value, job.log_output)
+                job.deadline += job.on_time
+            job.timer = self.__scheduler.call_at(job.deadline, self.__toggle_blink, job)
@@ -39,7 +39,7 @@ class DUMMY(KeyboardAbstractBaseClass):
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
         self.__destroyed = True
 
-    def status_input(self, pin):
+    def read_input(self, pin):
         if self._polarity is 0:
             return str(0).lower() in HIGH_LEVEL
         else:
@@ -7,12 +7,12 @@ logger.debug("%s loaded", __name__)
 
 import os
 import ntpath
-from time import sleep
-
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import threading
+from collections import defaultdict
 
 from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+from doorpi.keyboard.Inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO, IN_Q_OVERFLOW
+from doorpi.keyboard.IOReactor import REACTOR
 import doorpi
 
 def path_leaf(path):
@@ -22,17 +22,27 @@ def path_leaf(path):
 class MissingMandatoryParameter(Exception): pass
 
 def get(**kwargs): return FileSystem(**kwargs)
-class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
-
-    __reset_file = None
-    
-    def __init__(self, input_pins, output_pins, conf_pre, conf_post, keyboard_name, polarity = 0, *args, **kwargs):
+class FileSystem(KeyboardAbstractBaseClass):
+    """ keyboard with one file per pin
+
+    Input files are watched with inotify (IN_CLOSE_WRITE and IN_MOVED_TO) in the shared
+    IOReactor. Events only fire if the content differs from the cached state - with
+    reset_input every external write of a high value is a key press. Own writes are
+    counted per pin and their inotify events are skipped, so resetting an input
+    doesn't trigger it again. All files are written atomically (temp file + rename).
+    Output changes are collected and written by the reactor, so a fast sequence of
+    set_output calls ends in one write with the last value.
+    """
+
+    def __init__(self, input_pins, output_pins, conf_pre, conf_post, keyboard_name, polarity = 0,
+                 pressed_on_key_down = True, *args, **kwargs):
         logger.debug("FileSystem.__init__(input_pins = %s, output_pins = %s, polarity = %s)",
                      input_pins, output_pins, polarity)
         self.keyboard_name = keyboard_name
         self._polarity = polarity
         self._InputPins = map(str, input_pins)
         self._OutputPins = map(str, output_pins)
+        self._pressed_on_key_down = pressed_on_key_down
 
         section_name = conf_pre+'keyboard'+conf_post
         self.__reset_input = doorpi.DoorPi().config.get_bool(section_name, 'reset_input', True)
@@ -42,21 +52,26 @@ class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
         if self.__base_path_input == '': raise MissingMandatoryParameter('base_path_input in %s '%section_name)
         if self.__base_path_output == '': raise MissingMandatoryParameter('base_path_output in %s '%section_name)
 
-        if not os.path.exists(os.path.dirname(self.__base_path_input)):
-            logger.info('Path %s does not exist - creating it now', os.path.dirname(self.__base_path_input))
-            os.makedirs(os.path.dirname(self.__base_path_input))
+        for path in [self.__base_path_input, self.__base_path_output]:
+            if not os.path.exists(path):
+                logger.info('Path %s does not exist - creating it now', path)
+                os.makedirs(path)
 
-        if not os.path.exists(os.path.dirname(self.__base_path_output)):
-            logger.info('Path %s does not exist - creating it now', os.path.dirname(self.__base_path_output))
-            os.makedirs(os.path.dirname(self.__base_path_output))
+        self.__lock = threading.Lock()
+        self.__own_writes = defaultdict(int)
+        self.__dirty_outputs = {}
+        self.__flush_pending = False
+        self._init_edge_filter(section_name)
 
         for input_pin in self._InputPins:
-            self.__set_input(os.path.join(self.__base_path_input, input_pin))
+            self.__set_input(input_pin, False)
             self._register_EVENTS_for_pin(input_pin, __name__)
 
-        self.__observer = Observer()
-        self.__observer.schedule(self, self.__base_path_input)
-        self.__observer.start()
+        self.__inotify = Inotify()
+        self.__inotify.add_watch(self.__base_path_input, IN_CLOSE_WRITE | IN_MOVED_TO)
+        # the initial writes happened before the watch - inotify will never report them
+        self.__own_writes.clear()
+        REACTOR.register(self.__inotify.fd, self.__inotify_readable)
 
         # use set_output to register status @ dict self.__OutputStatus
         for output_pin in self._OutputPins:
@@ -68,8 +83,9 @@ class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
         if self.is_destroyed: return
         logger.debug("destroy")
 
-        self.__observer.stop()
-        self.__observer.join()
+        REACTOR.unregister(self.__inotify.fd)
+        self.__inotify.close()
+        self.__flush_outputs()
 
         for input_pin in self._InputPins:
             os.remove(os.path.join(self.__base_path_input, input_pin))
@@ -79,7 +95,50 @@ class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
         self.__destroyed = True
 
-    def status_input(self, pin):
+    def __inotify_readable(self, fd, event_mask):
+        self.__handle_inotify_events(self.__inotify.read_events())
+
+    def __handle_inotify_events(self, events):
+        # all events of one read are handled together - one check per pin
+        event_count = defaultdict(int)
+        for watch_descriptor, event_mask, name in events:
+            if event_mask & IN_Q_OVERFLOW:
+                logger.warning('inotify queue overflow - check all input pins')
+                for input_pin in self._InputPins: event_count[input_pin] += 1
+            elif name in self._InputPins:
+                event_count[name] += 1
+
+        for input_pin, count in event_count.items():
+            with self.__lock:
+                own_writes = min(self.__own_writes[input_pin], count)
+                self.__own_writes[input_pin] -= own_writes
+            if count - own_writes <= 0:
+                logger.trace('skip own write of input %s', input_pin)
+                continue
+            self.__input_changed(input_pin)
+
+    def __input_changed(self, input_pin):
+        try:
+            value = self.read_input(input_pin)
+        except IOError as exp:
+            logger.warning('could not read input %s: %s', input_pin, exp)
+            return
+
+        if self.__reset_input:
+            if not value: return
+            if not self._press_accepted(input_pin):
+                self.__set_input(input_pin, False)
+                return
+            self._set_input_status(input_pin, True)
+            self._fire_OnKeyDown(input_pin, __name__)
+            self._fire_OnKeyPressed(input_pin, __name__)
+            self.__set_input(input_pin, False)
+            self._fire_OnKeyUp(input_pin, __name__)
+            return
+
+        self._input_edge(input_pin, value)
+
+    def read_input(self, pin):
         f = open(os.path.join(self.__base_path_input, pin), 'r')
         plain_value = f.readline().rstrip()
         f.close()
@@ -89,16 +148,31 @@ class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
             return str(plain_value).lower() in LOW_LEVEL
 
     def __write_file(self, file, value = False):
-        f = open(file, 'w')
         value = str(value).lower() in HIGH_LEVEL
         if self._polarity is 1: value = not value
+        # write a temp file and rename it, so readers never see a half written file
+        temp_file = os.path.join(os.path.dirname(file), '.'+path_leaf(file)+'.tmp')
+        f = open(temp_file, 'w')
         f.write(str(value)+'\r\n')
         f.close()
+        os.chmod(temp_file, 0o666)
+        os.rename(temp_file, file)
         return value
 
-    def __set_input(self, file, value = False):
-        self.__write_file(file, value)
-        os.chmod(file, 0o666)
+    def __set_input(self, pin, value = False):
+        with self.__lock:
+            self.__own_writes[pin] += 1
+        self.__write_file(os.path.join(self.__base_path_input, pin), value)
+        self._set_input_status(pin, str(value).lower() in HIGH_LEVEL)
+
+    def __flush_outputs(self):
+        with self.__lock:
+            dirty_outputs = self.__dirty_outputs
+            self.__dirty_outputs = {}
+            self.__flush_pending = False
+        for pin, (value, log_output) in dirty_outputs.items():
+            written_value = self.__write_file(os.path.join(self.__base_path_output, pin), value)
+            if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, written_value, log_output)
 
     def set_output(self, pin, value, log_output = True):
         parsed_pin = doorpi.DoorPi().parse_string("!"+str(pin)+"!")
@@ -109,28 +183,10 @@ class FileSystem(KeyboardAbstractBaseClass, FileSystemEventHandler):
         log_output = str(log_output).lower() in HIGH_LEVEL
 
         if pin not in self._OutputPins: return False
-        written_value = self.__write_file(os.path.join(self.__base_path_output, pin), value)
-        if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, written_value, log_output)
-
-        self._OutputStatus[pin] = value
+        with self.__lock:
+            self.__dirty_outputs[pin] = (value, log_output)
+            self._OutputStatus[pin] = value
+            if self.__flush_pending: return True
+            self.__flush_pending = True
+        REACTOR.call_soon(self.__flush_outputs)
         return True
-
-    def on_modified(self, event):
-        if 'FileModifiedEvent' not in str(event): return
-        if self.__reset_file:
-            if self.__reset_file == event.src_path:
-                self.__reset_file = None
-                logging.debug('reset inputfile will not fire event (%s)', event.src_path)
-                return
-            self.__reset_file = event.src_path
-            self.__set_input(event.src_path, 'false')
-
-        input_pin = path_leaf(event.src_path)
-        if input_pin not in self._InputPins: return
-
-        if self.status_input(input_pin):
-            self.__reset_file = event.src_path
-            self._fire_OnKeyPressed(input_pin, __name__)
-            self._fire_OnKeyDown(input_pin, __name__)
-        else:
-            self._fire_OnKeyUp(input_pin, __name__)
@@ -51,7 +51,9 @@ class GPIO(KeyboardAbstractBaseClass):
             for input_pin in self._InputPins:
                 RPiGPIO.setup(input_pin, RPiGPIO.IN, pull_up_down=pull_up_down)
 
+        self._init_edge_filter(section_name)
         for input_pin in self._InputPins:
+            self._set_input_status(input_pin, self.read_input(input_pin))
             RPiGPIO.add_event_detect(
                 input_pin,
                 RPiGPIO.BOTH,
@@ -87,16 +89,10 @@ class GPIO(KeyboardAbstractBaseClass):
         self.__destroyed = True
 
     def event_detect(self, pin):
-        if self.status_input(pin):
-            self._fire_OnKeyDown(pin, __name__)
-            if self._pressed_on_key_down:  # issue 134
-                self._fire_OnKeyPressed(pin, __name__)
-        else:
-            self._fire_OnKeyUp(pin, __name__)
-            if not self._pressed_on_key_down:  # issue 134
-                self._fire_OnKeyPressed(pin, __name__)
+        # the callback doesn't know the edge - one read here keeps all other reads in memory
+        self._input_edge(pin, self.read_input(pin))
 
-    def status_input(self, pin):
+    def read_input(self, pin):
         if self._polarity is 0:
             return str(RPiGPIO.input(int(pin))).lower() in HIGH_LEVEL
         else:
@@ -25,9 +25,11 @@ class PiFace(KeyboardAbstractBaseClass):
         self._OutputPins = map(int, output_pins)
         self._pressed_on_key_down = pressed_on_key_down
 
+        self._init_edge_filter(kwargs['conf_pre']+'keyboard'+kwargs['conf_post'])
         p.init()
         self.__listener = p.InputEventListener()
         for input_pin in self._InputPins:
+            self._set_input_status(input_pin, self.read_input(input_pin))
             self.__listener.register(
                 pin_num=input_pin,
                 direction=p.IODIR_BOTH,
@@ -59,16 +61,12 @@ class PiFace(KeyboardAbstractBaseClass):
         self.__destroyed = True
 
     def event_detect(self, event):
-        if self.status_input(event.pin_num):
-            self._fire_OnKeyDown(event.pin_num, __name__)
-            if self._pressed_on_key_down:  # issue 134
-                self._fire_OnKeyPressed(event.pin_num, __name__)
-        else:
-            self._fire_OnKeyUp(event.pin_num, __name__)
-            if not self._pressed_on_key_down:  # issue 134
-                self._fire_OnKeyPressed(event.pin_num, __name__)
+        # IODIR_ON is the edge of a pressed input (digital_read returns 1)
+        value = '1' if event.direction == p.IODIR_ON else '0'
+        if self._polarity is 0: self._input_edge(event.pin_num, value in HIGH_LEVEL)
+        else: self._input_edge(event.pin_num, value in LOW_LEVEL)
 
-    def status_input(self, pin):
+    def read_input(self, pin):
         if self._polarity is 0:
             return str(p.digital_read(int(pin))).lower() in HIGH_LEVEL
         else:
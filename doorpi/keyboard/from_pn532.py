@@ -83,6 +83,7 @@ logger.debug("%s loaded", __name__)
 
 import threading
 from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+from doorpi.keyboard.EdgeFilter import FILTER_LOCKOUT
 import doorpi
 import nfc
 import time
@@ -93,30 +94,26 @@ def get(**kwargs): return pn532(**kwargs)
 class pn532(KeyboardAbstractBaseClass):
     name = 'pn532 nfc keyboard'
 
-    @property
-    def current_millisecond_timestamp(self):
-        return int(round(time.time() * 1000))
-
-    @property
-    def in_bouncetime(self):
-        return self.last_key_time + self.bouncetime >= self.current_millisecond_timestamp
-
     def pn532_recognized(self, tag):
         try:
-            if self.in_bouncetime:
-                logger.debug('founded tag while bouncetime -> skip')
-                return
-            self.last_key_time = self.current_millisecond_timestamp
             logger.debug("tag: %s", tag)
             hmm = str(tag)
             ID = str(hmm.split('ID=')[-1:])[2:-2]
             logger.debug("ID: %s", ID)
-            if ID in self._InputPins:
+            if not self._press_accepted(ID):
+                logger.debug('founded tag while bouncetime -> skip')
+                return
+            if ID in self._InputPinSet:
+                pin = ID
+            else:
+                pin = self._credential_pin(ID, __name__)
+            if pin is not None:
                 logger.debug("ID gefunden: %s", ID)
                 self.last_key = ID
-                self._fire_OnKeyDown(self.last_key, __name__)
-                self._fire_OnKeyPressed(self.last_key, __name__)
-                self._fire_OnKeyUp(self.last_key, __name__)
+                self._set_last_input(ID)
+                self._fire_OnKeyDown(pin, __name__)
+                self._fire_OnKeyPressed(pin, __name__)
+                self._fire_OnKeyUp(pin, __name__)
                 doorpi.DoorPi().event_handler('OnFoundKnownTag', __name__)
                 logger.debug("last_key is %s", self.last_key)
         except Exception as ex:
@@ -136,12 +133,14 @@ class pn532(KeyboardAbstractBaseClass):
     def __init__(self, input_pins, output_pins, keyboard_name, conf_pre, conf_post, bouncetime, *args, **kwargs):
         self.keyboard_name = keyboard_name
         self.last_key = ""
-        self.bouncetime = bouncetime
-        self.last_key_time = self.current_millisecond_timestamp
         # auslesen aus ini:
         section_name = conf_pre+'keyboard'+conf_post
         self._device = doorpi.DoorPi().config.get_string_parsed(section_name, 'device', 'tty:AMA0:pn532')
         self._InputPins = map(str.upper, input_pins)
+        self._InputPinSet = set(self._InputPins)
+        self._load_credential_store(section_name, __name__)
+        # bouncetime (ms) is the default of the lockout for repeated reads of a tag
+        self._init_edge_filter(section_name, FILTER_LOCKOUT, bouncetime)
         self._InputPairs = {}
         self.__clf = nfc.ContactlessFrontend(self._device) #init nfc-reader
         for input_pin in self._InputPins:
@@ -164,9 +163,6 @@ class pn532(KeyboardAbstractBaseClass):
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
         self.__destroyed = True
 
-    def status_input(self, tag):
-        logger.debug("status_input for tag %s", tag)
-        if tag == self.last_key:
-            return True
-        else:
-            return False
+    def read_input(self, tag):
+        # the reader only knows the last tag and this is already in the cache
+        return self.input_status.get(str(tag), False)
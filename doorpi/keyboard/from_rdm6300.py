@@ -76,109 +76,133 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
-import threading
+import select
 import serial 
 import time
 
 from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+from doorpi.keyboard.serial_lib.FrameDecoder import FrameDecoder, read_available, hex_byte, is_hex
+from doorpi.keyboard.IOReactor import REACTOR
+from doorpi.keyboard.EdgeFilter import FILTER_LOCKOUT
 import doorpi
 
 START_FLAG = '\x02'
 STOP_FLAG = '\x03'
-MAX_LENGTH = 14
+# 10 ascii hex chars data + 2 ascii hex chars checksum
+PAYLOAD_LENGTH = 12
 
 def get(**kwargs): return RDM6300(**kwargs)
 class RDM6300(KeyboardAbstractBaseClass):
     name = 'RFID Reader RDM6300'
 
     @staticmethod
-    def calculate_checksum(string):
-        checkSum = 0
-        for I in range(1, 10, 2):
-            checkSum = checkSum ^ ((int(string[I], 16)) << 4) + int(string[I+1], 16)
-        return checkSum
+    def calculate_checksum(payload):
+        checksum = 0
+        for position in range(0, 10, 2):
+            checksum ^= hex_byte(payload, position)
+        return checksum
 
     @staticmethod
-    def check_checksum(string):
-        given_checksum = (int(string[11], 16) << 4) + int(string[12], 16)
-        return given_checksum == RDM6300.calculate_checksum(string)
-
-    def readUART(self):
-        while not self._shutdown:
-            logger.debug("readUART() started")
-            # initialize UART
-            # make sure that terminal via UART is disabled
-            # see http://kampis-elektroecke.de/?page_id=3248 for details
+    def check_checksum(payload):
+        return is_hex(payload) and hex_byte(payload, 10) == RDM6300.calculate_checksum(payload)
+
+    def handle_tag(self, payload):
+        logger.debug("found tag, checking dismisstime")
+        # alles okay... nur noch schauen, ob das nicht eine Erkennungs-Wiederholung ist
+        tag = int(payload[4:10], 16)
+        if not self._press_accepted(tag): return
+
+        doorpi.DoorPi().event_handler('OnFoundTag', __name__)
+        self.last_key = tag
+        self._set_last_input(self.last_key)
+        logger.debug("key is %s", self.last_key)
+        if self.last_key in self._InputPinSet:
+            pin = self.last_key
+        else:
+            pin = self._credential_pin(self.last_key, __name__)
+        if pin is not None:
+            self._fire_OnKeyDown(pin, __name__)
+            self._fire_OnKeyPressed(pin, __name__)
+            self._fire_OnKeyUp(pin, __name__)
+            doorpi.DoorPi().event_handler('OnFoundKnownTag', __name__)
+        else:
+            doorpi.DoorPi().event_handler('OnFoundUnknownTag', __name__)
+
+    def __open_uart(self):
+        if self._shutdown: return
+        logger.debug("open UART %s", self.__port)
+        # initialize UART
+        # make sure that terminal via UART is disabled
+        # see http://kampis-elektroecke.de/?page_id=3248 for details
+        try:
             self._UART = serial.Serial(self.__port, self.__baudrate)
-            self._UART.timeout = 1
+            self._UART.timeout = 0
             self._UART.close()
             self._UART.open()
-            try:
-                chars = ""
-
-                while not self._shutdown:
-                    # char aus buffer holen
-                    newChar = self._UART.read()
-                    if newChar != "":
-                        logger.debug("new char %s read", newChar)
-                        chars += str(newChar)
-
-                        # aktuelles Ergebnis kontrollieren
-                        if newChar == STOP_FLAG and chars[0] == START_FLAG and len(chars) == MAX_LENGTH and RDM6300.check_checksum(chars):
-                            logger.debug("found tag, checking dismisstime")
-                            # alles okay... nur noch schauen, ob das nicht eine Erkennungs-Wiederholung ist
-                            now = time.time()
-                            if now - self.last_key_time > self.__dismisstime:
-                                doorpi.DoorPi().event_handler('OnFoundTag', __name__)
-                                self.last_key = int(chars[5:-3], 16)
-                                self.last_key_time = now
-                                logger.debug("key is %s", self.last_key)
-                                if self.last_key in self._InputPins:
-                                    self._fire_OnKeyDown(self.last_key, __name__)
-                                    self._fire_OnKeyPressed(self.last_key, __name__)
-                                    self._fire_OnKeyUp(self.last_key, __name__)
-                                    doorpi.DoorPi().event_handler('OnFoundKnownTag', __name__)
-                                else:
-                                    doorpi.DoorPi().event_handler('OnFoundUnknownTag', __name__)
-
-                        # ggf. löschen
-                        if newChar == STOP_FLAG or len(chars) > MAX_LENGTH:
-                            chars = ""
-
-            except Exception as ex:
-                logger.exception(ex)
-            finally:
-                # shutdown the UART
-                self._UART.close()
-                self._UART = None
-                logger.debug("readUART thread ended")
-
-        
+        except Exception as ex:
+            logger.exception(ex)
+            # the port was never registered at the reactor - only schedule the retry
+            self._UART = None
+            self.__close_uart()
+            return
+        self.__decoder = FrameDecoder(
+            stop_flag = STOP_FLAG,
+            start_flag = START_FLAG,
+            payload_length = PAYLOAD_LENGTH,
+            validator = RDM6300.check_checksum
+        )
+        REACTOR.register(self._UART.fileno(), self.__uart_readable)
+
+    def __close_uart(self):
+        if self._UART is not None:
+            REACTOR.unregister(self._UART.fileno())
+            logger.debug("decoder statistic: %s", self.__decoder.statistic if self.__decoder else None)
+            self._UART.close()
+            self._UART = None
+        # neuer Versuch in einer Sekunde
+        if not self._shutdown:
+            doorpi.DoorPi().scheduler.call_later(1, self.__open_uart)
+
+    def __uart_readable(self, fd, event_mask):
+        try:
+            if event_mask & (select.EPOLLERR | select.EPOLLHUP):
+                raise IOError('UART %s reports error or hangup' % self.__port)
+            # alle wartenden Zeichen auf einmal holen
+            for payload in self.__decoder.feed(read_available(self._UART)):
+                self.handle_tag(payload)
+        except Exception as ex:
+            logger.exception(ex)
+            self.__close_uart()
+
     def __init__(self, input_pins, keyboard_name, conf_pre, conf_post, *args, **kwargs):
         logger.debug("__init__ (input_pins = %s)", input_pins)
         self.keyboard_name = keyboard_name
-        self._InputPins = map(int, input_pins)
+        # groups of the credential store are no numbers
+        self._InputPins = [int(input_pin) if input_pin.isdigit() else input_pin for input_pin in input_pins]
+        self._InputPinSet = set(self._InputPins)
 
         doorpi.DoorPi().event_handler.register_event('OnFoundTag', __name__)
         doorpi.DoorPi().event_handler.register_event('OnFoundUnknownTag', __name__)
         doorpi.DoorPi().event_handler.register_event('OnFoundKnownTag', __name__)
 
         self.last_key = ""
-        self.last_key_time = 0
 
         # somit wirds aus der Config-Datei geladen, falls dort vorhanden.
         section_name = conf_pre+'keyboard'+conf_post
         self.__port = doorpi.DoorPi().config.get(section_name, 'port', "/dev/ttyAMA0")
         self.__baudrate = doorpi.DoorPi().config.get_int(section_name, 'baudrate', 9600)
-        self.__dismisstime = doorpi.DoorPi().config.get_int(section_name, 'dismisstime', 5)
+        # dismisstime (s) is the default of the lockout for repeated reads of a tag
+        dismisstime = doorpi.DoorPi().config.get_int(section_name, 'dismisstime', 5)
+        self._init_edge_filter(section_name, FILTER_LOCKOUT, dismisstime * 1000)
+        self._load_credential_store(section_name, __name__)
 
         for input_pin in self._InputPins:
             self._register_EVENTS_for_pin(input_pin, __name__)
 
         self._shutdown = False
-        self._thread = threading.Thread(target = self.readUART)
-        self._thread.daemon = True
-        self._thread.start()
+        self._UART = None
+        self.__decoder = None
+        self.__open_uart()
 
         self.register_destroy_action()
 
@@ -186,15 +210,13 @@ class RDM6300(KeyboardAbstractBaseClass):
         if self.is_destroyed: return
         logger.debug("destroy")
         self._shutdown = True
+        self.__close_uart()
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
         self.__destroyed = True
 
-    def status_input(self, tag):
-        logger.debug("status_input for tag %s", tag)
-        if tag == self.last_key:
-            return True
-        else:
-            return False
+    def read_input(self, tag):
+        # the reader only knows the last tag and this is already in the cache
+        return self.input_status.get(str(tag), False)
 
     def set_output(self, pin, value, log_output = True):
         # RDM6300 does not support output
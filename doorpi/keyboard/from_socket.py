@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [keyboards]
+#  remote = socket
+#
+#  [remote_keyboard]
+#  udp_port = 48200               # 0 = no UDP
+#  tcp_port = 48201               # 0 = no TCP
+#  bind_address = 127.0.0.1       # 0.0.0.0 for all interfaces
+#  hmac_key =                     # empty = no authentication
+#
+#  [remote_InputPins]
+#  klingel = out:tueroeffner,1,0,3
+#
+#  [remote_OutputPins]
+#  tueroeffner = tueroeffner
+#
+#  Protocol
+#  --------
+#
+#  One frame per line, several commands of a frame are separated by ';'.
+#  An UDP datagram can contain several lines.
+#
+#  press klingel          OnKeyDown, OnKeyPressed and OnKeyUp
+#  down klingel           OnKeyDown (and OnKeyPressed if pressed_on_keydown)
+#  up klingel             OnKeyUp (and OnKeyPressed if not pressed_on_keydown)
+#  in klingel             answer: in klingel 0
+#  out tueroeffner        answer: out tueroeffner 1 (without pin all outputs)
+#
+#  Sample: echo "press klingel;out tueroeffner" | nc -u -q1 127.0.0.1 48200
+#
+#  With hmac_key every frame starts with the HMAC-SHA256 (hex) of the rest of the
+#  line and a unix timestamp, which has to be within hmac_max_age seconds:
+#  <hmac> <timestamp> press klingel
+#
+#  Every signed frame is accepted only once - a captured frame can't be sent again. So two
+#  frames with the same commands need different timestamps (sign_frame uses microseconds).
+#
+#  Errors are answered with "error <message>", edges are not answered.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import socket
+import errno
+import hmac
+import hashlib
+import heapq
+import time
+
+from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+from doorpi.keyboard.IOReactor import REACTOR
+import doorpi
+
+COMMAND_SEPARATOR = ';'
+MAX_DATAGRAM_SIZE = 65535
+MAX_LINE_LENGTH = 4096
+RECV_SIZE = 16 * 1024
+
+# steps of the timestamps of sign_frame - two lines never get the same timestamp
+SIGN_TIMESTAMP_STEP = 0.00001
+
+class FrameError(Exception): pass
+
+last_sign_timestamp = 0
+
+def sign_frame(key, frame, timestamp = None):
+    # for clients: returns the signed line of a frame
+    global last_sign_timestamp
+    if timestamp is None:
+        timestamp = last_sign_timestamp = max(time.time(), last_sign_timestamp + SIGN_TIMESTAMP_STEP)
+    payload = '%.6f %s' % (timestamp, frame)
+    return '%s %s' % (hmac.new(key, payload, hashlib.sha256).hexdigest(), payload)
+
+def get(**kwargs): return Socket(**kwargs)
+class Socket(KeyboardAbstractBaseClass):
+    name = 'Socket Keyboard'
+
+    @property
+    def statistic(self):
+        return dict(self.__statistic, connections = len(self.__connections))
+
+    def __init__(self, input_pins, output_pins, conf_pre, conf_post, keyboard_name,
+                 pressed_on_key_down = True, *args, **kwargs):
+        logger.debug("__init__(input_pins = %s, output_pins = %s)", input_pins, output_pins)
+        self.keyboard_name = keyboard_name
+        self._InputPins = map(str, input_pins)
+        self._InputPinSet = set(self._InputPins)
+        self._OutputPins = map(str, output_pins)
+        self._OutputStatus = {}
+        self._pressed_on_key_down = pressed_on_key_down
+
+        section_name = conf_pre+'keyboard'+conf_post
+        bind_address = doorpi.DoorPi().config.get(section_name, 'bind_address', '127.0.0.1')
+        udp_port = doorpi.DoorPi().config.get_int(section_name, 'udp_port', 0)
+        tcp_port = doorpi.DoorPi().config.get_int(section_name, 'tcp_port', 0)
+        self.__hmac_key = doorpi.DoorPi().config.get(section_name, 'hmac_key', '')
+        self.__hmac_max_age = doorpi.DoorPi().config.get_int(section_name, 'hmac_max_age', 30)
+        self.__max_connections = doorpi.DoorPi().config.get_int(section_name, 'max_connections', 8)
+
+        if not udp_port and not tcp_port:
+            logger.warning('neither udp_port nor tcp_port in %s - keyboard %s receives nothing',
+                           section_name, keyboard_name)
+
+        self.__statistic = dict(frames = 0, commands = 0, rejected = 0, replayed = 0)
+        # signatures of the accepted frames, until their timestamp is older than hmac_max_age
+        self.__seen_signatures = set()
+        self.__seen_expiry = []
+        self.__connections = {}
+        self.__udp_socket = None
+        self.__tcp_socket = None
+
+        self._init_edge_filter(section_name)
+        for input_pin in self._InputPins:
+            self._set_input_status(input_pin, False)
+            self._register_EVENTS_for_pin(input_pin, __name__)
+
+        # use set_output to register status @ dict self.__OutputStatus
+        for output_pin in self._OutputPins:
+            self.set_output(output_pin, 0, False)
+
+        if udp_port:
+            self.__udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.__udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.__udp_socket.bind((bind_address, udp_port))
+            self.__udp_socket.setblocking(0)
+            REACTOR.register(self.__udp_socket.fileno(), self.__udp_readable)
+            logger.info('keyboard %s listens on udp %s:%s', keyboard_name, bind_address, udp_port)
+
+        if tcp_port:
+            self.__tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.__tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.__tcp_socket.bind((bind_address, tcp_port))
+            self.__tcp_socket.listen(self.__max_connections)
+            self.__tcp_socket.setblocking(0)
+            REACTOR.register(self.__tcp_socket.fileno(), self.__tcp_acceptable)
+            logger.info('keyboard %s listens on tcp %s:%s', keyboard_name, bind_address, tcp_port)
+
+        self.register_destroy_action()
+
+    def destroy(self):
+        if self.is_destroyed: return
+        logger.debug("destroy")
+        for fd in self.__connections.keys(): self.__close_connection(fd)
+        for listen_socket in [self.__udp_socket, self.__tcp_socket]:
+            if listen_socket is None: continue
+            REACTOR.unregister(listen_socket.fileno())
+            listen_socket.close()
+        logger.debug("statistic: %s", self.__statistic)
+        doorpi.DoorPi().event_handler.unregister_source(__name__, True)
+        self.__destroyed = True
+
+    def __udp_readable(self, fd, event_mask):
+        # alle wartenden Datagramme auf einmal abholen
+        while True:
+            try:
+                datagram, address = self.__udp_socket.recvfrom(MAX_DATAGRAM_SIZE)
+            except socket.error as exp:
+                if exp.errno in [errno.EAGAIN, errno.EWOULDBLOCK]: return
+                raise
+            reply = lambda line, address = address: self.__udp_socket.sendto(line+'\n', address)
+            for line in datagram.splitlines():
+                self.__handle_frame(line, reply)
+
+    def __tcp_acceptable(self, fd, event_mask):
+        try:
+            connection, address = self.__tcp_socket.accept()
+        except socket.error as exp:
+            if exp.errno in [errno.EAGAIN, errno.EWOULDBLOCK]: return
+            raise
+        if len(self.__connections) >= self.__max_connections:
+            logger.warning('too many connections - reject %s', address)
+            connection.close()
+            return
+        connection.setblocking(0)
+        self.__connections[connection.fileno()] = [connection, '']
+        REACTOR.register(connection.fileno(), self.__tcp_readable)
+        logger.debug('new connection from %s', address)
+
+    def __tcp_readable(self, fd, event_mask):
+        connection, buffer = self.__connections[fd]
+        try:
+            data = connection.recv(RECV_SIZE)
+        except socket.error as exp:
+            if exp.errno in [errno.EAGAIN, errno.EWOULDBLOCK]: return
+            logger.warning('connection error: %s', exp)
+            data = ''
+        if not data:
+            self.__close_connection(fd)
+            return
+
+        lines = (buffer + data).split('\n')
+        self.__connections[fd][1] = lines.pop()
+        reply = lambda line: self.__send(fd, line)
+        for line in lines:
+            self.__handle_frame(line, reply)
+        if len(self.__connections.get(fd, [None, ''])[1]) > MAX_LINE_LENGTH:
+            logger.warning('line too long - close connection')
+            self.__close_connection(fd)
+
+    def __send(self, fd, line):
+        if fd not in self.__connections: return
+        try:
+            self.__connections[fd][0].sendall(line+'\n')
+        except socket.error as exp:
+            # the client doesn't read its answers - it doesn't get more
+            logger.warning('could not answer: %s', exp)
+            self.__close_connection(fd)
+
+    def __close_connection(self, fd):
+        if fd not in self.__connections: return
+        connection = self.__connections.pop(fd)[0]
+        REACTOR.unregister(fd)
+        connection.close()
+
+    def __handle_frame(self, line, reply):
+        line = line.strip()
+        if line == '': return
+        self.__statistic['frames'] += 1
+        try:
+            if self.__hmac_key: line = self.__verify(line)
+            for command in line.split(COMMAND_SEPARATOR):
+                answer = self.__handle_command(command.split())
+                if answer is not None: reply(answer)
+        except FrameError as exp:
+            self.__statistic['rejected'] += 1
+            logger.info('reject frame: %s', exp)
+            reply('error %s' % exp)
+
+    def __verify(self, line):
+        try:
+            signature, payload = line.split(' ', 1)
+            timestamp, frame = payload.split(' ', 1)
+            timestamp = float(timestamp)
+        except ValueError:
+            raise FrameError('frame not signed')
+        expected = hmac.new(self.__hmac_key, payload, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            raise FrameError('wrong signature')
+        now = time.time()
+        if abs(now - timestamp) > self.__hmac_max_age:
+            raise FrameError('frame too old')
+        while self.__seen_expiry and self.__seen_expiry[0][0] < now:
+            self.__seen_signatures.discard(heapq.heappop(self.__seen_expiry)[1])
+        if signature in self.__seen_signatures:
+            self.__statistic['replayed'] += 1
+            raise FrameError('frame replayed')
+        self.__seen_signatures.add(signature)
+        heapq.heappush(self.__seen_expiry, (timestamp + self.__hmac_max_age, signature))
+        return frame
+
+    def __handle_command(self, command):
+        if not command: return None
+        self.__statistic['commands'] += 1
+        action = command[0].lower()
+        pin = command[1] if len(command) > 1 else None
+
+        if action == 'out':
+            if pin is None:
+                return 'out ' + ' '.join('%s %d' % (output_pin, self._OutputStatus.get(output_pin, False))
+                                         for output_pin in self._OutputPins)
+            if pin not in self._OutputPins: raise FrameError('unknown output %s' % pin)
+            return 'out %s %d' % (pin, self._OutputStatus.get(pin, False))
+
+        if pin not in self._InputPinSet: raise FrameError('unknown input %s' % pin)
+        if action == 'in':
+            return 'in %s %d' % (pin, self.status_input(pin))
+        elif action == 'press':
+            if not self._press_accepted(pin): return None
+            self._set_input_status(pin, True)
+            self._fire_press(pin, __name__)
+        elif action in ['down', 'up']:
+            self._input_edge(pin, action == 'down')
+        else:
+            raise FrameError('unknown command %s' % action)
+        return None
+
+    def read_input(self, pin):
+        # inputs only change with the received edges and these are already in the cache
+        return self.input_status.get(str(pin), False)
+
+    def set_output(self, pin, value, log_output = True):
+        parsed_pin = doorpi.DoorPi().parse_string("!"+str(pin)+"!")
+        if parsed_pin != "!"+str(pin)+"!":
+            pin = parsed_pin
+
+        value = str(value).lower() in HIGH_LEVEL
+        log_output = str(log_output).lower() in HIGH_LEVEL
+
+        if pin not in self._OutputPins: return False
+        if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, value, log_output)
+
+        # the outputs are only kept here, the clients read them with "out"
+        self._OutputStatus[pin] = value
+        return True
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  Synthetic keyboard for load tests and benchmarks without hardware.
+#
+#  [keyboards]
+#  synthetic = synthetic
+#
+#  [synthetic_keyboard]
+#  rate = 20                  # inputs per second (0 = only replay_file or emit())
+#  distribution = poisson     # poisson or uniform (fixed interval)
+#  duration = 10              # seconds, 0 = until shutdown
+#  start_delay = 1            # seconds after the keyboard is loaded
+#  seed = 0                   # 0 = random
+#  mix = key:70,rfid:20,dtmf:10
+#  tags = 1234567,7654321     # tags for rfid (default: the InputPins)
+#  dtmf = #1#,#2#             # codes for dtmf (default: the keys of section DTMF)
+#  replay_file =              # trace with one input per line: <offset in seconds> <kind> <value>
+#
+#  [synthetic_InputPins]
+#  1 = sleep:0
+#  1234567 = out:Tueroeffner,1,0,3
+#
+#  key presses a random InputPin (OnKeyDown, OnKeyPressed, OnKeyUp), rfid reads a tag like
+#  the rdm6300 (OnFoundTag, OnFoundKnownTag / OnFoundUnknownTag and the key events of the
+#  tag or its group in the credential store) and dtmf fires OnDTMF and OnDTMF_[code] like
+#  the sipphones.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import random
+import threading
+import time
+
+from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+import doorpi
+
+KIND_KEY = 'key'
+KIND_RFID = 'rfid'
+KIND_DTMF = 'dtmf'
+KINDS = [KIND_KEY, KIND_RFID, KIND_DTMF]
+
+DISTRIBUTION_POISSON = 'poisson'
+DISTRIBUTION_UNIFORM = 'uniform'
+
+def parse_mix(mix):
+    weights = []
+    for entry in mix:
+        kind, weight = (entry.split(':', 1) + ['1'])[:2]
+        kind = kind.strip().lower()
+        if kind not in KINDS: raise ValueError('unknown kind %s in mix' % kind)
+        weights.append((kind, float(weight)))
+    return weights
+
+def load_trace(file_name):
+    # one input per line: <offset in seconds> <kind> <value>
+    trace = []
+    with open(file_name, 'r') as trace_file:
+        for line_number, line in enumerate(trace_file, 1):
+            line = line.strip()
+            if line == '' or line.startswith('#'): continue
+            try:
+                offset, kind, value = line.split(None, 2)
+                if kind not in KINDS: raise ValueError('unknown kind %s' % kind)
+                trace.append((float(offset), kind, value))
+            except ValueError as exp:
+                logger.warning('skip line %s of %s: %s', line_number, file_name, exp)
+    return sorted(trace)
+
+def get(**kwargs): return Synthetic(**kwargs)
+class Synthetic(KeyboardAbstractBaseClass):
+    name = 'Synthetic Keyboard'
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            return {
+                'emitted':      dict(self.__emitted),
+                'running':      self.__job is not None
+            }
+
+    def __init__(self, input_pins, output_pins, conf_pre, conf_post, keyboard_name, *args, **kwargs):
+        logger.debug("__init__(input_pins = %s, output_pins = %s)", input_pins, output_pins)
+        self.keyboard_name = keyboard_name
+        self._InputPins = map(str, input_pins)
+        self._InputPinSet = set(self._InputPins)
+        self._OutputPins = map(str, output_pins)
+        self._OutputStatus = {}
+
+        section_name = conf_pre+'keyboard'+conf_post
+        config = doorpi.DoorPi().config
+        self.__rate = config.get_float(section_name, 'rate', 0)
+        self.__distribution = config.get(section_name, 'distribution', DISTRIBUTION_POISSON).lower()
+        self.__duration = config.get_float(section_name, 'duration', 0)
+        start_delay = config.get_float(section_name, 'start_delay', 1)
+        self.__mix = parse_mix(config.get_list(section_name, 'mix', 'key') or ['key'])
+        self.__tags = [tag.strip() for tag in config.get_list(section_name, 'tags', '')] or list(self._InputPins)
+        self.__dtmf = [code.strip() for code in config.get_list(section_name, 'dtmf', '')] or \
+                      config.get_keys('DTMF', log = False)
+        replay_file = config.get_string_parsed(section_name, 'replay_file', '')
+
+        seed = config.get_int(section_name, 'seed', 0)
+        self.__random = random.Random(seed or None)
+
+        self.__lock = threading.Lock()
+        self.__listeners = []
+        self.__emitted = dict((kind, 0) for kind in KINDS)
+        self.__job = None
+        self._load_credential_store(section_name, __name__)
+        self._init_edge_filter(section_name)
+
+        for input_pin in self._InputPins:
+            self._set_input_status(input_pin, False)
+            self._register_EVENTS_for_pin(input_pin, __name__)
+
+        for event in ['OnFoundTag', 'OnFoundUnknownTag', 'OnFoundKnownTag', 'OnDTMF']:
+            doorpi.DoorPi().event_handler.register_event(event, __name__)
+        for code in self.__dtmf:
+            doorpi.DoorPi().event_handler.register_event('OnDTMF_'+code, __name__)
+
+        # use set_output to register status @ dict self.__OutputStatus
+        for output_pin in self._OutputPins:
+            self.set_output(output_pin, 0, False)
+
+        self.__start_time = time.time() + start_delay
+        if replay_file:
+            self.__trace = load_trace(replay_file)
+            logger.info('replay %s inputs from %s', len(self.__trace), replay_file)
+            if self.__trace: self.__schedule(self.__start_time + self.__trace[0][0], self.__replay, 0)
+        elif self.__rate > 0:
+            self.__schedule(self.__start_time, self.__generate, self.__start_time)
+
+        self.register_destroy_action()
+
+    def destroy(self):
+        if self.is_destroyed: return
+        logger.debug("destroy")
+        with self.__lock:
+            if self.__job: self.__job.cancel()
+            self.__job = None
+        logger.debug("statistic: %s", self.statistic)
+        doorpi.DoorPi().event_handler.unregister_source(__name__, True)
+        self.__destroyed = True
+
+    def add_emit_listener(self, callback):
+        # callback(kind, value, measured_event, emit_time) is called before the events are fired
+        self.__listeners.append(callback)
+
+    def __schedule(self, when, callback, *args):
+        with self.__lock:
+            self.__job = doorpi.DoorPi().scheduler.call_at(when, callback, *args)
+
+    def __next_interval(self):
+        if self.__distribution == DISTRIBUTION_UNIFORM: return 1.0 / self.__rate
+        return self.__random.expovariate(self.__rate)
+
+    def __generate(self, deadline):
+        kind = self.__choose_kind()
+        if kind == KIND_KEY and self._InputPins: self.emit(KIND_KEY, self.__random.choice(self._InputPins))
+        elif kind == KIND_RFID and self.__tags: self.emit(KIND_RFID, self.__random.choice(self.__tags))
+        elif kind == KIND_DTMF and self.__dtmf: self.emit(KIND_DTMF, self.__random.choice(self.__dtmf))
+
+        # relative to the last deadline, so the rate doesn't drift with the time of emit()
+        deadline += self.__next_interval()
+        if self.__duration and deadline > self.__start_time + self.__duration:
+            logger.info('synthetic input finished: %s', self.statistic['emitted'])
+            with self.__lock: self.__job = None
+            return
+        self.__schedule(deadline, self.__generate, deadline)
+
+    def __replay(self, position):
+        offset, kind, value = self.__trace[position]
+        self.emit(kind, value)
+        if position + 1 >= len(self.__trace):
+            logger.info('replay finished: %s', self.statistic['emitted'])
+            with self.__lock: self.__job = None
+            return
+        self.__schedule(self.__start_time + self.__trace[position + 1][0], self.__replay, position + 1)
+
+    def __choose_kind(self):
+        choice = self.__random.uniform(0, sum(weight for kind, weight in self.__mix))
+        for kind, weight in self.__mix:
+            choice -= weight
+            if choice <= 0: return kind
+        return self.__mix[-1][0]
+
+    def emit(self, kind, value):
+        if kind == KIND_KEY: measured_event = 'OnKeyPressed_'+self.keyboard_name+'.'+str(value)
+        elif kind == KIND_RFID: measured_event = self.__tag_pin(value)
+        elif kind == KIND_DTMF: measured_event = 'OnDTMF_'+str(value)
+        else: raise ValueError('unknown kind %s' % kind)
+
+        with self.__lock: self.__emitted[kind] += 1
+        emit_time = time.time()
+        for listener in self.__listeners: listener(kind, value, measured_event, emit_time)
+
+        if kind == KIND_KEY: self.__press(value)
+        elif kind == KIND_RFID: self.__read_tag(value)
+        else: self.__dtmf_code(value)
+        return measured_event
+
+    def replay_edge(self, event_name, pin):
+        # edge of a recorded input trace (doorpi_cli replay) - pins unknown to the config fire too
+        if pin not in self._InputPinSet:
+            self._InputPins.append(pin)
+            self._InputPinSet.add(pin)
+            self._register_EVENTS_for_pin(pin, __name__)
+        if event_name == 'OnKeyDown': self._set_input_status(pin, True)
+        elif event_name == 'OnKeyUp': self._set_input_status(pin, False)
+        self._fire_EVENT(event_name, pin, __name__)
+
+    def __tag_pin(self, tag):
+        if str(tag) in self._InputPinSet: return 'OnKeyPressed_'+self.keyboard_name+'.'+str(tag)
+        group = self._credential_store.lookup(tag) if self._credential_store else None
+        if group is not None: return 'OnKeyPressed_'+self.keyboard_name+'.'+group
+        return 'OnFoundUnknownTag'
+
+    def __press(self, pin):
+        if pin not in self._InputPinSet:
+            logger.warning('unknown input pin %s', pin)
+            return
+        if not self._press_accepted(pin): return
+        self._set_input_status(pin, True)
+        self._fire_OnKeyDown(pin, __name__)
+        self._fire_OnKeyPressed(pin, __name__)
+        self._set_input_status(pin, False)
+        self._fire_OnKeyUp(pin, __name__)
+
+    def __read_tag(self, tag):
+        if not self._press_accepted(tag): return
+        doorpi.DoorPi().event_handler('OnFoundTag', __name__)
+        self._set_last_input(tag)
+        if tag in self._InputPinSet:
+            pin = tag
+        else:
+            pin = self._credential_pin(tag, __name__)
+        if pin is not None:
+            self._fire_OnKeyDown(pin, __name__)
+            self._fire_OnKeyPressed(pin, __name__)
+            self._fire_OnKeyUp(pin, __name__)
+            doorpi.DoorPi().event_handler('OnFoundKnownTag', __name__)
+        else:
+            doorpi.DoorPi().event_handler('OnFoundUnknownTag', __name__)
+
+    def __dtmf_code(self, code):
+        doorpi.DoorPi().event_handler('OnDTMF', __name__, {'digits': code})
+        doorpi.DoorPi().event_handler('OnDTMF_'+code, __name__, {
+            'remote_uri': 'synthetic',
+            'DTMF': code
+        })
+
+    def read_input(self, pin):
+        # the inputs only change with emit() and these are already in the cache
+        return self.input_status.get(str(pin), False)
+
+    def set_output(self, pin, value, log_output = True):
+        parsed_pin = doorpi.DoorPi().parse_string("!"+str(pin)+"!")
+        if parsed_pin != "!"+str(pin)+"!":
+            pin = parsed_pin
+
+        value = str(value).lower() in HIGH_LEVEL
+        log_output = str(log_output).lower() in HIGH_LEVEL
+
+        if pin not in self._OutputPins: return False
+        if log_output: logger.debug("out(pin = %s, value = %s, log_output = %s)", pin, value, log_output)
+
+        self._OutputStatus[pin] = value
+        return True
@@ -5,51 +5,58 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
-import threading
+import select
 import serial 
 import time
 from os import linesep as OS_LINESEP
 
 from doorpi.keyboard.AbstractBaseClass import KeyboardAbstractBaseClass, HIGH_LEVEL, LOW_LEVEL
+from doorpi.keyboard.serial_lib.FrameDecoder import read_available
+from doorpi.keyboard.IOReactor import REACTOR
+from doorpi.action.matcher import SequenceMatcher
 import doorpi
 
 CONFIG = doorpi.DoorPi().config
 
+# value of the input stop flag in the matcher (can't be mixed up with an input pin)
+INPUT_STOP_FLAG = object()
+
 def get(**kwargs): return UsbPlain(**kwargs)
 class UsbPlain(KeyboardAbstractBaseClass):
     name = 'UsbPlain Keyboard'
 
     @property
-    def last_received_chars(self): return self._last_received_chars
+    def last_received_chars(self): return self._matcher.history
 
     _ser = None
 
-    def read_usb_plain(self):
-
-        self._last_received_chars = ""
-        while not self._shutdown and self._ser.isOpen():
-            # char aus buffer holen
-            newChar = self._ser.read()
-            if newChar == "": continue
-
-            self._last_received_chars += str(newChar)
-            logger.debug("new char %s read and is now %s", newChar, self._last_received_chars)
-
-            for input_pin in self._InputPins:
-                if self._last_received_chars.endswith(input_pin):
-                    self.last_key = input_pin
-                    self._fire_OnKeyDown(input_pin, __name__)
-                    self._fire_OnKeyPressed(input_pin, __name__)
-                    self._fire_OnKeyUp(input_pin, __name__)
-
-            if self._last_received_chars.endswith(self._input_stop_flag):
-                logger.debug("found input stop flag -> clear received chars")
-                self._last_received_chars = ""
-            if len(self._last_received_chars) > self._input_max_size:
-                logger.debug("received chars bigger then input max size -> clear received chars")
-                self._last_received_chars = ""
-
-        return
+    def read_usb_plain(self, fd, event_mask):
+        if event_mask & (select.EPOLLERR | select.EPOLLHUP):
+            logger.error("serial usb plain reports error or hangup - stop reading")
+            REACTOR.unregister(fd)
+            return
+
+        # alle wartenden Zeichen auf einmal aus dem buffer holen
+        for newChar in read_available(self._ser):
+            self._received_chars += 1
+            matches = self._matcher.feed(str(newChar))
+
+            for input_pin in matches:
+                if input_pin is INPUT_STOP_FLAG or not self._press_accepted(input_pin): continue
+                self.last_key = input_pin
+                self._set_last_input(input_pin)
+                self._fire_OnKeyDown(input_pin, __name__)
+                self._fire_OnKeyPressed(input_pin, __name__)
+                self._fire_OnKeyUp(input_pin, __name__)
+
+            if INPUT_STOP_FLAG in matches:
+                logger.trace("found input stop flag -> clear received chars")
+                self._matcher.reset()
+                self._received_chars = 0
+            if self._received_chars > self._input_max_size:
+                logger.trace("received chars bigger then input max size -> clear received chars")
+                self._matcher.reset()
+                self._received_chars = 0
 
     def __init__(self, input_pins, output_pins, conf_pre, conf_post, keyboard_name, *args, **kwargs):
         logger.debug("FileSystem.__init__(input_pins = %s, output_pins = %s)", input_pins, output_pins)
@@ -57,7 +64,6 @@ class UsbPlain(KeyboardAbstractBaseClass):
         self._InputPins = map(str, input_pins)
         self._OutputPins = map(str, output_pins)
 
-        self._last_received_chars = ""
         self.last_key = ""
 
         for input_pin in self._InputPins:
@@ -76,10 +82,15 @@ class UsbPlain(KeyboardAbstractBaseClass):
         self._input_stop_flag = CONFIG.get(section_name, 'input_stop_flag', OS_LINESEP)
         self._input_max_size = CONFIG.get_int(section_name, 'input_max_size', 255)
         self._output_stop_flag = CONFIG.get(section_name, 'output_stop_flag', OS_LINESEP)
+        self._init_edge_filter(section_name)
+
+        codes = dict((input_pin, input_pin) for input_pin in self._InputPins)
+        codes[self._input_stop_flag] = INPUT_STOP_FLAG
+        self._matcher = SequenceMatcher(codes, self._input_max_size)
 
         self._ser = serial.Serial(port, baudrate)
 
-        self._ser.timeout = 1             #block read, 0 for #non-block read, > 0 for timeout block read
+        self._ser.timeout = 0             #block read, 0 for #non-block read, > 0 for timeout block read
         self._ser.close()
         #self._ser.bytesize = serial.EIGHTBITS       #number of bits per bytes
         #self._ser.parity = serial.PARITY_NONE       #set parity check: no parity
@@ -91,28 +102,24 @@ class UsbPlain(KeyboardAbstractBaseClass):
 
         self._ser.open()
 
-        self._shutdown = False
-        self._thread = threading.Thread(target = self.read_usb_plain)
-        self._thread.daemon = True
-        self._thread.start()
+        self._received_chars = 0
+        REACTOR.register(self._ser.fileno(), self.read_usb_plain)
 
         doorpi.DoorPi().event_handler.register_action('OnShutdown', self.destroy)
 
     def destroy(self):
         if self.is_destroyed: return
         logger.debug("destroy")
-        self._shutdown = True
-        if self._ser and self._ser.isOpen(): self._ser.close()
+        if self._ser and self._ser.isOpen():
+            REACTOR.unregister(self._ser.fileno())
+            self._ser.close()
         doorpi.DoorPi().event_handler.unregister_source(__name__, True)
         self.__destroyed = True
         return
 
-    def status_input(self, input_pin):
-        logger.debug("status_input for tag %s", tag)
-        if input_pin == self.last_key:
-            return True
-        else:
-            return False
+    def read_input(self, input_pin):
+        # only the last received input is pressed and this is already in the cache
+        return self.input_status.get(str(input_pin), False)
 
     def set_output(self, pin, value, log_output = True):
         if self._ser and self._ser.isOpen():
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+# value of an ascii hex digit for every possible byte (-1 = no hex digit)
+HEX_VALUES = [-1] * 256
+for index, digit in enumerate('0123456789ABCDEF'):
+    HEX_VALUES[ord(digit)] = index
+    HEX_VALUES[ord(digit.lower())] = index
+
+def hex_byte(data, position):
+    return (HEX_VALUES[data[position]] << 4) + HEX_VALUES[data[position + 1]]
+
+def is_hex(data):
+    for byte in data:
+        if HEX_VALUES[byte] < 0: return False
+    return True
+
+def read_available(connection):
+    # read everything that is waiting - blocks (up to the timeout) only for the first byte
+    try:
+        waiting = connection.in_waiting
+    except AttributeError:
+        waiting = connection.inWaiting()
+    return connection.read(waiting or 1)
+
+class FrameDecoder(object):
+    """ streaming decoder for frames like <START_FLAG>payload<STOP_FLAG>
+
+    feed() accepts any chunk of bytes and returns the complete and valid payloads.
+    Bytes outside a frame, too long frames and frames with a wrong length or an
+    invalid checksum are dropped and the decoder resynchronises on the next
+    START_FLAG. Without START_FLAG every STOP_FLAG ends a frame.
+    """
+
+    @property
+    def statistic(self): return {
+        'frames':           self.frames,
+        'invalid_frames':   self.invalid_frames,
+        'dropped_bytes':    self.dropped_bytes
+    }
+
+    def __init__(self, stop_flag, start_flag = None, payload_length = None, max_length = 255, validator = None):
+        self.__stop_flag = bytearray(stop_flag)
+        self.__start_flag = bytearray(start_flag) if start_flag else None
+        self.__payload_length = payload_length
+        self.__max_length = max_length
+        self.__validator = validator
+        self.__buffer = bytearray()
+        self.__in_frame = self.__start_flag is None
+        self.frames = 0
+        self.invalid_frames = 0
+        self.dropped_bytes = 0
+
+    def reset(self):
+        self.dropped_bytes += len(self.__buffer)
+        del self.__buffer[:]
+        self.__in_frame = self.__start_flag is None
+
+    def feed(self, data):
+        payloads = []
+        self.__buffer.extend(data)
+        while self.__buffer:
+            if not self.__in_frame:
+                start = self.__buffer.find(self.__start_flag)
+                if start < 0:
+                    # keep a possible beginning of the start flag
+                    keep = min(len(self.__start_flag) - 1, len(self.__buffer))
+                    self.dropped_bytes += len(self.__buffer) - keep
+                    del self.__buffer[:len(self.__buffer) - keep]
+                    break
+                self.dropped_bytes += start
+                del self.__buffer[:start + len(self.__start_flag)]
+                self.__in_frame = True
+
+            stop = self.__buffer.find(self.__stop_flag)
+            if stop < 0:
+                if len(self.__buffer) > self.__max_length:
+                    logger.trace('frame longer than %s bytes - resynchronise', self.__max_length)
+                    self.invalid_frames += 1
+                    self.reset()
+                break
+
+            payload = self.__buffer[:stop]
+            del self.__buffer[:stop + len(self.__stop_flag)]
+            self.__in_frame = self.__start_flag is None
+            if self.__start_flag and self.__start_flag in payload:
+                # lost the stop flag of the last frame - only the last start flag counts
+                payload = payload[payload.rfind(self.__start_flag) + len(self.__start_flag):]
+            if self.__payload_length is not None and len(payload) != self.__payload_length \
+                    or self.__validator and not self.__validator(payload):
+                self.invalid_frames += 1
+                self.dropped_bytes += len(payload)
+                continue
+            self.frames += 1
+            payloads.append(bytes(payload))
+        return payloads
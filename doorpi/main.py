@@ -22,7 +22,7 @@ def add_trace_level():
     logging.addLevelName(TRACE_LEVEL, "TRACE")
     def trace(self, message, *args, **kws):
         # Yes, logger takes its '*args' as 'args'.
-        self._log(TRACE_LEVEL, message, args, **kws)
+        if self.isEnabledFor(TRACE_LEVEL): self._log(TRACE_LEVEL, message, args, **kws)
     logging.Logger.trace = trace
 
 
@@ -58,13 +58,19 @@ def parse_arguments(argv):
     arg_parser.add_argument('--debug', action="store_true")
     arg_parser.add_argument('--trace', action="store_true")
     arg_parser.add_argument('--test', action="store_true")
+    arg_parser.add_argument('--duration', type=float, default=10, help='bench: seconds of synthetic input')
+    arg_parser.add_argument('--rate', type=float, default=20, help='bench: synthetic inputs per second')
+    arg_parser.add_argument('--scenario', help='bench: component scenarios (comma separated or all) instead of the synthetic keyboard')
+    arg_parser.add_argument('--json', action="store_true", help='bench, replay: print the report as json')
+    arg_parser.add_argument('--tracefile', help='replay: input trace of [DoorPi] trace_file')
+    arg_parser.add_argument('--fast', action="store_true", help='replay: inputs one after another, not in real time')
     arg_parser.add_argument(
         '-c', '--configfile',
         help='configfile for DoorPi - https://github.com/motom001/DoorPi/wiki for more help',
         dest='configfile'
     )
     try:
-        if len(sys.argv) > 1 and sys.argv[1] in ['start', 'stop', 'restart', 'status']:
+        if len(sys.argv) > 1 and sys.argv[1] in ['start', 'stop', 'restart', 'status', 'bench', 'replay']:
             return arg_parser.parse_args(args=sys.argv[2:])
         else:
             return arg_parser.parse_args(args=sys.argv[1:])
@@ -157,12 +163,32 @@ def main_as_application(argv):
     return 0
 
 
+def main_as_benchmark(argv):
+    parsed_arguments = parse_arguments(argv)
+    # the report is the output - only warnings and errors of DoorPi itself
+    if log_level > logging.DEBUG: logging.getLogger().setLevel(logging.WARNING)
+
+    from benchmark import run_benchmark
+    return run_benchmark(parsed_arguments)
+
+def main_as_replay(argv):
+    parsed_arguments = parse_arguments(argv)
+    if log_level > logging.DEBUG: logging.getLogger().setLevel(logging.WARNING)
+
+    from benchmark import run_replay
+    return run_replay(parsed_arguments)
+
+
 def entry_point():
     init_logger(sys.argv)
 
     """Zero-argument entry point for use with setuptools/distribute."""
     if len(sys.argv) > 1 and sys.argv[1] in ['status']:
         raise SystemExit(get_status_from_doorpi(sys.argv))
+    elif len(sys.argv) > 1 and sys.argv[1] in ['bench']:
+        raise SystemExit(main_as_benchmark(sys.argv))
+    elif len(sys.argv) > 1 and sys.argv[1] in ['replay']:
+        raise SystemExit(main_as_replay(sys.argv))
     elif len(sys.argv) > 1 and sys.argv[1] in ['start', 'stop', 'restart', 'reload']:
         raise SystemExit(main_as_daemon(sys.argv))
     else:
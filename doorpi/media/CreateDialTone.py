@@ -1,32 +1,145 @@
 #!/usr/bin/python
-
+# -*- coding: utf-8 -*-
 
 # Stolen from this source - thx to FB36:
 # http://code.activestate.com/recipes/578168-sound-generator-using-wav-file/
+#
+# One period of the (mixed) frequencies of a tone is calculated and repeated, instead of
+# calculating every sample. A pattern is a cadence of one or more tones and pauses:
+#
+#   "400+450:0.4,0:0.2,400+450:0.4,0:2"  ->  frequencies (+ mixed, 0 = pause):seconds, ...
+#
+# or the name of a pattern in TONE_PATTERNS. The wav files are cached by their parameters.
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import math
+import wave
+import array
+import shutil
+import hashlib
+import tempfile
+
+SAMPLE_RATE = 44100
+SAMPLE_WIDTH = 2        # 2 bytes because of using signed short integers => bit depth = 16
+CHANNELS = 1
+
+TONE_PATTERNS = {
+    'dialtone':         '440:1.5,0:1.5',                        # DoorPi default
+    'ringback_de':      '425:1,0:4',
+    'ringback_at':      '420:1,0:5',
+    'ringback_ch':      '425:1,0:4',
+    'ringback_fr':      '440:1.5,0:3.5',
+    'ringback_uk':      '400+450:0.4,0:0.2,400+450:0.4,0:2',
+    'ringback_us':      '440+480:2,0:4',
+    'busy_de':          '425:0.48,0:0.48',
+    'busy_uk':          '400:0.375,0:0.375',
+    'busy_us':          '480+620:0.5,0:0.5',
+    'confirm':          '1000:0.1,0:0.1,1000:0.1,0:0.7',
+    'beep':             '1000:0.2,0:0.8'
+}
+
+def gcd(a, b):
+    while b: a, b = b, a % b
+    return a
+
+def parse_pattern(pattern):
+    # returns [(frequencies, seconds), ...] - frequencies () is a pause
+    pattern = TONE_PATTERNS.get(pattern, pattern)
+    cadence = []
+    for segment in pattern.split(','):
+        if not segment.strip(): continue
+        frequencies, _, seconds = segment.partition(':')
+        frequencies = tuple(sorted(int(frequency) for frequency in frequencies.split('+') if int(frequency) > 0))
+        cadence.append((frequencies, float(seconds)))
+    if not cadence: raise ValueError('empty tone pattern "%s"' % pattern)
+    return cadence
+
+def period_samples(frequencies, sample_rate = SAMPLE_RATE):
+    # smallest number of samples after which all frequencies start again at the same phase -
+    # at most one second for integer frequencies
+    samples = 1
+    for frequency in frequencies:
+        frequency_samples = sample_rate / gcd(sample_rate, frequency)
+        samples = samples * frequency_samples / gcd(samples, frequency_samples)
+    return samples
 
-def generate_dial_tone(filename = 'dialtone.wav', volume = 50):
-    # generate wav file containing sine waves
-    # FB36 - 20120617
-    import math, wave, array
-    duration = 3 # seconds
-    freq = 440 # of cycles per second (Hz) (frequency of the sine waves)
-    data = array.array('h') # signed short integer (-32768 to 32767) data
-    sampleRate = 44100 # of samples per second (standard)
-    #sampleRate = 2048 # of samples per second (standard)
-    numChan = 1 # of channels (1: mono, 2: stereo)
-    dataSize = 2 # 2 bytes because of using signed short integers => bit depth = 16
-    numSamplesPerCyc = int(sampleRate / freq)
-    numSamples = sampleRate * duration
-    for i in range(numSamples / 2):
-        sample = 32767 * float(volume) / 100
-        sample *= math.sin(math.pi * 2 * (i % numSamplesPerCyc) / numSamplesPerCyc)
-        data.append(int(sample))
-    for i in range(numSamples / 2):
-        sample = 0
-        data.append(int(sample))
-    f = wave.open(filename, 'w')
-    f.setparams((numChan, dataSize, sampleRate, numSamples, "NONE", "Uncompressed"))
+def one_period(frequencies, volume, sample_rate = SAMPLE_RATE):
+    samples = period_samples(frequencies, sample_rate)
+    # mixed frequencies share the amplitude, so the sum doesn't clip
+    amplitude = 32767 * float(volume) / 100 / len(frequencies)
+    steps = [math.pi * 2 * frequency / sample_rate for frequency in frequencies]
+    return array.array('h', [
+        int(amplitude * sum(math.sin(step * i) for step in steps)) for i in range(samples)
+    ])
+
+def render_pattern(pattern, volume = 50, sample_rate = SAMPLE_RATE):
+    periods = {}
+    data = array.array('h')
+    for frequencies, seconds in parse_pattern(pattern):
+        samples = int(round(seconds * sample_rate))
+        if not frequencies:
+            data.extend(array.array('h', [0]) * samples)
+            continue
+        if frequencies not in periods: periods[frequencies] = one_period(frequencies, volume, sample_rate)
+        period = periods[frequencies]
+        data.extend(period * (samples / len(period)))
+        data.extend(period[:samples % len(period)])
+    return data
+
+def cache_key(pattern, volume, sample_rate = SAMPLE_RATE):
+    cadence = ','.join('%s:%s' % ('+'.join(str(f) for f in frequencies) or '0', seconds)
+                       for frequencies, seconds in parse_pattern(pattern))
+    return hashlib.sha1('%s|%s|%s' % (cadence, volume, sample_rate)).hexdigest()[:16]
+
+def temp_filename_for(filename):
+    # written to a temp file first and renamed, so a player never sees half a file
+    handle, temp_filename = tempfile.mkstemp(suffix = '.wav', dir = os.path.dirname(filename) or '.')
+    os.close(handle)
+    os.chmod(temp_filename, 0o644)
+    return temp_filename
+
+def write_wav(filename, data, sample_rate = SAMPLE_RATE):
+    temp_filename = temp_filename_for(filename)
+    f = wave.open(temp_filename, 'w')
+    f.setparams((CHANNELS, SAMPLE_WIDTH, sample_rate, len(data), "NONE", "Uncompressed"))
     f.writeframes(data.tostring())
     f.close()
+    os.rename(temp_filename, filename)
+
+def copy_wav(source, filename):
+    temp_filename = temp_filename_for(filename)
+    shutil.copyfile(source, temp_filename)
+    os.rename(temp_filename, filename)
+
+def generate_tone(filename, pattern = 'dialtone', volume = 50, cache_dir = None, sample_rate = SAMPLE_RATE):
+    # cache_dir keeps every generated pattern - the same parameters are only copied
+    try:
+        parse_pattern(pattern)
+    except ValueError as exp:
+        logger.error('wrong tone pattern "%s" (%s) - use dialtone', pattern, exp)
+        pattern = 'dialtone'
+    cached_filename = None
+    if cache_dir:
+        cached_filename = os.path.join(cache_dir, 'tone_%s.wav' % cache_key(pattern, volume, sample_rate))
+        if os.path.isfile(cached_filename):
+            logger.debug('use cached tone %s for %s', cached_filename, filename)
+            if os.path.abspath(cached_filename) != os.path.abspath(filename): copy_wav(cached_filename, filename)
+            return filename
+
+    data = render_pattern(pattern, volume, sample_rate)
+    write_wav(filename, data, sample_rate)
+    logger.debug('generated tone %s (%s, volume %s, %s samples)', filename, pattern, volume, len(data))
+    if cached_filename:
+        try:
+            if not os.path.exists(cache_dir): os.makedirs(cache_dir)
+            copy_wav(filename, cached_filename)
+        except (IOError, OSError) as exp:
+            logger.warning('could not cache tone %s: %s', cached_filename, exp)
+    return filename
 
-    return filename
\ No newline at end of file
+def generate_dial_tone(filename = 'dialtone.wav', volume = 50, pattern = 'dialtone', cache_dir = None):
+    return generate_tone(filename, pattern, volume, cache_dir)
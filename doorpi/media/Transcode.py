@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Compression of recorded wav files with the codecs of the standard library (audioop):
+#
+#   pcm     16 bit mono PCM, downsampled to sample_rate (playable by every browser)
+#   adpcm   IMA ADPCM (4 bit) wav - a quarter of pcm, but not playable by all browsers
+#
+# The functions run in the worker processes of the recording pipeline - so they don't log.
+
+import os
+import wave
+import struct
+import audioop
+
+FORMAT_PCM = 'pcm'
+FORMAT_ADPCM = 'adpcm'
+FORMATS = [FORMAT_PCM, FORMAT_ADPCM]
+
+WAVE_FORMAT_IMA_ADPCM = 0x0011
+ADPCM_BLOCK_ALIGN = 256
+# the first sample of a block is stored in the header, the others need 4 bit each
+ADPCM_SAMPLES_PER_BLOCK = (ADPCM_BLOCK_ALIGN - 4) * 2 + 1
+
+# audioop stores the first sample in the high nibble, IMA ADPCM wav in the low nibble
+NIBBLE_SWAP = ''.join(chr(((byte & 0x0f) << 4) | (byte >> 4)) for byte in range(256))
+
+# frames read at once
+CHUNK_FRAMES = 16384
+
+class AdpcmWaveWriter(object):
+    """ writes mono 16 bit samples as IMA ADPCM wav (WAVE_FORMAT_IMA_ADPCM) """
+
+    @property
+    def frames(self): return self.__frames
+
+    def __init__(self, filename, sample_rate):
+        self.__file = open(filename, 'wb')
+        self.__sample_rate = sample_rate
+        self.__buffer = ''
+        self.__index = 0
+        self.__frames = 0
+        self.__data_size = 0
+        self.__write_header()
+
+    def __write_header(self):
+        average_bytes = self.__sample_rate * ADPCM_BLOCK_ALIGN // ADPCM_SAMPLES_PER_BLOCK
+        fmt = struct.pack('<HHIIHHHH', WAVE_FORMAT_IMA_ADPCM, 1, self.__sample_rate, average_bytes,
+                          ADPCM_BLOCK_ALIGN, 4, 2, ADPCM_SAMPLES_PER_BLOCK)
+        self.__file.seek(0)
+        self.__file.write(struct.pack('<4sI4s', 'RIFF', 4 + 8 + len(fmt) + 8 + 4 + 8 + self.__data_size, 'WAVE'))
+        self.__file.write(struct.pack('<4sI', 'fmt ', len(fmt)) + fmt)
+        self.__file.write(struct.pack('<4sII', 'fact', 4, self.__frames))
+        self.__file.write(struct.pack('<4sI', 'data', self.__data_size))
+
+    def __write_block(self, samples):
+        # samples: 16 bit pcm of one block - the decoder starts with the sample and index of the header
+        first = struct.unpack('<h', samples[:2])[0]
+        header = struct.pack('<hBB', first, self.__index, 0)
+        data, (_, self.__index) = audioop.lin2adpcm(samples[2:], 2, (first, self.__index))
+        self.__file.write(header + data.translate(NIBBLE_SWAP))
+        self.__data_size += ADPCM_BLOCK_ALIGN
+
+    def writeframes(self, samples):
+        self.__buffer += samples
+        self.__frames += len(samples) // 2
+        block_bytes = ADPCM_SAMPLES_PER_BLOCK * 2
+        offset = 0
+        while len(self.__buffer) - offset >= block_bytes:
+            self.__write_block(self.__buffer[offset:offset + block_bytes])
+            offset += block_bytes
+        self.__buffer = self.__buffer[offset:]
+
+    def close(self):
+        # the last block is filled with silence - the fact chunk has the real number of samples
+        if self.__buffer:
+            self.__write_block(self.__buffer + '\x00' * (ADPCM_SAMPLES_PER_BLOCK * 2 - len(self.__buffer)))
+            self.__buffer = ''
+        self.__write_header()
+        self.__file.close()
+
+class PcmWaveWriter(object):
+
+    @property
+    def frames(self): return self.__frames
+
+    def __init__(self, filename, sample_rate):
+        self.__wave = wave.open(filename, 'wb')
+        self.__wave.setparams((1, 2, sample_rate, 0, 'NONE', 'not compressed'))
+        self.__frames = 0
+
+    def writeframes(self, samples):
+        self.__wave.writeframes(samples)
+        self.__frames += len(samples) // 2
+
+    def close(self):
+        self.__wave.close()
+
+def transcode(source, target, audio_format = FORMAT_PCM, sample_rate = 8000):
+    # source wav (any PCM) -> target as mono 16 bit with sample_rate in audio_format
+    # returns dict with duration, size and the formats of source and target
+    reader = wave.open(source, 'rb')
+    try:
+        channels, width, rate, frames = reader.getnchannels(), reader.getsampwidth(), \
+                                        reader.getframerate(), reader.getnframes()
+        sample_rate = min(sample_rate, rate) if sample_rate else rate
+        writer = (AdpcmWaveWriter if audio_format == FORMAT_ADPCM else PcmWaveWriter)(target, sample_rate)
+        try:
+            state = None
+            while True:
+                samples = reader.readframes(CHUNK_FRAMES)
+                if not samples: break
+                # 8 bit wav is unsigned
+                if width == 1: samples = audioop.bias(samples, 1, -128)
+                if channels == 2: samples = audioop.tomono(samples, width, 0.5, 0.5)
+                if width != 2: samples = audioop.lin2lin(samples, width, 2)
+                if rate != sample_rate:
+                    samples, state = audioop.ratecv(samples, 2, 1, rate, sample_rate, state)
+                writer.writeframes(samples)
+        finally:
+            writer.close()
+        return {
+            'duration':         round(float(frames) / rate, 2) if rate else 0,
+            'source_size':      os.path.getsize(source),
+            'size':             os.path.getsize(target),
+            'source_format':    '%s Hz, %s bit, %s channels' % (rate, width * 8, channels),
+            'format':           '%s %s Hz' % (audio_format, sample_rate)
+        }
+    finally:
+        reader.close()
+
+def is_transcoded(source, audio_format = FORMAT_PCM, sample_rate = 8000):
+    # an IMA ADPCM wav can't be opened by wave - so only pcm files are checked
+    try:
+        reader = wave.open(source, 'rb')
+    except (wave.Error, EOFError):
+        return audio_format == FORMAT_ADPCM and read_format_tag(source) == WAVE_FORMAT_IMA_ADPCM
+    try:
+        return audio_format == FORMAT_PCM and reader.getnchannels() == 1 and reader.getsampwidth() == 2 \
+               and reader.getframerate() <= sample_rate
+    finally:
+        reader.close()
+
+def read_format_tag(filename):
+    with open(filename, 'rb') as wav_file:
+        header = wav_file.read(22)
+    if len(header) < 22 or header[:4] != 'RIFF' or header[8:16] != 'WAVEfmt ': return None
+    return struct.unpack('<H', header[20:22])[0]
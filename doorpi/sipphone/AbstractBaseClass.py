@@ -5,12 +5,194 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
+import threading
+import itertools
+
+from doorpi import DoorPi
+from doorpi.sipphone.CallEventQueue import CallEventQueue
+from doorpi.sipphone.SipPump import SipPump
+from doorpi.sipphone.RingGroup import RingGroup, parse_targets
+from doorpi.sipphone.RegistrationMonitor import RegistrationMonitor
+from doorpi.sipphone.CallSetupTrace import CallSetupTracer
+from doorpi.sipphone.AdminNumbers import AdminNumberMatcher
+from doorpi.sipphone.RecordingPipeline import RecordingPipeline
+from doorpi.action.handler import current_correlation_id, set_correlation_id
+
 SIPPHONE_SECTION = 'SIP-Phone'
 
 class SipphoneAbstractBaseClass(object):
 
     def thread_register(self, name): pass
 
+    __call_events = None
+    @property
+    def call_events(self):
+        # created on first use - the subclasses don't call __init__ of this class
+        if self.__call_events is None:
+            self.__call_events = CallEventQueue(DoorPi().config.get_int(SIPPHONE_SECTION, 'call_event_workers', 4))
+        return self.__call_events
+
+    __pump = None
+    @property
+    def pump(self):
+        # created on first use like call_events - started by start() of the subclass
+        if self.__pump is None:
+            self.__pump = SipPump(
+                self,
+                DoorPi().config.get_int(SIPPHONE_SECTION, 'pump_interval_call', 20) / 1000.0,
+                DoorPi().config.get_int(SIPPHONE_SECTION, 'pump_interval_idle', 250) / 1000.0
+            )
+        return self.__pump
+
+    # True if the account of the sipphone registers at sipserver_server
+    @property
+    def registers(self): return bool(DoorPi().config.get(SIPPHONE_SECTION, 'sipserver_server', ''))
+
+    __registration = None
+    @property
+    def registration(self):
+        # created on first use like call_events - disabled if the sipphone doesn't register
+        if self.__registration is None:
+            conf = DoorPi().config
+            server = conf.get(SIPPHONE_SECTION, 'sipserver_server', '')
+            backups = [backup.strip() for backup in conf.get_list(SIPPHONE_SECTION, 'sipserver_backup', '')]
+            self.__registration = RegistrationMonitor(
+                self,
+                [server] + backups if server and self.registers else [],
+                probe_interval = conf.get_float(SIPPHONE_SECTION, 'registration_probe_interval', 30),
+                probe_timeout = conf.get_float(SIPPHONE_SECTION, 'registration_probe_timeout', 2),
+                probe_failures = conf.get_int(SIPPHONE_SECTION, 'registration_probe_failures', 2),
+                failback_probes = conf.get_int(SIPPHONE_SECTION, 'registration_failback_probes', 3),
+                queue_timeout = conf.get_float(SIPPHONE_SECTION, 'registration_queue_timeout', 30)
+            )
+        return self.__registration
+
+    # switch the registrar of the account - called in the pump thread by the RegistrationMonitor
+    def _use_registrar(self, registrar): pass
+
+    @property
+    def max_calls(self): return DoorPi().config.get_int(SIPPHONE_SECTION, 'ua.max_calls', 2)
+
+    __call_trace = None
+    @property
+    def call_trace(self):
+        if self.__call_trace is None: self.__call_trace = CallSetupTracer()
+        return self.__call_trace
+
+    def _call_with_trace(self, make_call, number):
+        # the call runs with the correlation id of its trace - also the SIP states within it
+        previous_correlation_id = current_correlation_id()
+        set_correlation_id(self.call_trace.call_started())
+        try:
+            return make_call(number)
+        finally:
+            set_correlation_id(previous_correlation_id)
+
+    __recordings = None
+    @property
+    def recordings(self):
+        # created on first use like call_events - started by start() of the subclass
+        if self.__recordings is None:
+            conf = DoorPi().config
+            self.__recordings = RecordingPipeline(
+                conf.get_string_parsed(SIPPHONE_SECTION, 'recordings_index', ''),
+                conf.get(SIPPHONE_SECTION, 'records', '!BASEPATH!/records/%Y-%m-%d_%H-%M-%S.wav'),
+                audio_format = conf.get(SIPPHONE_SECTION, 'recordings_format', 'pcm'),
+                sample_rate = conf.get_int(SIPPHONE_SECTION, 'recordings_sample_rate', 8000),
+                workers = conf.get_int(SIPPHONE_SECTION, 'recordings_workers', 1),
+                nice = conf.get_int(SIPPHONE_SECTION, 'recordings_nice', 10),
+                max_size = conf.get_int(SIPPHONE_SECTION, 'recordings_max_size', 500),
+                max_age = conf.get_int(SIPPHONE_SECTION, 'recordings_max_age', 0)
+            )
+        return self.__recordings
+
+    __admin_numbers = None
+    @property
+    def admin_numbers(self):
+        # compiled from [AdminNumbers] - compiled again after a change of the config
+        if self.__admin_numbers is None: self.__admin_numbers = AdminNumberMatcher()
+        return self.__admin_numbers
+
+    def is_admin_number(self, remote_uri):
+        is_admin = self.admin_numbers.match(remote_uri)
+        logger.debug("%s is %san adminnumber", remote_uri, '' if is_admin else 'not ')
+        return is_admin
+
+    __ring_group = None
+    @property
+    def ring_group(self): return self.__ring_group
+
+    def call_group(self, targets):
+        # targets: list of number|delay|timeout
+        if self.__ring_group is not None and not self.__ring_group.finished:
+            logger.debug('ring group is still ringing -> skip')
+            return self.__ring_group
+        if self.current_call:
+            logger.info('ring group not started - there is an active call')
+            return None
+        targets = parse_targets(targets, DoorPi().config.get_int(SIPPHONE_SECTION, 'call_timeout', 15))
+        if not targets: return None
+        self.__ring_group = RingGroup(self, targets, self.max_calls, self.call_trace.call_started()).start()
+        self.pump.wake()
+        return self.__ring_group
+
+    def ring_group_state(self, key, answered, reason = ''):
+        # called by the callbacks of the sipphone - True if the call belongs to the ring group
+        if self.__ring_group is None: return False
+        if answered: return self.__ring_group.answered(key)
+        return self.__ring_group.ended(key, reason)
+
+    def is_lost_ring_group_call(self, key):
+        # the end of this call is no end of the call for the actions (Recorder, Player)
+        if self.__ring_group is None: return False
+        return self.__ring_group.is_lost_call(key)
+
+    def _stop_ring_group(self):
+        if self.__ring_group is not None: self.__ring_group.stop()
+
+    # used by RingGroup: dial a number without touching the current call -> (key, handle)
+    def _ring_target(self, number): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
+    def _ring_cancel(self, handle): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
+    def _ring_connected(self, handle): pass
+
+    # one round of the SIP library - called by the pump thread
+    def iterate(self): pass
+    def self_check(self, *args, **kwargs): self.iterate()
+
+    __deadline_lock = threading.Lock()
+    __deadline_counter = itertools.count()
+    __call_deadlines = None
+
+    def _set_call_deadline(self, name, delay, check):
+        # check() runs in the pump thread (the scheduler thread, if the pump doesn't run) after
+        # delay seconds and returns None or the seconds until it should run again - replaces
+        # the deadline with this name
+        with self.__deadline_lock:
+            if self.__call_deadlines is None: self.__call_deadlines = {}
+            if name in self.__call_deadlines: self.__call_deadlines[name][1].cancel()
+            token = next(self.__deadline_counter)
+            self.__call_deadlines[name] = (token, DoorPi().scheduler.call_later(
+                max(0, delay), self.__call_deadline, name, token, check
+            ))
+
+    def _cancel_call_deadlines(self):
+        with self.__deadline_lock:
+            for token, job in (self.__call_deadlines or {}).values(): job.cancel()
+            self.__call_deadlines = {}
+
+    def __call_deadline(self, name, token, check):
+        # the checks hang up calls - the SIP library is only touched by the pump thread
+        if self.pump.is_running: self.pump.run_soon(self.__run_call_deadline, name, token, check)
+        else: self.__run_call_deadline(name, token, check)
+
+    def __run_call_deadline(self, name, token, check):
+        # a new call could have replaced the deadline until the pump got to it
+        with self.__deadline_lock:
+            if self.__call_deadlines.get(name, (None, None))[0] != token: return
+            del self.__call_deadlines[name]
+        delay = check()
+        if delay is not None: self._set_call_deadline(name, delay, check)
+
     @property
     def name(self): return 'SipphoneAbstractBaseClass'
 
@@ -39,7 +221,6 @@ class SipphoneAbstractBaseClass(object):
     def destroy(self): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
     def call(self, number): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
     def hangup(self): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
-    def is_admin_number(self, number): raise NotImplementedError("Subclass %s should implement this!"%self.__class__.__name__)
     def __del__(self): self.destroy()
 
 class RecorderAbstractBaseClass(object):
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [AdminNumbers]
+#  **621 = active                  # user of the SIP URI, any host
+#  **622@fritz.box = active        # user and host
+#  0170* = active                  # wildcards * and ? (a leading ** is part of the number)
+#  *@fritz.box = active            # every user of this host
+#  * = active                      # every caller is an admin (admin numbers deactivated)
+#
+#  The remote URI of a call can look like '"Name" <sip:**621@fritz.box:5060;transport=udp>'.
+#  Only the user (unquoted) and the host (without port) of it are compared - both without
+#  case, because the config stores the keys in lower case.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import re
+import threading
+import urllib
+
+from doorpi import DoorPi
+
+ADMIN_NUMBERS_SECTION = 'AdminNumbers'
+MATCH_ALL = '*'
+
+def parse_sip_uri(uri):
+    # returns (user, host) of a SIP URI with or without display name and brackets
+    uri = (uri or '').strip()
+    if '<' in uri: uri = uri.split('<', 1)[1].split('>', 1)[0]
+    scheme, separator, rest = uri.partition(':')
+    if not separator or scheme.lower() not in ['sip', 'sips', 'tel']: rest = uri
+    rest = re.split('[;?>]', rest, 1)[0].strip()
+    user, separator, host = rest.rpartition('@')
+    if not separator: user, host = host, ''
+    # host:port and [ipv6]:port
+    if host.startswith('['): host = host.split(']', 1)[0] + ']'
+    else: host = host.split(':', 1)[0]
+    return urllib.unquote(user).lower(), host.lower()
+
+def _split_internal_prefix(entry):
+    # ** at the start is the prefix of internal numbers (FritzBox), not a wildcard
+    prefix = ''
+    while entry.startswith('**'): prefix, entry = prefix + '**', entry[2:]
+    return prefix, entry
+
+def _is_pattern(entry):
+    entry = _split_internal_prefix(entry)[1]
+    return '*' in entry or '?' in entry
+
+def _pattern_to_regex(pattern):
+    prefix, pattern = _split_internal_prefix(pattern)
+    regex = [re.escape(prefix)]
+    for char in pattern:
+        if char == '*': regex.append('[^@]*')
+        elif char == '?': regex.append('[^@]')
+        else: regex.append(re.escape(char))
+    return ''.join(regex)
+
+class AdminNumberMatcher(object):
+    """ matches remote URIs against the [AdminNumbers] of the config
+
+    The entries are compiled into a set of users, a set of (user, host) and one regex for
+    all wildcard entries. They are compiled again, when the generation of the config changed.
+    """
+
+    @property
+    def statistic(self):
+        match_all, users, addresses, patterns, regex = self.__compile()
+        return {
+            'match_all':    match_all,
+            'users':        len(users),
+            'addresses':    len(addresses),
+            'patterns':     patterns,
+            'compiled':     self.__compiled
+        }
+
+    def __init__(self, section = ADMIN_NUMBERS_SECTION):
+        self.__section = section
+        self.__lock = threading.Lock()
+        # (id and generation of the config, compiled entries) - replaced as a whole
+        self.__cache = (None, None)
+        self.__compiled = 0
+
+    def __compile(self):
+        config = DoorPi().config
+        key = (id(config), config.generation)
+        cache = self.__cache
+        if cache[0] == key: return cache[1]
+        with self.__lock:
+            if self.__cache[0] == key: return self.__cache[1]
+            match_all, users, addresses, patterns = False, set(), set(), []
+            for entry in config.get_keys(self.__section, log = False):
+                entry = entry.strip()
+                if entry == MATCH_ALL:
+                    match_all = True
+                    continue
+                entry = entry.lower()
+                if entry.startswith('sip:'): entry = entry[4:]
+                user, separator, host = entry.rpartition('@')
+                if not separator: user, host = host, ''
+                if _is_pattern(user) or _is_pattern(host):
+                    patterns.append('%s@%s' % (_pattern_to_regex(user), _pattern_to_regex(host) if host else '[^@]*'))
+                elif host:
+                    addresses.add((user, host))
+                else:
+                    users.add(user)
+            regex = re.compile('^(?:%s)$' % '|'.join(patterns)) if patterns else None
+            entries = (match_all, frozenset(users), frozenset(addresses), len(patterns), regex)
+            self.__cache = (key, entries)
+            self.__compiled += 1
+            if match_all: logger.info("admin numbers are deactivated by using '*' as single number")
+            logger.debug('compiled %s admin numbers and %s patterns', len(users) + len(addresses), len(patterns))
+            return entries
+
+    def match(self, remote_uri):
+        match_all, users, addresses, patterns, regex = self.__compile()
+        if match_all: return True
+        user, host = parse_sip_uri(remote_uri)
+        if not user: return False
+        if user in users or (user, host) in addresses: return True
+        return regex is not None and regex.match('%s@%s' % (user, host)) is not None
+
+    __call__ = match
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+from collections import deque
+
+from doorpi import DoorPi
+from doorpi.action.handler import percentile, LANE_LATENCY_SAMPLES, LANE_WORKER_IDLE_TIMEOUT
+
+class CallEventQueue(object):
+    """ events of the sipphone callbacks - in order per call
+
+    put(call_id, event_name, event_source, kwargs) queues the event of a call. The events of
+    one call are fired one after another (fire_event_synchron) in the order of put(), the
+    events of different calls run in parallel on at most max_workers worker threads.
+    Idle workers stop after LANE_WORKER_IDLE_TIMEOUT seconds.
+    """
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            wait_times = sorted(self.__wait_times)
+            return {
+                'max_workers':  self.max_workers,
+                'workers':      self.__workers,
+                'calls':        len(self.__calls),
+                'queued':       sum(len(events) for events in self.__calls.values()),
+                'processed':    self.__processed,
+                'max_depth':    self.__max_depth,
+                'wait_time':    {
+                    'avg':  sum(wait_times) / len(wait_times) if wait_times else 0,
+                    'p50':  percentile(wait_times, 50),
+                    'p95':  percentile(wait_times, 95),
+                    'max':  self.__max_wait_time
+                }
+            }
+
+    def __init__(self, max_workers = 4):
+        self.max_workers = max(1, max_workers)
+        self.__condition = threading.Condition()
+        # call_id -> deque of waiting events, only calls with waiting or running events
+        self.__calls = {}
+        # calls with waiting events and without a running event - in the order they got ready
+        self.__ready = deque()
+        self.__workers = 0
+        self.__idle_workers = 0
+        self.__started_workers = 0
+        self.__processed = 0
+        self.__max_depth = 0
+        self.__wait_times = deque(maxlen = LANE_LATENCY_SAMPLES)
+        self.__max_wait_time = 0
+        self.__stopped = False
+
+    def put(self, call_id, event_name, event_source, kwargs = None):
+        # the events of a traced call carry the correlation id of its call setup trace
+        correlation_id = DoorPi().sipphone.call_trace.correlation_id(call_id)
+        if correlation_id: kwargs = dict(kwargs or {}, correlation_id = correlation_id)
+        with self.__condition:
+            self.__stopped = False
+            events = self.__calls.get(call_id)
+            if events is None:
+                events = self.__calls[call_id] = deque()
+                self.__ready.append(call_id)
+            events.append((time.time(), event_name, event_source, kwargs))
+            if len(events) > self.__max_depth: self.__max_depth = len(events)
+            if self.__idle_workers < len(self.__ready) and self.__workers < self.max_workers:
+                self.__start_worker()
+            else:
+                self.__condition.notify()
+
+    def stop(self):
+        # idle workers finish now instead of waiting for their timeout
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+
+    def __start_worker(self):
+        self.__workers += 1
+        self.__started_workers += 1
+        worker = threading.Thread(
+            target = self.__work,
+            name = "CallEventQueue worker %s" % self.__started_workers
+        )
+        worker.daemon = True
+        worker.start()
+
+    def __next_event(self):
+        with self.__condition:
+            self.__idle_workers += 1
+            idle_since = time.time()
+            while not self.__ready and not self.__stopped and \
+                    time.time() - idle_since < LANE_WORKER_IDLE_TIMEOUT:
+                self.__condition.wait(LANE_WORKER_IDLE_TIMEOUT - (time.time() - idle_since))
+            self.__idle_workers -= 1
+            if not self.__ready:
+                self.__workers -= 1
+                return None, None
+            # the call stays out of __ready while its event runs - so no other worker takes the next one
+            call_id = self.__ready.popleft()
+            return call_id, self.__calls[call_id].popleft()
+
+    def __done(self, call_id, wait_time):
+        with self.__condition:
+            self.__processed += 1
+            self.__wait_times.append(wait_time)
+            if wait_time > self.__max_wait_time: self.__max_wait_time = wait_time
+            if self.__calls[call_id]:
+                self.__ready.append(call_id)
+                self.__condition.notify()
+            else:
+                del self.__calls[call_id]
+
+    def __work(self):
+        while True:
+            call_id, event = self.__next_event()
+            if event is None: return
+            queued_time, event_name, event_source, kwargs = event
+            wait_time = time.time() - queued_time
+            try:
+                DoorPi().event_handler.fire_event_synchron(event_name, event_source, kwargs)
+            except:
+                logger.exception('error while firing %s of call %s', event_name, call_id)
+            finally:
+                self.__done(call_id, wait_time)
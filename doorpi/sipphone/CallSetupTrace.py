@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Call setup trace
+#  ----------------
+#
+#  Every OnKeyPressed gets a correlation_id that is carried in the kwargs of all following
+#  events (see doorpi/action/handler.py). When the key press leads to a call, the times of
+#  these phases are collected under this id:
+#
+#  key          OnKeyPressed*
+#  action       call() of the sipphone (action call or ringgroup)
+#  before_call  BeforeSipPhoneMakeCall
+#  invite       SIP OutgoingInit / CALLING
+#  ringing      SIP OutgoingRinging / EARLY
+#  connected    SIP Connected / CONFIRMED
+#  media        SIP StreamsRunning / media active
+#  player       OnPlayerStarted
+#  recorder     OnRecorderStarted
+#
+#  A trace is finished TRACE_FINISH_DELAY seconds after the media phase (so a late recorder
+#  still counts), at the end of the call or after TRACE_TIMEOUT seconds. Then the event
+#  OnCallSetupTrace with the durations of the segments is written to the event log and the
+#  percentiles of the segments are available in the status of the sipphone (call_trace):
+#
+#  doorpi_input    key -> action          DoorPi (event handling)
+#  doorpi_call     action -> invite       DoorPi (sipphone)
+#  pbx             invite -> ringing      SIP server
+#  callee          ringing -> connected   the called phone / person
+#  media           connected -> media
+#  total           key -> media
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+from collections import deque, OrderedDict
+
+from doorpi import DoorPi
+from doorpi.action.handler import percentile, current_correlation_id, new_correlation_id, LANE_LATENCY_SAMPLES
+
+PHASE_KEY = 'key'
+PHASE_ACTION = 'action'
+PHASE_BEFORE_CALL = 'before_call'
+PHASE_INVITE = 'invite'
+PHASE_RINGING = 'ringing'
+PHASE_CONNECTED = 'connected'
+PHASE_MEDIA = 'media'
+PHASE_PLAYER = 'player'
+PHASE_RECORDER = 'recorder'
+
+EVENT_PHASES = {
+    'BeforeSipPhoneMakeCall':   PHASE_BEFORE_CALL,
+    'OnPlayerStarted':          PHASE_PLAYER,
+    'OnRecorderStarted':        PHASE_RECORDER
+}
+
+SEGMENTS = [
+    ('doorpi_input',    PHASE_KEY,          PHASE_ACTION),
+    ('doorpi_call',     PHASE_ACTION,       PHASE_INVITE),
+    ('pbx',             PHASE_INVITE,       PHASE_RINGING),
+    ('callee',          PHASE_RINGING,      PHASE_CONNECTED),
+    ('media',           PHASE_CONNECTED,    PHASE_MEDIA),
+    ('total',           PHASE_KEY,          PHASE_MEDIA),
+    ('player',          PHASE_KEY,          PHASE_PLAYER),
+    ('recorder',        PHASE_KEY,          PHASE_RECORDER)
+]
+
+TRACE_FINISH_DELAY = 2
+TRACE_TIMEOUT = 120
+# key presses that could still lead to a call
+MAX_PENDING_KEYS = 100
+
+class CallSetupTracer(object):
+    """ collects the phases of call setups by correlation id
+
+    The sipphone reports call() with call_started(), the SIP states with sip_state(call_id,
+    phase) and call ends with call_ended(call_id). The other phases come from the events.
+    """
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            segments = {}
+            for name, durations in self.__durations.items():
+                durations = sorted(durations)
+                segments[name] = {
+                    'count':    len(durations),
+                    'avg':      sum(durations) / len(durations) if durations else 0,
+                    'p50':      percentile(durations, 50),
+                    'p95':      percentile(durations, 95),
+                    'max':      durations[-1] if durations else 0
+                }
+            return {
+                'in_progress':  len(self.__traces),
+                'completed':    self.__completed,
+                'failed':       self.__failed,
+                'segments':     segments
+            }
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__keys = OrderedDict()     # correlation_id -> time of the key press
+        self.__traces = {}              # correlation_id -> {phase: time}
+        self.__calls = {}               # call_id -> correlation_id
+        self.__jobs = {}                # correlation_id -> finish job
+        self.__durations = dict((name, deque(maxlen = LANE_LATENCY_SAMPLES)) for name, _, _ in SEGMENTS)
+        self.__completed = 0
+        self.__failed = 0
+        self.__started = False
+
+    def start(self):
+        if self.__started: return self
+        self.__started = True
+        DoorPi().event_handler.register_event('OnCallSetupTrace', __name__)
+        DoorPi().event_handler.add_listener(self.__event_fired)
+        return self
+
+    def __event_fired(self, event_name, event_source, kwargs, fire_time):
+        correlation_id = kwargs.get('correlation_id') if kwargs else None
+        if not correlation_id: return
+        with self.__lock:
+            if event_name.startswith('OnKeyPressed'):
+                if correlation_id not in self.__keys:
+                    self.__keys[correlation_id] = fire_time
+                    if len(self.__keys) > MAX_PENDING_KEYS: self.__keys.popitem(last = False)
+            elif event_name in EVENT_PHASES:
+                self.__phase(correlation_id, EVENT_PHASES[event_name], fire_time)
+
+    def __phase(self, correlation_id, phase, when):
+        # under lock - the first time of a phase counts
+        trace = self.__traces.get(correlation_id)
+        if trace is not None and phase not in trace: trace[phase] = when
+
+    def call_started(self):
+        # called by call() of the sipphone - a call without key press gets a new correlation id
+        now = time.time()
+        correlation_id = current_correlation_id() or new_correlation_id()
+        with self.__lock:
+            if correlation_id in self.__traces: return correlation_id
+            trace = self.__traces[correlation_id] = {PHASE_ACTION: now}
+            if correlation_id in self.__keys: trace[PHASE_KEY] = self.__keys.pop(correlation_id)
+            self.__jobs[correlation_id] = DoorPi().scheduler.call_later(TRACE_TIMEOUT, self.__finish, correlation_id)
+        return correlation_id
+
+    def correlation_id(self, call_id):
+        with self.__lock:
+            return self.__calls.get(call_id)
+
+    def sip_state(self, call_id, phase):
+        # the first state of a call comes within call() - so the call gets its correlation id
+        now = time.time()
+        with self.__lock:
+            correlation_id = self.__calls.get(call_id)
+            if correlation_id is None:
+                correlation_id = current_correlation_id()
+                if correlation_id not in self.__traces: return
+                self.__calls[call_id] = correlation_id
+            trace = self.__traces.get(correlation_id)
+            if trace is None or phase in trace: return
+            trace[phase] = now
+            if phase == PHASE_MEDIA:
+                self.__jobs[correlation_id].cancel()
+                self.__jobs[correlation_id] = DoorPi().scheduler.call_later(
+                    TRACE_FINISH_DELAY, self.__finish, correlation_id)
+
+    def call_ended(self, call_id):
+        with self.__lock:
+            correlation_id = self.__calls.pop(call_id, None)
+            trace = self.__traces.get(correlation_id)
+            # after the media phase the finish job is already waiting, a ring group has more calls
+            if trace is None or PHASE_MEDIA in trace or correlation_id in self.__calls.values(): return
+        self.__finish(correlation_id)
+
+    def __finish(self, correlation_id):
+        with self.__lock:
+            trace = self.__traces.pop(correlation_id, None)
+            if trace is None: return
+            job = self.__jobs.pop(correlation_id, None)
+            if job: job.cancel()
+            for call_id in [call_id for call_id, value in self.__calls.items() if value == correlation_id]:
+                del self.__calls[call_id]
+
+            durations = {}
+            for name, start_phase, end_phase in SEGMENTS:
+                # calls without key press (web, timer) are measured from call()
+                if start_phase == PHASE_KEY and PHASE_KEY not in trace:
+                    if end_phase == PHASE_ACTION: continue
+                    start_phase = PHASE_ACTION
+                if start_phase in trace and end_phase in trace:
+                    durations[name] = round(trace[end_phase] - trace[start_phase], 3)
+                    self.__durations[name].append(durations[name])
+            complete = PHASE_MEDIA in trace
+            if complete: self.__completed += 1
+            else: self.__failed += 1
+
+        logger.debug('[%s] call setup %s: %s', correlation_id, 'complete' if complete else 'incomplete', durations)
+        kwargs = dict(('%s_time' % name, duration) for name, duration in durations.items())
+        kwargs.update({
+            'correlation_id':   correlation_id,
+            'complete':         complete,
+            'phases':           ','.join(phase for phase, _ in sorted(trace.items(), key = lambda item: item[1]))
+        })
+        DoorPi().event_handler('OnCallSetupTrace', __name__, kwargs)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [SIP-Phone]
+#  records = !BASEPATH!/records/%Y-%m-%d_%H-%M-%S.wav
+#  recordings_index = !BASEPATH!/conf/recordings.db   # SQLite index - empty (default) = no post processing
+#  recordings_format = pcm                            # pcm or adpcm (see doorpi/media/Transcode.py)
+#  recordings_sample_rate = 8000
+#  recordings_workers = 1                             # worker processes
+#  recordings_nice = 10                               # priority of the worker processes
+#  recordings_max_size = 500                          # MB of all recordings - 0 = no limit
+#  recordings_max_age = 0                             # days - 0 = no limit
+#
+#  After OnRecorderStopped the recording is compressed in place (same file name) by a worker
+#  process and its metadata (start time, duration, size, remote URI, last key, correlation id)
+#  is stored in the index. The oldest recordings are deleted when the quota is exceeded.
+#  Recordings without index entry (older versions, crash) are found at the start - only files
+#  whose names match the records path (!...! and %x as placeholders). Files that are not in
+#  the index are never compressed or deleted.
+#
+#  Web: /recordings?offset=0&limit=50 lists the recordings (newest first),
+#       /recordings/file?id=<recording_id> returns the file.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import os
+import re
+import time
+import signal
+import sqlite3
+import threading
+import multiprocessing
+
+from doorpi import DoorPi
+from doorpi.media.Transcode import transcode, is_transcoded, FORMATS, FORMAT_PCM
+
+STATE_PENDING = 'pending'
+STATE_PROCESSED = 'processed'
+STATE_FAILED = 'failed'
+
+# the recorder may still write the end of the file after OnRecorderStopped
+RECORDING_SETTLE_DELAY = 2
+RECORDING_EXTENSION = '.wav'
+PART_EXTENSION = '.part'
+
+# strftime directives that are replaced by digits
+NUMERIC_DIRECTIVES = 'CdfGgHIjmMSsUuVwWyY'
+
+def _records_path(records):
+    return re.sub('(?i)!BASEPATH!', DoorPi().base_path.replace('\\', '\\\\'), records)
+
+def records_base_path(records):
+    # the fixed part of the records path: !BASEPATH!/records/!LastKey!/%Y.wav -> <basepath>/records
+    return os.path.dirname(re.split('[%!]', _records_path(records), 1)[0])
+
+def records_pattern(records):
+    # regex of the file names the recorder creates: !LastKey! -> one path segment, %Y -> digits
+    regex = []
+    for part in re.split('(![^!/]+!|%.)', _records_path(records)):
+        if len(part) > 2 and part.startswith('!') and part.endswith('!'): regex.append('[^/]*')
+        elif part == '%%': regex.append('%')
+        elif len(part) == 2 and part.startswith('%'):
+            regex.append('[0-9]+' if part[1] in NUMERIC_DIRECTIVES else '[^/]+')
+        else: regex.append(re.escape(part))
+    return re.compile('^%s$' % ''.join(regex))
+
+def _init_worker(nice):
+    # the worker processes ignore Ctrl+C (DoorPi stops them) and run with low priority
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        os.nice(nice)
+    except OSError:
+        pass
+
+def _process(file_name, audio_format, sample_rate):
+    # runs in a worker process - returns (file_name, result or None, error or None)
+    part_name = file_name + PART_EXTENSION
+    try:
+        if is_transcoded(file_name, audio_format, sample_rate):
+            return file_name, {'size': os.path.getsize(file_name)}, None
+        result = transcode(file_name, part_name, audio_format, sample_rate)
+        os.rename(part_name, file_name)
+        return file_name, result, None
+    except Exception as exp:
+        try:
+            os.remove(part_name)
+        except OSError:
+            pass
+        return file_name, None, '%s: %s' % (exp.__class__.__name__, exp)
+
+class RecordingPipeline(object):
+    """ compresses, indexes and deletes the recordings of the sipphone
+
+    The recorder events are watched with a listener of the event handler. The transcoding runs
+    in a multiprocessing pool (created with the first recording), the results are written to
+    the index in the result thread of the pool.
+    """
+
+    @property
+    def enabled(self): return self.__index_file != '' and self.__records != ''
+
+    @property
+    def statistic(self):
+        with self.__lock:
+            statistic = {
+                'enabled':          self.enabled,
+                'format':           '%s %s Hz' % (self.__audio_format, self.__sample_rate),
+                'queued':           self.__queued,
+                'processed':        self.__processed,
+                'failed':           self.__failed,
+                'saved_bytes':      self.__saved_bytes,
+                'deleted':          self.__deleted,
+                'process_time':     {
+                    'avg':  self.__process_time / self.__processed if self.__processed else 0,
+                    'max':  self.__max_process_time
+                }
+            }
+            if self.__db:
+                count, size = self.__db.execute('SELECT COUNT(*), SUM(size) FROM recordings').fetchone()
+                statistic.update({'recordings': count, 'size': size or 0})
+            return statistic
+
+    def __init__(self, index_file, records, audio_format = FORMAT_PCM, sample_rate = 8000, workers = 1,
+                 nice = 10, max_size = 0, max_age = 0):
+        self.__index_file = index_file
+        self.__records = records
+        self.__audio_format = audio_format if audio_format in FORMATS else FORMAT_PCM
+        self.__sample_rate = sample_rate
+        self.__workers = max(1, workers)
+        self.__nice = nice
+        self.__max_size = max(0, max_size) * 1024 * 1024
+        self.__max_age = max(0, max_age) * 86400
+        self.__lock = threading.RLock()
+        self.__db = None
+        self.__pool = None
+        self.__started_recordings = {}      # file_name -> metadata from OnRecorderStarted
+        self.__queue_times = {}             # file_name -> time of the submit
+        self.__queued = 0
+        self.__processed = 0
+        self.__failed = 0
+        self.__saved_bytes = 0
+        self.__deleted = 0
+        self.__process_time = 0
+        self.__max_process_time = 0
+        if audio_format not in FORMATS:
+            logger.warning('unknown recordings_format %s - use %s', audio_format, FORMAT_PCM)
+
+    def start(self):
+        if not self.enabled or self.__db is not None: return self
+        try:
+            if not os.path.exists(os.path.dirname(self.__index_file)):
+                logger.info('Path %s does not exist - creating it now', os.path.dirname(self.__index_file))
+                os.makedirs(os.path.dirname(self.__index_file))
+            db = sqlite3.connect(database = self.__index_file, timeout = 1, check_same_thread = False)
+            db.text_factory = str
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS recordings (
+                    recording_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT UNIQUE NOT NULL,
+                    start_time REAL,
+                    duration REAL,
+                    size INTEGER,
+                    remote_uri TEXT,
+                    last_key TEXT,
+                    correlation_id TEXT,
+                    format TEXT,
+                    state TEXT
+                );'''
+            )
+            # the quota deletes the oldest first and the list is ordered by start_time
+            db.execute('CREATE INDEX IF NOT EXISTS recordings_start_time ON recordings (start_time);')
+            db.commit()
+        except sqlite3.Error as exp:
+            logger.error('could not open recordings index %s: %s', self.__index_file, exp)
+            return self
+        with self.__lock: self.__db = db
+
+        DoorPi().event_handler.register_event('OnRecordingProcessed', __name__)
+        DoorPi().event_handler.register_event('OnRecordingDeleted', __name__)
+        DoorPi().event_handler.add_listener(self.__event_fired)
+
+        scan = threading.Thread(target = self.__scan, name = 'RecordingPipeline scan')
+        scan.daemon = True
+        scan.start()
+        return self
+
+    def stop(self):
+        # unfinished recordings stay pending in the index and are processed at the next start
+        with self.__lock:
+            pool, self.__pool = self.__pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        with self.__lock:
+            if self.__db is not None: self.__db.close()
+            self.__db = None
+
+    def __event_fired(self, event_name, event_source, kwargs, fire_time):
+        if event_name not in ['OnRecorderStarted', 'OnRecorderStopped']: return
+        file_name = (kwargs or {}).get('last_record_filename')
+        if not file_name:
+            try: file_name = DoorPi().sipphone.recorder.last_record_filename
+            except AttributeError: return
+        if not file_name: return
+
+        if event_name == 'OnRecorderStarted':
+            try: remote_uri = DoorPi().sipphone.current_call_dump.get('remote_uri', '')
+            except Exception: remote_uri = ''
+            keyboard = DoorPi().keyboard
+            with self.__lock:
+                self.__started_recordings[file_name] = {
+                    'start_time':       fire_time,
+                    'remote_uri':       remote_uri,
+                    'last_key':         str(keyboard.last_key) if keyboard and keyboard.last_key is not None else '',
+                    'correlation_id':   (kwargs or {}).get('correlation_id', '')
+                }
+        else:
+            with self.__lock: metadata = self.__started_recordings.pop(file_name, {})
+            DoorPi().scheduler.call_later(RECORDING_SETTLE_DELAY, self.__recorded, file_name, metadata)
+
+    def __recorded(self, file_name, metadata):
+        if not os.path.isfile(file_name):
+            logger.warning('recording %s does not exist', file_name)
+            return
+        self.__index(file_name, metadata.get('start_time') or os.path.getmtime(file_name), metadata)
+        self.__submit(file_name)
+
+    def __index(self, file_name, start_time, metadata = None):
+        metadata = metadata or {}
+        with self.__lock:
+            if self.__db is None: return
+            self.__db.execute('''
+                INSERT OR REPLACE INTO recordings
+                (file_name, start_time, size, remote_uri, last_key, correlation_id, state)
+                VALUES (?, ?, ?, ?, ?, ?, ?)''', (
+                file_name, start_time, os.path.getsize(file_name), metadata.get('remote_uri', ''),
+                metadata.get('last_key', ''), metadata.get('correlation_id', ''), STATE_PENDING
+            ))
+            self.__db.commit()
+
+    def __submit(self, file_name):
+        with self.__lock:
+            if self.__db is None or file_name in self.__queue_times: return
+            if self.__pool is None:
+                self.__pool = multiprocessing.Pool(self.__workers, _init_worker, (self.__nice,))
+            self.__queue_times[file_name] = time.time()
+            self.__queued += 1
+            self.__pool.apply_async(_process, (file_name, self.__audio_format, self.__sample_rate),
+                                    callback = self.__processed_callback)
+
+    def __processed_callback(self, processed):
+        # runs in the result thread of the pool
+        file_name, result, error = processed
+        with self.__lock:
+            if self.__db is None: return
+            process_time = time.time() - self.__queue_times.pop(file_name, time.time())
+            self.__queued -= 1
+            if error:
+                self.__failed += 1
+                self.__db.execute('UPDATE recordings SET state = ? WHERE file_name = ?', (STATE_FAILED, file_name))
+            else:
+                self.__processed += 1
+                self.__process_time += process_time
+                self.__max_process_time = max(self.__max_process_time, process_time)
+                self.__saved_bytes += result.get('source_size', result['size']) - result['size']
+                self.__db.execute('''
+                    UPDATE recordings SET size = ?, duration = COALESCE(?, duration),
+                    format = COALESCE(?, format), state = ? WHERE file_name = ?''', (
+                    result['size'], result.get('duration'), result.get('format'), STATE_PROCESSED, file_name
+                ))
+            self.__db.commit()
+
+        if error:
+            logger.error('could not process recording %s: %s', file_name, error)
+            return
+        logger.info('processed recording %s (%s bytes -> %s bytes)', file_name,
+                    result.get('source_size', result['size']), result['size'])
+        DoorPi().event_handler('OnRecordingProcessed', __name__, {
+            'file_name':    file_name,
+            'duration':     result.get('duration', ''),
+            'size':         result['size'],
+            'source_size':  result.get('source_size', result['size'])
+        })
+        self.enforce_quota()
+
+    def __scan(self):
+        # recordings without index entry and pending ones of the last run - other files in the
+        # directories of the records are not touched
+        base_path = records_base_path(self.__records)
+        pattern = records_pattern(self.__records)
+        # the recorder never writes deeper than the records path
+        max_depth = _records_path(self.__records).count(os.sep) - base_path.count(os.sep) - 1
+        with self.__lock:
+            if self.__db is None: return
+            known = dict(self.__db.execute('SELECT file_name, state FROM recordings').fetchall())
+        for file_name, state in known.items():
+            if not os.path.isfile(file_name): self.__delete(file_name, 'missing')
+        for directory, directories, files in os.walk(base_path):
+            if directory[len(base_path):].count(os.sep) >= max_depth: directories[:] = []
+            for name in sorted(files):
+                file_name = os.path.join(directory, name)
+                # left by a worker process that was stopped
+                if name.endswith(PART_EXTENSION) and pattern.match(file_name[:-len(PART_EXTENSION)]):
+                    try: os.remove(file_name)
+                    except OSError: pass
+                    continue
+                if not name.endswith(RECORDING_EXTENSION) or not pattern.match(file_name) \
+                        or known.get(file_name) in [STATE_PROCESSED, STATE_FAILED]:
+                    continue
+                # recorded right now
+                with self.__lock:
+                    if file_name in self.__started_recordings: continue
+                if file_name not in known: self.__index(file_name, os.path.getmtime(file_name))
+                self.__submit(file_name)
+        self.enforce_quota()
+
+    def enforce_quota(self):
+        deletes = []
+        with self.__lock:
+            if self.__db is None: return
+            if self.__max_age:
+                deletes.extend(('age', row[0]) for row in self.__db.execute(
+                    'SELECT file_name FROM recordings WHERE start_time < ? AND state != ?',
+                    (time.time() - self.__max_age, STATE_PENDING)
+                ))
+            if self.__max_size:
+                total = self.__db.execute('SELECT SUM(size) FROM recordings').fetchone()[0] or 0
+                for file_name, size in self.__db.execute(
+                        'SELECT file_name, size FROM recordings WHERE state != ? ORDER BY start_time',
+                        (STATE_PENDING,)):
+                    if total <= self.__max_size: break
+                    total -= size or 0
+                    deletes.append(('size', file_name))
+        for reason, file_name in deletes: self.__delete(file_name, reason)
+
+    def __delete(self, file_name, reason):
+        try:
+            if os.path.isfile(file_name): os.remove(file_name)
+        except OSError as exp:
+            logger.warning('could not delete recording %s: %s', file_name, exp)
+            return
+        with self.__lock:
+            if self.__db is None: return
+            # the same file can be too old and over the quota
+            if not self.__db.execute('DELETE FROM recordings WHERE file_name = ?', (file_name,)).rowcount: return
+            self.__db.commit()
+            if reason != 'missing': self.__deleted += 1
+        if reason == 'missing': return
+        logger.info('deleted recording %s (%s)', file_name, reason)
+        DoorPi().event_handler('OnRecordingDeleted', __name__, {'file_name': file_name, 'reason': reason})
+
+    def list(self, offset = 0, limit = 50):
+        columns = ['recording_id', 'file_name', 'start_time', 'duration', 'size', 'remote_uri', 'last_key',
+                   'correlation_id', 'format', 'state']
+        with self.__lock:
+            if self.__db is None: return {'total': 0, 'recordings': []}
+            total = self.__db.execute('SELECT COUNT(*) FROM recordings').fetchone()[0]
+            rows = self.__db.execute(
+                'SELECT %s FROM recordings ORDER BY start_time DESC LIMIT ? OFFSET ?' % ', '.join(columns),
+                (max(0, limit), max(0, offset))
+            ).fetchall()
+        return {'total': total, 'recordings': [dict(zip(columns, row)) for row in rows]}
+
+    def file_name(self, recording_id):
+        # only processed recordings - the others are still written
+        with self.__lock:
+            if self.__db is None: return None
+            row = self.__db.execute('SELECT file_name FROM recordings WHERE recording_id = ? AND state != ?',
+                                    (recording_id, STATE_PENDING)).fetchone()
+        return row[0] if row and os.path.isfile(row[0]) else None
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [SIP-Phone]
+#  sipserver_server = fritz.box            # first registrar (primary)
+#  sipserver_backup = 192.168.1.2:5060     # more registrars for failover (comma separated)
+#  registration_probe_interval = 30        # seconds between the OPTIONS pings to all registrars
+#  registration_probe_timeout = 2          # seconds to wait for the answer of a ping
+#  registration_probe_failures = 2         # pings without answer until a registrar is down
+#  registration_failback_probes = 3        # answered pings of the primary until failback
+#  registration_queue_timeout = 30         # seconds a call waits for the registration
+#
+#  Any SIP answer to the OPTIONS ping (also 4xx) counts as healthy. If the active registrar
+#  is down or the registration fails, DoorPi switches to the next healthy registrar and back
+#  to the primary as soon as it answers again. Calls while DoorPi is not registered are made
+#  after the next successful registration.
+#
+#  The monitor is disabled, if the sipphone doesn't register (linphone without
+#  sipserver_username and sipserver_password) - calls are made at once then.
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import random
+import socket
+import threading
+import time
+
+from doorpi import DoorPi
+from doorpi.action.handler import current_correlation_id, set_correlation_id
+
+REGISTRATION_OK = 'ok'
+REGISTRATION_PROGRESS = 'progress'
+REGISTRATION_CLEARED = 'cleared'
+REGISTRATION_FAILED = 'failed'
+
+SIP_PORT = 5060
+
+def split_registrar(registrar):
+    host, _, port = registrar.strip().partition(':')
+    return host, int(port) if port else SIP_PORT
+
+def options_ping(registrar, timeout = 2):
+    # returns the round trip time of an OPTIONS request or None without answer
+    host, port = split_registrar(registrar)
+    call_id = '%x@doorpi' % random.getrandbits(64)
+    sock = None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(timeout)
+        sock.connect((host, port))
+        local_host, local_port = sock.getsockname()
+        request = '\r\n'.join([
+            'OPTIONS sip:%s SIP/2.0' % host,
+            'Via: SIP/2.0/UDP %s:%s;branch=z9hG4bK%x;rport' % (local_host, local_port, random.getrandbits(48)),
+            'Max-Forwards: 70',
+            'From: <sip:doorpi@%s>;tag=%x' % (local_host, random.getrandbits(32)),
+            'To: <sip:%s>' % host,
+            'Call-ID: %s' % call_id,
+            'CSeq: 1 OPTIONS',
+            'Accept: application/sdp',
+            'Content-Length: 0',
+            '', ''
+        ])
+        start_time = time.time()
+        sock.send(request)
+        while time.time() - start_time < timeout:
+            response = sock.recv(4096)
+            if response.startswith('SIP/2.0 ') and call_id in response: return time.time() - start_time
+        return None
+    except socket.error:
+        return None
+    finally:
+        if sock: sock.close()
+
+class RegistrarHealth(object):
+    __slots__ = ['name', 'rtt', 'probes', 'failures', 'ok_in_row', 'failed_in_row', 'last_probe']
+
+    def __init__(self, name):
+        self.name = name
+        self.rtt = None
+        self.probes = 0
+        self.failures = 0
+        self.ok_in_row = 0
+        self.failed_in_row = 0
+        self.last_probe = None
+
+class RegistrationMonitor(object):
+    """ registration state, health of the registrars and failover
+
+    The sipphone reports its registration with registration_state(state, reason) and switches
+    the registrar with _use_registrar(registrar) - called in the thread of the pump. The
+    monitor thread pings all registrars with OPTIONS every probe_interval seconds (and at once
+    when the registration failed). queue_call() keeps calls until DoorPi is registered and
+    makes them in the pump thread, with the correlation id of their trace.
+    """
+
+    @property
+    def enabled(self): return len(self.__registrars) > 0
+
+    @property
+    def registered(self): return self.__registered
+
+    @property
+    def registrar(self): return self.__active.name if self.__active else None
+
+    @property
+    def ready(self): return not self.enabled or self.__registered
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            now = time.time()
+            return {
+                'enabled':                  self.enabled,
+                'registered':               self.__registered,
+                'registrar':                self.registrar,
+                'state_since':              round(now - self.__state_time, 1),
+                'unregistered_time':        round(self.__unregistered_time +
+                                                  (0 if self.__registered else now - self.__state_time), 1),
+                'registrations':            self.__registrations,
+                'registration_failures':    self.__registration_failures,
+                'failovers':                self.__failovers,
+                'failbacks':                self.__failbacks,
+                'queued_calls':             len(self.__queue),
+                'dropped_calls':            self.__dropped_calls,
+                'registrars':               dict((health.name, {
+                    'healthy':      health.failed_in_row < self.__probe_failures,
+                    'rtt_ms':       round(health.rtt * 1000, 1) if health.rtt is not None else None,
+                    'probes':       health.probes,
+                    'failures':     health.failures
+                }) for health in self.__registrars)
+            }
+
+    def __init__(self, sipphone, registrars, probe_interval = 30, probe_timeout = 2,
+                 probe_failures = 2, failback_probes = 3, queue_timeout = 30):
+        self.__sipphone = sipphone
+        self.__registrars = [RegistrarHealth(registrar) for registrar in registrars if registrar.strip()]
+        self.__active = self.__registrars[0] if self.__registrars else None
+        self.__probe_interval = max(1, probe_interval)
+        self.__probe_timeout = probe_timeout
+        self.__probe_failures = max(1, probe_failures)
+        self.__failback_probes = max(1, failback_probes)
+        self.__queue_timeout = queue_timeout
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+        self.__probe_now = False
+
+        self.__registered = False
+        self.__registration_failed = False
+        self.__state_time = time.time()
+        self.__unregistered_time = 0
+        self.__registrations = 0
+        self.__registration_failures = 0
+        self.__failovers = 0
+        self.__failbacks = 0
+        self.__queue = []               # (queued time, callback, number, correlation id)
+        self.__dropped_calls = 0
+
+        for event_name in ['OnSipRegistrationOk', 'OnSipRegistrationFailed',
+                           'OnSipRegistrarFailover', 'OnSipRegistrarFailback']:
+            DoorPi().event_handler.register_event(event_name, __name__)
+
+    def start(self):
+        if not self.enabled: return self
+        with self.__condition:
+            if self.__thread is not None: return self
+            self.__stopped = False
+            self.__thread = threading.Thread(target = self.__run, name = 'RegistrationMonitor')
+            self.__thread.daemon = True
+            self.__thread.start()
+        return self
+
+    def stop(self, timeout = 1):
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+            self.__queue = []
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join(timeout)
+        self.__thread = None
+
+    def registration_state(self, state, reason = ''):
+        # called by the callbacks of the sipphone - progress (refresh) keeps the last state
+        if state == REGISTRATION_PROGRESS: return
+        now = time.time()
+        with self.__condition:
+            registrar = self.registrar
+            was_registered = self.__registered
+            self.__registered = state == REGISTRATION_OK
+            if was_registered is not self.__registered:
+                if not was_registered: self.__unregistered_time += now - self.__state_time
+                self.__state_time = now
+            if state == REGISTRATION_OK:
+                self.__registrations += 1
+                self.__registration_failed = False
+                queued, self.__queue = self.__queue, []
+            elif state == REGISTRATION_FAILED:
+                self.__registration_failures += 1
+                self.__registration_failed = True
+                self.__probe_now = True
+                self.__condition.notify()
+
+        if state == REGISTRATION_OK:
+            logger.info('registered at %s', registrar)
+            DoorPi().event_handler('OnSipRegistrationOk', __name__, {'registrar': registrar})
+            for queued_time, callback, number, correlation_id in queued:
+                if now - queued_time > self.__queue_timeout:
+                    self.__drop(number, queued_time)
+                    continue
+                logger.info('make queued call to %s', number)
+                self.__sipphone.pump.run_soon(self.__make_queued_call, callback, number, correlation_id)
+        elif state == REGISTRATION_FAILED:
+            logger.warning('registration at %s failed (%s)', registrar, reason)
+            DoorPi().event_handler('OnSipRegistrationFailed', __name__, {'registrar': registrar, 'reason': reason})
+
+    def queue_call(self, callback, number):
+        # returns True if the call waits for the registration - callback(number) is called later
+        # and has to make the call without BeforeSipPhoneMakeCall and new trace
+        with self.__condition:
+            if self.ready: return False
+            self.__queue = [entry for entry in self.__queue if entry[2] != number]
+            self.__queue.append((time.time(), callback, number, current_correlation_id()))
+        logger.info('not registered - call to %s waits up to %s seconds for the registration', number, self.__queue_timeout)
+        DoorPi().scheduler.call_later(self.__queue_timeout, self.__expire_queue)
+        return True
+
+    def __make_queued_call(self, callback, number, correlation_id):
+        previous_correlation_id = current_correlation_id()
+        set_correlation_id(correlation_id)
+        try:
+            callback(number)
+        finally:
+            set_correlation_id(previous_correlation_id)
+
+    def __expire_queue(self):
+        now = time.time()
+        with self.__condition:
+            expired = [entry for entry in self.__queue if now - entry[0] >= self.__queue_timeout]
+            self.__queue = [entry for entry in self.__queue if now - entry[0] < self.__queue_timeout]
+        for queued_time, callback, number, correlation_id in expired: self.__drop(number, queued_time)
+
+    def __drop(self, number, queued_time):
+        with self.__condition: self.__dropped_calls += 1
+        logger.warning('drop call to %s - not registered since %.1f seconds', number, time.time() - queued_time)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                if self.__stopped: return
+                self.__probe_now = False
+            self.__probe_all()
+            self.__check_registrar()
+            with self.__condition:
+                if not self.__stopped and not self.__probe_now:
+                    self.__condition.wait(self.__probe_interval)
+
+    def __probe_all(self):
+        for health in self.__registrars:
+            rtt = options_ping(health.name, self.__probe_timeout)
+            with self.__condition:
+                health.probes += 1
+                health.last_probe = time.time()
+                health.rtt = rtt
+                if rtt is None:
+                    health.failures += 1
+                    health.failed_in_row += 1
+                    health.ok_in_row = 0
+                else:
+                    health.failed_in_row = 0
+                    health.ok_in_row += 1
+            if rtt is None: logger.debug('registrar %s does not answer', health.name)
+
+    def __check_registrar(self):
+        with self.__condition:
+            active = self.__active
+            primary = self.__registrars[0]
+            healthy = [health for health in self.__registrars if health.ok_in_row > 0]
+            if active is not primary and primary.ok_in_row >= self.__failback_probes:
+                switch_to, event_name, reason = primary, 'OnSipRegistrarFailback', 'primary is back'
+            elif (active.failed_in_row >= self.__probe_failures or self.__registration_failed) \
+                    and [health for health in healthy if health is not active]:
+                switch_to = [health for health in healthy if health is not active][0]
+                event_name = 'OnSipRegistrarFailover'
+                reason = 'registration failed' if self.__registration_failed else 'no answer to OPTIONS'
+            else:
+                return
+            self.__active = switch_to
+            self.__registration_failed = False
+            # a failback to the left registrar needs failback_probes new answers
+            active.ok_in_row = 0
+            if event_name == 'OnSipRegistrarFailback': self.__failbacks += 1
+            else: self.__failovers += 1
+
+        logger.warning('switch registrar from %s to %s (%s)', active.name, switch_to.name, reason)
+        DoorPi().event_handler(event_name, __name__, {
+            'from': active.name,
+            'to': switch_to.name,
+            'reason': reason
+        })
+        self.__sipphone.pump.run_soon(self.__sipphone._use_registrar, switch_to.name)
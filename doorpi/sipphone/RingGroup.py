@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+#  Configuration
+#  -------------
+#
+#  [EVENT_OnKeyPressed_onboardpins.1]
+#  10 = ringgroup:**621,**622|0|20,01701234567|10|30
+#
+#  target = number|delay|timeout   (seconds, default delay 0 and timeout [SIP-Phone] call_timeout)
+#
+#  All targets ring in parallel (at most ua.max_calls at the same time, the others wait for a
+#  free call - with ua.max_calls = 1 they ring one after another). The first target that answers
+#  gets connected, the calls to all other targets are cancelled.
+#
+#  While another call is active, the ring group is not started - the active call is not hung up.
+#  The end of a call to a target that lost fires no OnCallStateDisconnect (and no
+#  OnMediaNotRequired), because it is no end of the call for Recorder and Player.
+#
+#  Events with the outcome of every target and the time to answer are written to the event log:
+#
+#  OnRingGroupStart      targets
+#  OnRingGroupTarget     number, outcome (answered, cancelled, timeout, ended, failed), ring_time
+#  OnRingGroupAnswered   number, time_to_answer
+#  OnRingGroupFinished   answered_by, time_to_answer, outcomes
+#
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+from collections import deque
+
+from doorpi import DoorPi
+from doorpi.action.handler import current_correlation_id, set_correlation_id
+
+RING_ANSWERED = 'answered'
+RING_CANCELLED = 'cancelled'
+RING_TIMEOUT = 'timeout'
+RING_ENDED = 'ended'
+RING_FAILED = 'failed'
+
+def parse_targets(parameter_list, default_timeout):
+    targets = []
+    for parameter in parameter_list:
+        fields = [field.strip() for field in parameter.split('|')]
+        if fields[0] == '': continue
+        delay = float(fields[1]) if len(fields) > 1 and fields[1] else 0
+        timeout = float(fields[2]) if len(fields) > 2 and fields[2] else default_timeout
+        targets.append(RingTarget(fields[0], delay, timeout))
+    return targets
+
+class RingTarget(object):
+    __slots__ = ['number', 'delay', 'timeout', 'key', 'handle', 'job', 'dial_time', 'outcome']
+
+    def __init__(self, number, delay, timeout):
+        self.number = number
+        self.delay = max(0, delay)
+        self.timeout = timeout
+        self.key = None             # call id of the sipphone, known after dialing
+        self.handle = None          # call object of the sipphone
+        self.job = None             # scheduled start or timeout
+        self.dial_time = None
+        self.outcome = None
+
+    def __str__(self):
+        return '%s|%s|%s' % (self.number, self.delay, self.timeout)
+
+class RingGroup(object):
+    """ rings several targets in parallel - the first one who answers wins
+
+    The sipphone dials with _ring_target(number) -> (key, handle), cancels with
+    _ring_cancel(handle) and connects the winner with _ring_connected(handle). Its callbacks
+    report the state of the calls with answered(key) and ended(key, reason). Calls to the
+    sipphone are made in its pump thread and outside of the lock, because they can report
+    states synchronous.
+    """
+
+    @property
+    def finished(self): return self.__finished
+
+    @property
+    def winner(self): return self.__winner
+
+    def __init__(self, sipphone, targets, max_calls = 2, correlation_id = None):
+        self.__sipphone = sipphone
+        self.__correlation_id = correlation_id
+        self.__targets = targets
+        self.__max_calls = max(1, max_calls)
+        self.__lock = threading.RLock()
+        self.__calls = {}           # key -> ringing target
+        self.__waiting = deque()    # due targets without a free call
+        self.__winner = None
+        self.__time_to_answer = None
+        self.__finished = False
+        self.__start_time = None
+
+        for event_name in ['OnRingGroupStart', 'OnRingGroupTarget', 'OnRingGroupAnswered', 'OnRingGroupFinished']:
+            DoorPi().event_handler.register_event(event_name, __name__)
+
+    def start(self):
+        self.__start_time = time.time()
+        logger.info('ring group with %s targets (max. %s calls)', len(self.__targets), self.__max_calls)
+        if self.__max_calls == 1 and len(self.__targets) > 1:
+            logger.warning('ua.max_calls is 1 - the targets of the ring group ring one after another')
+        DoorPi().event_handler('OnRingGroupStart', __name__, {
+            'targets': ','.join(str(target) for target in self.__targets)
+        })
+        with self.__lock:
+            for target in self.__targets:
+                target.job = DoorPi().scheduler.call_later(target.delay, self.__due, target)
+        return self
+
+    def stop(self):
+        to_cancel = []
+        with self.__lock:
+            for target in self.__targets:
+                if target.outcome is None:
+                    to_cancel.append(self.__close(target, RING_CANCELLED))
+        self.__cancel_all(to_cancel)
+        self.__check_finished()
+
+    def __due(self, target):
+        with self.__lock:
+            target.job = None
+            if self.__finished or target.outcome is not None: return
+            if len(self.__calls) >= self.__max_calls:
+                logger.debug('no free call for %s - waiting', target.number)
+                self.__waiting.append(target)
+                return
+            # the slot is taken before dialing, so the next target doesn't take it too
+            self.__calls[target] = target
+        self.__sipphone.pump.run_in_thread(self.__dial, target)
+
+    def __dial(self, target):
+        # the calls of the ring group belong to the trace of its start
+        previous_correlation_id = current_correlation_id()
+        set_correlation_id(self.__correlation_id)
+        try:
+            key, handle = self.__sipphone._ring_target(target.number)
+        except Exception:
+            logger.exception('could not call %s', target.number)
+            key, handle = None, None
+        finally:
+            set_correlation_id(previous_correlation_id)
+
+        to_cancel = None
+        with self.__lock:
+            del self.__calls[target]
+            if handle is not None:
+                target.key, target.handle, target.dial_time = key, handle, time.time()
+            if target.outcome is not None:
+                # cancelled while dialing (answered by someone else, stop)
+                to_cancel = handle
+            elif handle is None:
+                self.__close(target, RING_FAILED)
+            else:
+                self.__calls[key] = target
+                target.job = DoorPi().scheduler.call_later(target.timeout, self.__timeout, target)
+                logger.debug('ringing %s', target.number)
+        self.__cancel_all([to_cancel])
+        self.__next()
+
+    def __timeout(self, target):
+        with self.__lock:
+            target.job = None
+            if target.outcome is not None: return
+            logger.info('ring group: %s did not answer within %s seconds', target.number, target.timeout)
+            handle = self.__close(target, RING_TIMEOUT)
+        self.__cancel_all([handle])
+        self.__next()
+
+    def answered(self, key):
+        # returns True if the call belongs to this ring group
+        with self.__lock:
+            target = self.__calls.get(key)
+            if target is None:
+                return any(target.key == key for target in self.__targets)
+            if self.__winner is not None:
+                to_cancel = [self.__close(target, RING_CANCELLED)]
+            else:
+                self.__winner = target
+                self.__close(target, RING_ANSWERED)
+                to_cancel = [self.__close(other, RING_CANCELLED) for other in self.__targets if other.outcome is None]
+                self.__time_to_answer = round(time.time() - self.__start_time, 3)
+        if self.__winner is target:
+            logger.info('ring group: %s answered after %s seconds', target.number, self.__time_to_answer)
+            self.__sipphone._ring_connected(target.handle)
+            DoorPi().event_handler('OnRingGroupAnswered', __name__, {
+                'number': target.number,
+                'time_to_answer': self.__time_to_answer
+            })
+        self.__cancel_all(to_cancel)
+        self.__check_finished()
+        return True
+
+    def is_lost_call(self, key):
+        # True for the closed call of a target that didn't win, while the group goes on or has a winner
+        with self.__lock:
+            if not any(target.key == key and target.outcome not in [None, RING_ANSWERED] for target in self.__targets):
+                return False
+            return self.__winner is not None or any(target.outcome is None for target in self.__targets)
+
+    def ended(self, key, reason = ''):
+        with self.__lock:
+            target = self.__calls.get(key)
+            if target is None:
+                return any(target.key == key for target in self.__targets)
+            logger.info('ring group: call to %s ended before answer (%s)', target.number, reason)
+            self.__close(target, RING_ENDED)
+        self.__next()
+        return True
+
+    def __close(self, target, outcome):
+        # under lock - returns the handle that has to be cancelled
+        if target.job: target.job.cancel()
+        target.job = None
+        target.outcome = outcome
+        if target.key in self.__calls: del self.__calls[target.key]
+        if target in self.__waiting: self.__waiting.remove(target)
+        DoorPi().event_handler('OnRingGroupTarget', __name__, {
+            'number': target.number,
+            'outcome': outcome,
+            'ring_time': round(time.time() - target.dial_time, 3) if target.dial_time else 0
+        })
+        return target.handle if outcome != RING_ANSWERED else None
+
+    def __cancel_all(self, handles):
+        for handle in handles:
+            if handle is not None: self.__sipphone.pump.run_in_thread(self.__cancel, handle)
+
+    def __cancel(self, handle):
+        try:
+            self.__sipphone._ring_cancel(handle)
+        except Exception:
+            logger.exception('could not cancel call %s', handle)
+
+    def __next(self):
+        # a call got free - dial the next waiting target
+        with self.__lock:
+            target = None
+            if self.__waiting and len(self.__calls) < self.__max_calls and self.__winner is None:
+                target = self.__waiting.popleft()
+                self.__calls[target] = target
+        if target: self.__sipphone.pump.run_in_thread(self.__dial, target)
+        else: self.__check_finished()
+
+    def __check_finished(self):
+        with self.__lock:
+            if self.__finished or any(target.outcome is None for target in self.__targets): return
+            self.__finished = True
+        if not self.__winner: logger.info('ring group: nobody answered')
+        DoorPi().event_handler('OnRingGroupFinished', __name__, {
+            'answered_by': self.__winner.number if self.__winner else '',
+            'time_to_answer': self.__time_to_answer if self.__winner else '',
+            'outcomes': ','.join('%s:%s' % (target.number, target.outcome) for target in self.__targets)
+        })
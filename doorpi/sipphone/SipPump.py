@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+import threading
+import time
+from collections import deque
+
+from doorpi.action.handler import current_correlation_id, set_correlation_id
+
+class SipPump(object):
+    """ own thread that pumps the SIP library of the sipphone
+
+    iterate() of the sipphone is called every interval_call seconds while a call is active
+    and every interval_idle seconds otherwise. The thread registers itself once at the SIP
+    library, so iterate() doesn't have to. wake() starts the next round at once (new call),
+    run_soon(callback, *args) runs work that touches the SIP library in this thread - with the
+    correlation id of the caller - and run_in_thread(callback, *args) too, but at once if it is
+    called by this thread.
+    """
+
+    @property
+    def is_running(self): return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def statistic(self):
+        with self.__condition:
+            return {
+                'running':          self.is_running,
+                'interval_call':    self.interval_call * 1000,
+                'interval_idle':    self.interval_idle * 1000,
+                'iterations':       self.__iterations,
+                'call_iterations':  self.__call_iterations,
+                'iterate_time':     {
+                    'avg':  self.__iterate_time / self.__iterations if self.__iterations else 0,
+                    'max':  self.__max_iterate_time
+                }
+            }
+
+    def __init__(self, sipphone, interval_call = 0.02, interval_idle = 0.25, name = 'SipPump'):
+        self.__sipphone = sipphone
+        self.interval_call = max(0.001, interval_call)
+        self.interval_idle = max(self.interval_call, interval_idle)
+        self.name = name
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+        self.__woken = False
+        self.__tasks = deque()
+        self.__iterations = 0
+        self.__call_iterations = 0
+        self.__iterate_time = 0
+        self.__max_iterate_time = 0
+
+    def start(self):
+        with self.__condition:
+            if self.is_running: return self
+            self.__stopped = False
+            self.__thread = threading.Thread(target = self.__run, name = self.name)
+            self.__thread.daemon = True
+            self.__thread.start()
+        logger.debug('started with interval %s s (call) and %s s (idle)', self.interval_call, self.interval_idle)
+        return self
+
+    def stop(self, timeout = 1):
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join(timeout)
+        self.__thread = None
+
+    def run_soon(self, callback, *args):
+        with self.__condition:
+            self.__tasks.append((callback, args, current_correlation_id()))
+            self.__woken = True
+            self.__condition.notify()
+
+    def run_in_thread(self, callback, *args):
+        # at once in the pump thread (callbacks of the SIP library) or without a running pump
+        if threading.current_thread() is self.__thread or not self.is_running: return callback(*args)
+        self.run_soon(callback, *args)
+
+    def wake(self):
+        with self.__condition:
+            self.__woken = True
+            self.__condition.notify()
+
+    def __run(self):
+        try:
+            self.__sipphone.thread_register(self.name)
+        except Exception:
+            logger.exception('could not register %s at the sip library', self.name)
+            return
+
+        while True:
+            with self.__condition:
+                if self.__stopped: return
+                self.__woken = False
+                tasks, self.__tasks = self.__tasks, deque()
+
+            for callback, args, correlation_id in tasks:
+                set_correlation_id(correlation_id)
+                try:
+                    callback(*args)
+                except Exception:
+                    logger.exception('error while running %s in the pump thread', callback)
+                finally:
+                    set_correlation_id(None)
+
+            start_time = time.time()
+            try:
+                self.__sipphone.iterate()
+                in_call = bool(self.__sipphone.current_call)
+            except Exception:
+                logger.exception('error while pumping the sip library')
+                in_call = False
+            iterate_time = time.time() - start_time
+
+            with self.__condition:
+                self.__iterations += 1
+                if in_call: self.__call_iterations += 1
+                self.__iterate_time += iterate_time
+                if iterate_time > self.__max_iterate_time: self.__max_iterate_time = iterate_time
+
+                interval = self.interval_call if in_call else self.interval_idle
+                if not self.__stopped and not self.__woken and interval > iterate_time:
+                    self.__condition.wait(interval - iterate_time)
@@ -52,10 +52,12 @@ class DummyPhone(SipphoneAbstractBaseClass):
     def destroy(self):
         DoorPi().event_handler.fire_event_synchron('OnSipPhoneDestroy', __name__)
         DoorPi().event_handler.unregister_source(__name__, True)
-    def self_check(self, *args, **kwargs):
+    def iterate(self):
         return
     def call(self, number):
         DoorPi().event_handler('OnSipPhoneMakeCall', __name__)
+    def call_group(self, targets):
+        logger.info('dummy phone can not ring %s', ','.join(targets))
     def is_admin_number(self, remote_uri):
         return False
     def hangup(self):
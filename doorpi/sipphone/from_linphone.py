@@ -134,8 +134,25 @@ class LinPhone(SipphoneAbstractBaseClass):
     def reset_call_start_datetime(self):
         self.__current_call_start_datetime = datetime.datetime.utcnow()
         logger.debug('reset current call start datetime to %s', self.__current_call_start_datetime)
+        self._set_call_deadline('no_response', self.core.inc_timeout - 0.5, self.__check_call_timeout)
+        self._set_call_deadline('max_call_time', self.core.in_call_timeout - 0.5, self.__check_max_call_time)
+        self.pump.wake()
         return self.__current_call_start_datetime
 
+    def __check_call_timeout(self):
+        if not self.current_call or self.current_call.state >= lin.CallState.Connected: return None
+        logger.info("call timeout - hangup current call after %s seconds (max. %s)", self.current_call_duration, self.core.inc_timeout)
+        self.core.terminate_all_calls()
+        DoorPi().event_handler('OnSipPhoneCallTimeoutNoResponse', __name__)
+
+    def __check_max_call_time(self):
+        if not self.current_call: return None
+        # still ringing - the call timeout comes first, otherwise hangup as soon as connected
+        if self.current_call.state < lin.CallState.Connected: return 0.5
+        logger.info("max call time reached - hangup current call after %s seconds (max. %s)", self.current_call_duration, self.core.in_call_timeout)
+        self.core.terminate_all_calls()
+        DoorPi().event_handler('OnSipPhoneCallTimeoutMaxCalltime', __name__)
+
     def __init__(self, whitelist = list(), *args, **kwargs):
         logger.debug("__init__")
 
@@ -268,15 +285,20 @@ class LinPhone(SipphoneAbstractBaseClass):
         if server and username and password:
             logger.info('using DoorPi with SIP-Server')
             proxy_cfg = self.core.create_proxy_config()
-            proxy_cfg.identity_address = lin.Address.new("%s <sip:%s@%s>" % (
-                    conf.get(SIPPHONE_SECTION, "identity", 'DoorPi'), username, server)
-            )
+            proxy_cfg.identity_address = self.__identity_address(server)
             proxy_cfg.server_addr = "sip:%s"%server
             proxy_cfg.register_enabled = True
             self.core.add_proxy_config(proxy_cfg)
             self.core.default_proxy_config = proxy_cfg
             auth_info = self.core.create_auth_info(username, None, password, None, None, realm)
             self.core.add_auth_info(auth_info)
+            # without own realm in the config the backup registrars use their host as realm
+            if realm == server:
+                for backup in conf.get_list(SIPPHONE_SECTION, 'sipserver_backup', ''):
+                    if not backup.strip(): continue
+                    self.core.add_auth_info(self.core.create_auth_info(
+                        username, None, password, None, None, backup.strip().split(':')[0]
+                    ))
         else:
             logger.info('using DoorPi without SIP-Server? Okay...')
             proxy_cfg = self.core.create_proxy_config()
@@ -285,36 +307,54 @@ class LinPhone(SipphoneAbstractBaseClass):
             self.core.default_proxy_config = proxy_cfg
             logger.debug('%s',self.core.proxy_config_list)
 
+        self.call_trace.start()
+        self.recordings.start()
+        self.pump.start()
+        self.registration.start()
         logger.debug("start successfully")
 
+    def __identity_address(self, server):
+        return lin.Address.new("%s <sip:%s@%s>" % (
+            conf.get(SIPPHONE_SECTION, "identity", 'DoorPi'), conf.get(SIPPHONE_SECTION, "sipserver_username"), server)
+        )
+
+    def _use_registrar(self, registrar):
+        proxy_cfg = self.core.default_proxy_config
+        proxy_cfg.edit()
+        proxy_cfg.identity_address = self.__identity_address(registrar)
+        proxy_cfg.server_addr = "sip:%s"%registrar
+        proxy_cfg.done()
+        self.core.refresh_registers()
+
     def destroy(self):
         logger.debug("destroy")
+        self.registration.stop()
+        self._stop_ring_group()
+        self._cancel_call_deadlines()
         self.core.terminate_all_calls()
+        self.pump.stop()
+        self.recordings.stop()
         DoorPi().event_handler.fire_event_synchron('OnSipPhoneDestroy', __name__)
         DoorPi().event_handler.unregister_source(__name__, True)
+        self.call_events.stop()
         return
 
-    def self_check(self, *args, **kwargs):
+    def iterate(self):
         if not self.core: return
-
         self.core.iterate()
 
-        if not self.current_call: return
-
-        if self.current_call.state < lin.CallState.Connected:
-            if self.current_call_duration > self.core.inc_timeout - 0.5:
-                logger.info("call timeout - hangup current call after %s seconds (max. %s)", self.current_call_duration, self.core.inc_timeout)
-                self.core.terminate_all_calls()
-                DoorPi().event_handler('OnSipPhoneCallTimeoutNoResponse', __name__)
-        else:
-            if int(self.current_call_duration) > self.core.in_call_timeout - 0.5:
-                logger.info("max call time reached - hangup current call after %s seconds (max. %s)", self.current_call_duration, self.core.in_call_timeout)
-                self.core.terminate_all_calls()
-                DoorPi().event_handler('OnSipPhoneCallTimeoutMaxCalltime', __name__)
-
     def call(self, number):
+        return self._call_with_trace(self.__call, number)
+
+    def __call(self, number):
         DoorPi().event_handler('BeforeSipPhoneMakeCall', __name__, {'number':number})
         logger.debug("call (%s)",str(number))
+        # a queued call is made later by __make_call - within the trace of this call
+        if self.registration.queue_call(self.__make_call, number): return None
+        # the core is only touched by the pump thread, that runs core.iterate()
+        return self.pump.run_in_thread(self.__make_call, number)
+
+    def __make_call(self, number):
         if not self.current_call:
             logger.debug('no current call -> start new call')
             self.reset_call_start_datetime()
@@ -342,10 +382,31 @@ class LinPhone(SipphoneAbstractBaseClass):
         DoorPi().event_handler('AfterSipPhoneMakeCall', __name__, {'number':number})
         return self.current_call
 
-    def is_admin_number(self, remote_uri):
-        return self.callback.is_admin_number(remote_uri)
+    @property
+    def max_calls(self): return self.core.max_calls
+
+    @property
+    def registers(self):
+        # like start(): the account only registers with server, username and password
+        username = conf.get(SIPPHONE_SECTION, "sipserver_username")
+        return bool(conf.get(SIPPHONE_SECTION, "sipserver_server") and username
+                    and conf.get(SIPPHONE_SECTION, "sipserver_password", username))
+
+    def _ring_target(self, number):
+        call = self.core.invite_with_params(number, self.base_config)
+        if call is None: return None, None
+        return call.call_log.call_id, call
+
+    def _ring_cancel(self, call):
+        self.core.terminate_call(call)
+
+    def _ring_connected(self, call):
+        self.reset_call_start_datetime()
 
     def hangup(self):
+        self.pump.run_in_thread(self.__hangup)
+
+    def __hangup(self):
         if self.current_call:
             logger.debug("Received hangup request, cancelling current call")
             self.core.terminate_call(self.current_call)
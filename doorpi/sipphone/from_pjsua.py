@@ -123,11 +123,6 @@ class Pjsua(SipphoneAbstractBaseClass):
         logger.debug("Lib.start()")
         self.lib.start(0)
 
-        DoorPi().event_handler.register_action(
-            event_name      = 'OnTimeTick',
-            action_object   = 'pjsip_handle_events:50'
-        )
-
         logger.debug("init Acc")
         self.current_account_callback = SipPhoneAccountCallBack()
         self.__account = self.__Lib.create_account(
@@ -144,6 +139,10 @@ class Pjsua(SipphoneAbstractBaseClass):
         self.__recorder = PjsuaRecorder()
         self.__player = PjsuaPlayer()
 
+        self.call_trace.start()
+        self.recordings.start()
+        self.pump.start()
+        self.registration.start()
         logger.debug("start successfully")
 
     def stop(self, timeout = -1):
@@ -160,6 +159,12 @@ class Pjsua(SipphoneAbstractBaseClass):
     def destroy(self):
         logger.debug("destroy")
         DoorPi().event_handler('OnSipPhoneDestroy', __name__)
+        self.call_events.stop()
+        self.registration.stop()
+        self._stop_ring_group()
+        self._cancel_call_deadlines()
+        self.pump.stop()
+        self.recordings.stop()
 
         if self.lib is not None:
             self.lib.handle_events()
@@ -177,39 +182,55 @@ class Pjsua(SipphoneAbstractBaseClass):
             DoorPi().event_handler.unregister_source(__name__, True)
             return
 
-    def self_check(self, *args, **kwargs):
-        self.lib.thread_register('pjsip_handle_events')
-
-        self.lib.handle_events(self.call_timeout)
-
-        if self.current_call is not None:
-            if self.current_call.is_valid() is 0:
-                del self.current_callcallback
-                self.current_callcallback = None
-                del self.current_call
-                self.current_call = None
-
-            try:
-                if self.current_call.info().call_time == 0 \
-                and self.current_call.info().total_time > self.call_timeout:
-                    logger.info("call timeout - hangup current call after %s seconds", self.call_timeout)
-                    self.current_call.hangup()
-                    DoorPi().event_handler('OnSipPhoneCallTimeoutNoResponse', __name__)
-
-                if self.current_call.info().call_time > self.max_call_time:
-                    logger.info("max call time reached - hangup current call after %s seconds", self.max_call_time)
-                    self.current_call.hangup()
-                    DoorPi().event_handler('OnSipPhoneCallTimeoutMaxCalltime', __name__)
-            except:
-                pass
+    def iterate(self):
+        self.lib.handle_events(0)
+
+        if self.current_call is not None and self.current_call.is_valid() is 0:
+            del self.current_callcallback
+            self.current_callcallback = None
+            del self.current_call
+            self.current_call = None
+
+    def start_call_deadlines(self):
+        self._set_call_deadline('no_response', self.call_timeout, self.__check_call_timeout)
+        self._set_call_deadline('max_call_time', self.max_call_time, self.__check_max_call_time)
+        self.pump.wake()
+
+    def __deadline_call(self):
+        call = self.current_call
+        if call is None or call.is_valid() is 0: return None
+        return call
+
+    def __check_call_timeout(self):
+        call = self.__deadline_call()
+        if call is None or call.info().call_time != 0: return None
+        logger.info("call timeout - hangup current call after %s seconds", self.call_timeout)
+        call.hangup()
+        DoorPi().event_handler('OnSipPhoneCallTimeoutNoResponse', __name__)
+
+    def __check_max_call_time(self):
+        call = self.__deadline_call()
+        if call is None: return None
+        # call_time counts from connect - check again when it could be reached
+        call_time = call.info().call_time
+        if call_time < self.max_call_time: return self.max_call_time - call_time
+        logger.info("max call time reached - hangup current call after %s seconds", self.max_call_time)
+        call.hangup()
+        DoorPi().event_handler('OnSipPhoneCallTimeoutMaxCalltime', __name__)
 
     def call(self, number):
+        return self._call_with_trace(self.__call, number)
+
+    def __call(self, number):
         DoorPi().event_handler('BeforeSipPhoneMakeCall', __name__, {'number':number})
         logger.debug("call(%s)",str(number))
+        # a queued call is made later by __make_call - within the trace of this call
+        if self.registration.queue_call(self.__make_call, number): return None
+        # only the pump thread is registered at pjsua
+        return self.pump.run_in_thread(self.__make_call, number)
 
-        self.lib.thread_register('call_theard')
-
-        sip_server = doorpi.sipphone.pjsua_lib.Config.sipphone_server()
+    def __make_call(self, number):
+        sip_server = self.registration.registrar or doorpi.sipphone.pjsua_lib.Config.sipphone_server()
         sip_uri = "sip:"+str(number)+"@"+str(sip_server)
 
         if self.lib.verify_sip_url(sip_uri) is not 0:
@@ -227,6 +248,7 @@ class Pjsua(SipphoneAbstractBaseClass):
                 self.current_callcallback
             )
             del lck
+            self.start_call_deadlines()
 
         elif self.current_call.info().remote_uri == sip_uri:
             if self.current_call.info().total_time <= 1:
@@ -247,6 +269,29 @@ class Pjsua(SipphoneAbstractBaseClass):
         DoorPi().event_handler('AfterSipPhoneMakeCall', __name__)
         return self.current_call
 
+    def _ring_target(self, number):
+        sip_server = self.registration.registrar or doorpi.sipphone.pjsua_lib.Config.sipphone_server()
+        sip_uri = "sip:"+str(number)+"@"+str(sip_server)
+        if self.lib.verify_sip_url(sip_uri) is not 0:
+            logger.warning("SIP-URI %s is not valid (Errorcode: %s)", sip_uri, self.lib.verify_sip_url(sip_uri))
+            return None, None
+        lck = self.lib.auto_lock()
+        callback = SipPhoneCallCallBack()
+        call = self.__account.make_call(sip_uri, callback)
+        del lck
+        return call.info().sip_call_id, (call, callback)
+
+    def _use_registrar(self, registrar):
+        self.__account.modify(doorpi.sipphone.pjsua_lib.Config.create_AccountConfig(registrar))
+        self.__account.set_registration(True)
+
+    def _ring_cancel(self, handle):
+        handle[0].hangup()
+
+    def _ring_connected(self, handle):
+        self.current_call, self.current_callcallback = handle
+        self.start_call_deadlines()
+
     def is_admin_number(self, remote_uri = None):
         logger.debug("is_admin_number (%s)",remote_uri)
 
@@ -257,21 +302,12 @@ class Pjsua(SipphoneAbstractBaseClass):
                 logger.debug("couldn't catch current call - no parameter and no current_call from doorpi itself")
                 return False
 
-        possible_admin_numbers = DoorPi().config.get_keys('AdminNumbers')
-        for admin_number in possible_admin_numbers:
-            if admin_number == "*":
-                logger.info("admin numbers are deactivated by using '*' as single number")
-                return True
-            if "sip:"+admin_number+"@" in remote_uri:
-                logger.debug("%s is an adminnumber", remote_uri)
-                return True
-            if "sip:"+admin_number is remote_uri:
-                logger.debug("%s is adminnumber %s", remote_uri, admin_number)
-                return True
-        logger.debug("%s is not an adminnumber", remote_uri)
-        return False
+        return SipphoneAbstractBaseClass.is_admin_number(self, remote_uri)
 
     def hangup(self):
+        self.pump.run_in_thread(self.__hangup)
+
+    def __hangup(self):
         if self.current_call:
             logger.debug("Received hangup request, cancelling current call")
             self.lib.hangup_all()
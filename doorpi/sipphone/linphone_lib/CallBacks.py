@@ -8,6 +8,11 @@ logger.debug("%s loaded", __name__)
 from time import sleep
 import linphone
 from doorpi import DoorPi
+from doorpi.action.matcher import SequenceMatcher
+from doorpi.sipphone.CallSetupTrace import PHASE_INVITE, PHASE_RINGING, PHASE_CONNECTED, PHASE_MEDIA
+from doorpi.sipphone.RegistrationMonitor import REGISTRATION_OK, REGISTRATION_FAILED, REGISTRATION_CLEARED, REGISTRATION_PROGRESS
+
+DTMF_HISTORY_SIZE = 32
 
 class LinphoneCallbacks:
 
@@ -15,7 +20,7 @@ class LinphoneCallbacks:
     def used_callbacks(self): return {
         #http://www.linphone.org/docs/liblinphone/struct__LinphoneCoreVTable.html
         #'global_state_changed': self.global_state_changed, #Notifies global state changes
-        #'registration_state_changed': self.registration_state_changed, #Notifies registration state changes
+        'registration_state_changed': self.registration_state_changed, #Notifies registration state changes
         'call_state_changed': self.call_state_changed, #Notifies call state changes
         #'notify_presence_received': self.notify_presence_received, #Notify received presence events
         #'new_subscription_requested': self.new_subscription_requested, #Notify about pending presence subscription request
@@ -42,22 +47,9 @@ class LinphoneCallbacks:
     def whitelist(self): return DoorPi().config.get_keys('AdminNumbers')
 
     def is_admin_number(self, remote_uri):
-        logger.debug("is_admin_number (%s)",remote_uri)
-        for admin_number in self.whitelist:
-            if admin_number == "*":
-                logger.info("admin numbers are deactivated by using '*' as single number")
-                return True
-            if "sip:"+admin_number+"@" in remote_uri:
-                logger.debug("%s is adminnumber %s", remote_uri, admin_number)
-                return True
-            if "sip:"+admin_number is remote_uri:
-                logger.debug("%s is adminnumber %s", remote_uri, admin_number)
-                return True
-        logger.debug("%s is not an adminnumber", remote_uri)
-        return False
-
-    __DTMF = ''
-    __possible_DTMF = []
+        return DoorPi().sipphone.is_admin_number(remote_uri)
+
+    __DTMF = None
 
     def __init__(self):
         logger.debug("__init__")
@@ -80,9 +72,11 @@ class LinphoneCallbacks:
         DoorPi().event_handler.register_event('OnCallStart', __name__)
         DoorPi().event_handler.register_event('OnDTMF', __name__)
 
-        self.__possible_DTMF = DoorPi().config.get_keys('DTMF')
-        for DTMF in self.__possible_DTMF:
+        possible_DTMF = DoorPi().config.get_keys('DTMF')
+        for DTMF in possible_DTMF:
             DoorPi().event_handler.register_event('OnDTMF_'+DTMF, __name__)
+        # keys are quoted in the configfile ("123") - the matcher gets the digits only
+        self.__DTMF = SequenceMatcher(dict((DTMF[1:-1], DTMF) for DTMF in possible_DTMF), DTMF_HISTORY_SIZE)
 
         DoorPi().event_handler.register_event('OnCallStart', __name__)
         DoorPi().event_handler.register_event('BeforeCallIncoming', __name__)
@@ -102,15 +96,27 @@ class LinphoneCallbacks:
         logger.debug("destroy")
         DoorPi().event_handler.unregister_source(__name__, True)
 
+    def __call_event(self, call, event_name, kwargs = None):
+        # events of one call are fired in order - one call doesn't wait for the others
+        DoorPi().sipphone.call_events.put(call.call_log.call_id, event_name, __name__, kwargs)
+
     def global_state_changed(self, core, global_state, message): pass
-    def registration_state_changed(self, core, linphone_proxy_config, state, message): pass
+    def registration_state_changed(self, core, linphone_proxy_config, state, message):
+        logger.debug("registration_state_changed (%s - %s)", state, message)
+        if state == linphone.RegistrationState.Ok: registration_state = REGISTRATION_OK
+        elif state == linphone.RegistrationState.Failed: registration_state = REGISTRATION_FAILED
+        elif state == linphone.RegistrationState.Cleared: registration_state = REGISTRATION_CLEARED
+        else: registration_state = REGISTRATION_PROGRESS
+        DoorPi().sipphone.registration.registration_state(registration_state, message)
     def call_state_changed(self, core, call, call_state, message):
         self.call_state_changed_handle(core, call, call_state, message)
 
         if core.calls_nb > 0 and self._last_number_of_calls == 0:
-            DoorPi().event_handler('OnMediaRequired', __name__)
-        elif self._last_number_of_calls is not core.calls_nb:
-            DoorPi().event_handler('OnMediaNotRequired', __name__)
+            self.__call_event(call, 'OnMediaRequired')
+        elif core.calls_nb < self._last_number_of_calls \
+        and not DoorPi().sipphone.is_lost_ring_group_call(call.call_log.call_id):
+            # more calls (ring group) or the end of a lost ring group call don't end the media
+            self.__call_event(call, 'OnMediaNotRequired')
         self._last_number_of_calls = core.calls_nb
 
     def call_state_changed_handle(self, core, call, call_state, message):
@@ -118,7 +124,7 @@ class LinphoneCallbacks:
 
         remote_uri = call.remote_address.as_string_uri_only()
 
-        DoorPi().event_handler('OnCallStateChange', __name__, {
+        self.__call_event(call, 'OnCallStateChange', {
             'remote_uri': remote_uri,
             'call_state': call_state,
             'state': message
@@ -127,7 +133,7 @@ class LinphoneCallbacks:
         if call_state == linphone.CallState.Idle:
             pass
         elif call_state == linphone.CallState.IncomingReceived:
-            DoorPi().event_handler('BeforeCallIncoming', __name__, {'remote_uri': remote_uri})
+            self.__call_event(call, 'BeforeCallIncoming', {'remote_uri': remote_uri})
             if core.current_call and core.current_call.state > linphone.CallState.IncomingReceived:
                 logger.debug("Incoming call while another call is active")
                 logger.debug("- incoming.remote_uri: %s", call)
@@ -135,74 +141,87 @@ class LinphoneCallbacks:
 
                 if core.current_call.remote_address.as_string_uri_only() == remote_uri:
                     logger.info("Current call is incoming call - quitting current and connecting to incoming. Maybe connection reset?")
-                    DoorPi().event_handler('OnCallReconnect', __name__, {'remote_uri': remote_uri})
+                    self.__call_event(call, 'OnCallReconnect', {'remote_uri': remote_uri})
                     core.terminate_call(core.current_call)
                     DoorPi().sipphone.reset_call_start_datetime()
                     core.accept_call_with_params(call, DoorPi().sipphone.base_config)
-                    DoorPi().event_handler('AfterCallReconnect', __name__)
+                    self.__call_event(call, 'AfterCallReconnect')
                     return
                 else:
                     if self.is_admin_number(remote_uri):
                         logger.info("Incoming and current call are different - incoming is AdminNumber, so hanging up current call")
-                        DoorPi().event_handler('OnCallIncoming', __name__, {'remote_uri': remote_uri})
+                        self.__call_event(call, 'OnCallIncoming', {'remote_uri': remote_uri})
                         core.terminate_call(core.current_call)
                         DoorPi().sipphone.reset_call_start_datetime()
                         core.accept_call_with_params(call, DoorPi().sipphone.base_config)
-                        DoorPi().event_handler('AfterCallIncoming', __name__, {'remote_uri': remote_uri})
+                        self.__call_event(call, 'AfterCallIncoming', {'remote_uri': remote_uri})
                         return
                     else:
                         logger.info("Incoming and current call are different - sending busy signal to incoming call")
-                        DoorPi().event_handler('OnCallBusy', __name__, {'remote_uri': remote_uri})
+                        self.__call_event(call, 'OnCallBusy', {'remote_uri': remote_uri})
                         core.decline_call(call, linphone.Reason.Busy)
-                        DoorPi().event_handler('AfterCallBusy', __name__)
+                        self.__call_event(call, 'AfterCallBusy')
                         return
             if self.is_admin_number(remote_uri):
-                DoorPi().event_handler('OnCallIncoming', __name__, {'remote_uri': remote_uri})
+                self.__call_event(call, 'OnCallIncoming', {'remote_uri': remote_uri})
                 DoorPi().sipphone.reset_call_start_datetime()
                 core.accept_call_with_params(call, DoorPi().sipphone.base_config)
-                DoorPi().event_handler('AfterCallIncoming', __name__, {'remote_uri': remote_uri})
+                self.__call_event(call, 'AfterCallIncoming', {'remote_uri': remote_uri})
                 return
             else:
-                DoorPi().event_handler('OnCallReject', __name__)
+                self.__call_event(call, 'OnCallReject')
                 core.decline_call(call, linphone.Reason.Forbidden) #Declined
-                DoorPi().event_handler('AfterCallReject', __name__)
+                self.__call_event(call, 'AfterCallReject')
                 return
         elif call_state == linphone.CallState.OutgoingInit:
-            pass
+            DoorPi().sipphone.call_trace.sip_state(call.call_log.call_id, PHASE_INVITE)
         elif call_state == linphone.CallState.OutgoingProgress:
             pass
         elif call_state == linphone.CallState.OutgoingRinging:
-            pass
+            DoorPi().sipphone.call_trace.sip_state(call.call_log.call_id, PHASE_RINGING)
         elif call_state == linphone.CallState.OutgoingEarlyMedia:
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            DoorPi().sipphone.call_trace.sip_state(call.call_log.call_id, PHASE_RINGING)
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Connected:
-            DoorPi().event_handler('OnCallStateConnect', __name__)
+            DoorPi().sipphone.call_trace.sip_state(call.call_log.call_id, PHASE_CONNECTED)
+            DoorPi().sipphone.ring_group_state(call.call_log.call_id, True)
+            # DTMF codes never reach over more than one call
+            self.__DTMF.reset()
+            self.__call_event(call, 'OnCallStateConnect')
         elif call_state == linphone.CallState.StreamsRunning:
-            DoorPi().event_handler('AfterCallStateConnect', __name__)
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            DoorPi().sipphone.call_trace.sip_state(call.call_log.call_id, PHASE_MEDIA)
+            self.__call_event(call, 'AfterCallStateConnect')
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Pausing:
             pass
         elif call_state == linphone.CallState.Paused:
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Resuming:
-            DoorPi().event_handler('OnCallStateConnect', __name__)
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            self.__call_event(call, 'OnCallStateConnect')
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Refered:
             pass
         elif call_state == linphone.CallState.Error:
-            if message == "Busy here": DoorPi().event_handler('OnCallStateDismissed', __name__)
+            DoorPi().sipphone.call_trace.call_ended(call.call_log.call_id)
+            DoorPi().sipphone.ring_group_state(call.call_log.call_id, False, message)
+            if DoorPi().sipphone.is_lost_ring_group_call(call.call_log.call_id): return
+            if message == "Busy here": self.__call_event(call, 'OnCallStateDismissed')
         elif call_state == linphone.CallState.End:
-            if message == "Call declined.": DoorPi().event_handler('OnCallStateReject', __name__)
-            DoorPi().event_handler('OnCallStateDisconnect', __name__)
+            DoorPi().sipphone.call_trace.call_ended(call.call_log.call_id)
+            DoorPi().sipphone.ring_group_state(call.call_log.call_id, False, message)
+            # the other targets of the ring group still ring (or one of them answered)
+            if DoorPi().sipphone.is_lost_ring_group_call(call.call_log.call_id): return
+            if message == "Call declined.": self.__call_event(call, 'OnCallStateReject')
+            self.__call_event(call, 'OnCallStateDisconnect')
         elif call_state == linphone.CallState.PausedByRemote:
             pass
         elif call_state == linphone.CallState.UpdatedByRemote:
             pass
         elif call_state == linphone.CallState.IncomingEarlyMedia:
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Updating:
-            DoorPi().event_handler('OnCallStateConnect', __name__)
-            DoorPi().event_handler('OnCallMediaStateChange', __name__)
+            self.__call_event(call, 'OnCallStateConnect')
+            self.__call_event(call, 'OnCallMediaStateChange')
         elif call_state == linphone.CallState.Released:
             pass
         elif call_state == linphone.CallState.EarlyUpdatedByRemote:
@@ -218,14 +237,12 @@ class LinphoneCallbacks:
     def dtmf_received(self, core, call, digits):
         logger.debug("on_dtmf_digit (%s)", str(digits))
         digits = chr(digits)
-        DoorPi().event_handler('OnDTMF', __name__, {'digits':digits})
-        self.__DTMF += str(digits)
-        for DTMF in self.__possible_DTMF:
-            if self.__DTMF.endswith(DTMF[1:-1]):
-                DoorPi().event_handler('OnDTMF_'+DTMF+'', __name__, {
-                    'remote_uri': str(call.remote_address.as_string_uri_only()),
-                    'DTMF': str(self.__DTMF)
-                })
+        self.__call_event(call, 'OnDTMF', {'digits':digits})
+        for DTMF in self.__DTMF.feed(str(digits)):
+            self.__call_event(call, 'OnDTMF_'+DTMF+'', {
+                'remote_uri': str(call.remote_address.as_string_uri_only()),
+                'DTMF': self.__DTMF.history
+            })
     def refer_received(self, core, refer_to): pass
     def call_encryption_changed(self, core, call, on, authentication_token): pass
     def transfer_state_changed(self, core, call, transfer_state): pass
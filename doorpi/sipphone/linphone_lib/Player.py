@@ -8,7 +8,7 @@ logger.debug("%s loaded", __name__)
 import os
 
 import doorpi
-from doorpi.media.CreateDialTone import generate_dial_tone
+from doorpi.media.CreateDialTone import generate_tone
 from doorpi.sipphone.AbstractBaseClass import PlayerAbstractBaseClass, SIPPHONE_SECTION
 
 class LinphonePlayer(PlayerAbstractBaseClass):
@@ -38,7 +38,10 @@ class LinphonePlayer(PlayerAbstractBaseClass):
         if not os.path.isfile(self.__player_filename) or dialtone_renew_every_start:
             logger.info('DialTone %s does not exist - creating it now', self.__player_filename)
             dialtone_volume = doorpi.DoorPi().config.get_int(SIPPHONE_SECTION, 'dialtone_volume', 35)
-            generate_dial_tone(self.__player_filename, dialtone_volume)
+            dialtone_pattern = doorpi.DoorPi().config.get_string(SIPPHONE_SECTION, 'dialtone_pattern', 'dialtone')
+            dialtone_cache = doorpi.DoorPi().config.get_string_parsed(SIPPHONE_SECTION, 'dialtone_cache',
+                                                                      '!BASEPATH!/media/tones')
+            generate_tone(self.__player_filename, dialtone_pattern, dialtone_volume, dialtone_cache)
         doorpi.DoorPi().event_handler.register_event('OnPlayerStarted', __name__)
         doorpi.DoorPi().event_handler.register_event('OnPlayerStopped', __name__)
         doorpi.DoorPi().event_handler.register_event('OnPlayerCreated', __name__)
@@ -36,7 +36,7 @@ def create_UAConfig():
     logger.debug("create_UAConfig")
     # Doc: http://www.pjsip.org/python/pjsua.htm#UAConfig
     UAConfig = pj.UAConfig()
-    UAConfig.max_calls = conf.get_int(SIPPHONE_SECTION, 'ua.max_calls', 1)
+    UAConfig.max_calls = conf.get_int(SIPPHONE_SECTION, 'ua.max_calls', 2)
     UAConfig.nameserver = conf.get_list(SIPPHONE_SECTION, 'ua.nameserver', [])
     UAConfig.stun_domain = conf.get(SIPPHONE_SECTION, 'ua.stun_domain', '')
     UAConfig.stun_host = conf.get(SIPPHONE_SECTION, 'ua.stun_host', '')
@@ -81,10 +81,10 @@ def create_LogConfig():
     )
     return LogConfig
 
-def create_AccountConfig():
+def create_AccountConfig(server = None):
     logger.debug("create_AccountConfig")
     # Doc: http://www.pjsip.org/python/pjsua.htm#AccountConfig
-    server = conf.get(SIPPHONE_SECTION, "sipserver_server")
+    if server is None: server = conf.get(SIPPHONE_SECTION, "sipserver_server")
     username = conf.get(SIPPHONE_SECTION, "sipserver_username")
     password = conf.get(SIPPHONE_SECTION, "sipserver_password")
     realm = conf.get(SIPPHONE_SECTION, "sipserver_realm")
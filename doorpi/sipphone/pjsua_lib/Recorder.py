@@ -67,7 +67,9 @@ class PjsuaRecorder(RecorderAbstractBaseClass):
             self.__rec_id = DoorPi().sipphone.lib.create_recorder(self.__last_record_filename)
             self.__slot_id = DoorPi().sipphone.lib.recorder_get_slot(self.__rec_id)
             DoorPi().sipphone.lib.conf_connect(0, self.__slot_id)
-            DoorPi().event_handler('OnRecorderStarted', __name__)
+            DoorPi().event_handler('OnRecorderStarted', __name__, {
+                'last_record_filename': self.__last_record_filename
+            })
 
     def stop(self):
         if self.__rec_id is not None:
@@ -77,4 +79,6 @@ class PjsuaRecorder(RecorderAbstractBaseClass):
             DoorPi().sipphone.lib.recorder_destroy(self.__rec_id)
             self.__rec_id = None
             self.__slot_id = None
-            DoorPi().event_handler('OnRecorderStopped', __name__)
\ No newline at end of file
+            DoorPi().event_handler('OnRecorderStopped', __name__, {
+                'last_record_filename': self.__last_record_filename
+            })
\ No newline at end of file
@@ -11,6 +11,7 @@ import time
 import os
 import pjsua as pj
 from doorpi import DoorPi
+from doorpi.sipphone.RegistrationMonitor import REGISTRATION_OK, REGISTRATION_FAILED, REGISTRATION_PROGRESS
 from SipPhoneCallCallBack import SipPhoneCallCallBack as CallCallback
 
 class SipPhoneAccountCallBack(pj.AccountCallback):
@@ -47,6 +48,12 @@ class SipPhoneAccountCallBack(pj.AccountCallback):
             if self.account.info().reg_status >= 200:
                 self.sem.release()
 
+        reg_status = self.account.info().reg_status
+        if reg_status < 200: registration_state = REGISTRATION_PROGRESS
+        elif reg_status < 300: registration_state = REGISTRATION_OK
+        else: registration_state = REGISTRATION_FAILED
+        DoorPi().sipphone.registration.registration_state(registration_state, self.account.info().reg_reason)
+
         #DoorPi().event_handler('AfterAccountRegState', __name__)
         #logger.debug(self.account.info.reg_status)
 
@@ -55,6 +62,11 @@ class SipPhoneAccountCallBack(pj.AccountCallback):
         call.set_callback(DoorPi().sipphone.current_callcallback)
         DoorPi().sipphone.current_call = call
         DoorPi().sipphone.current_call.answer(code = 200)
+        DoorPi().sipphone.start_call_deadlines()
+
+    def __call_event(self, call, event_name, kwargs = None):
+        # same queue as the events of SipPhoneCallCallBack - in order per call
+        DoorPi().sipphone.call_events.put(call.info().sip_call_id, event_name, __name__, kwargs)
 
     def on_incoming_call(self, call):
         # SIP-Status-Codes: http://de.wikipedia.org/wiki/SIP-Status-Codes
@@ -65,7 +77,7 @@ class SipPhoneAccountCallBack(pj.AccountCallback):
         # 494 = Security Agreement Required
         logger.debug("on_incoming_call")
         logger.info("Incoming call from %s", str(call.info().remote_uri))
-        DoorPi().event_handler('BeforeCallIncoming', __name__)
+        self.__call_event(call, 'BeforeCallIncoming')
 
         call.answer(180)
 
@@ -76,27 +88,27 @@ class SipPhoneAccountCallBack(pj.AccountCallback):
 
             if call.info().remote_uri == DoorPi().sipphone.current_call.info().remote_uri:
                 logger.info("Current call is incoming call - quitting current and connecting to incoming. Maybe connection reset?")
-                DoorPi().event_handler('OnCallReconnect', __name__, {'remote_uri': call.info().remote_uri})
+                self.__call_event(call, 'OnCallReconnect', {'remote_uri': call.info().remote_uri})
                 DoorPi().current_call.hangup()
                 self.answer_call(call)
-                DoorPi().event_handler('AfterCallReconnect', __name__)
+                self.__call_event(call, 'AfterCallReconnect')
                 return
             else:
                 logger.info("Incoming and current call are different - sending busy signal to incoming call")
-                DoorPi().event_handler('OnCallBusy', __name__, {'remote_uri': call.info().remote_uri})
+                self.__call_event(call, 'OnCallBusy', {'remote_uri': call.info().remote_uri})
                 call.answer(code = 494, reason = "Security Agreement Required")
-                DoorPi().event_handler('AfterCallBusy', __name__)
+                self.__call_event(call, 'AfterCallBusy')
                 return
 
         if DoorPi().sipphone.is_admin_number(call.info().remote_uri):
             logger.debug("Incoming call from trusted admin number %s -> autoanswer", call.info().remote_uri)
-            DoorPi().event_handler('OnCallIncoming', __name__, {'remote_uri': call.info().remote_uri})
+            self.__call_event(call, 'OnCallIncoming', {'remote_uri': call.info().remote_uri})
             self.answer_call(call)
-            DoorPi().event_handler('AfterCallIncoming', __name__)
+            self.__call_event(call, 'AfterCallIncoming')
             return
         else:
             logger.debug("Incoming call ist not from a trusted admin number %s -> sending busy signal", call.info().remote_uri)
-            DoorPi().event_handler('OnCallReject', __name__, {'remote_uri': call.info().remote_uri})
+            self.__call_event(call, 'OnCallReject', {'remote_uri': call.info().remote_uri})
             call.answer(code = 494, reason = "Security Agreement Required")
-            DoorPi().event_handler('AfterCallReject', __name__)
+            self.__call_event(call, 'AfterCallReject')
             return
\ No newline at end of file
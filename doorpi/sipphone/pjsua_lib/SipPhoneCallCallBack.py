@@ -11,13 +11,16 @@ import time
 import os
 import pjsua as pj
 from doorpi import DoorPi
+from doorpi.action.matcher import SequenceMatcher
+from doorpi.sipphone.CallSetupTrace import PHASE_INVITE, PHASE_RINGING, PHASE_CONNECTED, PHASE_MEDIA
+
+DTMF_HISTORY_SIZE = 32
 
 class SipPhoneCallCallBack(pj.CallCallback):
 
     Lib = None
 
-    __DTMF = ''
-    __possible_DTMF = []
+    __DTMF = None
 
     def __init__(self, PlayerID = None, call = None):
         logger.debug("__init__")
@@ -34,9 +37,11 @@ class SipPhoneCallCallBack(pj.CallCallback):
         DoorPi().event_handler.register_event('OnCallStart', __name__)
         DoorPi().event_handler.register_event('OnDTMF', __name__)
 
-        self.__possible_DTMF = DoorPi().config.get_keys('DTMF')
-        for DTMF in self.__possible_DTMF:
+        possible_DTMF = DoorPi().config.get_keys('DTMF')
+        for DTMF in possible_DTMF:
             DoorPi().event_handler.register_event('OnDTMF_'+DTMF, __name__)
+        # keys are quoted in the configfile ("123") - the matcher gets the digits only
+        self.__DTMF = SequenceMatcher(dict((DTMF[1:-1], DTMF) for DTMF in possible_DTMF), DTMF_HISTORY_SIZE)
 
         DoorPi().event_handler('OnCallStart', __name__)
 
@@ -47,23 +52,40 @@ class SipPhoneCallCallBack(pj.CallCallback):
         logger.debug("destroy")
         DoorPi().event_handler.unregister_source(__name__, True)
 
+    def __call_event(self, event_name, kwargs = None):
+        # events of one call are fired in order - one call doesn't wait for the others
+        DoorPi().sipphone.call_events.put(self.call.info().sip_call_id, event_name, __name__, kwargs)
+
     def on_media_state(self):
         logger.debug("on_media_state (%s)",str(self.call.info().media_state))
-        DoorPi().event_handler('OnCallMediaStateChange', __name__, {
+        if self.call.info().media_state == pj.MediaState.ACTIVE:
+            DoorPi().sipphone.call_trace.sip_state(self.call.info().sip_call_id, PHASE_MEDIA)
+        self.__call_event('OnCallMediaStateChange', {
             'remote_uri': self.call.info().remote_uri,
             'media_state': str(self.call.info().media_state)
         })
 
     def on_state(self):
         logger.debug("on_state (%s)", self.call.info().state_text)
-        DoorPi().event_handler('OnCallStateChange', __name__, {
+        self.__call_event('OnCallStateChange', {
             'remote_uri': self.call.info().remote_uri,
             'state': self.call.info().state_text
         })
 
+        if self.call.info().state == pj.CallState.CALLING:
+            DoorPi().sipphone.call_trace.sip_state(self.call.info().sip_call_id, PHASE_INVITE)
+        elif self.call.info().state == pj.CallState.EARLY:
+            DoorPi().sipphone.call_trace.sip_state(self.call.info().sip_call_id, PHASE_RINGING)
+        elif self.call.info().state == pj.CallState.CONFIRMED:
+            DoorPi().sipphone.call_trace.sip_state(self.call.info().sip_call_id, PHASE_CONNECTED)
+            DoorPi().sipphone.ring_group_state(self.call.info().sip_call_id, True)
+        elif self.call.info().state == pj.CallState.DISCONNECTED:
+            DoorPi().sipphone.call_trace.call_ended(self.call.info().sip_call_id)
+            DoorPi().sipphone.ring_group_state(self.call.info().sip_call_id, False, self.call.info().last_reason)
+
         if self.call.info().state in [pj.CallState.CONFIRMED] \
         and self.call.info().media_state == pj.MediaState.ACTIVE:
-            DoorPi().event_handler('OnCallStateConnect', __name__, {
+            self.__call_event('OnCallStateConnect', {
                 'remote_uri': self.call.info().remote_uri
             })
             call_slot = self.call.info().conf_slot
@@ -72,26 +94,31 @@ class SipPhoneCallCallBack(pj.CallCallback):
             self.Lib.conf_connect(0, call_slot)
             logger.debug("conneted Media to call_slot %s",str(call_slot))
 
-            DoorPi().event_handler('AfterCallStateConnect', __name__, {
+            self.__call_event('AfterCallStateConnect', {
                 'remote_uri': self.call.info().remote_uri
             })
 
         if self.call.info().state == pj.CallState.DISCONNECTED:
             call_slot = self.call.info().conf_slot
+            # the other targets of the ring group still ring (or one of them answered)
+            lost_call = DoorPi().sipphone.is_lost_ring_group_call(self.call.info().sip_call_id)
 
             # If conf_slot is not greater than -1, the call has not yet been accepted
-            if call_slot > -1:
-                DoorPi().event_handler('OnCallStateDisconnect', __name__, {
+            if call_slot > -1 and lost_call:
+                self.Lib.conf_disconnect(call_slot, 0)
+                self.Lib.conf_disconnect(0, call_slot)
+            elif call_slot > -1:
+                self.__call_event('OnCallStateDisconnect', {
                     'remote_uri': self.call.info().remote_uri
                 })
                 self.Lib.conf_disconnect(call_slot, 0)
                 self.Lib.conf_disconnect(0, call_slot)
                 logger.debug("disconneted Media from call_slot %s",str(call_slot))
-                DoorPi().event_handler('AfterCallStateDisconnect', __name__, {
+                self.__call_event('AfterCallStateDisconnect', {
                     'remote_uri': self.call.info().remote_uri
                 })
-            else:
-                DoorPi().event_handler('OnCallStateDismissed', __name__, {
+            elif not lost_call:
+                self.__call_event('OnCallStateDismissed', {
                     'remote_uri': self.call.info().remote_uri
                 })
 
@@ -99,10 +126,8 @@ class SipPhoneCallCallBack(pj.CallCallback):
     def on_dtmf_digit(self, digits):
         logger.debug("on_dtmf_digit (%s)",str(digits))
 
-        self.__DTMF += str(digits)
-        for DTMF in self.__possible_DTMF:
-            if self.__DTMF.endswith(DTMF[1:-1]):
-                DoorPi().event_handler('OnDTMF_'+DTMF+'', __name__, {
-                    'remote_uri': str(self.call.info().remote_uri),
-                    'DTMF': str(self.__DTMF)
-                })
+        for DTMF in self.__DTMF.feed(str(digits)):
+            self.__call_event('OnDTMF_'+DTMF+'', {
+                'remote_uri': str(self.call.info().remote_uri),
+                'DTMF': self.__DTMF.history
+            })
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+CAMERA_SECTION = 'Camera'
+
+REQUIREMENT = dict(
+    fulfilled_with_one = True,
+    text_description = '''Der Kamera-Dienst hält die Kamera dauerhaft offen und speichert die letzten Bilder (JPEG) in einem Ringpuffer.
+Die Action take_snapshot (ohne URL als Parameter) schreibt dann nur noch ein Bild aus dem Puffer - ohne die 1-2 Sekunden, die die Kamera sonst zum Einschalten braucht.
+Genommen wird das Bild, das snapshot_offset Sekunden vor dem Tastendruck aufgenommen wurde, der die Action ausgelöst hat. Damit ist der Besucher auch dann auf dem Bild, wenn er nach dem Klingeln gleich zur Seite tritt.
+
+Mögliche Quellen (source):
+<ul>
+<li>picamera - Raspberry Pi Kamera (Python-Modul picamera)</li>
+<li>v4l2 - USB-Webcam über Video4Linux (Python-Modul cv2 von OpenCV)</li>
+<li>mjpeg - IP-Kamera mit MJPEG-Stream oder Einzelbild-URL</li>
+<li>synthetic - erzeugte Testbilder ohne Hardware</li>
+</ul>
+
+Beispiel:
+<code>
+[Camera]
+source = picamera
+resolution = 1024x768
+fps = 2
+buffer_frames = 10
+snapshot_offset = 0.5
+
+[EVENT_OnKeyPressed]
+10 = take_snapshot
+20 = mailto:visitor@example.com,Besucher,!INFOS!,!LAST_SNAPSHOT!
+</code>
+''',
+    events = [
+        #dict( name = 'Vorlage', description = ''),
+    ],
+    configuration = [
+        dict( section = CAMERA_SECTION, key = 'source', type = 'string', default = '', mandatory = False, description = 'Quelle der Bilder: picamera, v4l2, mjpeg oder synthetic (leer = kein Kamera-Dienst, take_snapshot öffnet die picamera bei jedem Bild).'),
+        dict( section = CAMERA_SECTION, key = 'resolution', type = 'string', default = '1024x768', mandatory = False, description = 'Auflösung der Bilder (Breite x Höhe).'),
+        dict( section = CAMERA_SECTION, key = 'fps', type = 'float', default = '2', mandatory = False, description = 'Bilder pro Sekunde, die im Puffer gespeichert werden.'),
+        dict( section = CAMERA_SECTION, key = 'buffer_frames', type = 'integer', default = '10', mandatory = False, description = 'Anzahl der Bilder im Puffer - buffer_frames / fps ist die Zeit, die der Puffer zurück reicht.'),
+        dict( section = CAMERA_SECTION, key = 'snapshot_offset', type = 'float', default = '0.5', mandatory = False, description = 'So viele Sekunden vor dem Tastendruck soll das Bild aufgenommen sein.'),
+        dict( section = CAMERA_SECTION, key = 'quality', type = 'integer', default = '85', mandatory = False, description = 'JPEG-Qualität (picamera und v4l2).'),
+        dict( section = CAMERA_SECTION, key = 'device', type = 'string', default = '0', mandatory = False, description = 'Nummer (/dev/videoX) oder Pfad der Webcam (v4l2).'),
+        dict( section = CAMERA_SECTION, key = 'url', type = 'string', default = '', mandatory = False, description = 'URL des MJPEG-Streams oder eines Einzelbilds der IP-Kamera (mjpeg).'),
+        dict( section = CAMERA_SECTION, key = 'timeout', type = 'float', default = '10', mandatory = False, description = 'Timeout in Sekunden für die Verbindung zur IP-Kamera (mjpeg).')
+    ],
+    libraries = dict(
+        picamera = dict(
+            text_warning =          'Die Kamera muss mit <code>sudo raspi-config</code> aktiviert werden.',
+            text_description =      'Das Python-Modul picamera steuert die Raspberry Pi Kamera.',
+            text_installation =     '<code>sudo apt-get install python-picamera</code>',
+            auto_install =          False,
+            text_test =             'Der Status kann gestestet werden, in dem im Python-Interpreter <code>import picamera</code> eingeben wird.',
+            text_configuration =    '',
+            configuration = [],
+            text_links = {
+                'picamera.readthedocs.io': 'https://picamera.readthedocs.io/'
+            }
+        ),
+        cv2 = dict(
+            text_warning =          '',
+            text_description =      'OpenCV liest die Bilder von USB-Webcams (Video4Linux) und wandelt sie in JPEG um.',
+            text_installation =     '<code>sudo apt-get install python-opencv</code>',
+            auto_install =          False,
+            text_test =             'Der Status kann gestestet werden, in dem im Python-Interpreter <code>import cv2</code> eingeben wird.',
+            text_configuration =    '',
+            configuration = [],
+            text_links = {
+                'opencv.org': 'https://opencv.org/'
+            }
+        )
+    )
+)
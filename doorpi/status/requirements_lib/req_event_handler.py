@@ -20,6 +20,51 @@ Die ausgelösten Events werden in einer Datenbank (SQLLite) gespeichert und kön
     ],
     configuration = [
         #dict( section = 'DoorPi', key = 'eventlog', type = 'string', default = '!BASEPATH!/conf/eventlog.db', mandatory = False, description = 'Ablageort der SQLLite Datenbank für den Event-Handler.'),
+        dict( section = 'DoorPi', key = 'eventlog_commit_interval', type = 'float', default = '1', mandatory = False, description = 'Die Einträge der Event-Datenbank werden gesammelt und spätestens nach so vielen Sekunden gespeichert (0 = jeder Eintrag sofort).'),
+        dict( section = 'DoorPi', key = 'trace_file', type = 'string', default = '', mandatory = False, description = 'Datei, an die alle Eingaben (Tasten, Sipphone-Events, Web-Trigger) und gestarteten Actions angehängt werden (leer = aus). Abspielen mit "doorpi_cli replay --tracefile [Datei] --configfile [Config]".'),
+        dict( section = 'EventHandler', key = 'lane_critical_events', type = 'string', default = '', mandatory = False, description = 'Kommagetrennte Liste von Event-Namen (Wildcards wie OnKeyPressed_* erlaubt), die in der Spur "critical" abgearbeitet werden.'),
+        dict( section = 'EventHandler', key = 'lane_normal_events', type = 'string', default = '', mandatory = False, description = 'Kommagetrennte Liste von Event-Namen, die in der Spur "normal" abgearbeitet werden.'),
+        dict( section = 'EventHandler', key = 'lane_timer_events', type = 'string', default = 'OnTime*', mandatory = False, description = 'Kommagetrennte Liste von Event-Namen, die in der Spur "timer" abgearbeitet werden. Die OnTime-Ticks und der Watchdog (statuswatchdog) haben eigene Threads, damit hängende HTTP-Anfragen oder Mails der Spur "besteffort" das Füttern des Watchdogs nicht verzögern. Langsame Actions (url_call, mailto) an OnTime-Events belegen einen Thread dieser Spur.'),
+        dict( section = 'EventHandler', key = 'lane_besteffort_events', type = 'string', default = '', mandatory = False, description = 'Kommagetrennte Liste von Event-Namen, die in der Spur "besteffort" abgearbeitet werden.'),
+        dict( section = 'EventHandler', key = 'lane_critical_actions', type = 'string', default = 'out,out_triggered,blink,call,ringgroup,hangup', mandatory = False, description = 'Events ohne feste Zuordnung laufen in der Spur der Action mit der höchsten Priorität. Diese Actions gehören zur Spur "critical".'),
+        dict( section = 'EventHandler', key = 'lane_timer_actions', type = 'string', default = 'statuswatchdog', mandatory = False, description = 'Actions der Spur "timer".'),
+        dict( section = 'EventHandler', key = 'lane_normal_actions', type = 'string', default = '', mandatory = False, description = 'Actions der Spur "normal". Nicht aufgeführte Actions gehören ebenfalls hierher.'),
+        dict( section = 'EventHandler', key = 'lane_besteffort_actions', type = 'string', default = 'mailto,statusfile,url_call,ipsrpc_setvalue,take_snapshot', mandatory = False, description = 'Actions der Spur "besteffort" (langsame Netzwerk- und Datei-Zugriffe). ipsrpc_call_value ruft an und gehört deshalb nicht hierher.'),
+        dict( section = 'EventHandler', key = 'lane_critical_workers', type = 'integer', default = '0', mandatory = False, description = 'Maximale Anzahl paralleler Threads der Spur "critical" (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_timer_workers', type = 'integer', default = '4', mandatory = False, description = 'Maximale Anzahl paralleler Threads der Spur "timer" (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_normal_workers', type = 'integer', default = '0', mandatory = False, description = 'Maximale Anzahl paralleler Threads der Spur "normal" (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_besteffort_workers', type = 'integer', default = '2', mandatory = False, description = 'Maximale Anzahl paralleler Threads der Spur "besteffort" (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_critical_max_queued', type = 'integer', default = '0', mandatory = False, description = 'Maximale Anzahl wartender Events der Spur "critical" - ist sie voll, wird das älteste verworfen (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_timer_max_queued', type = 'integer', default = '0', mandatory = False, description = 'Maximale Anzahl wartender Events der Spur "timer" (0 = unbegrenzt). Von den OnTime-Events wartet ohnehin nur der neueste Tick je Event.'),
+        dict( section = 'EventHandler', key = 'lane_normal_max_queued', type = 'integer', default = '0', mandatory = False, description = 'Maximale Anzahl wartender Events der Spur "normal" (0 = unbegrenzt).'),
+        dict( section = 'EventHandler', key = 'lane_besteffort_max_queued', type = 'integer', default = '100', mandatory = False, description = 'Maximale Anzahl wartender Events der Spur "besteffort" (0 = unbegrenzt).'),
+        dict( section = 'HTTP', key = 'connect_timeout', type = 'float', default = '3', mandatory = False, description = 'Timeout in Sekunden für den Verbindungsaufbau der Actions take_snapshot (URL), url_call und ipsrpc_*. Die Verbindungen zu einem Host werden offen gehalten und wiederverwendet.'),
+        dict( section = 'HTTP', key = 'read_timeout', type = 'float', default = '10', mandatory = False, description = 'Timeout in Sekunden, wenn der Server keine Daten mehr sendet.'),
+        dict( section = 'HTTP', key = 'retries', type = 'integer', default = '2', mandatory = False, description = 'Anzahl der Wiederholungen nach Verbindungsfehlern - nach einem Timeout beim Lesen und HTTP 502-504 nur, wenn die Anfrage wiederholt werden darf (nicht bei url_call).'),
+        dict( section = 'HTTP', key = 'retry_backoff', type = 'float', default = '0.5', mandatory = False, description = 'Wartezeit in Sekunden vor der ersten Wiederholung, danach jeweils doppelt so lang.'),
+        dict( section = 'HTTP', key = 'max_connections', type = 'integer', default = '4', mandatory = False, description = 'Maximale Anzahl paralleler Anfragen und offener Verbindungen je Host.'),
+        dict( section = 'SMTP', key = 'server', type = 'string', default = 'smtp.gmail.com', mandatory = False, description = 'SMTP-Server für die Action mailto.'),
+        dict( section = 'SMTP', key = 'port', type = 'integer', default = '465', mandatory = False, description = 'Port des SMTP-Servers.'),
+        dict( section = 'SMTP', key = 'username', type = 'string', default = '', mandatory = False, description = 'Benutzername für den SMTP-Server.'),
+        dict( section = 'SMTP', key = 'password', type = 'string', default = '', mandatory = False, description = 'Passwort für den SMTP-Server.'),
+        dict( section = 'SMTP', key = 'from', type = 'string', default = '', mandatory = False, description = 'Absender der Mails.'),
+        dict( section = 'SMTP', key = 'use_ssl', type = 'boolean', default = 'True', mandatory = False, description = 'Verbindung mit SSL (SMTPS).'),
+        dict( section = 'SMTP', key = 'use_tls', type = 'boolean', default = 'False', mandatory = False, description = 'Verbindung mit STARTTLS (nur ohne use_ssl).'),
+        dict( section = 'SMTP', key = 'need_login', type = 'boolean', default = 'True', mandatory = False, description = 'Anmeldung mit username und password.'),
+        dict( section = 'SMTP', key = 'signature', type = 'string', default = '!EPILOG!', mandatory = False, description = 'Signatur der Mails (leer = keine).'),
+        dict( section = 'SMTP', key = 'queue', type = 'string', default = '!BASEPATH!/conf/mail_queue.db', mandatory = False, description = 'SQLite-Datei der Mail-Warteschlange. mailto stellt die Mail nur in die Warteschlange, ein eigener Thread sendet sie - auch nach einem Neustart, wenn der Server vorher nicht erreichbar war (leer = nur im Speicher). Anhänge werden beim Einstellen in den Ordner daneben verlinkt oder kopiert (mail_queue_attachments für mail_queue.db) und mit der Mail gelöscht.'),
+        dict( section = 'SMTP', key = 'retries', type = 'integer', default = '5', mandatory = False, description = 'So oft wird eine Mail wiederholt, bevor sie als fehlgeschlagen in der Warteschlange bleibt (Antworten 5xx des Servers werden nicht wiederholt).'),
+        dict( section = 'SMTP', key = 'retry_backoff', type = 'float', default = '30', mandatory = False, description = 'Sekunden bis zur ersten Wiederholung - jede weitere wartet doppelt so lang.'),
+        dict( section = 'SMTP', key = 'retry_max_delay', type = 'float', default = '3600', mandatory = False, description = 'Höchstens so viele Sekunden zwischen zwei Wiederholungen.'),
+        dict( section = 'SMTP', key = 'idle_timeout', type = 'float', default = '60', mandatory = False, description = 'So viele Sekunden bleibt die angemeldete Verbindung nach der letzten Mail offen und wird für weitere Mails genutzt.'),
+        dict( section = 'SMTP', key = 'digest_delay', type = 'float', default = '0', mandatory = False, description = 'So viele Sekunden werden Mails an dieselben Empfänger gesammelt und als eine Mail mit allen Texten und Anhängen gesendet (0 = jede Mail einzeln).'),
+        dict( section = 'SMTP', key = 'timeout', type = 'float', default = '30', mandatory = False, description = 'Timeout in Sekunden für die Verbindung und jeden Befehl.'),
+        dict( section = 'IP-Symcon', key = 'server', type = 'string', default = '', mandatory = False, description = 'URL der JSON-RPC Schnittstelle von IP-Symcon für die Actions ipsrpc_setvalue und ipsrpc_call_value (z.B. http://ips:3777/api/).'),
+        dict( section = 'IP-Symcon', key = 'username', type = 'string', default = '', mandatory = False, description = 'Benutzername für IP-Symcon.'),
+        dict( section = 'IP-Symcon', key = 'password', type = 'string', default = '', mandatory = False, description = 'Passwort für IP-Symcon.'),
+        dict( section = 'IP-Symcon', key = 'jsonrpc', type = 'string', default = '2.0', mandatory = False, description = 'Version von JSON-RPC - nur mit 2.0 werden Aufrufe in Batches gesendet.'),
+        dict( section = 'IP-Symcon', key = 'cache_ttl', type = 'float', default = '300', mandatory = False, description = 'So viele Sekunden wird der Typ einer vorhandenen Variable gespeichert, statt ihn vor jedem SetValue abzufragen. Nicht vorhandene Variablen werden jedes Mal abgefragt.'),
+        dict( section = 'IP-Symcon', key = 'batch_delay', type = 'float', default = '0.02', mandatory = False, description = 'Ein Aufruf wird sofort gesendet, wenn keine andere Anfrage an IP-Symcon läuft. Sonst werden Aufrufe bis zu ihrer Antwort, höchstens so viele Sekunden, gesammelt und als ein Batch gesendet - mehrere SetValue einer Variable im selben Batch werden zum letzten Wert zusammengefasst (0 = jeder Aufruf einzeln).'),
     ],
     libraries = dict(
         threading = dict(
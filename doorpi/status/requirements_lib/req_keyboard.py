@@ -84,6 +84,8 @@ Wobei !BASEPATH! für das Home-Verzeichnis von DoorPi steht (meistens "/home/Doo
     configuration = [
         dict( section = 'keyboards', key = '*', type = 'string', default = 'dummy', mandatory = False, description = 'In der Sektion werden die genutzten Keyboards mit Namen und Typ im Stil <code>[KeyboardName] = [KeyboardTyp]</code> aufgelistet. Die komplette Sektion wird ausgelesen.'),
         dict( section = '[KeyboardName]', key = 'bouncetime', type = 'float', default = '2000', mandatory = False, description = 'bouncetime ist ein softwareseitiger Prellschutz innerhalb dessen Zeit in ms alle weiteren Ereignisse ignoriert werden.'),
+        dict( section = '[KeyboardName]', key = 'debounce', type = 'string', default = 'none', mandatory = False, description = 'Entprellung aller Eingänge in DoorPi selbst, bevor Events ausgelöst werden: <code>lockout</code> (erste Flanke zählt, weitere innerhalb von debounce_time werden ignoriert), <code>integrator</code> (Flanke zählt erst, wenn der Pegel debounce_time stabil war) oder <code>min_press</code> (Tastendruck zählt erst nach debounce_time gedrückt). Bei RFID-Lesern und Codes gilt lockout / integrator als Sperrzeit für Wiederholungen. Default bei rdm6300 und pn532 ist lockout.'),
+        dict( section = '[KeyboardName]', key = 'debounce_time', type = 'float', default = '0', mandatory = False, description = 'Zeit in ms für debounce (rdm6300: dismisstime, pn532: bouncetime).'),
         dict( section = '[KeyboardName]', key = 'polarity', type = 'integer', default = '0', mandatory = False, description = 'polarity verdreht die Logik der Eingänge, so dass HIGH-Pegel = LOW-Pegel und umgedreht. Hat aber nur auf die Eingänge Auswirkung!'),
         dict( section = '[KeyboardName]_InputPins', key = '*', type = 'string', default = '', mandatory = False, description = 'Auflistung der Eingabeschnittstellen im Format <code>[PinName] = [Action]</code>. Bitte dazu die möglichen Actions und deren Syntax beachten!'),
         dict( section = '[KeyboardName]_OutputPins', key = '*', type = 'string', default = '', mandatory = False, description = 'Auflistung der Eingabeschnittstellen im Format <code>[PinName] = [SprechenderPinName]</code> - z.B. gibt es den GPIO Ausgang 27 für den Türöffner, so wäre die Syntax <code>27 = Tueroeffner</code>. Umlaute und Sonderzeichen sollten vermieden werden!')
@@ -209,22 +211,26 @@ Hier die Beschreibung aus der <a href="https://github.com/motom001/DoorPi/blob/m
             configuration = [
                 dict( section = '[KeyboardName]', key = 'port', type = 'string', default = '/dev/ttyAMA0', mandatory = False, description = ''),
                 dict( section = '[KeyboardName]', key = 'baudrate', type = 'integer', default = '9600', mandatory = False, description = ''),
-                dict( section = '[KeyboardName]', key = 'dismisstime', type = 'integer', default = '5', mandatory = False, description = ''),
+                dict( section = '[KeyboardName]', key = 'dismisstime', type = 'integer', default = '5', mandatory = False, description = 'Sekunden, in denen ein erneutes Lesen desselben Tags ignoriert wird (Default für debounce_time).'),
+                dict( section = '[KeyboardName]', key = 'credential_store', type = 'string', default = '', mandatory = False, description = 'SQLite Datenbank mit Tags und deren Gruppen (auch für pn532). Die Gruppen werden wie InputPins verwendet.'),
+                dict( section = '[KeyboardName]', key = 'credential_file', type = 'string', default = '', mandatory = False, description = 'Optionale Datei mit einer Zeile pro Tag (tag;gruppe;gültig_ab;gültig_bis), die bei Änderungen in die Datenbank übernommen wird.'),
+                dict( section = '[KeyboardName]', key = 'credential_reload_interval', type = 'integer', default = '60', mandatory = False, description = 'Sekunden zwischen zwei Prüfungen der credential_file auf Änderungen.'),
             ],
             text_links = {
                 'serial @ pypi': 'https://pypi.python.org/pypi/serial'
             }
         ),
-        'watchdog': dict(
+        'doorpi.keyboard.Inotify': dict(
             text_warning =          'Häufiges Lesen und Schreiben von SD-Karten wie im RPi können deren Verschleiß fördern. Eventuell sollte auf tmpfs Verzeichnisse ausgewichen werden.',
-            text_description =      '''Das Python-Modul watchdog wird genutzt um ein dateibasierendes Keyboard zu erstellen.
+            text_description =      '''Die inotify-Schnittstelle des Linux-Kernels wird genutzt um ein dateibasierendes Keyboard zu erstellen.
 So können entweder zu Testzwecken ohne Hardware-Aufbau Events und Actions getestet werden oder es kann als Schnittstelle zu anderen Systemen dienen,
 die per SSH-Befehle die Dateien schreiben und lesen, die auch vom virtuellen keyboard verarbeitet werden.
 Dabei kann eingestellt werden, in welchem Ordner die Dateien liegen, die jeweils als Ein- und Ausgabe fungieren und ob die Eingabe Dateien nach Erkennung eines Events durch das Filesystem-Keyboard wieder zurück in den Ausgangszustand versetzt werden.
+Ein Event wird nur ausgelöst, wenn sich der Inhalt einer Datei geändert hat. Alle Dateien werden atomar geschrieben (temporäre Datei und rename).
 ''',
-            text_installation =     'Eine Installation ist nicht nötig, da es sich hierbei um eine Python-Standard-Modul handelt.',
+            text_installation =     'Eine Installation ist nicht nötig, da inotify Teil des Linux-Kernels ist.',
             auto_install =          False,
-            text_test =             'Der Status kann gestestet werden, in dem im Python-Interpreter <code>import ConfigParser</code> eingeben wird.',
+            text_test =             'Der Status kann gestestet werden, in dem im Python-Interpreter <code>import doorpi.keyboard.Inotify</code> eingeben wird.',
             text_configuration =    '',
             configuration = [
                 dict( section = '[KeyboardName]', key = 'base_path_input', type = 'string', default = '', mandatory = False, description = 'Der Pfad in dem die Eingangspins angelegt werden'),
@@ -232,7 +238,31 @@ Dabei kann eingestellt werden, in welchem Ordner die Dateien liegen, die jeweils
                 dict( section = '[KeyboardName]', key = 'reset_input', type = 'boolean', default = 'True', mandatory = False, description = 'Gibt an ob die Dateien nach Erkennung eines Events durch das Filesystem-Keyboard wieder zurück in den Ausgangszustand versetzt werden')
             ],
             text_links = {
-                'watchdog @ pypi': 'https://pypi.python.org/pypi/watchdog'
+                'inotify(7)': 'http://man7.org/linux/man-pages/man7/inotify.7.html'
+            }
+        ),
+        'socket': dict(
+            text_warning =          'Ohne hmac_key kann jeder, der den Port erreicht, Eingaben auslösen. bind_address sollte deshalb nur dann auf 0.0.0.0 gesetzt werden, wenn ein hmac_key gesetzt ist.',
+            text_description =      '''Das Socket-Keyboard (Typ socket) nimmt Eingaben von anderen Systemen per UDP und/oder TCP entgegen.
+Jede Zeile ist ein Frame, mehrere Befehle eines Frames werden mit ";" getrennt: <code>press klingel</code>, <code>down klingel</code>, <code>up klingel</code>, <code>in klingel</code> und <code>out tueroeffner</code>.
+Mit <code>in</code> und <code>out</code> wird der aktuelle Zustand eines Eingangs oder Ausgangs zurückgeliefert. Ein UDP-Datagramm kann mehrere Zeilen enthalten.
+Ist ein hmac_key gesetzt, beginnt jeder Frame mit dem HMAC-SHA256 (hex) des restlichen Frames und einem Unix-Zeitstempel: <code>[hmac] [zeitstempel] press klingel</code>
+Jeder signierte Frame wird nur einmal angenommen, ein mitgeschnittener Frame kann also nicht erneut gesendet werden. Zwei Frames mit gleichem Inhalt brauchen deshalb verschiedene Zeitstempel (z.B. mit Sekundenbruchteilen).
+''',
+            text_installation =     'Eine Installation ist nicht nötig, da socket Teil der Python-Standardbibliothek ist.',
+            auto_install =          False,
+            text_test =             'Der Status kann gestestet werden, in dem im Python-Interpreter <code>import socket</code> eingeben wird.',
+            text_configuration =    '',
+            configuration = [
+                dict( section = '[KeyboardName]', key = 'udp_port', type = 'integer', default = '0', mandatory = False, description = 'UDP-Port für Eingaben (0 = kein UDP)'),
+                dict( section = '[KeyboardName]', key = 'tcp_port', type = 'integer', default = '0', mandatory = False, description = 'TCP-Port für Eingaben (0 = kein TCP)'),
+                dict( section = '[KeyboardName]', key = 'bind_address', type = 'string', default = '127.0.0.1', mandatory = False, description = 'Adresse auf der UDP- und TCP-Port geöffnet werden'),
+                dict( section = '[KeyboardName]', key = 'hmac_key', type = 'string', default = '', mandatory = False, description = 'Schlüssel für die Signatur der Frames (leer = keine Signatur nötig)'),
+                dict( section = '[KeyboardName]', key = 'hmac_max_age', type = 'integer', default = '30', mandatory = False, description = 'Maximales Alter eines signierten Frames in Sekunden'),
+                dict( section = '[KeyboardName]', key = 'max_connections', type = 'integer', default = '8', mandatory = False, description = 'Maximale Anzahl gleichzeitiger TCP-Verbindungen')
+            ],
+            text_links = {
+                'docs.python.org': 'https://docs.python.org/2.7/library/socket.html'
             }
         )
     }
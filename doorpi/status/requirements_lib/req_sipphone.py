@@ -9,7 +9,8 @@ from doorpi.sipphone.AbstractBaseClass import SIPPHONE_SECTION
 
 REQUIREMENT = dict(
     fulfilled_with_one = True,
-    text_description = 'Die Aufgabe von einem SIP-Phone innerhalb von DoorPi ist es, die Telefeongespräche (VoIP-Verbindungen) herzustellen. Dazu kann das Sip-Phone entweder mit oder ohne einem SIP-Server (z.B. FritzBox oder Asterisk) zusammen arbeiten.',
+    text_description = '''Die Aufgabe von einem SIP-Phone innerhalb von DoorPi ist es, die Telefeongespräche (VoIP-Verbindungen) herzustellen. Dazu kann das Sip-Phone entweder mit oder ohne einem SIP-Server (z.B. FritzBox oder Asterisk) zusammen arbeiten.
+Anrufe nimmt DoorPi nur von den Nummern der Sektion "AdminNumbers" an. Jeder Schlüssel der Sektion ist eine Nummer (Wert active): verglichen wird der Benutzer der SIP-Adresse, mit @ auch der Host (z.B. <code>**621@fritz.box = active</code>). Platzhalter * und ? sind möglich (z.B. <code>0170*</code> oder <code>*@fritz.box</code> - ein führendes ** gehört zur Nummer), <code>*</code> allein erlaubt alle Anrufer.''',
     events = [
         dict( name = 'OnSipPhoneCreate', description = 'Das SIP-Phone wurde erstellt und kann gestartet werden.'),
         dict( name = 'OnSipPhoneStart', description = 'Das SIP-Phone wurde gestartet und ist jetzt einsatzbereit.'),
@@ -22,6 +23,17 @@ REQUIREMENT = dict(
         dict( name = 'AfterSipPhoneMakeCall', description = 'Das Gespräch wurde hergestellt und es klingelt an der Gegenstelle'),
         dict( name = 'OnSipPhoneCallTimeoutNoResponse', description = 'Das Gespräch wurde beendet, da die Gegenstelle nicht abgenommen hat (Parameter call_timeout)'),
         dict( name = 'OnSipPhoneCallTimeoutMaxCalltime', description = 'Das Gespräch wurde beendet, da das Gespräch länger als erlaubt lief (Parameter max_call_time)'),
+        dict( name = 'OnRingGroupStart', description = 'Die Action ringgroup:nummer|verzögerung|timeout,... lässt mehrere Ziele gleichzeitig klingeln (maximal ua.max_calls). Während eines aktiven Anrufs wird sie nicht gestartet, der Anruf wird nicht aufgelegt.'),
+        dict( name = 'OnRingGroupTarget', description = 'Ein Ziel der Ringgroup ist fertig - Parameter number, outcome (answered, cancelled, timeout, ended, failed) und ring_time.'),
+        dict( name = 'OnRingGroupAnswered', description = 'Ein Ziel der Ringgroup hat als erstes abgenommen und wird verbunden, alle anderen Anrufe werden abgebrochen (Parameter number und time_to_answer). Deren Ende löst kein OnCallStateDisconnect aus.'),
+        dict( name = 'OnRingGroupFinished', description = 'Die Ringgroup ist beendet - Parameter answered_by, time_to_answer und outcomes aller Ziele.'),
+        dict( name = 'OnSipRegistrationOk', description = 'DoorPi ist am SIP-Server angemeldet (Parameter registrar). Gespräche, die ohne Anmeldung gestartet wurden, werden jetzt aufgebaut.'),
+        dict( name = 'OnSipRegistrationFailed', description = 'Die Anmeldung am SIP-Server ist fehlgeschlagen (Parameter registrar und reason).'),
+        dict( name = 'OnSipRegistrarFailover', description = 'Der aktive SIP-Server antwortet nicht oder die Anmeldung ist fehlgeschlagen - es wird zum nächsten erreichbaren Server aus sipserver_backup gewechselt (Parameter from, to und reason).'),
+        dict( name = 'OnSipRegistrarFailback', description = 'Der erste SIP-Server (sipserver_server) antwortet wieder und wird wieder verwendet.'),
+        dict( name = 'OnCallSetupTrace', description = 'Zeiten des Verbindungsaufbaus vom Tastendruck bis zur Media-Verbindung (Parameter correlation_id, complete, phases und doorpi_input_time, doorpi_call_time, pbx_time, callee_time, media_time, total_time, player_time, recorder_time in Sekunden). Die Perzentile stehen im Status des SIP-Phones unter call_trace.'),
+        dict( name = 'OnRecordingProcessed', description = 'Eine Aufnahme wurde komprimiert und im Index gespeichert (Parameter file_name, duration, size und source_size).'),
+        dict( name = 'OnRecordingDeleted', description = 'Eine Aufnahme wurde gelöscht, weil recordings_max_size oder recordings_max_age überschritten wurde (Parameter file_name und reason).'),
         dict( name = 'OnPlayerCreated', description = 'Es wurde ein Player erstellt und es kann beim nächsten Anruf eine Sounddatei als Wartemusik abgespielt werden (Parameter dialtone)'),
         dict( name = 'OnCallMediaStateChange', description = 'Die Nutzung der Ein- un Ausgabegeräte (Audio und Video) hat sich geändert.'),
         dict( name = 'OnMediaRequired', description = 'Es existiert ein Call und es wird das Media-Gerät benötigt. Kann z.B. genutzt werden um Verstärker zu aktivieren.'),
@@ -56,18 +68,37 @@ REQUIREMENT = dict(
         dict( section = SIPPHONE_SECTION, key = 'sipphone_username', type = 'string', default = '', mandatory = False, description = 'Benutzer zur Anmeldung am SIP-Phone Server'),
         dict( section = SIPPHONE_SECTION, key = 'sipphone_password', type = 'string', default = '', mandatory = False, description = 'Passwort zur Anmeldung am SIP-Phone Server'),
         dict( section = SIPPHONE_SECTION, key = 'sipphone_realm', type = 'string', default = '', mandatory = False, description = 'Realm zur Anmeldung am SIP-Phone Server (z.B. "fritz.box" bei der FritzBox)'),
+        dict( section = SIPPHONE_SECTION, key = 'sipserver_backup', type = 'string', default = '', mandatory = False, description = 'Weitere SIP-Server (kommagetrennt, z.B. 192.168.1.2:5060), zu denen gewechselt wird, wenn der erste Server nicht erreichbar ist. Die Überwachung der Anmeldung ist nur aktiv, wenn sich DoorPi anmeldet (bei linphone nur mit sipserver_username und sipserver_password).'),
+        dict( section = SIPPHONE_SECTION, key = 'registration_probe_interval', type = 'float', default = '30', mandatory = False, description = 'Abstand in Sekunden, in dem alle SIP-Server mit OPTIONS angepingt werden.'),
+        dict( section = SIPPHONE_SECTION, key = 'registration_probe_timeout', type = 'float', default = '2', mandatory = False, description = 'Wartezeit in Sekunden auf die Antwort eines OPTIONS-Pings.'),
+        dict( section = SIPPHONE_SECTION, key = 'registration_probe_failures', type = 'integer', default = '2', mandatory = False, description = 'Anzahl der Pings ohne Antwort, bis ein SIP-Server als ausgefallen gilt.'),
+        dict( section = SIPPHONE_SECTION, key = 'registration_failback_probes', type = 'integer', default = '3', mandatory = False, description = 'Anzahl der beantworteten Pings des ersten SIP-Servers, bis wieder zu ihm gewechselt wird.'),
+        dict( section = SIPPHONE_SECTION, key = 'registration_queue_timeout', type = 'float', default = '30', mandatory = False, description = 'So viele Sekunden wartet ein Gespräch, das ohne Anmeldung am SIP-Server gestartet wurde, auf die Anmeldung.'),
         dict( section = SIPPHONE_SECTION, key = 'identity', type = 'string', default = 'DoorPi', mandatory = False, description = 'Name, der beim Telefongespräch angezeigt wird'),
         dict( section = SIPPHONE_SECTION, key = 'ua.max_calls', type = 'integer', default = '2', mandatory = False, description = 'Anzahl der max. gleichzeitigen Gespräche'),
         dict( section = SIPPHONE_SECTION, key = 'local_port', type = 'integer', default = '5060', mandatory = False, description = 'Der Port auf dem VoIP SIP Gespräche angenommen werden.'),
         dict( section = SIPPHONE_SECTION, key = 'max_call_time', type = 'integer', default = '120', mandatory = False, description = 'maximale Zeit eines Gespräches bis zum automatischen Auflegen'),
         dict( section = SIPPHONE_SECTION, key = 'call_timeout', type = 'integer', default = '15', mandatory = False, description = 'maximale Zeit die es DoorPi am Telefon klingeln lässt, bevor es wieder auflegt'),
+        dict( section = SIPPHONE_SECTION, key = 'call_event_workers', type = 'integer', default = '4', mandatory = False, description = 'Die Events eines Gespräches werden nacheinander in der Reihenfolge der SIP-Callbacks ausgelöst, mehrere Gespräche parallel mit maximal so vielen Threads.'),
+        dict( section = SIPPHONE_SECTION, key = 'pump_interval_call', type = 'integer', default = '20', mandatory = False, description = 'Ein eigener Thread bedient die SIP-Bibliothek - Abstand der Durchläufe in ms während eines Gespräches.'),
+        dict( section = SIPPHONE_SECTION, key = 'pump_interval_idle', type = 'integer', default = '250', mandatory = False, description = 'Abstand der Durchläufe in ms ohne Gespräch. Ein neues Gespräch weckt den Thread sofort.'),
         dict( section = SIPPHONE_SECTION, key = 'dialtone', type = 'string', default = '', mandatory = False, description = 'Pfad zur DialTone Datei. diese wird abgespielt, wenn eine Klingel betätigt wird und dient als Zeichen, dass es klingelt für den Besucher. (z.B. !BASEPATH!/doorpi/media/ShortDialTone.wav)'),
         dict( section = SIPPHONE_SECTION, key = 'dialtone_renew_every_start', type = 'boolean', default = '', mandatory = False, description = 'Der DialTone soll bei jedem Start erneut erstellt werden.'),
         dict( section = SIPPHONE_SECTION, key = 'dialtone_volume', type = 'integer', default = '35', mandatory = False, description = 'Lautstärke des DialTone, der erzeugt werden soll (in %).'),
+        dict( section = SIPPHONE_SECTION, key = 'dialtone_pattern', type = 'string', default = 'dialtone', mandatory = False, description = 'Tonfolge des DialTone: Name (dialtone, ringback_de, ringback_at, ringback_ch, ringback_fr, ringback_uk, ringback_us, busy_de, busy_uk, busy_us, confirm, beep) oder eigene Folge aus Frequenzen (mit + gemischt, 0 = Pause) und Sekunden, z.B. 400+450:0.4,0:0.2,400+450:0.4,0:2'),
+        dict( section = SIPPHONE_SECTION, key = 'dialtone_cache', type = 'string', default = '!BASEPATH!/media/tones', mandatory = False, description = 'Ablagepfad der erzeugten Töne - ein Ton mit gleicher Tonfolge und Lautstärke wird nur noch kopiert (leer = kein Cache).'),
         dict( section = SIPPHONE_SECTION, key = 'records', type = 'string', default = '', mandatory = False, description = 'Ablagepfad der aufgenommenen Gespräche (z.B. !BASEPATH!/records/!LastKey!/%Y-%m-%d_%H-%M-%S.wav)'),
         dict( section = SIPPHONE_SECTION, key = 'record_while_dialing', type = 'string', default = 'False', mandatory = False, description = 'Soll das Gespräch schon aufgenommen werden, wenn es klingelt (True) oder erst wenn die Gegenseite abgenommmen hat (False). Im Fall von verpassten Anrufen kann man aufgrund der Geräusche den Besucher eventuell erkennen.'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_index', type = 'string', default = '', mandatory = False, description = 'Index der Aufnahmen (SQLite, z.B. !BASEPATH!/conf/recordings.db). Nach dem Ende einer Aufnahme wird sie im Hintergrund komprimiert und mit Gegenstelle, Dauer und Taste gespeichert - leer = Aufnahmen werden nicht bearbeitet. Beim Start werden nur Dateien übernommen, deren Name zu records passt, andere Dateien werden nie komprimiert oder gelöscht. Liste unter /recordings, Datei unter /recordings/file?id=...'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_format', type = 'string', default = 'pcm', mandatory = False, description = 'Format der komprimierten Aufnahmen: pcm (16 Bit mono, in jedem Browser abspielbar) oder adpcm (IMA ADPCM, ein Viertel von pcm).'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_sample_rate', type = 'integer', default = '8000', mandatory = False, description = 'Abtastrate der komprimierten Aufnahmen in Hz.'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_workers', type = 'integer', default = '1', mandatory = False, description = 'Anzahl der Prozesse, die Aufnahmen komprimieren.'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_nice', type = 'integer', default = '10', mandatory = False, description = 'Priorität (nice) der Prozesse, die Aufnahmen komprimieren.'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_max_size', type = 'integer', default = '500', mandatory = False, description = 'Maximale Größe aller Aufnahmen in MB - die ältesten werden gelöscht (0 = keine Grenze).'),
+        dict( section = SIPPHONE_SECTION, key = 'recordings_max_age', type = 'integer', default = '0', mandatory = False, description = 'Aufnahmen, die älter als so viele Tage sind, werden gelöscht (0 = keine Grenze).'),
         dict( section = SIPPHONE_SECTION, key = 'snapshot_path', type = 'string', default = '!Basepath!/doorpi/media/snapshots', mandatory = False, description = 'Ablagepfad der erstellten Bilder vor dem Läuten (z.B. !BASEPATH!/doorpi/media/snapshots)'),
-        dict( section = SIPPHONE_SECTION, key = 'number_of_snapshots', type = 'integer', default = '10', mandatory = False, description = 'Anzahl der Bilder die gespeichert werden.')
+        dict( section = SIPPHONE_SECTION, key = 'number_of_snapshots', type = 'integer', default = '10', mandatory = False, description = 'Anzahl der Bilder die gespeichert werden. Die Bilder werden in der Datei .snapshots.index im Ablagepfad verzeichnet - Liste unter /snapshots?offset=0&limit=50, Bild unter /snapshots/file?name=...'),
+        dict( section = 'AdminNumbers', key = '*', type = 'string', default = '', mandatory = False, description = 'Auflistung der Nummern, deren Anrufe DoorPi annimmt, im Format <code>[Nummer] = active</code> - siehe Sektion AdminNumbers in der Beschreibung.')
     ],
     libraries = dict(
         linphone = dict(
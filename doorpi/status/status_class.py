@@ -16,6 +16,7 @@ MODULES = [
     'config',
     'keyboard',
     'sipphone',
+    'camera',
     'event_handler',
     'history_event',
     'history_snapshot',
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+logger = logging.getLogger(__name__)
+logger.debug("%s loaded", __name__)
+
+def get(*args, **kwargs):
+    try:
+        if len(kwargs['name']) == 0: kwargs['name'] = ['']
+        if len(kwargs['value']) == 0: kwargs['value'] = ['']
+
+        camera = kwargs['DoorPiObject'].camera
+        if camera is None: return {'running': False}
+
+        status = {}
+        statistic = camera.statistic
+        for name_requested in kwargs['name']:
+            for key in statistic.keys():
+                if name_requested in key: status[key] = statistic[key]
+        return status
+
+    except Exception as exp:
+        logger.exception(exp)
+        return {'Error': 'could not create '+str(__name__)+' object - '+str(exp)}
+
+def is_active(doorpi_object):
+    return doorpi_object.camera is not None
@@ -47,6 +47,7 @@ REQUIREMENTS_DOORPI = {
     'event_handler':    load_module_status('req_event_handler'),
     'webserver':    load_module_status('req_webserver'),
     'keyboard':    load_module_status('req_keyboard'),
+    'camera':    load_module_status('req_camera'),
     'system':    load_module_status('req_system')
 }
 
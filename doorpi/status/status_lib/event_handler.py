@@ -5,6 +5,8 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
+from doorpi.action import http_client, ips_client, mail_queue
+
 def get(*args, **kwargs):
     try:
         if len(kwargs['name']) == 0: kwargs['name'] = ['']
@@ -30,6 +32,18 @@ def get(*args, **kwargs):
                 status['threads'] = str(event_handler.threads)
             if name_requested in 'idle':
                 status['idle'] = event_handler.idle
+            if name_requested in 'lanes':
+                status['lanes'] = {}
+                for lane in event_handler.lanes:
+                    status['lanes'][lane] = event_handler.lanes[lane].statistic
+            if name_requested in 'eventlog':
+                status['eventlog'] = event_handler.db.statistic
+            if name_requested in 'http':
+                status['http'] = http_client.HTTP_CLIENT.statistic if http_client.HTTP_CLIENT else {}
+            if name_requested in 'ips':
+                status['ips'] = ips_client.IPS_CLIENT[1].statistic if ips_client.IPS_CLIENT else {}
+            if name_requested in 'mail':
+                status['mail'] = mail_queue.MAIL_QUEUE.statistic if mail_queue.MAIL_QUEUE else {}
 
         return status
     except Exception as exp:
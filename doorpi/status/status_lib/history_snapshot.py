@@ -6,6 +6,8 @@ import os
 logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
+from doorpi.camera.SnapshotCatalogue import load_catalogue
+
 DOORPI_SECTION = 'DoorPi'
 
 def get(*args, **kwargs):
@@ -15,9 +17,8 @@ def get(*args, **kwargs):
         if len(kwargs['value']) == 0: kwargs['value'] = ['']
 
         path = kwargs['DoorPiObject'].config.get_string_parsed(DOORPI_SECTION, 'snapshot_path')
-        if os.path.exists(path):
-            files = [os.path.join(path,i) for i in os.listdir(path)]
-            files = sorted(files, key=os.path.getmtime)
+        if path and os.path.exists(path):
+            files = load_catalogue(path).files()
             # because path is added by webserver automatically
             if path.find('DoorPiWeb'):
                     changedpath = path[path.find('DoorPiWeb')+len('DoorPiWeb'):]
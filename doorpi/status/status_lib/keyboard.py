@@ -6,6 +6,7 @@ logger = logging.getLogger(__name__)
 logger.debug("%s loaded", __name__)
 
 from datetime import datetime
+from doorpi.keyboard.IOReactor import REACTOR
 
 def get(*args, **kwargs):
     try:
@@ -33,6 +34,13 @@ def get(*args, **kwargs):
                     for output_pin in status['output'].keys():
                         if value_requested not in output_pin:
                             del status['output'][output_pin]
+
+            if name_requested in 'reactor':
+                status['reactor'] = REACTOR.statistic
+
+            if name_requested in 'debounce':
+                status['debounce'] = dict((keyboard_name, single_keyboard.edge_filter_statistic)
+                                          for keyboard_name, single_keyboard in keyboard.keyboards.items())
         return status
 
     except Exception as exp:
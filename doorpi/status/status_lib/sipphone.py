@@ -56,6 +56,24 @@ def get(*args, **kwargs):
             if name_requested in 'current_call':
                 status['current_call'] = sipphone.current_call_dump
 
+            if name_requested in 'call_events':
+                status['call_events'] = sipphone.call_events.statistic
+
+            if name_requested in 'pump':
+                status['pump'] = sipphone.pump.statistic
+
+            if name_requested in 'registration':
+                status['registration'] = sipphone.registration.statistic
+
+            if name_requested in 'call_trace':
+                status['call_trace'] = sipphone.call_trace.statistic
+
+            if name_requested in 'admin_numbers':
+                status['admin_numbers'] = sipphone.admin_numbers.statistic
+
+            if name_requested in 'recordings':
+                status['recordings'] = sipphone.recordings.statistic
+
         return status
     except Exception as exp:
         logger.exception(exp)
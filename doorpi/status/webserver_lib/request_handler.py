@@ -16,6 +16,8 @@ from urllib2 import urlopen as load_online_fallback
 from urllib import unquote_plus
 
 from doorpi.action.base import SingleAction
+from doorpi.action.input_trace import TRACE_WEB
+from doorpi.camera.SnapshotCatalogue import load_catalogue
 import doorpi
 from request_handler_static_functions import *
 
@@ -28,6 +30,10 @@ VIRTUELL_RESOURCES = [
     '/control/config_value_delete',
     '/control/config_save',
     '/control/config_get_configfile',
+    '/recordings',
+    '/recordings/file',
+    '/snapshots',
+    '/snapshots/file',
     '/help/modules.overview.html'
 ]
 
@@ -94,6 +100,7 @@ class DoorPiWebRequestHandler(BaseHTTPRequestHandler):
                 except IndexError:      para[parameter_name] = ''
 
             if control_order == "trigger_event":
+                doorpi.DoorPi().trace_recorder.record(TRACE_WEB, para.get('event_name'), para.get('event_source'))
                 result_object['message'] = doorpi.DoorPi().event_handler.fire_event_synchron(**para)
                 if result_object['message'] is True:
                     result_object['success'] = True
@@ -152,6 +159,24 @@ class DoorPiWebRequestHandler(BaseHTTPRequestHandler):
                 ).dictionary
             elif path.path.startswith('/control/'):
                 return_object = self.do_control(path.path.split('/')[-1], raw_parameters)
+            elif path.path == '/recordings':
+                return_object = doorpi.DoorPi().sipphone.recordings.list(
+                    offset = int(raw_parameters.get('offset', ['0'])[0]),
+                    limit = int(raw_parameters.get('limit', ['50'])[0])
+                )
+            elif path.path == '/recordings/file':
+                file_name = doorpi.DoorPi().sipphone.recordings.file_name(int(raw_parameters.get('id', ['0'])[0]))
+                if file_name is None: return self.send_error(404, 'recording not found')
+                return self.return_file(file_name, 'audio/wav')
+            elif path.path == '/snapshots':
+                return_object = load_catalogue().list(
+                    offset = int(raw_parameters.get('offset', ['0'])[0]),
+                    limit = int(raw_parameters.get('limit', ['50'])[0])
+                )
+            elif path.path == '/snapshots/file':
+                file_name = load_catalogue().file_name(raw_parameters.get('name', [''])[0])
+                if file_name is None or not os.path.isfile(file_name): return self.send_error(404, 'snapshot not found')
+                return self.return_file(file_name, 'image/jpeg')
             elif path.path == '/help/modules.overview.html':
                 raw_parameters = self.clear_parameters(raw_parameters)
                 return_object, mime = self.get_file_content('/dashboard/parts/modules.overview.html')
@@ -292,6 +317,21 @@ class DoorPiWebRequestHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(message)
 
+    def return_file(self, file_name, content_type):
+        # streamed - recordings don't have to fit into memory
+        with open(file_name, 'rb') as file:
+            self.send_response(200)
+            self.send_header("Server", doorpi.DoorPi().name_and_version)
+            self.send_header("Content-type", content_type)
+            self.send_header("Content-Length", str(os.path.getsize(file_name)))
+            self.send_header("Content-Disposition", 'inline; filename="%s"' % os.path.basename(file_name))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            while True:
+                chunk = file.read(65536)
+                if not chunk: break
+                self.wfile.write(chunk)
+
     def login_form(self):
         try:
             login_form_content = self.read_from_file(self.server.www + "/" + self.server.loginfile)